@@ -64,6 +64,10 @@ def file_endpoint(request, piece_id):
         except OSError:
             pass
 
+    # Le texte extrait du PDF précédent n'est plus valable (même nom possible)
+    from avocat_app.services import pdf_text
+    pdf_text.invalidate(piece)
+
     piece.fichier.save(upload.name, upload, save=False)
     # Bump updated_at so clients pull a fresh metadata row that points at the
     # new path. is_deleted left as-is.
@@ -12,6 +12,13 @@ class AvocatAppConfig(AppConfig):
         from .services import signals  # noqa: F401 — ensure signal registration
         from .services import auth_signals  # إشارات التوكن
         from .services import audit_signals  # <— تفعيل إشارات التدقيق
+        from .services import contumace_search  # noqa: F401 — index de recherche المسطرة الغيابية
+        from .services import vector_index  # noqa: F401 — index des embeddings (jurisprudence)
+        from .services import ann_index  # noqa: F401 — journal de l'index ANN sur disque
+        from .services import lexical_index  # noqa: F401 — index BM25 (jurisprudence)
+        from .services import passages  # noqa: F401 — index des passages des textes sources
+        from .services import pdf_text  # noqa: F401 — extraction des PDF joints en tâche de fond
+        from .services import global_search  # noqa: F401 — index de la recherche globale
 
         from django.conf import settings
         if getattr(settings, "DESKTOP_MODE", False):
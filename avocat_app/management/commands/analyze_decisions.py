@@ -0,0 +1,133 @@
+"""
+Analyse IA (Claude) des décisions en masse.
+
+Usage:
+    python manage.py analyze_decisions                     # décisions sans analyse réussie
+    python manage.py analyze_decisions --all --workers=8   # tout ré-analyser
+    python manage.py analyze_decisions --affaire=<uuid> --pdf
+    python manage.py analyze_decisions --limit=50 --rpm=20 --model=claude-haiku-4-5
+
+Sans --all, seules les décisions sans analyse, en erreur ou en dry-run sont
+traitées. Source : texte source de l'analyse existante, sinon (--pdf) le PDF
+le plus récent de l'affaire, sinon le résumé de la décision.
+
+Les appels partent vers --workers threads sous ANTHROPIC_REQUESTS_PER_MINUTE
+(ou --rpm) ; 429 / 529 / 5xx sont retentés. Un texte déjà analysé par le même
+modèle est repris du cache (ai_analysis_cache) sans appel. Les écritures
+(analyse, embedding, passages) restent dans le thread principal.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from avocat_app.models import Decision, DecisionAnalysis
+from avocat_app.services import ai_client
+from avocat_app.services.mahakim_sync import RateLimiter
+
+
+class Command(BaseCommand):
+    help = "تحليل الأحكام بالذكاء الاصطناعي دفعة واحدة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Ré-analyser aussi les analyses réussies")
+        parser.add_argument("--affaire", default=None, help="Limiter à une affaire (uuid)")
+        parser.add_argument("--limit", type=int, default=None, help="Nombre maximal de décisions")
+        parser.add_argument("--pdf", action="store_true", help="Extraire le PDF le plus récent de l'affaire")
+        parser.add_argument("--model", default=None, help="Modèle Claude (défaut: ANTHROPIC_MODEL)")
+        parser.add_argument("--workers", type=int, default=4, help="Requêtes en parallèle (défaut: 4)")
+        parser.add_argument("--rpm", type=float, default=None,
+                            help="Requêtes par minute (défaut: ANTHROPIC_REQUESTS_PER_MINUTE, 0 = sans limite)")
+        parser.add_argument("--purge-cache", action="store_true", help="Supprimer d'abord les entrées expirées")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers doit être ≥ 1")
+        if options["rpm"] is not None:
+            ai_client._LIMITER = RateLimiter(60.0 / options["rpm"] if options["rpm"] > 0 else 0.0)
+        if not getattr(settings, "ANTHROPIC_API_KEY", "") or getattr(settings, "ANTHROPIC_DRY_RUN", False):
+            self.stdout.write(self.style.WARNING("ANTHROPIC_API_KEY absente ou ANTHROPIC_DRY_RUN : mode dry-run"))
+        if options["purge_cache"]:
+            self.stdout.write(f"Cache : {ai_client.purge_cache()} entrée(s) expirée(s) supprimée(s)")
+
+        qs = Decision.objects.select_related("affaire").order_by("-date_prononce")
+        if options["affaire"]:
+            qs = qs.filter(affaire_id=options["affaire"])
+        if not options["all"]:
+            done = DecisionAnalysis.objects.filter(generated_at__isnull=False, is_dry_run=False)
+            qs = qs.exclude(pk__in=done.values("decision_id"))
+        if options["limit"]:
+            qs = qs[:options["limit"]]
+        decisions = list(qs)
+        sources = dict(DecisionAnalysis.all_objects
+                       .filter(decision__in=decisions).exclude(Q(source_text="") | Q(source_text__isnull=True))
+                       .values_list("decision_id", "source_text"))
+
+        model = options["model"] or getattr(settings, "ANTHROPIC_MODEL", ai_client.DEFAULT_MODEL)
+        self.stdout.write(self.style.NOTICE(
+            f"{len(decisions)} décision(s) à analyser ({model}, {options['workers']} thread(s))…"
+        ))
+        stats = {"analyzed": 0, "cached": 0, "dry_run": 0, "failed": 0, "empty": 0}
+        started = time.monotonic()
+        pending = {}
+        todo = iter(decisions)
+        with ThreadPoolExecutor(max_workers=options["workers"], thread_name_prefix="claude") as pool:
+            while True:
+                # Fenêtre bornée : les textes (PDF extraits) ne sont pas tous gardés en mémoire
+                while len(pending) < options["workers"] * 2:
+                    decision = next(todo, None)
+                    if decision is None:
+                        break
+                    text = self._source(decision, sources.get(decision.pk), options["pdf"])
+                    if not text.strip():
+                        stats["empty"] += 1
+                        continue
+                    pending[pool.submit(_analyze, text, model)] = (decision, text)
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    decision, text = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = ai_client.AnalysisResult(ok=False, model_used=model, error_message=str(e))
+                    ai_client.save_analysis(decision, text, result)
+                    if not result.ok:
+                        stats["failed"] += 1
+                        self.stderr.write(f"  {decision.numero_decision} : {result.error_message[:200]}")
+                    elif result.is_dry_run:
+                        stats["dry_run"] += 1
+                    elif result.from_cache:
+                        stats["cached"] += 1
+                    else:
+                        stats["analyzed"] += 1
+                    seen = sum(stats.values())
+                    if seen % 10 == 0:
+                        elapsed = max(1e-6, time.monotonic() - started)
+                        self.stdout.write(f"  {seen}/{len(decisions)} — {seen / elapsed:.2f}/s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Analysées: {stats['analyzed']} | Depuis le cache: {stats['cached']} | "
+            f"Dry-run: {stats['dry_run']} | Sans texte: {stats['empty']} | Échecs: {stats['failed']} — "
+            f"{time.monotonic() - started:.1f} s"
+        ))
+        if stats["failed"]:
+            raise CommandError(f"{stats['failed']} décision(s) non analysée(s)")
+
+    def _source(self, decision, existing, use_pdf):
+        piece = None
+        if not existing and use_pdf:
+            piece = decision.affaire.pieces.filter(type_piece="PDF").order_by("-date_ajout").first()
+        return ai_client.decision_source_text(decision, source_text=existing, piece_jointe=piece)
+
+
+def _analyze(text, model):
+    # Thread du pool : lecture / écriture du cache d'analyses sur sa propre connexion
+    try:
+        return ai_client.analyze_decision_text(text, model=model)
+    finally:
+        connection.close()
@@ -0,0 +1,101 @@
+"""
+Rappel@k et latence de l'index ANN (IVF) face à la recherche exacte.
+
+Usage:
+    python manage.py bench_ann_index                              # 100k vecteurs synthétiques, dim 512
+    python manage.py bench_ann_index --size=1000000 --nprobe=4,8,16,32,64
+    python manage.py bench_ann_index --model=voyage-3              # build courant, requêtes tirées de la base
+
+Synthétique : vecteurs groupés autour de `--clusters` thèmes (les
+embeddings réels ne sont pas uniformes), build écrit dans un dossier
+temporaire. Avec `--model`, le build courant du modèle est comparé à la
+recherche exacte sur les mêmes vecteurs ; les requêtes sont des embeddings
+de la base légèrement bruités. Rappel@k = part des k plus proches exacts
+retrouvés par l'index approché.
+"""
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services import ann_index
+
+
+class Command(BaseCommand):
+    help = "قياس دقة وسرعة الفهرس التقريبي مقارنة بالبحث الشامل"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100000, help="Vecteurs synthétiques (défaut: 100000)")
+        parser.add_argument("--dim", type=int, default=512)
+        parser.add_argument("--clusters", type=int, default=2000, help="Thèmes synthétiques (défaut: 2000)")
+        parser.add_argument("--nlist", type=int, default=None, help="Listes du build (défaut: √n)")
+        parser.add_argument("--nprobe", default="1,4,8,16,32", help="Valeurs de nprobe à mesurer")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--model", default=None, help="Mesurer le build courant de ce modèle")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            nprobes = [int(x) for x in options["nprobe"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--nprobe : entiers séparés par des virgules")
+        k = options["top_k"]
+        rng = np.random.default_rng(options["seed"])
+
+        if options["model"]:
+            index = ann_index.get(options["model"])
+            if index is None:
+                raise CommandError(f"Aucun index pour {options['model']} (rebuild_ann_index)")
+            self._measure(index, np.asarray(index.vectors), [uuid.UUID(bytes=r.tobytes()) for r in index.ids],
+                          rng, nprobes, k, options["queries"])
+            return
+
+        n, dim = options["size"], options["dim"]
+        if n < 1 or dim < 1 or options["clusters"] < 1:
+            raise CommandError("--size, --dim et --clusters doivent être ≥ 1")
+        centers = rng.standard_normal((options["clusters"], dim), dtype=np.float32)
+        labels = rng.integers(0, options["clusters"], n)
+        data = centers[labels] + rng.standard_normal((n, dim), dtype=np.float32) * 0.6
+        data /= np.linalg.norm(data, axis=1, keepdims=True)
+        ids = [uuid.UUID(int=i + 1) for i in range(n)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            meta = ann_index.build(Path(tmp) / "build", zip(ids, data), n, model="bench",
+                                   nlist=options["nlist"], seed=options["seed"])
+            self.stdout.write(f"Build : {n} vecteurs × {dim}, {meta['nlist']} listes, {meta['seconds']} s")
+            index = ann_index.AnnIndex(Path(tmp) / "build")
+            self._measure(index, data, ids, rng, nprobes, k, options["queries"])
+            del index
+
+    def _measure(self, index, data, ids, rng, nprobes, k, n_queries):
+        picks = rng.choice(len(data), min(n_queries, len(data)), replace=False)
+        queries = data[picks] + rng.standard_normal((len(picks), data.shape[1]), dtype=np.float32) * 0.02
+
+        exact, t_exact = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            qn = q / np.linalg.norm(q)
+            scores = data @ qn
+            top = np.argpartition(-scores, k - 1)[:k]
+            t_exact.append((time.perf_counter() - t0) * 1000)
+            exact.append({ids[i] for i in top})
+        self.stdout.write(f"Exact          : p50 {statistics.median(t_exact):7.2f} ms")
+
+        for nprobe in nprobes:
+            recalls, latencies = [], []
+            for q, truth in zip(queries, exact):
+                t0 = time.perf_counter()
+                hits = index.search(q, k, nprobe=nprobe)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                recalls.append(len(truth & {pk for pk, _ in hits}) / k)
+            latencies.sort()
+            self.stdout.write(
+                f"nprobe={nprobe:<4}   : p50 {statistics.median(latencies):7.2f} ms  "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms  "
+                f"rappel@{k} {statistics.mean(recalls):.3f}"
+            )
@@ -0,0 +1,162 @@
+"""
+Latence de la recherche globale sur un index search_document synthétique.
+
+Usage:
+    python manage.py bench_global_search                      # 1 000 000 documents
+    python manage.py bench_global_search --size=200000 --queries=500 --like
+
+Aucune base de l'application n'est lue : l'index est construit dans un
+fichier SQLite temporaire avec les mêmes tables FTS5 trigram, les mêmes
+triggers et la même requête que services/global_search.py (instruction
+UNION ALL + classement en Python). Parties (50 %), affaires (45 %),
+avocats (5 %) et 200 juridictions, noms arabes et latins, téléphones,
+références « AFF-2024-000123 ».
+
+Familles de requêtes : début de mot de 2 lettres, fragment de 3 à 5 lettres,
+nom complet, fragment de téléphone, référence, sans résultat. --like mesure
+aussi l'ancien parcours `LIKE '%q%'` sur quelques requêtes.
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services import global_search as gs
+
+FIRST = ("محمد", "أحمد", "يوسف", "فاطمة", "خديجة", "عبد الله", "سعيد", "حسن", "مريم", "ياسين", "إبراهيم",
+         "عمر", "زينب", "نادية", "رشيد", "كريم", "سلمى", "هشام", "Mohamed", "Karim", "Nadia", "Hélène")
+LAST = ("العلوي", "بنعلي", "الإدريسي", "التازي", "بناني", "الفاسي", "المنصوري", "الشرقاوي", "الزياني",
+        "بوزيان", "العمراني", "الحسني", "Benali", "El Fassi", "Tazi", "Bennani", "Lefèvre", "Alaoui")
+CITIES = ("الرباط", "الدار البيضاء", "فاس", "مراكش", "طنجة", "أكادير", "مكناس", "وجدة", "تطوان", "القنيطرة")
+COURTS = ("المحكمة الابتدائية", "محكمة الاستئناف", "المحكمة التجارية", "المحكمة الإدارية")
+OBJETS = ("أداء دين", "إفراغ محل تجاري", "تعويض عن حادثة سير", "نفقة", "طلاق للشقاق", "فسخ عقد كراء",
+          "شيك بدون رصيد", "قسمة عقار", "تحفيظ عقاري", "نزاع شغل")
+
+
+class Command(BaseCommand):
+    help = "قياس سرعة البحث العام على فهرس اصطناعي"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1_000_000, help="Documents (défaut: 1000000)")
+        parser.add_argument("--queries", type=int, default=300, help="Requêtes par famille")
+        parser.add_argument("--like", action="store_true", help="Mesurer aussi LIKE '%%q%%' (lent)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["size"] < 1000 or options["queries"] < 1:
+            raise CommandError("--size doit être ≥ 1000 et --queries ≥ 1")
+        rng = random.Random(options["seed"])
+        fd, path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(path)
+            samples = self._build(conn, rng, options["size"])
+            self._run(conn, rng, samples, options)
+            conn.close()
+        finally:
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def _build(self, conn, rng, size):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE search_document (id INTEGER PRIMARY KEY, kind TEXT, object_id TEXT, "
+                     "title TEXT, subtitle TEXT, url TEXT, text TEXT, updated_at TEXT)")
+        for sql in gs.SQLITE_DDL:
+            conn.execute(sql)
+
+        samples = {"names": [], "phones": [], "refs": []}
+        t0 = time.perf_counter()
+        rows = []
+        for i in range(size):
+            if i < 200:
+                city = CITIES[i % len(CITIES)]
+                title = f"{COURTS[i % len(COURTS)]} ب{city}"
+                row = ("juridiction", title, city, [title, city, f"T{i:03d}"])
+            elif rng.random() < 0.5:
+                name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+                phone = f"06{rng.randrange(10 ** 8):08d}"
+                row = ("partie", name, f"مدعٍ — {phone}", [name, phone, f"BK{rng.randrange(10 ** 6)}"])
+                if i % 97 == 0:
+                    samples["names"].append(name)
+                    samples["phones"].append(phone)
+            elif rng.random() < 0.9:
+                ref = f"AFF-{rng.randrange(2015, 2027)}-{i:06d}"
+                objet = f"{rng.choice(OBJETS)} {rng.choice(LAST)}"
+                row = ("affaire", ref, f"مدني — {rng.choice(COURTS)}", [ref, f"{i % 9999}/1201/2024", objet])
+                if i % 97 == 0:
+                    samples["refs"].append(ref)
+            else:
+                name = f"ذ. {rng.choice(FIRST)} {rng.choice(LAST)}"
+                row = ("avocat", name, "", [name, f"05{rng.randrange(10 ** 8):08d}"])
+            kind, title, subtitle, searchable = row
+            text = f" {gs.normalize(' '.join(searchable))}"
+            rows.append((kind, str(i), title, subtitle, f"/{kind}/{i}/", text))
+            if len(rows) >= 50_000:
+                self._insert(conn, rows)
+                rows = []
+                self.stdout.write(f"  {i + 1}/{size}…")
+        self._insert(conn, rows)
+        for kind in gs.KINDS:
+            conn.execute(f"INSERT INTO {gs.fts_table(kind)}({gs.fts_table(kind)}) VALUES ('optimize')")
+        conn.commit()
+        self.stdout.write(f"Index : {size} documents en {time.perf_counter() - t0:.1f} s, "
+                          f"{os.path.getsize(conn.execute('PRAGMA database_list').fetchone()[2]) / 2 ** 20:.0f} Mo")
+        return samples
+
+    @staticmethod
+    def _insert(conn, rows):
+        conn.executemany("INSERT INTO search_document (kind, object_id, title, subtitle, url, text) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _run(self, conn, rng, samples, options):
+        n = options["queries"]
+        words = [w for name in FIRST + LAST for w in gs.normalize(name).split() if len(w) >= 3]
+        families = {
+            "2 lettres": [rng.choice(words)[:2] for _ in range(n)],
+            "fragment": [_fragment(rng, rng.choice(words)) for _ in range(n)],
+            "nom complet": [rng.choice(samples["names"]) for _ in range(n)],
+            "téléphone": [_fragment(rng, rng.choice(samples["phones"]), 4, 6) for _ in range(n)],
+            "référence": [rng.choice(samples["refs"]) for _ in range(n)],
+            "sans résultat": ["".join(rng.choice("ضظغثذ") for _ in range(4)) for _ in range(n)],
+        }
+        sql = gs.fts5_sql(list(gs.KINDS))
+        for family, queries in families.items():
+            latencies, hits = [], 0
+            for q in queries:
+                t0 = time.perf_counter()
+                terms = gs.query_words(q)
+                rows = conn.execute(sql, [gs.fts5_match(terms)] * len(gs.KINDS)).fetchall()
+                groups = gs.group(rows, terms, gs.normalize(q))
+                latencies.append((time.perf_counter() - t0) * 1000)
+                hits += bool(groups)
+            self._report(family, latencies, f"avec résultat {hits}/{len(queries)}")
+
+        if options["like"]:
+            # Pire cas de l'ancienne vue : requête rare ou absente, parcours complet
+            latencies = []
+            for q in families["téléphone"][:3] + families["sans résultat"][:3]:
+                t0 = time.perf_counter()
+                conn.execute("SELECT id FROM search_document WHERE text LIKE ? ORDER BY id DESC LIMIT 5",
+                             [f"%{q}%"]).fetchall()
+                latencies.append((time.perf_counter() - t0) * 1000)
+            self._report("LIKE %q%", latencies, "(ancien parcours, requêtes rares)")
+
+    def _report(self, name, latencies, extra=""):
+        latencies.sort()
+        self.stdout.write(
+            f"{name:<14}: p50 {statistics.median(latencies):7.2f} ms  "
+            f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)]:7.2f} ms  "
+            f"max {latencies[-1]:7.2f} ms  {extra}"
+        )
+
+
+def _fragment(rng, word, low=3, high=5):
+    """Sous-chaîne de `word` (requête tapée au milieu d'un nom ou d'un numéro)."""
+    size = min(len(word), rng.randint(low, high))
+    start = rng.randrange(0, len(word) - size + 1)
+    return word[start:start + size]
@@ -0,0 +1,152 @@
+"""
+Qualité et latence de la recherche jurisprudentielle : BM25, vecteurs hachés, fusion RRF.
+
+Usage:
+    python manage.py bench_hybrid_search                       # 20k décisions synthétiques
+    python manage.py bench_hybrid_search --size=100000 --queries=300 --rrf-k=60
+
+Aucune base n'est lue. Chaque décision synthétique combine quelques termes
+juridiques (sous des formes variées : ال، بال، وال، ات، ة…), un ou deux
+numéros d'articles (parfois en chiffres arabes-indiens) et du texte de
+remplissage à distribution de Zipf. Deux familles de requêtes :
+
+- « exactes » : un article et deux termes d'une décision, sous d'autres
+  formes ; pertinentes = décisions qui contiennent les trois ;
+- « paraphrases » : deux termes remplacés par des synonymes absents du
+  corpus ; pertinentes = décisions qui contiennent les deux termes.
+
+Pour chaque méthode et famille : latence p50/p95, rappel@k et MRR.
+
+- « hash-bow » : embeddings de repli (sans clé Voyage) dans l'index exact en
+  mémoire ; search_decisions ne les fusionne pas, BM25 les remplace ;
+- « sémantique » : embeddings simulés d'un modèle réel (somme de vecteurs
+  de concepts des termes, quelle que soit leur forme, plus du bruit ; les
+  numéros d'articles n'y laissent aucune trace) ;
+- « hybride » : fusion RRF des candidats BM25 et sémantiques, comme
+  search_decisions avec Voyage.
+"""
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services.embeddings import (
+    CANDIDATES_FACTOR, RRF_K, _hash_embedding, hash_model_name, reciprocal_rank_fusion,
+)
+from avocat_app.services.lexical_index import LexicalIndex
+from avocat_app.services.vector_index import VectorIndex
+
+LEGAL_TERMS = (
+    "عقد", "كراء", "افراغ", "تعويض", "ضرر", "شيك", "نفقه", "طلاق", "حضانه", "ارث", "وصيه", "رهن",
+    "تحفيظ", "عقار", "شفعه", "قسمه", "بيع", "وعد", "اجير", "مشغل", "فصل", "اقدميه", "حادث", "تامين",
+    "مسؤوليه", "تقادم", "بطلان", "فسخ", "اداء", "فوائد", "كفاله", "افلاس", "شركه", "تسيير", "علامه",
+    "تزوير", "خيانه", "امانه", "سرقه", "نصب", "مخدرات", "اختلاس", "رشوه", "استئناف", "نقض", "اختصاص",
+)
+PREFIXES = ("", "ال", "بال", "وال", "لل")
+SUFFIXES = ("", "", "ات", "ين", "ها")
+_INDIC = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+
+class Command(BaseCommand):
+    help = "قياس جودة وسرعة البحث المعجمي والدلالي والمدمج في الاجتهادات"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=20000, help="Décisions synthétiques (défaut: 20000)")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--words", type=int, default=200, help="Mots de remplissage par décision")
+        parser.add_argument("--rrf-k", type=int, default=RRF_K)
+        parser.add_argument("--dim", type=int, default=256, help="Dimension des embeddings simulés")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        n, k = options["size"], options["top_k"]
+        if n < 1 or options["queries"] < 1 or k < 1:
+            raise CommandError("--size, --queries et --top-k doivent être ≥ 1")
+        rng = np.random.default_rng(options["seed"])
+        filler = ["".join(rng.choice(list(_LETTERS), rng.integers(4, 7))) for _ in range(20000)]
+        weights = 1.0 / np.arange(1, len(filler) + 1)
+        weights /= weights.sum()
+
+        concepts = {t: rng.standard_normal(options["dim"]).astype(np.float32) for t in LEGAL_TERMS}
+        docs, facts, semantic = [], [], []
+        for i in range(n):
+            terms = [str(t) for t in rng.choice(LEGAL_TERMS, 4, replace=False)]
+            articles = [str(a) for a in rng.integers(1, 1000, rng.integers(1, 3))]
+            words = [filler[j] for j in rng.choice(len(filler), options["words"], p=weights)]
+            for t in terms:
+                for _ in range(rng.integers(1, 4)):
+                    words.insert(rng.integers(0, len(words) + 1), _variant(rng, t))
+            for a in articles:
+                number = a.translate(_INDIC) if rng.random() < 0.3 else a
+                words.insert(rng.integers(0, len(words) + 1), f"الفصل {number}")
+            docs.append(" ".join(words))
+            facts.append((set(terms), set(articles)))
+            semantic.append(sum(concepts[t] for t in terms) + rng.standard_normal(options["dim"]) * 1.5)
+
+        t0 = time.perf_counter()
+        lexical = LexicalIndex()
+        lexical.load(enumerate(docs))
+        self.stdout.write(f"BM25       : build {time.perf_counter() - t0:6.2f} s, {lexical.stats()}")
+        t0 = time.perf_counter()
+        model = hash_model_name()
+        vectors = VectorIndex()
+        vectors.load((i, model, _hash_embedding(d)) for i, d in enumerate(docs))
+        self.stdout.write(f"hash-bow   : build {time.perf_counter() - t0:6.2f} s")
+        dense = VectorIndex()
+        dense.load((i, "semantic", v) for i, v in enumerate(semantic))
+
+        synonyms = {t: "س" + "".join(rng.choice(list(_LETTERS), 5)) for t in LEGAL_TERMS}
+        families = {"exactes": [], "paraphrases": []}
+        for target in rng.choice(n, min(options["queries"], n), replace=False):
+            terms, articles = facts[target]
+            article = sorted(articles)[0]
+            picked = [str(t) for t in rng.choice(sorted(terms), 2, replace=False)]
+            vec = sum(concepts[t] for t in picked) + rng.standard_normal(options["dim"]) * 0.5
+            families["exactes"].append((
+                " ".join([f"الفصل {article}"] + [_variant(rng, t) for t in picked]), vec,
+                {i for i, (t, a) in enumerate(facts) if article in a and set(picked) <= t},
+            ))
+            families["paraphrases"].append((
+                " ".join(synonyms[t] for t in picked), vec,
+                {i for i, (t, a) in enumerate(facts) if set(picked) <= t},
+            ))
+
+        depth = k * CANDIDATES_FACTOR
+
+        methods = (
+            ("BM25", lambda q, v: lexical.search(q, k)),
+            ("hash-bow", lambda q, v: vectors.search(model, _hash_embedding(q), k)),
+            ("sémantique", lambda q, v: dense.search("semantic", v, k)),
+            ("hybride", lambda q, v: reciprocal_rank_fusion(
+                [dense.search("semantic", v, depth), lexical.search(q, depth)], k=options["rrf_k"],
+            )[:k]),
+        )
+        for family, queries in families.items():
+            self.stdout.write(f"— Requêtes {family}")
+            for name, search in methods:
+                self._measure(name, search, queries, k)
+
+    def _measure(self, name, search, queries, k):
+        latencies, recalls, rr = [], [], []
+        for text, vec, relevant in queries:
+            t0 = time.perf_counter()
+            hits = [pk for pk, _ in search(text, vec)]
+            latencies.append((time.perf_counter() - t0) * 1000)
+            recalls.append(len(relevant.intersection(hits)) / min(k, len(relevant)))
+            rank = next((r for r, pk in enumerate(hits, start=1) if pk in relevant), None)
+            rr.append(1.0 / rank if rank else 0.0)
+        latencies.sort()
+        self.stdout.write(
+            f"{name:<11}: p50 {statistics.median(latencies):7.2f} ms  "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms  "
+            f"rappel@{k} {statistics.mean(recalls):.3f}  MRR {statistics.mean(rr):.3f}"
+        )
+
+
+def _variant(rng, term: str) -> str:
+    """Forme fléchie d'un terme (préfixe, suffixe, ة finale)."""
+    word = f"{rng.choice(PREFIXES)}{term}{rng.choice(SUFFIXES)}"
+    return word[:-1] + "ة" if word.endswith("ه") and rng.random() < 0.5 else word
@@ -0,0 +1,99 @@
+"""
+Mesure l'index vectoriel de la recherche jurisprudentielle sur des vecteurs synthétiques.
+
+Usage:
+    python manage.py bench_vector_index                          # 10k, 100k, 1M vecteurs de dim 512
+    python manage.py bench_vector_index --sizes=10000,100000 --dim=1024 --queries=200
+    python manage.py bench_vector_index --baseline=20000         # + boucle Python d'origine
+
+Aucune base n'est lue : les vecteurs sont tirés au hasard (float32) et
+chargés par `VectorIndex.load`, comme au premier appel de search_decisions.
+Pour chaque taille : temps de chargement, mémoire de la matrice, latence
+p50/p95 d'un top-10. `--baseline` mesure aussi, jusqu'à cette taille, le
+calcul cosinus en Python pur (`embeddings.cosine_similarity` sur des listes)
+et vérifie que les deux donnent le même premier résultat.
+"""
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services.embeddings import cosine_similarity
+from avocat_app.services.vector_index import VectorIndex
+
+MODEL = "bench"
+
+
+class Command(BaseCommand):
+    help = "قياس أداء فهرس المتجهات للبحث في الاجتهادات"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000",
+                            help="Nombres de vecteurs, séparés par des virgules")
+        parser.add_argument("--dim", type=int, default=512, help="Dimension (défaut: 512)")
+        parser.add_argument("--queries", type=int, default=100, help="Requêtes par taille (défaut: 100)")
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--baseline", type=int, default=10000,
+                            help="Taille maximale mesurée en Python pur (0 = jamais)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--sizes : entiers séparés par des virgules")
+        dim, k = options["dim"], options["top_k"]
+        if not sizes or min(sizes) < 1 or dim < 1 or options["queries"] < 1:
+            raise CommandError("--sizes, --dim et --queries doivent être ≥ 1")
+        rng = np.random.default_rng(options["seed"])
+
+        for n in sizes:
+            index = VectorIndex()
+            t0 = time.perf_counter()
+            loaded = index.load(_rows(rng, n, dim))
+            build = time.perf_counter() - t0
+            queries = rng.standard_normal((options["queries"], dim), dtype=np.float32)
+
+            latencies, first = [], []
+            for q in queries:
+                t0 = time.perf_counter()
+                hits = index.search(MODEL, q, k)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                first.append(hits[0][0])
+            mb = n * dim * 4 / 2 ** 20
+            self.stdout.write(
+                f"{n:>9} vecteurs × {dim} : chargement {build:6.2f} s, matrice {mb:7.1f} Mo, "
+                f"top-{k} p50 {_pct(latencies, 50):7.2f} ms  p95 {_pct(latencies, 95):7.2f} ms"
+            )
+            if loaded != n:
+                raise CommandError(f"{loaded} vecteur(s) chargé(s) sur {n}")
+
+            if n <= options["baseline"]:
+                self._baseline(index, queries[:5], first[:5])
+            del index
+
+    def _baseline(self, index, queries, expected):
+        seg = index._segments[MODEL]
+        vectors = [(pk, seg.matrix[row].tolist()) for pk, row in seg.rows.items()]
+        latencies = []
+        for q, want in zip(queries, expected):
+            q = q.tolist()
+            t0 = time.perf_counter()
+            best = max(vectors, key=lambda item: cosine_similarity(q, item[1]))
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if best[0] != want:
+                raise CommandError(f"Résultat différent de la boucle Python : {best[0]} ≠ {want}")
+        self.stdout.write(f"{'':>9}   Python pur (avant) : {statistics.mean(latencies):9.1f} ms par requête")
+
+
+def _rows(rng, n, dim, chunk=10000):
+    for start in range(0, n, chunk):
+        block = rng.standard_normal((min(chunk, n - start), dim), dtype=np.float32)
+        for i, vec in enumerate(block, start):
+            yield i, MODEL, vec
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
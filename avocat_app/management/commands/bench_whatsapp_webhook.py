@@ -0,0 +1,123 @@
+"""
+Mesure la latence du webhook WhatsApp sous une rafale de messages (générateur local).
+
+Usage:
+    python manage.py bench_whatsapp_webhook                               # 500 messages, 4 fils
+    python manage.py bench_whatsapp_webhook --messages=2000 --concurrency=8 --duplicates=0.2
+    python manage.py bench_whatsapp_webhook --sync                        # mode TwiML synchrone
+
+Les requêtes passent par le client de test Django (signature Twilio
+calculée si TWILIO_AUTH_TOKEN est défini) avec des numéros fictifs
+(+999…). `--duplicates` rejoue une part des MessageSid, comme Twilio sur un
+webhook lent : en mode asynchrone chaque MessageSid ne doit créer qu'une
+tâche. Le worker embarqué est désactivé pendant la mesure ; les tâches et
+messages créés sont supprimés à la fin.
+"""
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from avocat_app.models import BackgroundJob, WhatsAppMessage
+from avocat_app.services.twilio_security import compute_signature
+from avocat_app.services.whatsapp_bot import INBOUND_JOB
+
+BENCH_PREFIX = "+999"
+
+
+class Command(BaseCommand):
+    help = "قياس زمن استجابة webhook واتساب تحت دفعة من الرسائل"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500, help="Requêtes envoyées (défaut: 500)")
+        parser.add_argument("--concurrency", type=int, default=4, help="Fils en parallèle (défaut: 4)")
+        parser.add_argument("--duplicates", type=float, default=0.1,
+                            help="Part de MessageSid rejoués (défaut: 0.1)")
+        parser.add_argument("--sync", action="store_true", help="Traitement dans la requête (TwiML)")
+        parser.add_argument("--keep", action="store_true", help="Ne pas supprimer les lignes créées")
+
+    def handle(self, *args, **options):
+        n = options["messages"]
+        if n < 1 or not 0 <= options["duplicates"] < 1:
+            raise CommandError("--messages ≥ 1 et 0 ≤ --duplicates < 1")
+
+        run = uuid.uuid4().hex[:8]
+        sids = []
+        for i in range(n):
+            if sids and random.random() < options["duplicates"]:
+                sids.append(random.choice(sids))
+            else:
+                sids.append(f"SMbench{run}{i:06d}")
+        url = reverse("cabinet:whatsapp_webhook")
+        token = getattr(settings, "TWILIO_AUTH_TOKEN", "") or ""
+        local = threading.local()
+
+        def post(i):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client()
+            params = {
+                "From": f"whatsapp:{BENCH_PREFIX}{i % 50:08d}",
+                "Body": random.choice(["ملف", "جلسة", "فاتورة", "مساعدة", "bonjour"]),
+                "ProfileName": "bench",
+                "MessageSid": sids[i],
+                "NumMedia": "0",
+            }
+            headers = {"HTTP_USER_AGENT": "TwilioProxy/1.1"}
+            if token:
+                headers["HTTP_X_TWILIO_SIGNATURE"] = compute_signature(
+                    f"http://testserver{url}", params.items(), token,
+                )
+            t0 = time.perf_counter()
+            try:
+                status = client.post(url, params, **headers).status_code
+            finally:
+                connection.close()
+            return (time.perf_counter() - t0) * 1000, status
+
+        started = time.time()
+        with override_settings(
+            WHATSAPP_WEBHOOK_ASYNC=not options["sync"],
+            JOBS_EMBEDDED_WORKER=False,
+            TWILIO_DRY_RUN=True,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        ):
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, options["concurrency"])) as pool:
+                results = list(pool.map(post, range(n)))
+            wall = time.perf_counter() - t0
+
+        latencies = sorted(ms for ms, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        jobs = BackgroundJob.objects.filter(kind=INBOUND_JOB, dedup_key__startswith=f"whatsapp:SMbench{run}")
+        messages = WhatsAppMessage.all_objects.filter(to_number__startswith=BENCH_PREFIX,
+                                                      created_at__gte=_aware(started))
+
+        mode = "synchrone (TwiML)" if options["sync"] else "asynchrone (file)"
+        self.stdout.write(f"Mode {mode} — {n} requêtes, {len(set(sids))} MessageSid distincts, "
+                          f"{options['concurrency']} fil(s), {wall:.2f} s ({n / wall:.0f} req/s)")
+        self.stdout.write(f"Latence ms : p50 {q[49]:.1f}  p95 {q[94]:.1f}  p99 {q[98]:.1f}  "
+                          f"max {latencies[-1]:.1f}")
+        self.stdout.write(f"Tâches créées : {jobs.count()}  messages journalisés : {messages.count()}  "
+                          f"erreurs HTTP : {errors}")
+
+        if not options["keep"]:
+            models.QuerySet.delete(messages)
+            jobs.delete()
+        if errors:
+            raise CommandError(f"{errors} requête(s) en erreur")
+
+
+def _aware(ts):
+    from datetime import datetime, timezone as dt_timezone
+
+    return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
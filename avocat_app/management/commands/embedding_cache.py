@@ -0,0 +1,46 @@
+"""
+État et entretien du cache d'embeddings (services/embedding_cache.py).
+
+Usage:
+    python manage.py embedding_cache                  # lignes par modèle, taille, limite
+    python manage.py embedding_cache --evict          # appliquer EMBEDDING_CACHE_MAX_ROWS maintenant
+    python manage.py embedding_cache --clear [--model=voyage-3]
+
+Les taux de succès sont comptés par processus (`embedding_cache.stats()`,
+journalisés périodiquement au niveau INFO) ; cette commande montre la table.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Min
+
+from avocat_app.models import EmbeddingCache
+from avocat_app.services import embedding_cache
+
+
+class Command(BaseCommand):
+    help = "حالة ذاكرة التضمينات المؤقتة وصيانتها"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--evict", action="store_true", help="Évincer au-delà de EMBEDDING_CACHE_MAX_ROWS")
+        parser.add_argument("--clear", action="store_true", help="Vider le cache")
+        parser.add_argument("--model", default=None, help="Limiter --clear à un modèle")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            deleted = embedding_cache.clear(options["model"])
+            self.stdout.write(self.style.SUCCESS(f"{deleted} ligne(s) supprimée(s)"))
+            return
+        if options["evict"]:
+            deleted = embedding_cache.evict()
+            self.stdout.write(self.style.SUCCESS(f"{deleted} ligne(s) évincée(s)"))
+
+        limit = getattr(settings, "EMBEDDING_CACHE_MAX_ROWS", embedding_cache.MAX_ROWS)
+        rows = (EmbeddingCache.objects.values("model")
+                .annotate(n=Count("pk"), oldest=Min("last_used_at"), newest=Max("last_used_at"))
+                .order_by("model"))
+        total = 0
+        for row in rows:
+            total += row["n"]
+            self.stdout.write(f"{row['model']:<20} {row['n']:>8} ligne(s) — utilisées du "
+                              f"{row['oldest']:%Y-%m-%d %H:%M} au {row['newest']:%Y-%m-%d %H:%M}")
+        self.stdout.write(f"Total : {total} / {limit} ligne(s)")
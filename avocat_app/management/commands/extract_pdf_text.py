@@ -0,0 +1,66 @@
+"""
+Extrait (ou rattrape) le texte des PDF joints pour l'analyse IA et la recherche.
+
+Usage:
+    python manage.py extract_pdf_text                      # pièces sans texte à jour
+    python manage.py extract_pdf_text --affaire=<uuid>
+    python manage.py extract_pdf_text --force --workers=8  # tout relire
+
+Un fichier dont le texte est à jour (nom et taille inchangés) est ignoré ; un
+contenu déjà extrait pour une autre pièce (même sha256) est recopié. Les gros
+PDF sont découpés par plages de pages sur --workers processus
+(services/pdf_text.py).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.models import PieceJointe
+from avocat_app.services import pdf_text
+
+
+class Command(BaseCommand):
+    help = "استخراج نص ملفات PDF المرفقة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--affaire", default=None, help="Limiter à une affaire (uuid)")
+        parser.add_argument("--force", action="store_true", help="Relire même les textes à jour")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Processus pour les gros PDF (défaut: PDF_TEXT_WORKERS)")
+
+    def handle(self, *args, **options):
+        if options["workers"] is not None:
+            if options["workers"] < 1:
+                raise CommandError("--workers doit être ≥ 1")
+            settings.PDF_TEXT_WORKERS = options["workers"]
+
+        qs = PieceJointe.objects.exclude(fichier="").order_by("date_ajout")
+        if options["affaire"]:
+            qs = qs.filter(affaire_id=options["affaire"])
+        stats = {"extracted": 0, "fresh": 0, "missing": 0, "failed": 0, "pages": 0}
+        started = time.monotonic()
+        for piece in qs.iterator():
+            if not pdf_text.is_pdf(piece):
+                continue
+            if not options["force"] and pdf_text.cached(piece) is not None:
+                stats["fresh"] += 1
+                continue
+            try:
+                row = pdf_text.extract(piece, force=options["force"])
+            except (OSError, ValueError, NotImplementedError):
+                stats["missing"] += 1
+                self.stderr.write(f"  {piece.pk} : fichier introuvable ({piece.fichier.name})")
+                continue
+            if row.error:
+                stats["failed"] += 1
+                self.stderr.write(f"  {piece.pk} : {row.error[:200]}")
+                continue
+            stats["extracted"] += 1
+            stats["pages"] += len(row.page_offsets)
+            self.stdout.write(f"  {piece.fichier.name} — {len(row.page_offsets)} p., {row.chars} car., {row.seconds} s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Extraits: {stats['extracted']} ({stats['pages']} pages) | À jour: {stats['fresh']} | "
+            f"Introuvables: {stats['missing']} | Échecs: {stats['failed']} — {time.monotonic() - started:.1f} s"
+        ))
@@ -11,6 +11,10 @@ Structure attendue (colonnes K..N) :
 Les groupes de PI sont séparés par une ligne vide. La première occurrence d'un
 code CA dans la colonne M permet de créer la CA elle-même.
 
+Une juridiction absente sous son code (CA{nn} / PI{nn}-{nn}) mais déjà en base
+sous un nom équivalent (ex. créée par la récupération des IDs mahakim.ma) est
+reprise et recodée plutôt que dupliquée (services/court_matcher.py).
+
 Usage :
     python manage.py import_juridictions_xlsx
 """
@@ -23,6 +27,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 from avocat_app.models import Juridiction, TypeJuridiction
+from avocat_app.services.court_matcher import CourtMatcher
 
 
 XLSX_REL_PATH = "media/المحاكم الابتدائية مع الاستئناف.xlsx"
@@ -52,6 +57,37 @@ def _ensure_type(code: str, libelle_ar: str, libelle_fr: str, niveau: str) -> Ty
     return obj
 
 
+class _Existing:
+    """Juridiction existante : par code, sinon par nom normalisé (une seule reprise par ligne en base)."""
+
+    def __init__(self):
+        self.by_code = {code: pk for pk, code in Juridiction.objects.values_list("pk", "code")}
+        self.matcher = CourtMatcher.from_db()
+        self.claimed: set = set()
+
+    def find(self, code: str, name: str, appel: bool, parent_id=None):
+        pk = self.by_code.get(code)
+        if pk is None:
+            match = self.matcher.match(name, appel=appel, parent_id=parent_id)
+            court = self.matcher.courts.get(match.juridiction_id)
+            if court and court.pk not in self.claimed and court.parent_id in (None, parent_id):
+                pk = court.pk
+        if pk is not None:
+            self.claimed.add(pk)
+        return pk
+
+    def save(self, pk, defaults: dict):
+        """update_or_create par pk ; tient l'index à jour pour les lignes suivantes."""
+        if pk is None:
+            obj, created = Juridiction.objects.create(**defaults), True
+        else:
+            obj, created = Juridiction.objects.update_or_create(pk=pk, defaults=defaults)
+        self.claimed.add(obj.pk)
+        self.by_code[obj.code] = obj.pk
+        self.matcher.add(CourtMatcher.court(obj.pk, obj.nomtribunal_ar, obj.TribunalParent_id, obj.type.code_type))
+        return obj, created
+
+
 class Command(BaseCommand):
     help = "Importe Cours d'Appel + Tribunaux de 1ère Instance depuis le XLSX."
 
@@ -111,15 +147,17 @@ class Command(BaseCommand):
         for _, _, code_ca, nom_ca in pi_rows:
             ca_unique.setdefault(code_ca, nom_ca)
 
+        existing = _Existing()
         self.stdout.write(f"→ {len(ca_unique)} Cour(s) d'Appel à créer/mettre à jour")
         for code_ca, nom_ca in sorted(ca_unique.items()):
             code_str = f"CA{code_ca:02d}"
             if dry:
                 self.stdout.write(f"  [DRY] CA #{code_ca} ({code_str}) : {nom_ca}")
                 continue
-            ca, created = Juridiction.objects.update_or_create(
-                code=code_str,
-                defaults={
+            ca, created = existing.save(
+                existing.find(code_str, nom_ca, appel=True),
+                {
+                    "code": code_str,
                     "nomtribunal_ar": nom_ca,
                     "nomtribunal_fr": f"Cour d'Appel #{code_ca}",
                     "type": type_ca,
@@ -145,9 +183,10 @@ class Command(BaseCommand):
                 self.stdout.write(f"  [DRY] {code_pi} → {nom_pi} (parent: CA#{code_ca})")
                 continue
             parent = ca_map.get(code_ca)
-            obj, was_created = Juridiction.objects.update_or_create(
-                code=code_pi,
-                defaults={
+            obj, was_created = existing.save(
+                existing.find(code_pi, nom_pi, appel=False, parent_id=parent.pk if parent else None),
+                {
+                    "code": code_pi,
                     "nomtribunal_ar": nom_pi,
                     "nomtribunal_fr": "",
                     "type": tj,
@@ -1,15 +1,93 @@
-"""Recalcule les embeddings de toutes les DecisionAnalysis pour la recherche sémantique."""
-from django.core.management.base import BaseCommand
+"""
+Recalcule les embeddings des DecisionAnalysis pour la recherche sémantique.
 
-from avocat_app.services.embeddings import reindex_all_decisions
+Usage:
+    python manage.py index_decisions                       # analyses dont le texte a changé
+    python manage.py index_decisions --since=2026-10-01    # modifiées depuis cette date
+    python manage.py index_decisions --model=voyage-3-lite --workers=8
+    python manage.py index_decisions --force               # tout recalculer
+    python manage.py index_decisions --no-passages         # sans les passages des textes sources
+
+Une analyse dont l'empreinte (modèle, texte) n'a pas changé est ignorée.
+Les textes partent par lots (VOYAGE_BATCH_SIZE) vers --workers threads,
+sous VOYAGE_REQUESTS_PER_MINUTE. Les textes sources sont ensuite découpés
+en passages embarqués séparément (services/passages.py), sauf hash-bow.
+"""
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from avocat_app.services import ann_index, passages
+from avocat_app.services.embeddings import default_model, hash_model_name, reindex_decisions
 
 
 class Command(BaseCommand):
     help = "Indexe (ou ré-indexe) les embeddings des analyses de décisions."
 
+    def add_arguments(self, parser):
+        parser.add_argument("--since", default=None, help="Date ou date-heure ISO (analyses modifiées depuis)")
+        parser.add_argument("--model", default=None, help="Modèle d'embedding (défaut: voyage-3 ou hash)")
+        parser.add_argument("--workers", type=int, default=4, help="Requêtes en parallèle (défaut: 4)")
+        parser.add_argument("--batch-size", type=int, default=None, help="Textes par requête")
+        parser.add_argument("--force", action="store_true", help="Ignorer les empreintes")
+        parser.add_argument("--no-passages", action="store_true", help="Ne pas (re)découper les textes sources")
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.NOTICE("Indexation en cours…"))
-        result = reindex_all_decisions()
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                day = parse_date(options["since"])
+                if day is None:
+                    raise CommandError("--since : date ISO attendue (2026-10-01 ou 2026-10-01T08:00)")
+                since = datetime.combine(day, dt_time.min)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        if options["workers"] < 1:
+            raise CommandError("--workers doit être ≥ 1")
+        model = options["model"] or default_model()
+
+        self.stdout.write(self.style.NOTICE(f"Indexation en cours ({model}, {options['workers']} thread(s))…"))
+        result = reindex_decisions(
+            model=model, since=since, workers=options["workers"], batch_size=options["batch_size"],
+            force=options["force"], progress=self._progress,
+        )
+        rate = result["indexed"] / result["seconds"] if result["seconds"] else 0.0
         self.stdout.write(self.style.SUCCESS(
-            f"Indexés: {result['indexed']} | Sautés (vides): {result['skipped']}"
+            f"Indexés: {result['indexed']} | Inchangés: {result['unchanged']} | "
+            f"Sautés (vides): {result['skipped']} | Échecs: {result['failed']} — "
+            f"{result['seconds']} s ({rate:.1f} analyses/s)"
         ))
+
+        failed = result["failed"]
+        self._rebuild_ann(model, result["indexed"])
+
+        if not options["no_passages"] and model != hash_model_name():
+            result = passages.reindex_passages(model=model, since=since, force=options["force"])
+            self.stdout.write(self.style.SUCCESS(
+                f"Passages : {result['passages']} pour {result['indexed']} texte(s) | "
+                f"Inchangés: {result['unchanged']} | Vidés: {result['cleared']} | "
+                f"Échecs: {result['failed']} — {result['seconds']} s"
+            ))
+            failed += result["failed"]
+            self._rebuild_ann(passages.index_key(model), result["passages"])
+        if failed:
+            raise CommandError(f"{failed} analyse(s) non indexée(s) (voir les logs)")
+
+    def _rebuild_ann(self, key, written):
+        # Beaucoup d'écritures journalisées : repartir d'un build propre
+        if written > getattr(settings, "ANN_MAX_UPDATES", ann_index.MAX_UPDATES) and key in ann_index.disk_models():
+            meta = ann_index.rebuild(key)
+            self.stdout.write(f"Index ANN {key} reconstruit : {meta['count']} vecteurs")
+
+    def _progress(self, stats):
+        elapsed = max(1e-6, time.monotonic() - stats["started"])
+        self.stdout.write(
+            f"  {stats['seen']}/{stats['total']} parcourues — {stats['indexed']} indexées, "
+            f"{stats['unchanged']} inchangées, {stats['failed']} échecs "
+            f"({stats['indexed'] / elapsed:.1f}/s)"
+        )
@@ -0,0 +1,118 @@
+"""
+Rejoue hors ligne des pages mahakim.ma enregistrées et mesure les parseurs.
+
+Enregistrer (vraie session, réseau requis) :
+    MAHAKIM_RECORD_DIR=/tmp/mahakim_rec python manage.py sync_mahakim --limit=3
+
+Rejouer (Chrome headless local, sans réseau) :
+    python manage.py mahakim_replay /tmp/mahakim_rec                  # sortie + temps par étape
+    python manage.py mahakim_replay DIR --step=contumace_page --repeat=10
+    python manage.py mahakim_replay DIR --save-expected               # fige la sortie de référence
+    python manage.py mahakim_replay DIR --check                       # régression (CI) : code 1 si écart
+    python manage.py mahakim_replay DIR --dom --check                 # parseurs lxml seuls, sans navigateur
+
+Chaque étape enregistrée (NNNN_<étape>.html + .json) est chargée dans le
+navigateur, puis le parseur correspondant est exécuté (voir
+services/mahakim_replay.PARSERS). Les attentes du scraper sont
+neutralisées : les temps affichés sont ceux du parsing seul. Avec --dom,
+les fonctions de services/mahakim_dom sont appliquées au HTML enregistré
+(voir DOM_PARSERS ; références *.dom.expected.json).
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services.mahakim_replay import (
+    DOM_PARSERS, PARSERS, load_recording, replay_dom_step, replay_step,
+)
+
+
+class Command(BaseCommand):
+    help = "Rejoue les pages mahakim.ma enregistrées (régression + benchmark des parseurs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Dossier d'enregistrement (MAHAKIM_RECORD_DIR)")
+        parser.add_argument(
+            "--step", action="append", choices=sorted(set(PARSERS) | set(DOM_PARSERS)), default=None,
+            help="Limiter à ces étapes (répétable)",
+        )
+        parser.add_argument("--repeat", type=int, default=1, help="Exécutions par étape (benchmark)")
+        parser.add_argument("--save-expected", action="store_true", help="Écrire les sorties de référence")
+        parser.add_argument("--check", action="store_true", help="Comparer aux sorties de référence")
+        parser.add_argument("--dom", action="store_true",
+                            help="Parseurs lxml sur le HTML enregistré, sans navigateur")
+        parser.add_argument("--no-headless", action="store_true", help="Navigateur visible (debug)")
+
+    def handle(self, *args, **options):
+        dom = options["dom"]
+        parsers = DOM_PARSERS if dom else PARSERS
+        steps = [s for s in load_recording(options["path"], options["step"]) if s.step in parsers]
+        if not steps:
+            raise CommandError(f"Aucune étape enregistrée dans {options['path']}")
+
+        scraper = None
+        if not dom:
+            try:
+                from avocat_app.services.mahakim_replay import ReplayScraper
+                scraper = ReplayScraper(headless=not options["no_headless"])
+            except ImportError:
+                raise CommandError("Selenium n'est pas installé (pip install selenium)")
+
+        timings = []
+        mismatches = []
+        missing = 0
+        try:
+            for step in steps:
+                try:
+                    if dom:
+                        output, timing = replay_dom_step(step, repeat=options["repeat"])
+                    else:
+                        output, timing = replay_step(scraper, step, repeat=options["repeat"])
+                except Exception as e:
+                    mismatches.append(step.name)
+                    self.stderr.write(self.style.ERROR(f"{step.name}: {e}"))
+                    continue
+                timings.append(timing)
+                expected_path = step.dom_expected_path if dom else step.expected_path
+
+                if options["save_expected"]:
+                    expected_path.write_text(
+                        json.dumps(output, ensure_ascii=False, indent=1), encoding="utf-8",
+                    )
+                status = ""
+                if options["check"]:
+                    if not expected_path.exists():
+                        missing += 1
+                        status = "  (pas de référence)"
+                    elif json.loads(expected_path.read_text(encoding="utf-8")) != output:
+                        mismatches.append(step.name)
+                        status = "  ÉCART"
+                    else:
+                        status = "  ok"
+                self.stdout.write(
+                    f"{step.name:<40} chargement {timing.load_ms:7.1f} ms"
+                    f"  parsing médiane {timing.median_ms:8.1f} ms  min {timing.min_ms:8.1f} ms{status}"
+                )
+        finally:
+            if scraper is not None:
+                scraper.close()
+
+        self._summary(timings)
+        if options["check"] and missing:
+            self.stdout.write(self.style.WARNING(f"{missing} étape(s) sans référence (--save-expected)"))
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} étape(s) en écart: {', '.join(mismatches)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(timings)} étape(s) rejouée(s)"))
+
+    def _summary(self, timings):
+        by_step = {}
+        for t in timings:
+            by_step.setdefault(t.step, []).append(t.median_ms)
+        if not by_step:
+            return
+        self.stdout.write("")
+        self.stdout.write(f"{'Étape':<20} {'n':>4} {'total ms':>10} {'moy. ms':>10}")
+        for step, values in sorted(by_step.items(), key=lambda kv: -sum(kv[1])):
+            self.stdout.write(
+                f"{step:<20} {len(values):>4} {sum(values):>10.1f} {sum(values) / len(values):>10.1f}"
+            )
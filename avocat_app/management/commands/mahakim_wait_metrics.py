@@ -0,0 +1,45 @@
+"""
+Résumé des mesures d'attente du scraper mahakim.ma.
+
+Enregistrer (une ligne JSON par attente) :
+    MAHAKIM_WAIT_METRICS=/tmp/mahakim_waits.jsonl python manage.py sync_mahakim --limit=5
+
+Analyser :
+    python manage.py mahakim_wait_metrics /tmp/mahakim_waits.jsonl
+    python manage.py mahakim_wait_metrics /tmp/mahakim_waits.jsonl --top=5
+
+Étapes triées par temps total d'attente : on voit où le scraping passe son
+temps (réseau, stabilité Angular, éléments) et quelles attentes expirent.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services.mahakim_waits import WaitMetrics
+
+
+class Command(BaseCommand):
+    help = "Résumé des temps d'attente du scraper mahakim.ma (MAHAKIM_WAIT_METRICS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier JSONL (MAHAKIM_WAIT_METRICS)")
+        parser.add_argument("--top", type=int, default=0, help="N premières étapes seulement")
+
+    def handle(self, *args, **options):
+        try:
+            rows = WaitMetrics.load(options["path"]).summary()
+        except OSError as e:
+            raise CommandError(str(e))
+        if not rows:
+            raise CommandError(f"Aucune mesure dans {options['path']}")
+
+        total = sum(r["total_ms"] for r in rows)
+        self.stdout.write(
+            f"{'Étape':<28} {'type':<8} {'n':>5} {'total ms':>10} {'moy. ms':>9} "
+            f"{'max ms':>9} {'%':>6} {'expirées':>9}"
+        )
+        for r in rows[:options["top"] or None]:
+            self.stdout.write(
+                f"{r['step']:<28} {r['kind']:<8} {r['count']:>5} {r['total_ms']:>10.0f} "
+                f"{r['total_ms'] / r['count']:>9.0f} {r['max_ms']:>9.0f} "
+                f"{100 * r['total_ms'] / total if total else 0:>6.1f} {r['timeouts']:>9}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Total : {total / 1000:.1f} s sur {len(rows)} étape(s)"))
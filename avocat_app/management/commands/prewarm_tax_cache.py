@@ -0,0 +1,102 @@
+"""
+Pré-calcule les taxes judiciaires des combinaisons courantes (cache tax_engine).
+
+Usage:
+    python manage.py prewarm_tax_cache                   # 20 combinaisons les plus consultées
+    python manage.py prewarm_tax_cache --top=50
+    python manage.py prewarm_tax_cache --all             # tout l'arbre de TaxCalculatorCache
+    python manage.py prewarm_tax_cache --refresh-options # re-scraper l'arbre des options d'abord
+    python manage.py prewarm_tax_cache --amounts=1000,5000,20000 --dry-run
+
+Chaque (combinaison, montant) déjà connu localement (échantillon ou règle
+inférée) est sauté ; les autres sont calculés sur caisseenligne avec un seul
+navigateur, puis enregistrés dans `tax_calculation_sample`. Sans historique
+de consultation, l'arbre des options est parcouru.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.models import TaxCalculatorCache
+from avocat_app.services import tax_engine
+
+
+class Command(BaseCommand):
+    help = "تسخين ذاكرة حاسبة الرسوم القضائية"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Combinaisons les plus consultées")
+        parser.add_argument("--all", action="store_true", help="Toutes les combinaisons de l'arbre")
+        parser.add_argument("--amounts", type=str, default="", help="Montants séparés par des virgules")
+        parser.add_argument("--refresh-options", action="store_true", help="Re-scraper l'arbre des options")
+        parser.add_argument("--no-headless", action="store_true", help="Navigateur visible (debug)")
+        parser.add_argument("--dry-run", action="store_true", help="Lister les calculs manquants")
+
+    def handle(self, *args, **options):
+        if options["amounts"]:
+            amounts = [a for a in (tax_engine.parse_amount(x) for x in options["amounts"].split(",")) if a]
+        else:
+            amounts = tax_engine.default_amounts()
+        if not amounts:
+            raise CommandError("Aucun montant valide")
+
+        scraper = None
+        try:
+            if options["refresh_options"] and not options["dry_run"]:
+                scraper = self._scraper(options)
+                self._refresh_options(scraper)
+
+            combos = [] if options["all"] else tax_engine.popular_combinations(options["top"])
+            if not combos:
+                cache = TaxCalculatorCache.objects.order_by("-date_sync").first()
+                if not cache or not cache.options_tree:
+                    raise CommandError("Arbre des options vide — lancer avec --refresh-options")
+                combos = tax_engine.tree_combinations(cache.options_tree)
+                if not options["all"]:
+                    combos = combos[:options["top"]]
+
+            todo = [
+                (combo, amount) for combo in combos for amount in amounts
+                if tax_engine.lookup(montant=amount, **combo) is None
+            ]
+            self.stdout.write(
+                f"{len(combos)} combinaison(s) × {len(amounts)} montant(s) — "
+                f"{len(todo)} calcul(s) à faire sur le site"
+            )
+            if options["dry_run"] or not todo:
+                return
+
+            scraper = scraper or self._scraper(options)
+            failures = 0
+            for i, (combo, amount) in enumerate(todo, 1):
+                result = tax_engine.calculate(montant=amount, scraper=scraper, **combo)
+                if not result or not result.get("success"):
+                    failures += 1
+                    self.stderr.write(
+                        f"[{i}/{len(todo)}] {combo['categorie']}/{combo['type_qadiya']} {amount}: "
+                        f"{(result or {}).get('error_message')}"
+                    )
+                    continue
+                self.stdout.write(
+                    f"[{i}/{len(todo)}] {combo['categorie']}/{combo['type_qadiya']} {amount} → {result['total']}"
+                )
+        finally:
+            if scraper:
+                scraper.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Terminé — {len(todo) - failures} calcul(s) enregistrés"))
+
+    def _scraper(self, options):
+        try:
+            from avocat_app.services.mahakim_scraper import MahakimScraper
+        except ImportError:
+            raise CommandError("Selenium n'est pas installé (pip install selenium)")
+        scraper = MahakimScraper(headless=not options["no_headless"], timeout=60)
+        scraper._create_driver()
+        return scraper
+
+    def _refresh_options(self, scraper):
+        data = scraper.scrape_tax_options(progress_callback=lambda m: self.stdout.write(m))
+        if not data.get("success"):
+            raise CommandError(data.get("error_message") or "Échec du scraping des options")
+        TaxCalculatorCache.objects.create(options_tree=data["options_tree"])
+        tax_engine.memo.clear()
+        self.stdout.write(self.style.SUCCESS("Arbre des options mis à jour"))
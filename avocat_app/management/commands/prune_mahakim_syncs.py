@@ -0,0 +1,43 @@
+"""
+Rétention des résultats de synchronisation mahakim.ma (mahakim_sync_result).
+
+Usage:
+    python manage.py prune_mahakim_syncs                 # plus vieux que MAHAKIM_SYNC_RETENTION_DAYS
+    python manage.py prune_mahakim_syncs --days=90
+    python manage.py prune_mahakim_syncs --dedupe        # fusionner d'abord les résultats identiques consécutifs
+    python manage.py prune_mahakim_syncs --dry-run
+
+Le dernier résultat de chaque affaire (MahakimSyncState.last_result) n'est
+jamais supprimé ; les HTML compressés devenus orphelins le sont.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from avocat_app.services import mahakim_results
+
+
+class Command(BaseCommand):
+    help = "حذف نتائج مزامنة محاكم القديمة أو المكررة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Âge maximal en jours (défaut : MAHAKIM_SYNC_RETENTION_DAYS)")
+        parser.add_argument("--dedupe", action="store_true",
+                            help="Fusionner les résultats réussis identiques consécutifs")
+        parser.add_argument("--dry-run", action="store_true", help="Compter sans supprimer")
+
+    def handle(self, *args, **options):
+        days = options["days"] if options["days"] is not None else mahakim_results.retention_days()
+        if days < 1:
+            raise CommandError("--days doit être ≥ 1")
+        dry = options["dry_run"]
+
+        if options["dedupe"]:
+            merged = mahakim_results.dedupe(dry_run=dry)
+            self.stdout.write(f"Doublons {'à fusionner' if dry else 'fusionnés'} : {merged}")
+
+        counts = mahakim_results.prune(days, dry_run=dry)
+        verb = "à supprimer" if dry else "supprimés"
+        self.stdout.write(self.style.SUCCESS(
+            f"Résultats de plus de {days} jours {verb} : {counts['results']} — "
+            f"HTML orphelins {verb} : {counts['html']}"
+        ))
@@ -0,0 +1,88 @@
+"""
+Reconstruit l'index approché (IVF) des embeddings de décisions sur disque.
+
+Usage:
+    python manage.py rebuild_ann_index                    # modèles ≥ ANN_MIN_VECTORS ou déjà indexés
+    python manage.py rebuild_ann_index --model=voyage-3 --force
+    python manage.py rebuild_ann_index --model=voyage-3 --nlist=2000
+    python manage.py rebuild_ann_index --model=voyage-3+passages   # passages des textes sources
+    python manage.py rebuild_ann_index --model=hash-bow-512 --drop
+    python manage.py rebuild_ann_index --status
+
+Le nouveau build remplace l'ancien d'un coup (fichier CURRENT) ; les
+workers le rouvrent à leur requête suivante. À relancer quand le journal
+des modifications dépasse ANN_MAX_UPDATES (avertissement dans les logs).
+Les passages (services/passages.py) sont comptés sous « <modèle>+passages ».
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from avocat_app.models import DecisionAnalysis, DecisionPassage
+from avocat_app.services import ann_index, passages
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء الفهرس التقريبي لمتجهات الأحكام"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=None, help="Modèle d'embedding (défaut: tous les éligibles)")
+        parser.add_argument("--nlist", type=int, default=None, help="Nombre de listes (défaut: ANN_NLIST ou √n)")
+        parser.add_argument("--force", action="store_true", help="Construire même sous ANN_MIN_VECTORS")
+        parser.add_argument("--drop", action="store_true", help="Supprimer l'index du modèle")
+        parser.add_argument("--status", action="store_true", help="Afficher les index existants")
+
+    def handle(self, *args, **options):
+        model = options["model"]
+        if options["drop"]:
+            if not model:
+                raise CommandError("--drop exige --model")
+            dropped = ann_index.drop(model)
+            self.stdout.write(f"{model} : {'index supprimé' if dropped else 'aucun index'}")
+            return
+
+        counts = dict(
+            DecisionAnalysis.objects.exclude(embedding__isnull=True).exclude(embedding_model__isnull=True)
+            .values_list("embedding_model").annotate(n=Count("pk")).values_list("embedding_model", "n")
+        )
+        counts.update(
+            (passages.index_key(name), n) for name, n in
+            DecisionPassage.objects.exclude(embedding__isnull=True).filter(analysis__is_deleted=False)
+            .values_list("embedding_model").annotate(n=Count("pk")).values_list("embedding_model", "n")
+        )
+        existing = set(ann_index.disk_models())
+
+        if options["status"]:
+            for name in sorted(set(counts) | existing):
+                index = ann_index.get(name)
+                line = f"{name} : {counts.get(name, 0)} embedding(s) en base"
+                if index is not None:
+                    meta = index.meta
+                    line += (f" — build {meta['built_at']}, {meta['count']} vecteurs, "
+                             f"{meta['nlist']} listes, dim {meta['dim']}")
+                self.stdout.write(line)
+            return
+
+        minimum = getattr(settings, "ANN_MIN_VECTORS", ann_index.MIN_VECTORS)
+        if model:
+            if counts.get(model, 0) < minimum and not options["force"] and model not in existing:
+                raise CommandError(f"{model} : {counts.get(model, 0)} embedding(s) < ANN_MIN_VECTORS "
+                                   f"({minimum}) — utiliser --force")
+            targets = [model]
+        else:
+            targets = sorted(m for m in set(counts) | existing
+                             if options["force"] or m in existing or counts.get(m, 0) >= minimum)
+        if not targets:
+            self.stdout.write(f"Aucun modèle n'atteint ANN_MIN_VECTORS ({minimum}).")
+            return
+
+        for name in targets:
+            if not counts.get(name):
+                ann_index.drop(name)
+                self.stdout.write(f"{name} : plus aucun embedding, index supprimé")
+                continue
+            meta = ann_index.rebuild(name, nlist=options["nlist"])
+            self.stdout.write(self.style.SUCCESS(
+                f"{name} : {meta['count']} vecteurs, {meta['nlist']} listes, dim {meta['dim']} "
+                f"({meta['seconds']} s)"
+            ))
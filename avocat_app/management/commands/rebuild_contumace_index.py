@@ -0,0 +1,29 @@
+"""
+Recalcule l'index de recherche de المسطرة الغيابية (search_text + trigrammes).
+
+Usage:
+    python manage.py rebuild_contumace_index
+    python manage.py rebuild_contumace_index --batch=2000
+
+À lancer après une modification des règles de normalisation
+(embeddings.normalize_text) ou un import fait hors de l'application.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from avocat_app.services.contumace_search import rebuild
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء فهرس البحث في سجلات المسطرة الغيابية"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Dossiers par lot (défaut: 1000)")
+
+    def handle(self, *args, **options):
+        t0 = time.monotonic()
+        total = rebuild(batch_size=max(1, options["batch"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} dossier(s) indexé(s) en {time.monotonic() - t0:.1f} s"
+        ))
@@ -0,0 +1,30 @@
+"""
+Recalcule les colonnes de recherche par téléphone des parties (telephone_e164, telephone_suffix).
+
+Usage:
+    python manage.py rebuild_phone_index
+    python manage.py rebuild_phone_index --batch=2000
+
+Les colonnes sont tenues à jour par Partie.save() ; à lancer après un
+import fait hors de l'ORM (SQL, bulk_create) ou un changement des règles
+de normalisation (services/phone_lookup.py).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from avocat_app.services.phone_lookup import rebuild
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء فهرس أرقام هواتف الأطراف"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Parties par lot (défaut: 1000)")
+
+    def handle(self, *args, **options):
+        t0 = time.monotonic()
+        seen, changed = rebuild(batch_size=max(1, options["batch"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"{seen} partie(s) parcourue(s), {changed} mise(s) à jour en {time.monotonic() - t0:.1f} s"
+        ))
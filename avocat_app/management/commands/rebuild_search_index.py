@@ -0,0 +1,35 @@
+"""
+Recalcule l'index de la recherche globale (search_document + plein texte).
+
+Usage:
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index --kind=partie --kind=avocat
+
+À lancer après une modification des règles de normalisation, un import fait
+hors de l'application (bulk_create, update() : pas de signal) ou une
+restauration de base. L'index est tenu à jour par signaux le reste du temps.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from avocat_app.services import global_search
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء فهرس البحث العام"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", action="append", choices=list(global_search.KINDS),
+                            help="Type à réindexer (répétable, défaut: tous)")
+
+    def handle(self, *args, **options):
+        t0 = time.monotonic()
+        counts = global_search.rebuild(
+            options["kind"],
+            progress=lambda kind, total: self.stdout.write(f"  {kind} : {total}…"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            " | ".join(f"{kind}: {n}" for kind, n in counts.items())
+            + f" — moteur {global_search.engine()}, {time.monotonic() - t0:.1f} s"
+        ))
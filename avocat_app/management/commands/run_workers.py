@@ -0,0 +1,76 @@
+"""Consomme la file de tâches `background_job` (scraping mahakim, traitements longs).
+
+Requis en production, comme service à côté de gunicorn (systemd, supervisor...),
+une instance par voie pour que les scrapings ne retardent pas les réponses
+WhatsApp :
+    python manage.py run_workers --lane interactive --workers 2
+    python manage.py run_workers --lane batch --workers 2
+
+Options:
+    --workers N   Nombre de tâches exécutées en parallèle (défaut: 1)
+    --lane L      interactive (handlers `interactive=True`) ou batch (les autres)
+    --kinds a,b   Ne traiter que ces types de tâches (ex: mahakim.fetch_ids)
+    --once        Vider la file puis s'arrêter (cron)
+    --poll S      Intervalle d'interrogation de la file en secondes
+
+Avec un worker dédié, désactiver le worker embarqué des processus web :
+JOBS_EMBEDDED_WORKER=False.
+"""
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from avocat_app.services.jobs import LANES, lane_filter, purge_finished, requeue_stale, work, worker_name
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches en file d'attente (BackgroundJob)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Tâches simultanées (défaut: 1)")
+        parser.add_argument("--lane", choices=LANES, default=None,
+                            help="Voie : interactive ou batch (défaut: toutes les tâches)")
+        parser.add_argument("--kinds", type=str, default="", help="Types de tâches séparés par des virgules")
+        parser.add_argument("--once", action="store_true", help="S'arrêter quand la file est vide")
+        parser.add_argument("--poll", type=float, default=None, help="Intervalle d'interrogation (secondes)")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        kinds, exclude = lane_filter(options["lane"])
+        kinds = [k.strip() for k in options["kinds"].split(",") if k.strip()] or kinds
+        once = options["once"]
+        poll = options["poll"]
+
+        purged = purge_finished()
+        requeued = requeue_stale()
+        self.stdout.write(self.style.NOTICE(
+            f"Workers: {workers} — tâches purgées: {purged}, reprogrammées: {requeued}"
+        ))
+
+        stop = threading.Event()
+        counts = [0] * workers
+
+        def _loop(idx):
+            try:
+                counts[idx] = work(worker_name(f"w{idx + 1}"), kinds=kinds, exclude=exclude, stop=stop, once=once, poll=poll)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=_loop, args=(i,), name=f"run_workers-{i + 1}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            while any(t.is_alive() for t in threads):
+                for t in threads:
+                    t.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Arrêt demandé — fin des tâches en cours..."))
+            stop.set()
+            for t in threads:
+                t.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Tâches exécutées: {sum(counts)}"))
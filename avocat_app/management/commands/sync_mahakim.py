@@ -7,13 +7,37 @@ Usage:
     python manage.py sync_mahakim --limit=5        # Limiter à 5 affaires
     python manage.py sync_mahakim --affaire=UUID   # Une seule affaire
     python manage.py sync_mahakim --no-headless    # Mode visible (debug)
+    python manage.py sync_mahakim --workers=4      # 4 navigateurs en parallèle
+    python manage.py sync_mahakim --resume         # Reprendre un lot interrompu
+    python manage.py sync_mahakim --plan --budget=50   # Les 50 affaires les plus prioritaires
+    python manage.py sync_mahakim --plan --budget=30m  # Autant que possible en 30 minutes
+    python manage.py sync_mahakim --plan --dry-run     # Afficher le plan sans synchroniser
+
+Chaque worker est un processus avec son propre navigateur ; un délai minimal
+(--rate) entre deux recherches est partagé par tous les workers. Les résultats
+sont écrits par lots (services/mahakim_results.py : un résultat identique au
+précédent n'ajoute pas de ligne, le HTML est stocké compressé) et un fichier
+de reprise est mis à jour après chaque lot.
+
+Avec --plan, seules les affaires utiles à rafraîchir sont traitées, par ordre
+de priorité (voir services/mahakim_planner.py) ; les affaires clôturées et
+celles synchronisées récemment sont ignorées.
 """
 import logging
+import multiprocessing
+import queue as _queue
+import time
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
-from avocat_app.models import Affaire, MahakimSyncResult
-from avocat_app.services.mahakim_scraper import MahakimScraper
+from avocat_app.models import Affaire
+from avocat_app.services import mahakim_results
+from avocat_app.services.mahakim_sync import (
+    RateLimiter, SyncCheckpoint, default_min_interval,
+    run_shard, scrape_kwargs, shard_process, split_shards, syncable_affaires,
+)
+from avocat_app.services.mahakim_planner import Budget, plan_affaires
 
 logger = logging.getLogger(__name__)
 
@@ -38,14 +62,133 @@ class Command(BaseCommand):
             "--timeout", type=int, default=30,
             help="مهلة الانتظار بالثواني",
         )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="عدد المتصفحات المتوازية (عملية لكل متصفح)",
+        )
+        parser.add_argument(
+            "--rate", type=float, default=None,
+            help="الحد الأدنى بالثواني بين عمليتي بحث (مشترك بين جميع العمليات)",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=20,
+            help="عدد النتائج المحفوظة دفعة واحدة (bulk_create)",
+        )
+        parser.add_argument(
+            "--resume", action="store_true", default=False,
+            help="استئناف آخر مزامنة متوقفة وتجاوز القضايا المعالجة",
+        )
+        parser.add_argument(
+            "--checkpoint", type=str, default=None,
+            help="مسار ملف نقطة الاستئناف (JSON)",
+        )
+        parser.add_argument(
+            "--plan", action="store_true", default=False,
+            help="مزامنة تدريجية حسب الأولوية (تجاهل القضايا المقفلة والمحدثة مؤخرًا)",
+        )
+        parser.add_argument(
+            "--budget", type=str, default=None,
+            help="ميزانية الدورة مع --plan: عدد الطلبات (50) أو مدة (90s, 30m, 2h)",
+        )
+        parser.add_argument(
+            "--min-age", type=float, default=None,
+            help="عدد الساعات الأدنى منذ آخر مزامنة قبل إعادة المحاولة (مع --plan)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", default=False,
+            help="عرض الخطة دون مزامنة (مع --plan)",
+        )
 
     def handle(self, *args, **options):
         limit = options["limit"]
         affaire_pk = options["affaire"]
         headless = not options["no_headless"]
         timeout = options["timeout"]
+        workers = max(1, options["workers"])
+        rate = options["rate"] if options["rate"] is not None else default_min_interval()
+        self.batch_size = max(1, options["batch"])
 
-        # Construire le queryset
+        try:
+            budget = Budget.parse(options["budget"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if (budget.requests or budget.seconds) and not options["plan"]:
+            raise CommandError("--budget يتطلب --plan")
+        if options["dry_run"] and not options["plan"]:
+            raise CommandError("--dry-run يتطلب --plan")
+
+        self.checkpoint = SyncCheckpoint(options["checkpoint"])
+        if options["resume"]:
+            self.checkpoint.load()
+            if self.checkpoint.done:
+                self.stdout.write(f"استئناف: تجاوز {len(self.checkpoint.done)} قضية معالجة سابقًا")
+        elif not options["dry_run"]:
+            self.checkpoint.start()
+
+        if options["plan"] and not affaire_pk:
+            affaires = self._planned(budget, workers, options["min_age"], limit, options["dry_run"])
+            if options["dry_run"]:
+                return
+        else:
+            affaires = self._queryset(affaire_pk, limit)
+
+        jobs = []
+        for affaire in affaires:
+            if not affaire.code_categorie_id:
+                continue
+            jobs.append({
+                "affaire_id": str(affaire.pk),
+                "label": (f"{affaire.reference_interne} — "
+                          f"{affaire.numero_dossier}/{affaire.code_categorie.code}/{affaire.annee_dossier}"),
+                "kwargs": scrape_kwargs(affaire),
+            })
+
+        total = len(jobs)
+        if total == 0:
+            self.stdout.write(self.style.WARNING("لا توجد قضايا للمزامنة (تأكد من وجود رقم الملف وصنف القضية والسنة)"))
+            self.checkpoint.clear()
+            return
+
+        workers = min(workers, total)
+        self.stdout.write(f"بدء مزامنة {total} قضية(قضايا) مع محاكم.ما ({workers} عملية) ...")
+
+        self.total = total
+        self.processed = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.pending = []
+
+        deadline = time.time() + budget.seconds if budget.seconds else None
+        try:
+            if workers == 1:
+                limiter = RateLimiter(rate)
+                run_shard(jobs, self._collect, limiter, headless=headless, timeout=timeout, deadline=deadline)
+            else:
+                self._run_parallel(jobs, workers, rate, headless, timeout, deadline)
+        finally:
+            # Navigateur planté, Ctrl+C... : les résultats déjà scrapés sont écrits
+            self._flush()
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"اكتملت المزامنة: {self.success_count} نجاح / {self.error_count} فشل / {total} إجمالي"
+        ))
+        if self.processed == total:
+            self.checkpoint.clear()
+        elif deadline is not None and time.time() >= deadline:
+            # Budget épuisé : le prochain --plan reprendra par priorité
+            self.checkpoint.clear()
+            self.stdout.write(self.style.WARNING(
+                f"انتهت ميزانية الوقت — {total - self.processed} قضية مؤجلة للدورة القادمة"
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"لم تُعالج {total - self.processed} قضية — أعد التشغيل مع --resume"
+            ))
+
+    # ------------------------------------------------------------------
+
+    def _queryset(self, affaire_pk, limit):
         if affaire_pk:
             try:
                 affaires = Affaire.objects.filter(pk=affaire_pk)
@@ -55,72 +198,108 @@ class Command(BaseCommand):
                 raise CommandError(str(e))
         else:
             # Seulement les affaires avec référence structurée
-            affaires = Affaire.objects.filter(
-                numero_dossier__isnull=False,
-                code_categorie__isnull=False,
-                annee_dossier__isnull=False,
-            ).exclude(
-                numero_dossier=""
-            ).exclude(
-                annee_dossier=""
-            ).select_related("code_categorie", "juridiction")
-
+            affaires = syncable_affaires()
+        affaires = affaires.select_related(
+            "code_categorie", "juridiction", "juridiction__TribunalParent",
+        ).order_by("pk")
+        if self.checkpoint.done:
+            affaires = affaires.exclude(pk__in=list(self.checkpoint.done))
         if limit > 0:
             affaires = affaires[:limit]
+        return affaires
 
-        total = affaires.count()
-        if total == 0:
-            self.stdout.write(self.style.WARNING("لا توجد قضايا للمزامنة (تأكد من وجود رقم الملف وصنف القضية والسنة)"))
-            return
+    def _planned(self, budget, workers, min_age, limit, dry_run):
+        """Affaires retenues par le planificateur, dans l'ordre de priorité."""
+        cap = budget.max_requests(workers)
+        if limit > 0:
+            cap = min(cap, limit) if cap else limit
+        planned = [
+            (affaire, score)
+            for affaire, score in plan_affaires(min_age_hours=min_age, persist=not dry_run)
+            if str(affaire.pk) not in self.checkpoint.done
+        ]
+        skipped = max(0, len(planned) - cap) if cap else 0
+        if cap:
+            planned = planned[:cap]
 
-        self.stdout.write(f"بدء مزامنة {total} قضية(قضايا) مع محاكم.ما ...")
+        self.stdout.write(f"الخطة: {len(planned)} قضية مختارة حسب الأولوية"
+                          + (f" ({skipped} مؤجلة)" if skipped else ""))
+        if dry_run:
+            for affaire, score in planned:
+                self.stdout.write(f"  {score:9.2f}  {affaire.reference_interne} — "
+                                  f"{affaire.numero_dossier}/{affaire.code_categorie.code}/{affaire.annee_dossier}")
+        return [affaire for affaire, _ in planned]
 
-        success_count = 0
-        error_count = 0
+    def _run_parallel(self, jobs, workers, rate, headless, timeout, deadline=None):
+        """Lance un processus par lot et agrège leurs résultats au fil de l'eau."""
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        limiter = RateLimiter(rate, ctx=ctx)
+        # Les workers n'utilisent pas la base ; on évite de leur léguer une connexion ouverte.
+        connections.close_all()
 
-        with MahakimScraper(headless=headless, timeout=timeout) as scraper:
-            for i, affaire in enumerate(affaires, 1):
-                self.stdout.write(f"\n[{i}/{total}] {affaire.reference_interne} — "
-                                  f"{affaire.numero_dossier}/{affaire.code_categorie.code}/{affaire.annee_dossier}")
+        procs = []
+        for idx, shard in enumerate(split_shards(jobs, workers), 1):
+            p = ctx.Process(
+                target=shard_process,
+                args=(shard, results, limiter, headless, timeout, idx, deadline),
+                name=f"sync_mahakim-{idx}",
+            )
+            p.start()
+            procs.append(p)
 
-                # Déterminer le type de juridiction
-                type_juridiction = None
-                if hasattr(affaire.juridiction, 'type') and affaire.juridiction.type:
-                    type_juridiction = str(affaire.juridiction.type)
-
-                result = scraper.scrape_affaire(
-                    numero=affaire.numero_dossier,
-                    code_categorie=affaire.code_categorie.code,
-                    annee=affaire.annee_dossier,
-                    type_juridiction=type_juridiction,
-                )
-
-                # Sauvegarder le résultat
-                sync_obj = MahakimSyncResult.objects.create(
-                    affaire=affaire,
-                    statut_mahakim=result.get("statut_mahakim"),
-                    prochaine_audience=result.get("prochaine_audience"),
-                    juge=result.get("juge"),
-                    observations=result.get("observations"),
-                    raw_html=result.get("raw_html", "")[:50000],  # Limiter la taille
-                    success=result.get("success", False),
-                    error_message=result.get("error_message"),
-                )
-
-                if result["success"]:
-                    success_count += 1
-                    self.stdout.write(self.style.SUCCESS(
-                        f"  ✓ نجاح — الحالة: {result.get('statut_mahakim', '—')}"
-                    ))
-                    if result.get("prochaine_audience"):
-                        self.stdout.write(f"    الجلسة القادمة: {result['prochaine_audience']}")
-                    if result.get("juge"):
-                        self.stdout.write(f"    القاضي: {result['juge']}")
-                else:
-                    error_count += 1
-                    self.stdout.write(self.style.ERROR(
-                        f"  ✗ فشل — {result.get('error_message', 'خطأ غير معروف')}"
-                    ))
+        running = len(procs)
+        while running:
+            try:
+                item = results.get(timeout=5)
+            except _queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    # Un worker a été tué sans envoyer sa sentinelle
+                    break
+                continue
+            if item is None:
+                running -= 1
+                continue
+            if "fatal" in item:
+                self.stdout.write(self.style.ERROR(f"  ✗ العملية {item['worker']} توقفت — {item['fatal']}"))
+                continue
+            self._collect(item)
 
-        self.stdout.write("")
-        self.stdout.write(self.style.SUCCESS(f"اكتملت المزامنة: {success_count} نجاح / {error_count} فشل / {total} إجمالي"))
+        for p in procs:
+            p.join(timeout=10)
+
+    def _collect(self, item):
+        """Reçoit le résultat d'une affaire (tous workers confondus)."""
+        self.processed += 1
+        result = item["result"]
+        prefix = f"[{self.processed}/{self.total}]"
+        if item.get("worker"):
+            prefix += f" [w{item['worker']}]"
+        self.stdout.write(f"\n{prefix} {item['label']}")
+
+        if result.get("success"):
+            self.success_count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"  ✓ نجاح — الحالة: {result.get('statut_mahakim') or '—'}"
+            ))
+            if result.get("prochaine_audience"):
+                self.stdout.write(f"    الجلسة القادمة: {result['prochaine_audience']}")
+            if result.get("juge"):
+                self.stdout.write(f"    القاضي: {result['juge']}")
+        else:
+            self.error_count += 1
+            self.stdout.write(self.style.ERROR(
+                f"  ✗ فشل — {result.get('error_message') or 'خطأ غير معروف'}"
+            ))
+
+        self.pending.append((item["affaire_id"], result))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        """Écrit les résultats en attente puis met à jour le point de reprise."""
+        if not self.pending:
+            return
+        mahakim_results.save_results(self.pending)
+        self.checkpoint.mark(str(aid) for aid, _ in self.pending)
+        self.pending = []
@@ -0,0 +1,76 @@
+"""
+Récupère en lot les programmes d'audiences (جدول الجلسات) de mahakim.ma.
+
+Usage:
+    python manage.py sync_sessions                          # demain, juridictions des affaires en cours
+    python manage.py sync_sessions --days=7 --workers=2     # 7 jours à partir de demain, 2 navigateurs
+    python manage.py sync_sessions --juridiction=12 --juridiction=40 --from=2026-11-02 --to=2026-11-06
+    python manage.py sync_sessions --refresh                # ignorer le cache (MAHAKIM_SESSIONS_TTL_HOURS)
+
+Les programmes sont enregistrés dans session_schedule / session_schedule_file
+et les dossiers du rôle rattachés aux affaires du cabinet (services/mahakim_sessions.py).
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from avocat_app.models import Affaire, PhaseAffaire
+from avocat_app.services import mahakim_sessions
+
+
+class Command(BaseCommand):
+    help = "جلب جداول الجلسات من بوابة محاكم.ما لعدة محاكم وعدة أيام"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--juridiction", action="append", type=int, default=None,
+                            help="ID de juridiction (répétable ; défaut : celles des affaires en cours)")
+        parser.add_argument("--from", dest="date_from", type=str, default=None, help="Premier jour (défaut : demain)")
+        parser.add_argument("--to", dest="date_to", type=str, default=None, help="Dernier jour")
+        parser.add_argument("--days", type=int, default=1, help="Nombre de jours si --to absent (défaut : 1)")
+        parser.add_argument("--type-seance", type=str, default="", help="نوع الجلسة (optionnel)")
+        parser.add_argument("--workers", type=int, default=1, help="Navigateurs en parallèle (défaut : 1)")
+        parser.add_argument("--refresh", action="store_true", help="Ignorer les programmes en cache")
+        parser.add_argument("--no-headless", action="store_true", help="Navigateur visible (debug)")
+
+    def handle(self, *args, **options):
+        try:
+            import selenium  # noqa: F401
+        except ImportError:
+            raise CommandError("Selenium n'est pas installé (pip install selenium)")
+
+        try:
+            start = (mahakim_sessions.parse_date(options["date_from"]) if options["date_from"]
+                     else timezone.localdate() + timedelta(days=1))
+            end = (mahakim_sessions.parse_date(options["date_to"]) if options["date_to"]
+                   else start + timedelta(days=max(1, options["days"]) - 1))
+        except ValueError as e:
+            raise CommandError(str(e))
+        if end < start:
+            raise CommandError("--to doit être postérieur à --from")
+
+        ids = options["juridiction"] or list(
+            Affaire.objects.exclude(phase=PhaseAffaire.CLOTURE)
+            .values_list("juridiction_id", flat=True).distinct()
+        )
+        if not ids:
+            self.stdout.write(self.style.WARNING("Aucune juridiction à traiter"))
+            return
+
+        dates = mahakim_sessions.date_range(start, end)
+        self.stdout.write(self.style.NOTICE(
+            f"{len(ids)} juridiction(s) × {len(dates)} jour(s) — {options['workers']} navigateur(s)"
+        ))
+
+        def _progress(done, total, label):
+            self.stdout.write(f"[{done}/{total}] {label}")
+
+        summary = mahakim_sessions.fetch_schedules(
+            ids, dates, type_seance=options["type_seance"], workers=max(1, options["workers"]),
+            refresh=options["refresh"], headless=not options["no_headless"], progress=_progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Programmes: {summary['fetched']} récupérés, {summary['cached']} en cache, "
+            f"{summary['failed']} en échec — {summary['files']} dossiers, "
+            f"{summary['matched']} rattachés à nos affaires"
+        ))
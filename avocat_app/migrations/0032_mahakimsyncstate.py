@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-19 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0031_codecategorieaffaire_sous_type_freetext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MahakimSyncState',
+            fields=[
+                ('affaire', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mahakim_state', serialize=False, to='avocat_app.affaire', verbose_name='القضية')),
+                ('last_sync_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر مزامنة')),
+                ('last_success_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر مزامنة ناجحة')),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر تغيير في النتيجة')),
+                ('last_hash', models.CharField(blank=True, default='', max_length=64, verbose_name='بصمة آخر نتيجة')),
+                ('unchanged_count', models.PositiveIntegerField(default=0, verbose_name='مزامنات متتالية بدون تغيير')),
+                ('failure_count', models.PositiveIntegerField(default=0, verbose_name='إخفاقات متتالية')),
+                ('prochaine_audience', models.DateField(blank=True, null=True, verbose_name='الجلسة القادمة (محاكم)')),
+                ('priority', models.FloatField(default=0.0, verbose_name='الأولوية المحسوبة')),
+            ],
+            options={
+                'verbose_name': 'حالة مزامنة محاكم',
+                'verbose_name_plural': 'حالات مزامنة محاكم',
+                'db_table': 'mahakim_sync_state',
+                'indexes': [models.Index(fields=['last_sync_at'], name='mahakim_syn_last_sy_28bb63_idx'), models.Index(fields=['-priority'], name='mahakim_syn_priorit_669563_idx'), models.Index(fields=['prochaine_audience'], name='mahakim_syn_prochai_883601_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import re
+
+# Copie figée (octobre 2026) de services/contumace_search.py et de
+# embeddings.normalize_text : une modification ultérieure des services ne
+# doit pas changer cette migration. `rebuild_contumace_index` recalcule
+# l'index avec les règles courantes.
+SEARCH_FIELDS = ('nom_accuse', 'nom_pere', 'nom_mere', 'numero_dossier', 'numero_carte', 'cour_appel')
+_DIACRITICS = re.compile(r"[\u064b-\u065f\u0670]")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize(text):
+    t = _DIACRITICS.sub('', (text or '').lower())
+    return t.replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا').replace('ى', 'ي').replace('ة', 'ه')
+
+
+def search_text_for(values):
+    return ' '.join(_TOKEN_RE.findall(_normalize(' '.join(v for v in values if v))))
+
+
+def grams(text):
+    out = set()
+    for tok in _TOKEN_RE.findall(text or ''):
+        if len(tok) < 3:
+            if len(tok) == 2:
+                out.add(tok)
+            continue
+        out.update(tok[i:i + 3] for i in range(len(tok) - 2))
+    return out
+
+
+def backfill_search_index(apps, schema_editor):
+    ContumaceRecord = apps.get_model('avocat_app', 'ContumaceRecord')
+    ContumaceSearchGram = apps.get_model('avocat_app', 'ContumaceSearchGram')
+    batch = []
+    for rec in ContumaceRecord.objects.all().iterator(chunk_size=1000):
+        rec.search_text = search_text_for(getattr(rec, f) or '' for f in SEARCH_FIELDS)
+        batch.append(rec)
+        if len(batch) >= 1000:
+            _flush(ContumaceRecord, ContumaceSearchGram, batch)
+            batch = []
+    _flush(ContumaceRecord, ContumaceSearchGram, batch)
+
+
+def _flush(ContumaceRecord, ContumaceSearchGram, batch):
+    if not batch:
+        return
+    ContumaceRecord.objects.bulk_update(batch, ['search_text'])
+    ContumaceSearchGram.objects.bulk_create(
+        [ContumaceSearchGram(record_id=r.pk, gram=g) for r in batch for g in grams(r.search_text)],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0033_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contumacerecord',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='نص البحث'),
+        ),
+        migrations.CreateModel(
+            name='ContumaceSearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='avocat_app.contumacerecord')),
+            ],
+            options={
+                'db_table': 'contumace_search_gram',
+                'indexes': [models.Index(fields=['gram', 'record'], name='contumace_s_gram_175e0e_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
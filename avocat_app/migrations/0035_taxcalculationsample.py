@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0034_contumace_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxCalculationSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nature', models.CharField(max_length=100)),
+                ('type_maqal', models.CharField(max_length=100)),
+                ('categorie', models.CharField(max_length=100)),
+                ('type_qadiya', models.CharField(max_length=100)),
+                ('type_talab', models.CharField(blank=True, default='', max_length=100)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('bracket', models.SmallIntegerField(default=0)),
+                ('total', models.DecimalField(blank=True, decimal_places=2, max_digits=16, null=True, verbose_name='المجموع')),
+                ('result_text', models.TextField(blank=True, default='')),
+                ('result_html', models.TextField(blank=True, default='')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'نتيجة حساب الرسوم',
+                'db_table': 'tax_calculation_sample',
+                'indexes': [models.Index(fields=['nature', 'type_maqal', 'categorie', 'type_qadiya', 'type_talab', 'bracket'], name='tax_calcula_nature_cb28c5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('nature', 'type_maqal', 'categorie', 'type_qadiya', 'type_talab', 'montant'), name='uniq_tax_sample')],
+            },
+        ),
+    ]
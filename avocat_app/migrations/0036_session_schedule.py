@@ -0,0 +1,82 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0035_taxcalculationsample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_seance', models.DateField(verbose_name='تاريخ الجلسة')),
+                ('type_seance', models.CharField(blank=True, default='', max_length=100, verbose_name='نوع الجلسة')),
+                ('sessions', models.JSONField(blank=True, default=list, verbose_name='الجلسات')),
+                ('sessions_count', models.PositiveIntegerField(default=0)),
+                ('files_count', models.PositiveIntegerField(default=0)),
+                ('success', models.BooleanField(default=False)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الجلب')),
+                ('juridiction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='avocat_app.juridiction', verbose_name='المحكمة')),
+            ],
+            options={
+                'verbose_name': 'جدول جلسات',
+                'verbose_name_plural': 'جداول الجلسات',
+                'db_table': 'session_schedule',
+            },
+        ),
+        migrations.CreateModel(
+            name='SessionScheduleFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_seance', models.DateField()),
+                ('heure', models.CharField(blank=True, default='', max_length=20, verbose_name='الساعة')),
+                ('salle', models.CharField(blank=True, default='', max_length=100, verbose_name='القاعة')),
+                ('division', models.CharField(blank=True, default='', max_length=200, verbose_name='الشعبة')),
+                ('numero', models.CharField(blank=True, default='', max_length=50, verbose_name='رقم الملف')),
+                ('numero_dossier', models.CharField(blank=True, default='', max_length=20)),
+                ('code_categorie', models.CharField(blank=True, default='', max_length=10)),
+                ('annee', models.CharField(blank=True, default='', max_length=4)),
+                ('date_enregistrement', models.CharField(blank=True, default='', max_length=30, verbose_name='تاريخ التسجيل')),
+                ('type_procedure', models.CharField(blank=True, default='', max_length=255, verbose_name='نوع الإجراء')),
+                ('decision', models.TextField(blank=True, default='', verbose_name='القرار')),
+                ('prochaine_audience', models.CharField(blank=True, default='', max_length=30, verbose_name='الجلسة المقبلة')),
+                ('parties', models.JSONField(blank=True, default=list, verbose_name='الأطراف')),
+                ('affaire', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='avocat_app.affaire')),
+                ('audience', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='avocat_app.audience')),
+                ('juridiction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='avocat_app.juridiction')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='avocat_app.sessionschedule')),
+            ],
+            options={
+                'verbose_name': 'ملف بجدول الجلسات',
+                'db_table': 'session_schedule_file',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sessionschedule',
+            index=models.Index(fields=['date_seance', 'juridiction'], name='session_sch_date_se_4fb063_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessionschedule',
+            constraint=models.UniqueConstraint(fields=('juridiction', 'date_seance', 'type_seance'), name='uniq_session_schedule'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionschedulefile',
+            index=models.Index(fields=['numero_dossier', 'annee'], name='session_sch_numero__af233f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionschedulefile',
+            index=models.Index(fields=['date_seance', 'juridiction'], name='session_sch_date_se_a9432f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionschedulefile',
+            index=models.Index(fields=['affaire', 'date_seance'], name='session_sch_affaire_a03fef_idx'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import hashlib
+import json
+import zlib
+
+# Copie figée (octobre 2026) de mahakim_planner.result_fingerprint et des
+# helpers de mahakim_results : une modification ultérieure des services ne
+# doit pas changer cette migration.
+
+
+def result_fingerprint(obj):
+    """Empreinte SHA-256 du contenu utile d'une ligne MahakimSyncResult."""
+    payload = {
+        'statut': obj.statut_mahakim or '',
+        'prochaine_audience': str(obj.prochaine_audience or ''),
+        'juge': obj.juge or '',
+        'observations': obj.observations or '',
+        'procedures': obj.procedures_json or [],
+        'parties': obj.parties_json or [],
+    }
+    blob = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def html_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress_html(text):
+    return zlib.compress(text.encode('utf-8'), 6)
+
+
+def move_raw_html(apps, schema_editor):
+    """Empreintes des résultats existants, HTML brut vers mahakim_raw_html, pointeur du dernier résultat."""
+    MahakimSyncResult = apps.get_model('avocat_app', 'MahakimSyncResult')
+    MahakimRawHtml = apps.get_model('avocat_app', 'MahakimRawHtml')
+    MahakimSyncState = apps.get_model('avocat_app', 'MahakimSyncState')
+
+    html_ids = dict(MahakimRawHtml.objects.values_list('sha256', 'pk'))
+    batch = []
+    for obj in MahakimSyncResult.objects.all().order_by('pk').iterator(chunk_size=500):
+        obj.content_hash = result_fingerprint(obj) if obj.success else ''
+        if obj.raw_html:
+            sha = html_digest(obj.raw_html)
+            if sha not in html_ids:
+                html_ids[sha] = MahakimRawHtml.objects.create(
+                    sha256=sha, data=compress_html(obj.raw_html), size=len(obj.raw_html),
+                ).pk
+            obj.html_id = html_ids[sha]
+            obj.raw_html = None
+        batch.append(obj)
+        if len(batch) >= 500:
+            MahakimSyncResult.objects.bulk_update(batch, ['content_hash', 'html', 'raw_html'])
+            batch = []
+    if batch:
+        MahakimSyncResult.objects.bulk_update(batch, ['content_hash', 'html', 'raw_html'])
+
+    latest = {}
+    for pk, affaire_id in (MahakimSyncResult.objects.filter(affaire__isnull=False, is_deleted=False)
+                           .order_by('affaire_id', '-date_sync').values_list('pk', 'affaire_id')):
+        latest.setdefault(affaire_id, pk)
+    states = list(MahakimSyncState.objects.filter(affaire_id__in=list(latest)))
+    for state in states:
+        state.last_result_id = latest[state.affaire_id]
+    MahakimSyncState.objects.bulk_update(states, ['last_result'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0036_session_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MahakimRawHtml',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='بصمة HTML')),
+                ('data', models.BinaryField(verbose_name='HTML مضغوط')),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='الحجم الأصلي')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'HTML خام محاكم',
+                'verbose_name_plural': 'HTML خام محاكم',
+                'db_table': 'mahakim_raw_html',
+            },
+        ),
+        migrations.AddField(
+            model_name='mahakimsyncresult',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='بصمة النتيجة'),
+        ),
+        migrations.AddField(
+            model_name='mahakimsyncresult',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخر تأكيد'),
+        ),
+        migrations.AddField(
+            model_name='mahakimsyncresult',
+            name='seen_count',
+            field=models.PositiveIntegerField(default=1, verbose_name='عدد المزامنات المطابقة'),
+        ),
+        migrations.AddField(
+            model_name='mahakimsyncstate',
+            name='last_result',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='avocat_app.mahakimsyncresult', verbose_name='آخر نتيجة مزامنة'),
+        ),
+        migrations.AddField(
+            model_name='mahakimsyncresult',
+            name='html',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='avocat_app.mahakimrawhtml', verbose_name='HTML خام (مضغوط)'),
+        ),
+        migrations.AddIndex(
+            model_name='mahakimsyncresult',
+            index=models.Index(fields=['affaire', '-date_sync'], name='mahakim_sync_aff_date_idx'),
+        ),
+        migrations.RunPython(move_raw_html, migrations.RunPython.noop),
+    ]
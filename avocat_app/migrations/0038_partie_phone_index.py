@@ -0,0 +1,69 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:23
+
+from django.db import migrations, models
+
+import re
+
+# Copie figée (octobre 2026) de phone_lookup.phone_keys et de
+# twilio_client._normalize_to_e164 : une modification ultérieure des services
+# ne doit pas changer cette migration. `rebuild_phone_index` recalcule les
+# colonnes avec les règles courantes.
+SUFFIX_LEN = 8
+
+
+def _to_e164(phone):
+    digits = re.sub(r'[^\d+]', '', phone)
+    if digits.startswith('+'):
+        return digits if len(digits) >= 9 else None
+    if digits.startswith('00'):
+        return '+' + digits[2:]
+    if digits.startswith('0'):
+        return '+212' + digits[1:]
+    if digits.startswith('212'):
+        return '+' + digits
+    return None
+
+
+def phone_keys(phone):
+    raw = str(phone or '').replace('whatsapp:', '').strip()
+    if not raw:
+        return '', ''
+    return _to_e164(raw) or '', re.sub(r'\D', '', raw)[-SUFFIX_LEN:]
+
+
+def backfill_phone_keys(apps, schema_editor):
+    Partie = apps.get_model('avocat_app', 'Partie')
+    batch = []
+    for p in Partie.objects.exclude(telephone__isnull=True).exclude(telephone='').iterator(chunk_size=1000):
+        p.telephone_e164, p.telephone_suffix = phone_keys(p.telephone)
+        batch.append(p)
+        if len(batch) >= 1000:
+            Partie.objects.bulk_update(batch, ['telephone_e164', 'telephone_suffix'])
+            batch = []
+    if batch:
+        Partie.objects.bulk_update(batch, ['telephone_e164', 'telephone_suffix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0037_mahakim_sync_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partie',
+            name='telephone_e164',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20, verbose_name='الهاتف (E.164)'),
+        ),
+        migrations.AddField(
+            model_name='partie',
+            name='telephone_suffix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=8, verbose_name='آخر أرقام الهاتف'),
+        ),
+        migrations.AddIndex(
+            model_name='partie',
+            index=models.Index(fields=['telephone_suffix'], name='partie_telepho_349483_idx'),
+        ),
+        migrations.RunPython(backfill_phone_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0038_partie_phone_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='dedup_key',
+            field=models.CharField(blank=True, max_length=120, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:45
+
+from django.db import migrations
+
+import avocat_app.models_fields
+
+
+def json_to_binary(apps, schema_editor):
+    DecisionAnalysis = apps.get_model('avocat_app', 'DecisionAnalysis')
+    batch = []
+    qs = DecisionAnalysis._base_manager.exclude(embedding__isnull=True).only('pk', 'embedding')
+    for a in qs.iterator(chunk_size=500):
+        if isinstance(a.embedding, list) and a.embedding:
+            a.embedding_vec = a.embedding
+            batch.append(a)
+        if len(batch) >= 500:
+            DecisionAnalysis._base_manager.bulk_update(batch, ['embedding_vec'])
+            batch = []
+    if batch:
+        DecisionAnalysis._base_manager.bulk_update(batch, ['embedding_vec'])
+
+
+def binary_to_json(apps, schema_editor):
+    DecisionAnalysis = apps.get_model('avocat_app', 'DecisionAnalysis')
+    batch = []
+    qs = DecisionAnalysis._base_manager.exclude(embedding_vec__isnull=True).only('pk', 'embedding_vec')
+    for a in qs.iterator(chunk_size=500):
+        a.embedding = [float(x) for x in a.embedding_vec]
+        batch.append(a)
+        if len(batch) >= 500:
+            DecisionAnalysis._base_manager.bulk_update(batch, ['embedding'])
+            batch = []
+    if batch:
+        DecisionAnalysis._base_manager.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0039_backgroundjob_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decisionanalysis',
+            name='embedding_vec',
+            field=avocat_app.models_fields.VectorField(blank=True, null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name='decisionanalysis',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='decisionanalysis',
+            old_name='embedding_vec',
+            new_name='embedding',
+        ),
+        migrations.AlterField(
+            model_name='decisionanalysis',
+            name='embedding',
+            field=avocat_app.models_fields.VectorField(blank=True, help_text='Vecteur de similarité sémantique (float32 binaire, cf. models_fields).', null=True, verbose_name='التضمين'),
+        ),
+    ]
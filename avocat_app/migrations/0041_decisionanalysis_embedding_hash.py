@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0040_decisionanalysis_binary_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decisionanalysis',
+            name='embedding_hash',
+            field=models.CharField(blank=True, default='', editable=False, help_text="sha256(modèle, texte) de l'embedding courant (index_decisions).", max_length=64, verbose_name='بصمة النص المضمّن'),
+        ),
+    ]
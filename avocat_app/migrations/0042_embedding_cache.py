@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:39
+
+import avocat_app.models_fields
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0041_decisionanalysis_embedding_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=64, verbose_name='نموذج التضمين')),
+                ('key', models.CharField(max_length=64, verbose_name='بصمة النص')),
+                ('vector', avocat_app.models_fields.VectorField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'embedding_cache',
+                'indexes': [models.Index(fields=['last_used_at'], name='embedding_c_last_us_d89822_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'key'), name='embedding_cache_model_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:52
+
+import avocat_app.models_fields
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0042_embedding_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DecisionPassage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('position', models.PositiveSmallIntegerField(verbose_name='الترتيب')),
+                ('start', models.PositiveIntegerField(verbose_name='بداية المقطع')),
+                ('end', models.PositiveIntegerField(verbose_name='نهاية المقطع')),
+                ('embedding_model', models.CharField(max_length=64, verbose_name='نموذج التضمين')),
+                ('embedding', avocat_app.models_fields.VectorField(null=True)),
+                ('source_hash', models.CharField(editable=False, max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='avocat_app.decisionanalysis', verbose_name='تحليل الحكم')),
+            ],
+            options={
+                'db_table': 'decision_passage',
+                'ordering': ['analysis', 'position'],
+                'indexes': [models.Index(fields=['analysis', 'embedding_model'], name='decision_pa_analysi_0b26d6_idx'), models.Index(fields=['embedding_model', 'created_at'], name='decision_pa_embeddi_e48b9f_idx')],
+            },
+        ),
+    ]
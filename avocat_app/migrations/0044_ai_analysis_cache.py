@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-19 07:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0043_decision_passage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AiAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=64, verbose_name='نموذج الذكاء الاصطناعي')),
+                ('key', models.CharField(max_length=64, verbose_name='بصمة النص')),
+                ('result', models.JSONField(default=dict)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'ai_analysis_cache',
+                'indexes': [models.Index(fields=['created_at'], name='ai_analysis_created_0f34f9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'key'), name='ai_analysis_cache_model_key_uniq')],
+            },
+        ),
+    ]
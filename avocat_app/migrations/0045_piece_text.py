@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0044_ai_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PieceText',
+            fields=[
+                ('piece', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='extracted_text', serialize=False, to='avocat_app.piecejointe', verbose_name='المرفق')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='بصمة الملف')),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('text', models.BinaryField(default=b'')),
+                ('page_offsets', models.JSONField(blank=True, default=list)),
+                ('chars', models.PositiveIntegerField(default=0, verbose_name='عدد الأحرف')),
+                ('error', models.TextField(blank=True, default='')),
+                ('seconds', models.FloatField(default=0.0)),
+                ('extracted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'piece_text',
+            },
+        ),
+    ]
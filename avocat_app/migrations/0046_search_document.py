@@ -0,0 +1,161 @@
+# Generated by Django 5.1.2 on 2026-10-19 08:10
+
+from django.db import migrations, models
+
+import re
+import unicodedata
+
+# Copie figée (octobre 2026) des règles de services/global_search.py : une
+# modification ultérieure du service ne doit pas changer cette migration.
+# `python manage.py rebuild_search_index` recalcule l'index avec les règles courantes.
+
+KINDS = ('affaire', 'partie', 'juridiction', 'avocat')
+URLS = {
+    'affaire': '/affaires/{}/',
+    'partie': '/parties/{}/',
+    'juridiction': '/juridictions/{}/',
+    'avocat': '/avocats/{}/',
+}
+_DIACRITICS = re.compile(r"[\u064b-\u065f\u0670]")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def _normalize(text):
+    t = _DIACRITICS.sub('', (text or '').lower())
+    t = t.replace('أ', 'ا').replace('إ', 'ا').replace('آ', 'ا').replace('ى', 'ي').replace('ة', 'ه')
+    t = unicodedata.normalize('NFKD', t.translate(_DIGITS))
+    t = ''.join(ch for ch in t if not unicodedata.combining(ch))
+    return ' '.join(_TOKEN_RE.findall(t))
+
+
+def _fts_table(kind):
+    return f'search_document_fts_{kind}'
+
+
+def _sqlite_ddl(kind):
+    t = _fts_table(kind)
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5("
+        "text, content='search_document', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON search_document "
+        f"WHEN new.kind = '{kind}' BEGIN INSERT INTO {t}(rowid, text) VALUES (new.id, new.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON search_document "
+        f"WHEN old.kind = '{kind}' BEGIN INSERT INTO {t}({t}, rowid, text) VALUES ('delete', old.id, old.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE OF kind, text ON search_document BEGIN "
+        f"INSERT INTO {t}({t}, rowid, text) SELECT 'delete', old.id, old.text WHERE old.kind = '{kind}'; "
+        f"INSERT INTO {t}(rowid, text) SELECT new.id, new.text WHERE new.kind = '{kind}'; END",
+    )
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE search_document ADD FULLTEXT INDEX search_document_text_ft (text) WITH PARSER ngram'
+        )
+    elif vendor == 'sqlite':
+        try:
+            for kind in KINDS:
+                for sql in _sqlite_ddl(kind):
+                    schema_editor.execute(sql)
+        except Exception:
+            pass  # SQLite sans FTS5 : la recherche globale se replie sur LIKE
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE search_document DROP INDEX search_document_text_ft')
+    elif vendor == 'sqlite':
+        for kind in KINDS:
+            t = _fts_table(kind)
+            for sql in (f'DROP TRIGGER IF EXISTS {t}_ai', f'DROP TRIGGER IF EXISTS {t}_ad',
+                        f'DROP TRIGGER IF EXISTS {t}_au', f'DROP TABLE IF EXISTS {t}'):
+                schema_editor.execute(sql)
+
+
+def _documents(apps, kind):
+    model = apps.get_model('avocat_app', kind.capitalize())
+    qs = model.objects.filter(is_deleted=False)
+    if kind == 'affaire':
+        rows = qs.values('pk', 'reference_interne', 'reference_tribunal', 'numero_dossier', 'objet',
+                         'type_affaire__libelle', 'juridiction__nomtribunal_ar', 'juridiction__nomtribunal_fr')
+    elif kind == 'partie':
+        roles = {str(k): str(v) for k, v in model._meta.get_field('type_partie').choices or []}
+        rows = qs.values('pk', 'nom_complet', 'type_partie', 'telephone', 'cin_ou_rc', 'email')
+    elif kind == 'juridiction':
+        rows = qs.values('pk', 'nomtribunal_ar', 'nomtribunal_fr', 'villetribunal_ar', 'villetribunal_fr', 'code')
+    else:
+        rows = qs.values('pk', 'nom', 'telephone', 'email')
+    for v in rows.iterator(chunk_size=2000):
+        if kind == 'affaire':
+            court = v['juridiction__nomtribunal_ar'] or v['juridiction__nomtribunal_fr'] or ''
+            title, subtitle = v['reference_interne'], f"{v['type_affaire__libelle']} — {court}"
+            searchable = [v['reference_interne'], v['reference_tribunal'], v['numero_dossier'],
+                          (v['objet'] or '')[:4000]]
+        elif kind == 'partie':
+            role = roles.get(v['type_partie'], v['type_partie'])
+            title = v['nom_complet']
+            subtitle = f"{role} — {v['telephone'] or v['cin_ou_rc'] or v['email'] or ''}"
+            searchable = [v['nom_complet'], v['telephone'], _NON_DIGITS.sub('', v['telephone'] or ''),
+                          v['cin_ou_rc'], v['email']]
+        elif kind == 'juridiction':
+            title = v['nomtribunal_ar'] or v['nomtribunal_fr'] or v['code']
+            subtitle = v['villetribunal_ar'] or v['villetribunal_fr'] or ''
+            searchable = [v['nomtribunal_ar'], v['nomtribunal_fr'], v['villetribunal_ar'],
+                          v['villetribunal_fr'], v['code']]
+        else:
+            title, subtitle = v['nom'], v['telephone'] or v['email'] or ''
+            searchable = [v['nom'], v['telephone'], _NON_DIGITS.sub('', v['telephone'] or ''), v['email']]
+        yield {
+            'kind': kind,
+            'object_id': str(v['pk']),
+            'title': (title or '')[:255],
+            'subtitle': (subtitle or '')[:255],
+            'url': URLS[kind].format(v['pk']),
+            'text': f" {_normalize(' '.join(s for s in searchable if s))}",
+        }
+
+
+def backfill(apps, schema_editor):
+    SearchDocument = apps.get_model('avocat_app', 'SearchDocument')
+    db = schema_editor.connection.alias
+    for kind in KINDS:
+        batch = []
+        for doc in _documents(apps, kind):
+            batch.append(SearchDocument(**doc))
+            if len(batch) >= 2000:
+                SearchDocument.objects.using(db).bulk_create(batch)
+                batch = []
+        SearchDocument.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('avocat_app', '0045_piece_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20, verbose_name='النوع')),
+                ('object_id', models.CharField(max_length=64)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('subtitle', models.CharField(blank=True, default='', max_length=255)),
+                ('url', models.CharField(blank=True, default='', max_length=255)),
+                ('text', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'search_document',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='uniq_search_document_object')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
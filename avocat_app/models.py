@@ -11,6 +11,8 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .models_base import TimeStampedSoftDeleteModel
+from .models_fields import VectorField
+from .models_softdelete import ActiveManager, AllManager
 
 
 # =============================================
@@ -725,16 +727,27 @@ class Partie(TimeStampedSoftDeleteModel):
     email = models.EmailField(max_length=120, null=True, blank=True, verbose_name='بريد إلكتروني')
     representant_legal = models.CharField(max_length=180, null=True, blank=True, verbose_name='الممثل القانوني', validators=[arabic_name_validator])
     avocat = models.ForeignKey(Avocat, null=True, blank=True, on_delete=models.SET_NULL, verbose_name='محامي الطرف')
+    # Dérivés de `telephone` à chaque save (services/phone_lookup.py)
+    telephone_e164 = models.CharField(max_length=20, blank=True, default='', editable=False, verbose_name='الهاتف (E.164)')
+    telephone_suffix = models.CharField(max_length=8, blank=True, default='', editable=False, verbose_name='آخر أرقام الهاتف')
 
     class Meta:
         db_table = 'partie'
         verbose_name = 'طرف'
         verbose_name_plural = 'أطراف'
-        indexes = [models.Index(fields=['nom_complet'])]
+        indexes = [models.Index(fields=['nom_complet']), models.Index(fields=['telephone_suffix'])]
 
     def __str__(self):
         return f"{self.nom_complet} — {self.get_type_partie_display()}"
 
+    def save(self, *args, **kwargs):
+        from .services.phone_lookup import phone_keys
+        self.telephone_e164, self.telephone_suffix = phone_keys(self.telephone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'telephone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'telephone_e164', 'telephone_suffix'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse("cabinet:partie_detail", kwargs={"pk": self.pk})
 
@@ -1215,6 +1228,22 @@ class AuthToken(TimeStampedSoftDeleteModel):
             self.save(update_fields=["is_active"])
 
 
+class MahakimRawHtml(models.Model):
+    """HTML brut d'un résultat mahakim.ma, compressé (zlib) et partagé par empreinte SHA-256."""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='بصمة HTML')
+    data = models.BinaryField(verbose_name='HTML مضغوط')
+    size = models.PositiveIntegerField(default=0, verbose_name='الحجم الأصلي')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='تاريخ الإنشاء')
+
+    class Meta:
+        db_table = 'mahakim_raw_html'
+        verbose_name = 'HTML خام محاكم'
+        verbose_name_plural = 'HTML خام محاكم'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size})"
+
+
 class MahakimSyncResult(TimeStampedSoftDeleteModel):
     SYNC_TYPE_CHOICES = [
         ('dossier', 'ملف/محضر/شكاية'),
@@ -1235,18 +1264,74 @@ class MahakimSyncResult(TimeStampedSoftDeleteModel):
     error_message = models.TextField(null=True, blank=True, verbose_name='رسالة الخطأ')
     procedures_json = models.JSONField(null=True, blank=True, verbose_name='الإجراءات المستخرجة')
     parties_json = models.JSONField(null=True, blank=True, verbose_name='الأطراف المستخرجة')
+    # Déduplication : une ligne par résultat distinct, les synchronisations
+    # identiques suivantes ne font que mettre à jour last_seen_at / seen_count.
+    content_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='بصمة النتيجة')
+    html = models.ForeignKey(MahakimRawHtml, null=True, blank=True, on_delete=models.SET_NULL,
+                             related_name='results', verbose_name='HTML خام (مضغوط)')
+    last_seen_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر تأكيد')
+    seen_count = models.PositiveIntegerField(default=1, verbose_name='عدد المزامنات المطابقة')
 
     class Meta:
         db_table = 'mahakim_sync_result'
         verbose_name = 'نتيجة مزامنة محاكم'
         verbose_name_plural = 'نتائج مزامنة محاكم'
         ordering = ['-date_sync']
+        indexes = [
+            models.Index(fields=['affaire', '-date_sync'], name='mahakim_sync_aff_date_idx'),
+        ]
 
     def __str__(self):
         status = "✓" if self.success else "✗"
         ref = self.affaire.reference_interne if self.affaire else self.get_sync_type_display()
         return f"{status} مزامنة {ref} — {self.date_sync:%Y-%m-%d %H:%M}"
 
+    @property
+    def checked_at(self):
+        """Date de la dernière synchronisation ayant donné ce résultat."""
+        return self.last_seen_at or self.date_sync
+
+    def html_text(self) -> str:
+        """HTML brut décompressé (ou ancien champ raw_html non migré)."""
+        from .services.mahakim_results import decompress_html
+
+        if self.html_id:
+            return decompress_html(self.html.data)
+        return self.raw_html or ''
+
+
+class MahakimSyncState(models.Model):
+    """État de fraîcheur d'une affaire vis-à-vis de mahakim.ma (une ligne par affaire).
+
+    Alimenté après chaque synchronisation et lu par le planificateur
+    (`sync_mahakim --plan`) pour prioriser les affaires à rafraîchir.
+    """
+    affaire = models.OneToOneField(Affaire, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='mahakim_state', verbose_name='القضية')
+    last_sync_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر مزامنة')
+    last_success_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر مزامنة ناجحة')
+    last_changed_at = models.DateTimeField(null=True, blank=True, verbose_name='آخر تغيير في النتيجة')
+    last_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='بصمة آخر نتيجة')
+    unchanged_count = models.PositiveIntegerField(default=0, verbose_name='مزامنات متتالية بدون تغيير')
+    failure_count = models.PositiveIntegerField(default=0, verbose_name='إخفاقات متتالية')
+    prochaine_audience = models.DateField(null=True, blank=True, verbose_name='الجلسة القادمة (محاكم)')
+    priority = models.FloatField(default=0.0, verbose_name='الأولوية المحسوبة')
+    last_result = models.ForeignKey(MahakimSyncResult, null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name='+', verbose_name='آخر نتيجة مزامنة')
+
+    class Meta:
+        db_table = 'mahakim_sync_state'
+        verbose_name = 'حالة مزامنة محاكم'
+        verbose_name_plural = 'حالات مزامنة محاكم'
+        indexes = [
+            models.Index(fields=['last_sync_at']),
+            models.Index(fields=['-priority']),
+            models.Index(fields=['prochaine_audience']),
+        ]
+
+    def __str__(self):
+        return f"{self.affaire_id} — {self.priority:.2f}"
+
 
 class ContumaceRecord(TimeStampedSoftDeleteModel):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -1258,6 +1343,8 @@ class ContumaceRecord(TimeStampedSoftDeleteModel):
     numero_carte = models.CharField(max_length=50, null=True, blank=True, verbose_name='رقم البطاقة')
     details_text = models.TextField(null=True, blank=True, verbose_name='التفاصيل')
     date_sync = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ المزامنة')
+    # Texte normalisé pour la recherche approchée (services/contumace_search.py)
+    search_text = models.TextField(blank=True, default='', editable=False, verbose_name='نص البحث')
 
     class Meta:
         db_table = 'contumace_record'
@@ -1269,6 +1356,83 @@ class ContumaceRecord(TimeStampedSoftDeleteModel):
     def __str__(self):
         return f"{self.nom_accuse} — {self.numero_dossier} ({self.cour_appel})"
 
+    def save(self, *args, **kwargs):
+        from .services.contumace_search import record_search_text
+        self.search_text = record_search_text(self)
+        super().save(*args, **kwargs)
+
+
+class ContumaceSearchGram(models.Model):
+    """Trigrammes normalisés d'un ContumaceRecord (index de recherche approchée)."""
+    record = models.ForeignKey(ContumaceRecord, on_delete=models.CASCADE, related_name='+')
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        db_table = 'contumace_search_gram'
+        indexes = [models.Index(fields=['gram', 'record'])]
+
+
+class SessionSchedule(models.Model):
+    """
+    Programme des audiences (جدول الجلسات) d'une juridiction pour une date,
+    tel que publié sur mahakim.ma. Sert de cache : relu tant que `fetched_at`
+    a moins de MAHAKIM_SESSIONS_TTL_HOURS (services/mahakim_sessions.py).
+    """
+    juridiction = models.ForeignKey(Juridiction, on_delete=models.CASCADE, related_name='+', verbose_name='المحكمة')
+    date_seance = models.DateField(verbose_name='تاريخ الجلسة')
+    type_seance = models.CharField(max_length=100, blank=True, default='', verbose_name='نوع الجلسة')
+    sessions = models.JSONField(default=list, blank=True, verbose_name='الجلسات')
+    sessions_count = models.PositiveIntegerField(default=0)
+    files_count = models.PositiveIntegerField(default=0)
+    success = models.BooleanField(default=False)
+    error_message = models.TextField(null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now, verbose_name='تاريخ الجلب')
+
+    class Meta:
+        db_table = 'session_schedule'
+        verbose_name = 'جدول جلسات'
+        verbose_name_plural = 'جداول الجلسات'
+        constraints = [
+            models.UniqueConstraint(fields=['juridiction', 'date_seance', 'type_seance'], name='uniq_session_schedule'),
+        ]
+        indexes = [models.Index(fields=['date_seance', 'juridiction'])]
+
+    def __str__(self):
+        return f"{self.juridiction_id} — {self.date_seance}"
+
+
+class SessionScheduleFile(models.Model):
+    """Un dossier inscrit au rôle d'une séance (ligne normalisée de SessionSchedule.sessions)."""
+    schedule = models.ForeignKey(SessionSchedule, on_delete=models.CASCADE, related_name='files')
+    juridiction = models.ForeignKey(Juridiction, on_delete=models.CASCADE, related_name='+')
+    date_seance = models.DateField()
+    heure = models.CharField(max_length=20, blank=True, default='', verbose_name='الساعة')
+    salle = models.CharField(max_length=100, blank=True, default='', verbose_name='القاعة')
+    division = models.CharField(max_length=200, blank=True, default='', verbose_name='الشعبة')
+    numero = models.CharField(max_length=50, blank=True, default='', verbose_name='رقم الملف')
+    numero_dossier = models.CharField(max_length=20, blank=True, default='')
+    code_categorie = models.CharField(max_length=10, blank=True, default='')
+    annee = models.CharField(max_length=4, blank=True, default='')
+    date_enregistrement = models.CharField(max_length=30, blank=True, default='', verbose_name='تاريخ التسجيل')
+    type_procedure = models.CharField(max_length=255, blank=True, default='', verbose_name='نوع الإجراء')
+    decision = models.TextField(blank=True, default='', verbose_name='القرار')
+    prochaine_audience = models.CharField(max_length=30, blank=True, default='', verbose_name='الجلسة المقبلة')
+    parties = models.JSONField(default=list, blank=True, verbose_name='الأطراف')
+    affaire = models.ForeignKey(Affaire, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    audience = models.ForeignKey(Audience, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        db_table = 'session_schedule_file'
+        verbose_name = 'ملف بجدول الجلسات'
+        indexes = [
+            models.Index(fields=['numero_dossier', 'annee']),
+            models.Index(fields=['date_seance', 'juridiction']),
+            models.Index(fields=['affaire', 'date_seance']),
+        ]
+
+    def __str__(self):
+        return f"{self.numero} — {self.date_seance}"
+
 
 class TaxCalculatorCache(models.Model):
     """
@@ -1302,6 +1466,45 @@ class TaxCalculatorCache(models.Model):
         return f"Tax Cache — {self.date_sync:%Y-%m-%d %H:%M}"
 
 
+class TaxCalculationSample(models.Model):
+    """
+    Résultat d'un calcul de taxe obtenu sur caisseenligne (cache des calculs).
+
+    Clé : (nature, type_maqal, categorie, type_qadiya, type_talab, montant).
+    `bracket` = ordre de grandeur du montant : les échantillons d'une même
+    combinaison et d'une même tranche servent à inférer la formule de la taxe
+    (services/tax_engine.py).
+    """
+    nature = models.CharField(max_length=100)
+    type_maqal = models.CharField(max_length=100)
+    categorie = models.CharField(max_length=100)
+    type_qadiya = models.CharField(max_length=100)
+    type_talab = models.CharField(max_length=100, blank=True, default='')
+    montant = models.DecimalField(max_digits=16, decimal_places=2)
+    bracket = models.SmallIntegerField(default=0)
+    total = models.DecimalField(max_digits=16, decimal_places=2, null=True, blank=True, verbose_name='المجموع')
+    result_text = models.TextField(blank=True, default='')
+    result_html = models.TextField(blank=True, default='')
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'tax_calculation_sample'
+        verbose_name = 'نتيجة حساب الرسوم'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['nature', 'type_maqal', 'categorie', 'type_qadiya', 'type_talab', 'montant'],
+                name='uniq_tax_sample',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['nature', 'type_maqal', 'categorie', 'type_qadiya', 'type_talab', 'bracket']),
+        ]
+
+    def __str__(self):
+        return f"{self.categorie} / {self.type_qadiya} — {self.montant} → {self.total}"
+
+
 # =============================================================
 # WhatsApp / Twilio messaging
 # =============================================================
@@ -1406,6 +1609,19 @@ class WhatsAppMessage(TimeStampedSoftDeleteModel):
 # AI — Résumé automatique de décision (Claude)
 # =============================================================
 
+class _DeferEmbeddingMixin:
+    def get_queryset(self):
+        return super().get_queryset().defer("embedding")
+
+
+class DecisionAnalysisManager(_DeferEmbeddingMixin, ActiveManager):
+    """Analyses actives, sans l'embedding (chargé par `.only()` / `values_list()` explicites)."""
+
+
+class DecisionAnalysisAllManager(_DeferEmbeddingMixin, AllManager):
+    """Toutes les analyses, sans l'embedding."""
+
+
 class DecisionAnalysis(TimeStampedSoftDeleteModel):
     """Résumé et extraction structurée d'une décision par l'IA (Claude)."""
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -1428,10 +1644,16 @@ class DecisionAnalysis(TimeStampedSoftDeleteModel):
     is_dry_run = models.BooleanField(default=False, verbose_name='محاكاة (بدون استدعاء API)')
     error_message = models.TextField(null=True, blank=True, verbose_name='رسالة الخطأ')
     generated_at = models.DateTimeField(null=True, blank=True, verbose_name='وقت التحليل')
-    embedding = models.JSONField(null=True, blank=True, verbose_name='التضمين',
-                                 help_text='Vecteur de similarité sémantique (list[float]).')
+    embedding = VectorField(null=True, blank=True, verbose_name='التضمين',
+                            help_text='Vecteur de similarité sémantique (float32 binaire, cf. models_fields).')
     embedding_model = models.CharField(max_length=64, null=True, blank=True,
                                        verbose_name='نموذج التضمين')
+    embedding_hash = models.CharField(max_length=64, blank=True, default='', editable=False,
+                                      verbose_name='بصمة النص المضمّن',
+                                      help_text='sha256(modèle, texte) de l\'embedding courant (index_decisions).')
+
+    objects = DecisionAnalysisManager()
+    all_objects = DecisionAnalysisAllManager()
 
     class Meta:
         db_table = 'decision_analysis'
@@ -1577,3 +1799,187 @@ class SyncOutbox(models.Model):
 
     def __str__(self):
         return f"[{self.op}] {self.table_name}:{self.entity_id}"
+
+
+# =============================================
+# BackgroundJob — file de tâches durable (scraping mahakim, traitements longs).
+# Alimentée par `services.jobs.enqueue`, consommée par `run_workers`
+# (ou le worker embarqué). Les mises à jour de progression passent par
+# QuerySet.update() : pas de signal d'audit à chaque battement.
+# =============================================
+class BackgroundJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    ERROR = "error"
+    STATUS_CHOICES = [
+        (QUEUED, "في الانتظار"),
+        (RUNNING, "قيد التنفيذ"),
+        (DONE, "منتهية"),
+        (ERROR, "خطأ"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    kind = models.CharField(max_length=64, verbose_name="نوع المهمة")
+    # Clé d'idempotence (ex. MessageSid Twilio) : une seule tâche par clé
+    dedup_key = models.CharField(max_length=120, null=True, blank=True, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.JSONField(default=dict, blank=True)
+    message = models.TextField(blank=True, default="")
+    result = models.JSONField(null=True, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=120, blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                                   on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "background_job"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+            models.Index(fields=["kind", "status"]),
+            models.Index(fields=["finished_at"]),
+        ]
+
+    def __str__(self):
+        return f"[{self.status}] {self.kind} {self.pk}"
+
+
+# =============================================
+# Cache d'embeddings (services/embedding_cache.py)
+# Second niveau, partagé par les processus, derrière le LRU en mémoire.
+# Écritures par bulk_create / update() : pas de signal d'audit.
+# =============================================
+class EmbeddingCache(models.Model):
+    model = models.CharField(max_length=64, verbose_name="نموذج التضمين")
+    key = models.CharField(max_length=64, verbose_name="بصمة النص")  # sha256 du texte normalisé
+    vector = VectorField()
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "embedding_cache"
+        constraints = [
+            models.UniqueConstraint(fields=["model", "key"], name="embedding_cache_model_key_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["last_used_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.key[:12]}"
+
+
+# =============================================
+# Passages des textes sources (services/passages.py)
+# Le texte n'est pas recopié : offsets [start, end) dans DecisionAnalysis.source_text.
+# Remplacés en bloc à chaque changement du texte (suppression SQL + bulk_create, sans audit).
+# =============================================
+class DecisionPassage(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    analysis = models.ForeignKey(DecisionAnalysis, on_delete=models.CASCADE, related_name="passages",
+                                 verbose_name="تحليل الحكم")
+    position = models.PositiveSmallIntegerField(verbose_name="الترتيب")
+    start = models.PositiveIntegerField(verbose_name="بداية المقطع")
+    end = models.PositiveIntegerField(verbose_name="نهاية المقطع")
+    embedding_model = models.CharField(max_length=64, verbose_name="نموذج التضمين")
+    embedding = VectorField(null=True)
+    # content_hash du texte source et des réglages de découpage : inchangé → pas de recalcul
+    source_hash = models.CharField(max_length=64, editable=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "decision_passage"
+        ordering = ["analysis", "position"]
+        indexes = [
+            models.Index(fields=["analysis", "embedding_model"]),
+            models.Index(fields=["embedding_model", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.analysis_id}#{self.position} [{self.start}:{self.end}]"
+
+
+# =============================================
+# Cache des analyses IA (services/ai_client.py)
+# Clé : modèle Claude + sha256 du prompt (texte tronqué compris). Seuls les
+# résultats réussis hors dry-run y sont écrits (bulk_create / update(), sans audit).
+# =============================================
+class AiAnalysisCache(models.Model):
+    model = models.CharField(max_length=64, verbose_name="نموذج الذكاء الاصطناعي")
+    key = models.CharField(max_length=64, verbose_name="بصمة النص")
+    result = models.JSONField(default=dict)  # AnalysisResult sérialisé (dataclasses.asdict)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "ai_analysis_cache"
+        constraints = [
+            models.UniqueConstraint(fields=["model", "key"], name="ai_analysis_cache_model_key_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.key[:12]}"
+
+
+# =============================================
+# Texte extrait des PDF joints (services/pdf_text.py)
+# Une ligne par PieceJointe, texte compressé (zlib) et début de chaque page.
+# Périmée dès que le fichier change (nom / taille, ou invalidation explicite
+# de files_views) ; un contenu déjà extrait (même sha256) est recopié sans relecture.
+# =============================================
+class PieceText(models.Model):
+    piece = models.OneToOneField(PieceJointe, on_delete=models.CASCADE, primary_key=True,
+                                 related_name="extracted_text", verbose_name="المرفق")
+    content_hash = models.CharField(max_length=64, db_index=True, verbose_name="بصمة الملف")
+    file_name = models.CharField(max_length=255)
+    file_size = models.BigIntegerField(default=0)
+    text = models.BinaryField(default=b"")  # zlib(utf-8)
+    page_offsets = models.JSONField(default=list, blank=True)  # début de chaque page dans le texte
+    chars = models.PositiveIntegerField(default=0, verbose_name="عدد الأحرف")
+    error = models.TextField(blank=True, default="")
+    seconds = models.FloatField(default=0.0)
+    extracted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "piece_text"
+
+    def __str__(self):
+        return f"{self.piece_id} ({len(self.page_offsets)} p.)"
+
+
+# =============================================
+# Index de la recherche globale (services/global_search.py)
+# Une ligne par affaire, partie, juridiction ou avocat : résultat déjà mis en
+# forme et texte normalisé, indexé en plein texte (FTS5 trigram / FULLTEXT ngram).
+# =============================================
+class SearchDocument(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, verbose_name="النوع")
+    object_id = models.CharField(max_length=64)
+    title = models.CharField(max_length=255, blank=True, default="")
+    subtitle = models.CharField(max_length=255, blank=True, default="")
+    url = models.CharField(max_length=255, blank=True, default="")
+    text = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "search_document"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uniq_search_document_object"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
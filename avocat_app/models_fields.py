@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Champ vecteur binaire (embeddings) : float32 little-endian, float16 ou int8 quantifié.
+
+Format stocké : en-tête de 8 octets puis les composantes.
+
+    octet 0     : 0 = float32, 1 = float16, 2 = int8 (× échelle)
+    octets 1-3  : réservés
+    octets 4-7  : échelle float32 (int8 seulement)
+
+La valeur Python est un `np.ndarray` : en float32 c'est une vue en lecture
+seule sur les octets lus en base (`np.frombuffer`, sans copie ni
+json.loads) ; float16 est élargi et int8 multiplié par l'échelle. Le
+format d'écriture vient de EMBEDDING_STORAGE (float32 par défaut) ; chaque
+valeur porte son format, changer le réglage ne demande pas de migration.
+"""
+import base64
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+
+HEADER = 8
+FORMATS = {"float32": 0, "float16": 1, "int8": 2}
+_F32 = np.dtype("<f4")
+_F16 = np.dtype("<f2")
+
+
+def encode_vector(values, storage: str = "float32") -> bytes:
+    vec = np.asarray(values, dtype=np.float32).ravel()
+    code = FORMATS.get(storage, 0)
+    scale = 0.0
+    if code == 1:
+        body = vec.astype(_F16).tobytes()
+    elif code == 2:
+        peak = float(np.max(np.abs(vec))) if vec.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        body = np.clip(np.rint(vec / scale), -127, 127).astype(np.int8).tobytes()
+    else:
+        body = vec.astype(_F32).tobytes()
+    header = bytes([code, 0, 0, 0]) + np.float32(scale).astype(_F32).tobytes()
+    return header + body
+
+
+def decode_vector(data) -> np.ndarray:
+    buf = memoryview(data)
+    code = buf[0]
+    if code == 0:
+        return np.frombuffer(buf, dtype=_F32, offset=HEADER)
+    if code == 1:
+        return np.frombuffer(buf, dtype=_F16, offset=HEADER).astype(np.float32)
+    if code == 2:
+        scale = float(np.frombuffer(buf, dtype=_F32, count=1, offset=4)[0])
+        return np.frombuffer(buf, dtype=np.int8, offset=HEADER).astype(np.float32) * np.float32(scale)
+    raise ValueError(f"format de vecteur inconnu : {code}")
+
+
+class VectorField(models.BinaryField):
+    """Embedding stocké en binaire ; accepte en écriture une liste de floats ou un ndarray."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get("editable") is False:
+            del kwargs["editable"]
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return decode_vector(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, np.ndarray):
+            return value
+        if isinstance(value, str):
+            # Sérialisation (dumpdata/loaddata) : base64 du format stocké
+            return decode_vector(base64.b64decode(value.encode("ascii")))
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_vector(value)
+        return np.asarray(value, dtype=np.float32)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        vec = np.asarray(value, dtype=np.float32).ravel()
+        if not vec.size:
+            return None
+        return encode_vector(vec, getattr(settings, "EMBEDDING_STORAGE", "float32"))
+
+    def value_to_string(self, obj):
+        value = self.get_prep_value(self.value_from_object(obj))
+        return base64.b64encode(value).decode("ascii") if value is not None else None
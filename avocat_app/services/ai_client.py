@@ -6,14 +6,25 @@ Conçu pour ne JAMAIS faire planter l'app si:
 - la requête échoue → renvoie un dict avec error_message rempli.
 
 Le prompt force un JSON structuré pour une extraction fiable.
+
+Les appels respectent ANTHROPIC_REQUESTS_PER_MINUTE (limiteur partagé par
+les threads) et retentent 429 / 529 / 5xx. Les résultats réussis sont mis en
+cache (table `ai_analysis_cache`, clé modèle + sha256 du prompt, donc du
+texte tronqué) : ré-analyser un texte identique ne rappelle pas l'API.
+L'analyse depuis l'interface passe par la file de tâches (services/ai_jobs.py).
 """
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import re
-from dataclasses import dataclass, field
-from typing import Optional
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, fields
+from datetime import timedelta
+from typing import Callable, Optional
 
 import requests
 from django.conf import settings
@@ -24,6 +35,8 @@ ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
 ANTHROPIC_VERSION = "2023-06-01"
 DEFAULT_MODEL = "claude-sonnet-4-6"
 MAX_INPUT_CHARS = 80000  # ~ tokens; on tronque proprement si le texte est trop long
+ANTHROPIC_RETRIES = 4
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504, 529}
 
 
 @dataclass
@@ -40,29 +53,21 @@ class AnalysisResult:
     dates_importantes: list = field(default_factory=list)
     raw_response: str = ""
     error_message: str = ""
+    from_cache: bool = False
 
 
 # --- PDF extraction ---------------------------------------------------------
 
 def extract_text_from_pdf(file_path_or_obj) -> str:
-    """Extrait le texte brut d'un PDF. Retourne '' en cas d'erreur."""
+    """Extrait le texte brut d'un PDF. Retourne '' en cas d'erreur.
+
+    Sans cache : les pièces jointes passent par services/pdf_text.get_text.
+    """
+    from .pdf_text import PAGE_SEPARATOR, read_pages
     try:
-        from pypdf import PdfReader
+        return PAGE_SEPARATOR.join(read_pages(file_path_or_obj)).strip()
     except ImportError:
-        try:
-            from PyPDF2 import PdfReader  # type: ignore
-        except ImportError:
-            return ""
-    try:
-        reader = PdfReader(file_path_or_obj)
-        pages_text = []
-        for page in reader.pages:
-            try:
-                t = page.extract_text() or ""
-                pages_text.append(t)
-            except Exception:
-                continue
-        return "\n\n".join(pages_text).strip()
+        return ""
     except Exception as e:
         logger.exception("PDF extraction failed: %s", e)
         return ""
@@ -100,6 +105,114 @@ ANALYSIS_PROMPT = """أنت مساعد قانوني خبير في القانون
 ---"""
 
 
+# --- Transport et cache ----------------------------------------------------
+
+def _anthropic_url() -> str:
+    return getattr(settings, "ANTHROPIC_API_URL", "") or ANTHROPIC_API_URL
+
+
+_LIMITER = None
+
+
+def _anthropic_limiter():
+    """Limiteur partagé par les threads du processus (ANTHROPIC_REQUESTS_PER_MINUTE)."""
+    global _LIMITER
+    if _LIMITER is None:
+        from .mahakim_sync import RateLimiter
+
+        rpm = float(getattr(settings, "ANTHROPIC_REQUESTS_PER_MINUTE", 0) or 0)
+        _LIMITER = RateLimiter(60.0 / rpm if rpm > 0 else 0.0)
+    return _LIMITER
+
+
+_INFLIGHT: dict = {}
+_INFLIGHT_GUARD = threading.Lock()
+
+
+@contextmanager
+def _inflight_lock(model: str, key: str):
+    with _INFLIGHT_GUARD:
+        lock, users = _INFLIGHT.get((model, key), (threading.Lock(), 0))
+        _INFLIGHT[(model, key)] = (lock, users + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _INFLIGHT_GUARD:
+            lock, users = _INFLIGHT[(model, key)]
+            if users <= 1:
+                del _INFLIGHT[(model, key)]
+            else:
+                _INFLIGHT[(model, key)] = (lock, users - 1)
+
+
+def cache_key(prompt: str) -> str:
+    """sha256 du prompt complet : texte tronqué + version du prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def cached_result(model: str, key: str) -> Optional[AnalysisResult]:
+    """Résultat déjà obtenu pour (modèle, clé), None si absent, expiré ou cache désactivé."""
+    days = int(getattr(settings, "AI_ANALYSIS_CACHE_DAYS", 0) or 0)
+    if days <= 0:
+        return None
+    from django.db import DatabaseError
+    from django.db.models import F
+    from django.utils import timezone
+
+    from ..models import AiAnalysisCache
+
+    try:
+        row = (AiAnalysisCache.objects
+               .filter(model=model, key=key, created_at__gte=timezone.now() - timedelta(days=days))
+               .values("pk", "result").first())
+        if row is None:
+            return None
+        AiAnalysisCache.objects.filter(pk=row["pk"]).update(hits=F("hits") + 1,
+                                                            last_used_at=timezone.now())
+    except DatabaseError:
+        logger.warning("Cache d'analyses indisponible", exc_info=True)
+        return None
+    known = {f.name for f in fields(AnalysisResult)}
+    data = {k: v for k, v in (row["result"] or {}).items() if k in known}
+    data["from_cache"] = True
+    return AnalysisResult(**data)
+
+
+def store_result(model: str, key: str, result: AnalysisResult) -> None:
+    """Enregistre un résultat réussi (les erreurs et les dry-run ne sont jamais mis en cache)."""
+    if not result.ok or result.is_dry_run or int(getattr(settings, "AI_ANALYSIS_CACHE_DAYS", 0) or 0) <= 0:
+        return
+    from django.db import DatabaseError
+
+    from ..models import AiAnalysisCache
+
+    data = asdict(result)
+    data.pop("from_cache", None)
+    try:
+        AiAnalysisCache.objects.bulk_create(
+            [AiAnalysisCache(model=model, key=key, result=data)], ignore_conflicts=True,
+        )
+    except DatabaseError:
+        logger.warning("Cache d'analyses : écriture impossible", exc_info=True)
+
+
+def purge_cache(days: Optional[int] = None) -> int:
+    """Supprime les entrées plus anciennes que `days` (défaut AI_ANALYSIS_CACHE_DAYS ; ≤ 0 : toutes).
+
+    Retourne le nombre supprimé.
+    """
+    from django.utils import timezone
+
+    from ..models import AiAnalysisCache
+
+    days = int(days if days is not None else getattr(settings, "AI_ANALYSIS_CACHE_DAYS", 0) or 0)
+    qs = AiAnalysisCache.objects.all()
+    if days > 0:
+        qs = qs.filter(created_at__lt=timezone.now() - timedelta(days=days))
+    return qs.delete()[0]
+
+
 # --- Public API -------------------------------------------------------------
 
 def _truncate(text: str) -> str:
@@ -163,9 +276,19 @@ def analyze_decision_text(text: str, *, model: Optional[str] = None) -> Analysis
     if dry_run or not api_key:
         return _dry_run_result(text)
 
-    truncated = _truncate(text)
+    truncated = _truncate(text.strip())
     prompt = ANALYSIS_PROMPT.replace("{TEXT}", truncated)
+    key = cache_key(prompt)
+    # Un même texte analysé en parallèle (threads d'analyze_decisions) : un seul appel
+    with _inflight_lock(chosen_model, key):
+        cached = cached_result(chosen_model, key)
+        if cached is not None:
+            return cached
+        return _call_anthropic(api_key, chosen_model, prompt, key)
+
 
+def _call_anthropic(api_key: str, chosen_model: str, prompt: str, key: str) -> AnalysisResult:
+    """Requête Messages (limiteur + nouvelles tentatives), parsing du JSON, mise en cache."""
     headers = {
         "x-api-key": api_key,
         "anthropic-version": ANTHROPIC_VERSION,
@@ -177,23 +300,38 @@ def analyze_decision_text(text: str, *, model: Optional[str] = None) -> Analysis
         "messages": [{"role": "user", "content": prompt}],
     }
 
-    try:
-        r = requests.post(ANTHROPIC_API_URL, headers=headers, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-    except requests.HTTPError as e:
-        logger.exception("Anthropic HTTP error")
-        body = ""
+    delay = 2.0
+    for attempt in range(1, ANTHROPIC_RETRIES + 1):
+        _anthropic_limiter().wait()
         try:
-            body = e.response.text[:500] if e.response is not None else ""
-        except Exception:
-            pass
-        return AnalysisResult(ok=False, model_used=chosen_model,
-                              error_message=f"HTTP {e.response.status_code if e.response else '?'}: {body}",
-                              raw_response=body)
-    except Exception as e:
-        logger.exception("Anthropic call failed")
-        return AnalysisResult(ok=False, model_used=chosen_model, error_message=str(e))
+            r = requests.post(_anthropic_url(), headers=headers, json=payload, timeout=60)
+        except requests.RequestException as e:
+            error, wait = str(e), delay
+        else:
+            if r.status_code < 400:
+                try:
+                    data = r.json()
+                except ValueError:
+                    return AnalysisResult(ok=False, model_used=chosen_model,
+                                          error_message="استجابة غير صالحة من Anthropic.",
+                                          raw_response=r.text[:500])
+                break
+            body = r.text[:500]
+            if r.status_code not in _RETRY_STATUSES or attempt == ANTHROPIC_RETRIES:
+                logger.error("Anthropic HTTP %s: %s", r.status_code, body)
+                return AnalysisResult(ok=False, model_used=chosen_model,
+                                      error_message=f"HTTP {r.status_code}: {body}", raw_response=body)
+            error = f"HTTP {r.status_code}"
+            try:
+                wait = float(r.headers.get("retry-after") or delay)
+            except ValueError:
+                wait = delay
+        if attempt == ANTHROPIC_RETRIES:
+            logger.error("Anthropic call failed: %s", error)
+            return AnalysisResult(ok=False, model_used=chosen_model, error_message=error)
+        logger.warning("Anthropic (%s), nouvelle tentative dans %.1f s", error, wait)
+        time.sleep(wait)
+        delay *= 2
 
     # Extraire le texte de la réponse Claude
     try:
@@ -218,7 +356,7 @@ def analyze_decision_text(text: str, *, model: Optional[str] = None) -> Analysis
     except (TypeError, ValueError):
         delai = None
 
-    return AnalysisResult(
+    result = AnalysisResult(
         ok=True,
         model_used=chosen_model,
         resume_ar=_str(parsed.get("resume_ar")),
@@ -230,29 +368,32 @@ def analyze_decision_text(text: str, *, model: Optional[str] = None) -> Analysis
         dates_importantes=_list(parsed.get("dates_importantes")),
         raw_response=raw_text[:8000],
     )
+    store_result(chosen_model, key, result)
+    return result
 
 
-def analyze_decision(decision, *, source_text: Optional[str] = None,
-                     piece_jointe=None) -> "DecisionAnalysis":
-    """Orchestrateur de plus haut niveau:
-    - Reçoit une Decision
-    - Choisit la source: source_text > piece_jointe (PDF) > rien
-    - Lance l'analyse et persiste DecisionAnalysis
-    """
-    from django.utils import timezone
-    from ..models import DecisionAnalysis
-
+def decision_source_text(decision, *, source_text: Optional[str] = None, piece_jointe=None) -> str:
+    """Texte à analyser : source_text > piece_jointe (PDF) > résumé de la décision."""
     text = (source_text or "").strip()
     if not text and piece_jointe and getattr(piece_jointe, "fichier", None):
+        # Texte extrait une fois par fichier (services/pdf_text.py)
+        from .pdf_text import get_text
         try:
-            text = extract_text_from_pdf(piece_jointe.fichier.path)
+            text = get_text(piece_jointe).strip()
         except Exception:
+            logger.exception("PDF extraction failed")
             text = ""
 
     if not text and getattr(decision, "resumé", None):
         text = decision.resumé or ""
+    return text
+
 
-    result = analyze_decision_text(text)
+def save_analysis(decision, text: str, result: AnalysisResult, *,
+                  progress: Optional[Callable[[str, str], None]] = None) -> "DecisionAnalysis":
+    """Persiste le résultat dans DecisionAnalysis puis met à jour l'embedding et les passages."""
+    from django.utils import timezone
+    from ..models import DecisionAnalysis
 
     analysis, _ = DecisionAnalysis.objects.update_or_create(
         decision=decision,
@@ -272,25 +413,43 @@ def analyze_decision(decision, *, source_text: Optional[str] = None,
             "generated_at": timezone.now() if result.ok else None,
         },
     )
+    analysis.from_cache = result.from_cache
 
     # Mettre à jour l'embedding pour la recherche sémantique
     if result.ok:
+        if progress:
+            progress("embed", "جاري تحديث فهرس البحث...")
         try:
-            from .embeddings import embed_text
-            text_parts = [
-                result.resume_ar, result.resume_fr, result.decision_essentielle, text,
-            ]
-            for m in (result.motifs or []):
-                if isinstance(m, dict):
-                    text_parts.append(m.get("titre", ""))
-                    text_parts.append(m.get("contenu", ""))
-            joined = "\n".join(p for p in text_parts if p).strip()
+            from .embeddings import analysis_text, content_hash, embed_text
+            joined = analysis_text(analysis)
             if joined:
                 vec, model = embed_text(joined)
                 analysis.embedding = vec
                 analysis.embedding_model = model
-                analysis.save(update_fields=["embedding", "embedding_model"])
+                analysis.embedding_hash = content_hash(joined, model)
+                analysis.save(update_fields=["embedding", "embedding_model", "embedding_hash", "updated_at"])
+                from .passages import reindex_passages
+                reindex_passages(model=model, analyses=[analysis.pk])
         except Exception:
             logger.exception("Embedding update failed")
 
     return analysis
+
+
+def analyze_decision(decision, *, source_text: Optional[str] = None,
+                     piece_jointe=None, model: Optional[str] = None,
+                     progress: Optional[Callable[[str, str], None]] = None) -> "DecisionAnalysis":
+    """Orchestrateur de plus haut niveau:
+    - Reçoit une Decision
+    - Choisit la source: source_text > piece_jointe (PDF) > rien
+    - Lance l'analyse et persiste DecisionAnalysis
+    `progress(phase, message)` est appelé à chaque étape (tâche de fond).
+    """
+    if progress and not (source_text or "").strip() and piece_jointe is not None:
+        progress("extract", "جاري قراءة نص ملف PDF...")
+    text = decision_source_text(decision, source_text=source_text, piece_jointe=piece_jointe)
+
+    if progress:
+        progress("analyze", "جاري التحليل بالذكاء الاصطناعي...")
+    result = analyze_decision_text(text, model=model)
+    return save_analysis(decision, text, result, progress=progress)
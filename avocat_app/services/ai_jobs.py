@@ -0,0 +1,84 @@
+"""Analyse IA des décisions en tâche de fond.
+
+`decision_ai_analyze` n'appelle plus `analyze_decision` dans la requête
+(extraction PDF + appel Claude jusqu'à 60 s + embeddings) : il enregistre une
+tâche `ai.analyze_decision` et la page de la décision suit sa progression
+(SSE `job_events`, repli sur `decision_ai_analyze_status`).
+
+Une seule tâche en attente ou en cours par décision (`dedup_key`
+`ai.analyze:<pk>`, libérée en fin de tâche) : un second clic renvoie la tâche
+existante.
+"""
+from __future__ import annotations
+
+import logging
+
+from .jobs import JobFailed, enqueue, handler
+
+logger = logging.getLogger(__name__)
+
+ANALYZE_DECISION = "ai.analyze_decision"
+
+
+def job_key(decision_id) -> str:
+    return f"ai.analyze:{decision_id}"
+
+
+def pending_job(decision_id):
+    """Tâche d'analyse en attente ou en cours pour cette décision (None sinon)."""
+    from ..models import BackgroundJob
+
+    return BackgroundJob.objects.filter(dedup_key=job_key(decision_id)).first()
+
+
+def start_analysis(decision, *, source_text: str = "", piece_jointe_id=None, user=None):
+    """Met l'analyse de `decision` en file ; retourne la tâche (existante si déjà lancée)."""
+    return enqueue(
+        ANALYZE_DECISION,
+        {
+            "decision_id": str(decision.pk),
+            "source_text": source_text or "",
+            "piece_jointe_id": str(piece_jointe_id) if piece_jointe_id else None,
+        },
+        user=user,
+        progress={"phase": "queued"},
+        message="التحليل في الانتظار...",
+        key=job_key(decision.pk),
+    )
+
+
+def outcome(analysis) -> tuple:
+    """(niveau, message) à afficher après une analyse (niveaux de django.contrib.messages)."""
+    if analysis.error_message:
+        return "warning", f"تم الحفظ مع خطأ: {analysis.error_message[:200]}"
+    if analysis.is_dry_run:
+        return "info", "تمت المحاكاة بنجاح (لم يتم تكوين مفتاح Anthropic)."
+    if getattr(analysis, "from_cache", False):
+        return "success", f"تم التحليل بنجاح بواسطة {analysis.model_used} (نتيجة محفوظة لنص مطابق)."
+    return "success", f"تم التحليل بنجاح بواسطة {analysis.model_used}."
+
+
+@handler(ANALYZE_DECISION, release_key=True, interactive=True)
+def analyze_decision_job(ctx, decision_id, source_text="", piece_jointe_id=None):
+    from ..models import Decision, PieceJointe
+    from .ai_client import analyze_decision
+
+    decision = Decision.objects.select_related("affaire").filter(pk=decision_id).first()
+    if decision is None:
+        raise JobFailed("الحكم غير موجود")
+    piece_jointe = None
+    if piece_jointe_id:
+        piece_jointe = PieceJointe.objects.filter(pk=piece_jointe_id, affaire=decision.affaire).first()
+
+    analysis = analyze_decision(
+        decision, source_text=source_text or None, piece_jointe=piece_jointe,
+        progress=lambda phase, message: ctx.update(phase=phase, message=message),
+    )
+    level, message = outcome(analysis)
+    ctx.update(phase="done", message=message)
+    return {
+        "analysis_id": str(analysis.pk),
+        "level": level,
+        "message": message,
+        "from_cache": bool(getattr(analysis, "from_cache", False)),
+    }
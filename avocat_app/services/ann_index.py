@@ -0,0 +1,444 @@
+"""Index approché (IVF) des embeddings de décisions, sur disque et partagé par les workers.
+
+Au-delà de quelques centaines de milliers d'analyses, la matrice complète
+de vector_index coûte trop de mémoire par worker gunicorn et trop de temps
+par requête. Pour un `embedding_model`, `rebuild_ann_index` écrit sous
+MEDIA_ROOT/embeddings/<modèle>/<build>/ :
+
+- `centroids.npy` : nlist centroïdes (k-means sphérique sur un échantillon) ;
+- `vectors.npy` : les vecteurs normalisés float32, regroupés par liste ;
+- `ids.npy` : les UUID (16 octets) dans le même ordre ;
+- `offsets.npy` : début de chaque liste dans `vectors.npy` ;
+- `meta.json` ; `updates.bin` : journal des modifications depuis le build.
+
+Les fichiers sont ouverts en `mmap_mode="r"` : les pages sont partagées par
+tous les processus via le cache du système. `CURRENT` désigne le build
+actif ; il est remplacé atomiquement à la reconstruction.
+
+Recherche : score des centroïdes, parcours des ANN_NPROBE listes les plus
+proches (ANN_NPROBE ↑ = rappel ↑, latence ↑), plus un parcours exhaustif du
+journal. Le journal reçoit un enregistrement à chaque `save()` d'une
+DecisionAnalysis indexée (analyze_decision, index_decisions) ou une
+suppression ; une ligne du journal masque la même ligne du build.
+
+En dessous de ANN_MIN_VECTORS, ou sans build pour le modèle de la requête,
+search_decisions reste sur l'index exact en mémoire (vector_index).
+
+Les passages des textes sources (services/passages.py) ont leurs propres
+builds sous la clé « <modèle>+passages », journalisés par passages._replace.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .vector_index import normalized
+
+logger = logging.getLogger(__name__)
+
+NPROBE = 16
+MIN_VECTORS = 50_000
+MAX_UPDATES = 20_000     # au-delà, avertir : le journal est parcouru en entier à chaque requête
+KMEANS_ITERATIONS = 10
+TRAIN_PER_LIST = 32      # vecteurs d'entraînement par centroïde
+BATCH = 8192             # vecteurs par bloc (affectation, copie)
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def root_dir() -> Path:
+    custom = _setting("ANN_INDEX_DIR", "")
+    if custom:
+        return Path(custom)
+    from django.conf import settings
+
+    return Path(settings.MEDIA_ROOT) / "embeddings"
+
+
+def model_dir(model: str) -> Path:
+    return root_dir() / (_SLUG_RE.sub("_", model) or "_")
+
+
+def _record_dtype(dim: int) -> np.dtype:
+    return np.dtype([("id", "V16"), ("live", "u1"), ("pad", "V3"), ("vec", "<f4", (dim,))])
+
+
+# ---------- Construction ----------
+
+def default_nlist(count: int) -> int:
+    return max(1, min(count, int(round(math.sqrt(count)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), BATCH):
+        block = np.asarray(vectors[start:start + BATCH], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(sample: np.ndarray, nlist: int, *, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """k-means sphérique (vecteurs normalisés, similarité cosinus)."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        lists, starts = np.unique(assign[order], return_index=True)
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        centroids[lists] = sums
+        empty = np.setdiff1d(np.arange(nlist), lists)
+        if len(empty):
+            # Liste vide : nouveau centroïde tiré au hasard dans l'échantillon
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def build(directory: Path, rows: Iterable[Tuple[object, Sequence[float]]], count: int, *,
+          model: str = "", nlist: Optional[int] = None, seed: int = 0) -> dict:
+    """Écrit un build IVF dans `directory` à partir de (uuid, vecteur) ; `count` = nombre maximal de lignes.
+
+    Les vecteurs sont d'abord copiés (normalisés) dans un fichier temporaire
+    mappé, puis réordonnés par liste : la mémoire reste bornée par BATCH.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    raw_path = directory / "raw.npy"
+    raw = ids = None
+    n = dim = 0
+    for pk, emb in rows:
+        vec = normalized(emb)
+        if vec is None:
+            continue
+        if raw is None:
+            dim = vec.size
+            raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(max(1, count), dim))
+            ids = np.zeros((max(1, count), 16), dtype=np.uint8)
+        if vec.size != dim or n >= count:
+            continue
+        raw[n] = vec
+        ids[n] = np.frombuffer(_uuid(pk).bytes, dtype=np.uint8)
+        n += 1
+    if raw is None or not n:
+        raise ValueError("aucun vecteur à indexer")
+
+    nlist = min(n, nlist or default_nlist(n))
+    rng = np.random.default_rng(seed)
+    train_n = min(n, max(nlist * TRAIN_PER_LIST, 1000))
+    sample_rows = np.sort(rng.choice(n, train_n, replace=False))
+    centroids = train_centroids(np.asarray(raw[sample_rows]), nlist, seed=seed)
+    assign = _assign(raw[:n], centroids)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+
+    vectors = np.lib.format.open_memmap(directory / "vectors.npy", mode="w+", dtype=np.float32, shape=(n, dim))
+    for start in range(0, n, BATCH):
+        chunk = order[start:start + BATCH]
+        vectors[start:start + len(chunk)] = raw[np.sort(chunk)][np.argsort(np.argsort(chunk))]
+    vectors.flush()
+    del vectors, raw
+    raw_path.unlink()
+    np.save(directory / "ids.npy", ids[:n][order])
+    np.save(directory / "centroids.npy", centroids)
+    np.save(directory / "offsets.npy", offsets)
+    meta = {
+        "model": model, "dim": int(dim), "count": int(n), "nlist": int(nlist),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": round(time.perf_counter() - t0, 2),
+    }
+    (directory / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    (directory / "updates.bin").touch()
+    return meta
+
+
+def _uuid(pk) -> uuid.UUID:
+    return pk if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk))
+
+
+# ---------- Lecture ----------
+
+class AnnIndex:
+    """Un build ouvert en lecture (fichiers mappés) + le journal des modifications."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.dim = int(self.meta["dim"])
+        self.centroids = np.load(directory / "centroids.npy")
+        self.offsets = np.load(directory / "offsets.npy")
+        self.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        self.ids = np.load(directory / "ids.npy", mmap_mode="r")
+        self._record = _record_dtype(self.dim)
+        self._lock = threading.Lock()
+        self._log_offset = 0
+        self._updates: Dict[bytes, Optional[np.ndarray]] = {}
+        self._delta_ids: List[bytes] = []
+        self._delta = np.zeros((0, self.dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    @property
+    def updates_path(self) -> Path:
+        return self.directory / "updates.bin"
+
+    def _read_updates(self) -> None:
+        """Applique les enregistrements ajoutés au journal depuis la dernière lecture."""
+        try:
+            size = self.updates_path.stat().st_size
+        except OSError:
+            return
+        complete = self._log_offset + (size - self._log_offset) // self._record.itemsize * self._record.itemsize
+        if complete <= self._log_offset:
+            return
+        with open(self.updates_path, "rb") as fh:
+            fh.seek(self._log_offset)
+            recs = np.frombuffer(fh.read(complete - self._log_offset), dtype=self._record)
+        for rec in recs:
+            self._updates[rec["id"].tobytes()] = rec["vec"].copy() if rec["live"] else None
+        self._log_offset = complete
+        if len(self._updates) > int(_setting("ANN_MAX_UPDATES", MAX_UPDATES)):
+            logger.warning("Index ANN %s : %d modifications journalisées, lancer rebuild_ann_index",
+                           self.meta.get("model"), len(self._updates))
+        live = [(k, v) for k, v in self._updates.items() if v is not None]
+        self._delta_ids = [k for k, _ in live]
+        self._delta = np.stack([v for _, v in live]) if live else np.zeros((0, self.dim), dtype=np.float32)
+
+    def search(self, query: Sequence[float], k: int, nprobe: Optional[int] = None) -> List[Tuple[uuid.UUID, float]]:
+        q = normalized(query)
+        if q is None or q.size != self.dim or k <= 0:
+            return []
+        nprobe = max(1, min(len(self.centroids), nprobe or int(_setting("ANN_NPROBE", NPROBE))))
+        with self._lock:
+            self._read_updates()
+            updates, delta_ids, delta = self._updates, self._delta_ids, self._delta
+
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        rows, scores = [], []
+        for lst in probe:
+            a, b = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if a < b:
+                rows.append(np.arange(a, b))
+                scores.append(self.vectors[a:b] @ q)
+        hits: List[Tuple[bytes, float]] = []
+        if rows:
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            # Marge pour les lignes masquées par le journal
+            want = min(len(scores), k + min(len(updates), k))
+            top = np.argpartition(-scores, want - 1)[:want] if want < len(scores) else np.arange(len(scores))
+            for i in top:
+                key = self.ids[rows[i]].tobytes()
+                if key not in updates:
+                    hits.append((key, float(scores[i])))
+        if len(delta_ids):
+            dscores = delta @ q
+            hits.extend(zip(delta_ids, (float(s) for s in dscores)))
+        hits.sort(key=lambda h: -h[1])
+        return [(uuid.UUID(bytes=key), score) for key, score in hits[:k]]
+
+
+def append_update(model: str, pk, embedding) -> bool:
+    """Ajoute au journal du build courant de `model` (embedding None → suppression). False sans build."""
+    directory = current_dir(model)
+    if directory is None:
+        return False
+    try:
+        dim = int(json.loads((directory / "meta.json").read_text(encoding="utf-8"))["dim"])
+    except (OSError, ValueError, KeyError):
+        return False
+    vec = normalized(embedding) if embedding is not None else None
+    if vec is not None and vec.size != dim:
+        return False
+    rec = np.zeros(1, dtype=_record_dtype(dim))
+    rec["id"] = np.frombuffer(_uuid(pk).bytes, dtype="V16")
+    if vec is not None:
+        rec["live"] = 1
+        rec["vec"] = vec
+    # Un seul write() en mode ajout : les enregistrements de plusieurs processus ne s'entremêlent pas
+    try:
+        with open(directory / "updates.bin", "ab") as fh:
+            fh.write(rec.tobytes())
+    except OSError as e:
+        # Build remplacé entre-temps : la reconstruction a lu la base après cette écriture
+        logger.warning("Journal ANN %s inaccessible : %s", directory, e)
+        return False
+    return True
+
+
+# ---------- Builds courants ----------
+
+def current_dir(model: str) -> Optional[Path]:
+    base = model_dir(model)
+    try:
+        name = (base / "CURRENT").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    directory = base / name
+    return directory if name and (directory / "meta.json").exists() else None
+
+
+def disk_models() -> List[str]:
+    """Modèles ayant un build courant."""
+    models = []
+    try:
+        entries = list(root_dir().iterdir())
+    except OSError:
+        return []
+    for base in entries:
+        try:
+            name = (base / "CURRENT").read_text(encoding="utf-8").strip()
+            meta = json.loads((base / name / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        models.append(meta.get("model") or base.name)
+    return models
+
+
+_OPEN: Dict[str, Tuple[Path, AnnIndex]] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def get(model: str) -> Optional[AnnIndex]:
+    """Build courant de `model` (rouvert quand CURRENT change), None s'il n'y en a pas."""
+    directory = current_dir(model)
+    with _OPEN_LOCK:
+        if directory is None:
+            _OPEN.pop(model, None)
+            return None
+        cached = _OPEN.get(model)
+        if cached is not None and cached[0] == directory:
+            return cached[1]
+        try:
+            index = AnnIndex(directory)
+        except (OSError, ValueError, KeyError):
+            logger.exception("Index ANN illisible : %s", directory)
+            return None
+        _OPEN[model] = (directory, index)
+        return index
+
+
+def _source(model: str):
+    """Lignes indexées sous la clé `model` : analyses, ou passages pour « <modèle>+passages »."""
+    from ..models import DecisionAnalysis, DecisionPassage
+    from .passages import SUFFIX
+
+    if model.endswith(SUFFIX):
+        return (DecisionPassage.objects.filter(embedding_model=model[:-len(SUFFIX)], analysis__is_deleted=False)
+                .exclude(embedding__isnull=True))
+    return DecisionAnalysis.objects.filter(embedding_model=model).exclude(embedding__isnull=True)
+
+
+def rebuild(model: str, *, nlist: Optional[int] = None, seed: int = 0) -> dict:
+    """Reconstruit le build de `model` depuis la base et le rend courant.
+
+    Les modifications journalisées pendant la reconstruction sont recopiées
+    dans le journal du nouveau build.
+    """
+    base = model_dir(model)
+    previous = current_dir(model)
+    old_log = previous / "updates.bin" if previous is not None else None
+    log_start = old_log.stat().st_size if old_log is not None and old_log.exists() else 0
+
+    qs = _source(model)
+    name = time.strftime("%Y%m%d-%H%M%S") + f"-{uuid.uuid4().hex[:6]}"
+    directory = base / name
+    try:
+        meta = build(directory, qs.values_list("pk", "embedding").iterator(chunk_size=2000),
+                     qs.count(), model=model, nlist=nlist or int(_setting("ANN_NLIST", 0)) or None, seed=seed)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    tmp = base / "CURRENT.tmp"
+    tmp.write_text(name, encoding="utf-8")
+    os.replace(tmp, base / "CURRENT")
+    if old_log is not None and old_log.exists():
+        with open(old_log, "rb") as src:
+            src.seek(log_start)
+            tail = src.read()
+        if tail:
+            with open(directory / "updates.bin", "ab") as dst:
+                dst.write(tail)
+    for other in base.iterdir():
+        if other.is_dir() and other.name != name:
+            # Les workers qui ont encore l'ancien build mappé le gardent jusqu'à leur prochaine lecture
+            shutil.rmtree(other, ignore_errors=True)
+    logger.info("Index ANN %s : %d vecteurs, %d listes, %.1f s", model, meta["count"], meta["nlist"], meta["seconds"])
+    return meta
+
+
+def drop(model: str) -> bool:
+    base = model_dir(model)
+    if not base.exists():
+        return False
+    shutil.rmtree(base, ignore_errors=True)
+    return True
+
+
+_INDEXED_FIELDS = {"embedding", "embedding_model", "embedding_hash", "is_deleted"}
+
+
+def _touches_index(update_fields) -> bool:
+    return update_fields is None or bool(_INDEXED_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mémorise (modèle, empreinte, vivant) tels qu'en base avant l'écriture."""
+    from django.db.models import BooleanField, ExpressionWrapper, Q
+
+    instance._ann_previous = None
+    if raw or instance._state.adding or not _touches_index(update_fields):
+        return
+    instance._ann_previous = (
+        sender.all_objects.filter(pk=instance.pk)
+        .annotate(alive=ExpressionWrapper(Q(embedding__isnull=False, is_deleted=False), output_field=BooleanField()))
+        .values_list("embedding_model", "embedding_hash", "alive").first()
+    )
+
+
+@receiver(post_save, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Journalise l'analyse seulement si son vecteur, son modèle ou sa suppression ont changé."""
+    previous = instance.__dict__.pop("_ann_previous", None)
+    if raw or not _touches_index(update_fields):
+        return
+    alive = not instance.is_deleted and instance.embedding is not None
+    if previous is not None:
+        old_model, old_hash, old_alive = previous
+        if old_model and old_model != instance.embedding_model:
+            if old_alive:
+                append_update(old_model, instance.pk, None)
+        elif old_alive == alive and (not alive or (old_hash and old_hash == instance.embedding_hash)):
+            return  # sans empreinte connue, on journalise par prudence
+    if not instance.embedding_model or "embedding" in instance.get_deferred_fields():
+        return
+    append_update(instance.embedding_model, instance.pk, instance.embedding if alive else None)
+
+
+@receiver(post_delete, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_delete(sender, instance, **kwargs):
+    if instance.embedding_model:
+        append_update(instance.embedding_model, instance.pk, None)
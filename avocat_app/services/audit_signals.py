@@ -34,10 +34,21 @@ def _sync_pull_in_progress() -> bool:
     return _is_suppressed()
 
 
+# Tables dérivées / caches, recalculables : pas de journal d'audit
+_EXCLUDED_MODELS = {
+    "avocat_app.decisionpassage",
+    "avocat_app.aianalysiscache",
+    "avocat_app.piecetext",
+    "avocat_app.searchdocument",
+}
+
+
 def _should_audit(inst: Model) -> bool:
     # لا تسجل نفسك ولا موديلات التدقيق
     if inst.__class__ is AuditLog:
         return False
+    if inst._meta.label_lower in _EXCLUDED_MODELS:
+        return False
     if _sync_pull_in_progress():
         return False
     return True
@@ -82,7 +93,7 @@ def _audit_after_save(sender, instance, created, **kwargs):
         method=getattr(request, "method", "") if request else "",
         status_code=getattr(request, "status_code", None),  # غالبًا غير متاح هنا
         ip=request.META.get("REMOTE_ADDR") if request else None,
-        user_agent=request.META.get("HTTP_USER_AGENT")[:256] if request else None,
+        user_agent=(request.META.get("HTTP_USER_AGENT") or "")[:256] if request else None,
         session_key=getattr(request, "session", None).session_key if request and getattr(request, "session", None) else None,
         token_id=str(getattr(request, "auth_token_id", "") or "") if request else None,
     )
@@ -105,7 +116,7 @@ def _audit_after_delete(sender, instance, **kwargs):
         method=getattr(request, "method", "") if request else "",
         status_code=getattr(request, "status_code", None),
         ip=request.META.get("REMOTE_ADDR") if request else None,
-        user_agent=request.META.get("HTTP_USER_AGENT")[:256] if request else None,
+        user_agent=(request.META.get("HTTP_USER_AGENT") or "")[:256] if request else None,
         session_key=getattr(request, "session", None).session_key if request and getattr(request, "session", None) else None,
         token_id=str(getattr(request, "auth_token_id", "") or "") if request else None,
     )
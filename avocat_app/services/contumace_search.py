@@ -0,0 +1,171 @@
+"""Recherche approchée dans المسطرة الغيابية (ContumaceRecord).
+
+Chaque dossier porte une colonne `search_text` (nom, père, mère, n° de
+dossier, n° de carte, cour d'appel) normalisée comme les embeddings
+(`embeddings.normalize_text` : harakat retirés, أ/إ/آ → ا, ى → ي, ة → ه),
+et ses trigrammes distincts dans la table indexée `contumace_search_gram`.
+
+Une recherche découpe la requête normalisée en trigrammes, compte par
+dossier les trigrammes communs (un GROUP BY sur l'index (gram, record))
+et garde ceux qui en partagent au moins MIN_SIMILARITY : une variante
+d'orthographe (همزة, تاء مربوطة, une lettre de plus ou de moins) retrouve
+toujours le dossier, sans parcourir la table entière.
+
+Maintenance : `post_save` pour les enregistrements unitaires,
+`index_keys()` après l'upsert groupé de l'ingestion, commande
+`rebuild_contumace_index` pour tout recalculer.
+"""
+from __future__ import annotations
+
+import math
+import re
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .embeddings import normalize_text
+
+SEARCH_FIELDS = ("nom_accuse", "nom_pere", "nom_mere", "numero_dossier", "numero_carte", "cour_appel")
+MIN_SIMILARITY = 0.5   # part minimale des trigrammes de la requête présents dans le dossier
+CANDIDATES_FACTOR = 4  # candidats lus par résultat demandé avant le classement final
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_text_for(values: Iterable[str]) -> str:
+    """Texte normalisé d'un dossier (valeurs des SEARCH_FIELDS)."""
+    text = normalize_text(" ".join(v for v in values if v))
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def record_search_text(record) -> str:
+    return search_text_for(getattr(record, f, "") or "" for f in SEARCH_FIELDS)
+
+
+def grams(text: str) -> Set[str]:
+    """Trigrammes distincts par mot (un mot de 2 lettres compte pour un gramme)."""
+    out = set()
+    for tok in _TOKEN_RE.findall(text or ""):
+        if len(tok) < 3:
+            if len(tok) == 2:
+                out.add(tok)
+            continue
+        out.update(tok[i:i + 3] for i in range(len(tok) - 2))
+    return out
+
+
+# ---------- Maintenance de l'index ----------
+
+def index_records(pairs: Sequence[Tuple[object, str]]) -> None:
+    """Remplace les trigrammes de dossiers déjà enregistrés : [(pk, search_text), ...]."""
+    from ..models import ContumaceSearchGram
+
+    if not pairs:
+        return
+    ContumaceSearchGram.objects.filter(record_id__in=[pk for pk, _ in pairs]).delete()
+    ContumaceSearchGram.objects.bulk_create(
+        [ContumaceSearchGram(record_id=pk, gram=g) for pk, text in pairs for g in grams(text)],
+        batch_size=2000,
+    )
+
+
+def index_keys(keys: Sequence[Tuple[str, str]]) -> None:
+    """Réindexe les dossiers (numero_dossier, cour_appel) écrits par un upsert groupé.
+
+    `search_text` est déjà posé par l'upsert ; on relit les pk (MySQL ne les
+    renvoie pas pour un bulk_create avec update_conflicts).
+    """
+    from ..models import ContumaceRecord
+
+    wanted = set(keys)
+    if not wanted:
+        return
+    rows = (ContumaceRecord.all_objects
+            .filter(numero_dossier__in={k[0] for k in wanted})
+            .values_list("pk", "numero_dossier", "cour_appel", "search_text"))
+    index_records([(pk, text) for pk, num, cour, text in rows if (num, cour) in wanted])
+
+
+def rebuild(batch_size: int = 1000) -> int:
+    """Recalcule `search_text` et les trigrammes de tous les dossiers."""
+    from ..models import ContumaceRecord
+
+    total = 0
+    batch = []
+    qs = ContumaceRecord.all_objects.only("pk", *SEARCH_FIELDS, "search_text").order_by("pk")
+    for rec in qs.iterator(chunk_size=batch_size):
+        rec.search_text = record_search_text(rec)
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            total += _flush(batch)
+            batch = []
+    if batch:
+        total += _flush(batch)
+    return total
+
+
+def _flush(records) -> int:
+    from django.db import transaction
+
+    from ..models import ContumaceRecord
+
+    with transaction.atomic():
+        ContumaceRecord.all_objects.bulk_update(records, ["search_text"])
+        index_records([(r.pk, r.search_text) for r in records])
+    return len(records)
+
+
+@receiver(post_save, sender="avocat_app.ContumaceRecord")
+def contumace_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_records([(instance.pk, instance.search_text)])
+
+
+# ---------- Recherche ----------
+
+def search(query: str, limit: int = 50, min_similarity: float = MIN_SIMILARITY) -> List[Tuple[object, float]]:
+    """Dossiers actifs les plus proches de `query` : [(pk, score), ...], score décroissant.
+
+    Score = part des trigrammes de la requête présents, +1 si la requête
+    normalisée apparaît telle quelle, +2 sur n° de dossier / carte exact.
+    """
+    from django.db.models import Count, Q
+
+    from ..models import ContumaceRecord, ContumaceSearchGram
+
+    raw = (query or "").strip()
+    norm = search_text_for([raw])
+    if not norm:
+        return []
+    active = ContumaceRecord.objects.all()
+    scores: Dict[object, float] = {
+        pk: 2.0 for pk in active.filter(Q(numero_dossier=raw) | Q(numero_carte=raw))
+        .values_list("pk", flat=True)[:limit]
+    }
+
+    q_grams = grams(norm)
+    if not q_grams:
+        # Requête d'une lettre : pas de trigramme exploitable
+        for pk in active.filter(search_text__contains=norm).values_list("pk", flat=True)[:limit]:
+            scores.setdefault(pk, 1.0)
+        return _ranked(scores, limit)
+
+    needed = max(1, math.ceil(len(q_grams) * min_similarity))
+    hits = (ContumaceSearchGram.objects
+            .filter(gram__in=q_grams)
+            .values("record_id")
+            .annotate(hits=Count("id"))
+            .filter(hits__gte=needed)
+            .order_by("-hits")[:limit * CANDIDATES_FACTOR])
+    hits = {row["record_id"]: row["hits"] for row in hits}
+    if hits:
+        for pk, text in active.filter(pk__in=list(hits)).values_list("pk", "search_text"):
+            score = hits[pk] / len(q_grams) + (1.0 if norm in text else 0.0)
+            scores[pk] = max(scores.get(pk, 0.0), score)
+    return _ranked(scores, limit)
+
+
+def _ranked(scores: Dict[object, float], limit: int) -> List[Tuple[object, float]]:
+    return sorted(scores.items(), key=lambda kv: -kv[1])[:limit]
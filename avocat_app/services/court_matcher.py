@@ -0,0 +1,172 @@
+"""Rapprochement de noms de juridictions (mahakim.ma, fichiers XLSX) avec la table Juridiction.
+
+Un seul chargement de la table, puis tout se fait en mémoire :
+
+- normalisation : `embeddings.normalize_text` (harakat, أ/إ/آ, ى, ة) + hamza
+  sur support (ئ → ي, ؤ → و), tatweel, articles et préfixes collés
+  (ال / بال / وال / لل) retirés de chaque mot ;
+- clé exacte = mots normalisés triés → score 1.0 ;
+- sinon Jaccard « souple » sur les mots : deux mots s'apparient si leur
+  ratio d'édition (difflib) dépasse TOKEN_RATIO, ce qui absorbe les fautes
+  de frappe sans confondre ابتدائية et استئناف. Les candidats sont ceux qui
+  partagent un mot (index inversé) ; à défaut toute la table est parcourue.
+
+Un match n'est retenu qu'au-dessus de MIN_SCORE. `appel=True/False` limite
+aux cours d'appel (sans TribunalParent) ou aux juridictions rattachées ;
+`first_instance=True` écarte les types de cour d'appel (CA…), même sans
+TribunalParent ; `parent_id` départage deux tribunaux homonymes.
+"""
+from __future__ import annotations
+
+import difflib
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .embeddings import normalize_text
+
+MIN_SCORE = 0.8
+PARENT_BONUS = 0.05
+TOKEN_RATIO = 0.85
+APPEL_TYPE_PREFIX = "CA"  # TypeJuridiction.code_type des cours d'appel (CA, CA_COM, CA_ADMIN)
+
+_PREFIXES = ("بال", "وال", "لل", "ال")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def court_tokens(name: str) -> FrozenSet[str]:
+    text = normalize_text(name or "").replace("ـ", "").replace("ئ", "ي").replace("ؤ", "و").replace("ء", "")
+    out = set()
+    for tok in _TOKEN_RE.findall(text):
+        for p in _PREFIXES:
+            if tok.startswith(p) and len(tok) - len(p) >= 2:
+                tok = tok[len(p):]
+                break
+        out.add(tok)
+    return frozenset(out)
+
+
+def court_key(name: str) -> str:
+    return " ".join(sorted(court_tokens(name)))
+
+
+def soft_jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard où un mot compte pour son meilleur ratio d'édition (≥ TOKEN_RATIO) dans l'autre ensemble."""
+    if not a or not b:
+        return 0.0
+    shared = a & b
+    weight, paired = float(len(shared)), len(shared)
+    rest_b = b - shared
+    for tok in a - shared:
+        best, best_ratio = None, 0.0
+        for other in rest_b:
+            ratio = difflib.SequenceMatcher(None, tok, other).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = other, ratio
+        if best is not None and best_ratio >= TOKEN_RATIO:
+            weight += best_ratio
+            paired += 1
+            rest_b = rest_b - {best}
+    return weight / (len(a) + len(b) - paired)
+
+
+@dataclass(frozen=True)
+class Court:
+    pk: int
+    name: str
+    parent_id: Optional[int]
+    tokens: FrozenSet[str]
+    key: str
+    type_code: str = ""
+
+
+@dataclass(frozen=True)
+class CourtMatch:
+    name: str
+    juridiction_id: Optional[int]
+    score: float
+    method: str  # exact | tokens | fuzzy | none
+
+    @property
+    def matched(self) -> bool:
+        return self.juridiction_id is not None
+
+
+class CourtMatcher:
+    """Index en mémoire des juridictions (noms arabes normalisés)."""
+
+    def __init__(self, courts: Iterable[Court], min_score: float = MIN_SCORE):
+        self.min_score = min_score
+        self.courts: Dict[int, Court] = {}
+        self._by_key: Dict[str, List[int]] = {}
+        self._by_token: Dict[str, Set[int]] = {}
+        for c in courts:
+            self.add(c)
+
+    @classmethod
+    def from_db(cls, queryset=None, min_score: float = MIN_SCORE) -> "CourtMatcher":
+        from ..models import Juridiction
+
+        qs = queryset if queryset is not None else Juridiction.objects.all()
+        rows = qs.exclude(nomtribunal_ar__isnull=True).values_list(
+            "pk", "nomtribunal_ar", "TribunalParent_id", "type__code_type")
+        return cls((cls.court(pk, name, parent, code) for pk, name, parent, code in rows), min_score=min_score)
+
+    @staticmethod
+    def court(pk, name, parent_id=None, type_code="") -> Court:
+        tokens = court_tokens(name)
+        return Court(pk=pk, name=name or "", parent_id=parent_id, tokens=tokens, key=" ".join(sorted(tokens)),
+                     type_code=type_code or "")
+
+    def add(self, court: Court) -> None:
+        """Ajoute (ou remplace) une juridiction — ex. créée pendant un import."""
+        old = self.courts.get(court.pk)
+        if old is not None:
+            self._by_key.get(old.key, []).remove(old.pk)
+            for t in old.tokens:
+                self._by_token.get(t, set()).discard(old.pk)
+        self.courts[court.pk] = court
+        if not court.key:
+            return
+        self._by_key.setdefault(court.key, []).append(court.pk)
+        for t in court.tokens:
+            self._by_token.setdefault(t, set()).add(court.pk)
+
+    def _allowed(self, pk, appel: Optional[bool], first_instance: bool = False) -> bool:
+        court = self.courts[pk]
+        if first_instance and court.type_code.upper().startswith(APPEL_TYPE_PREFIX):
+            return False
+        if appel is None:
+            return True
+        return (court.parent_id is None) == appel
+
+    def _rank(self, pks, scorer, parent_id):
+        """Meilleur candidat ; le rattachement à `parent_id` ne sert qu'à départager."""
+        best, best_score, best_rank = None, 0.0, -1.0
+        for pk in pks:
+            score = scorer(self.courts[pk])
+            rank = score + (PARENT_BONUS if parent_id is not None and self.courts[pk].parent_id == parent_id else 0)
+            if rank > best_rank:
+                best, best_score, best_rank = pk, score, rank
+        return best, best_score
+
+    def match(self, name: str, appel: Optional[bool] = None, parent_id=None,
+              first_instance: bool = False) -> CourtMatch:
+        tokens = court_tokens(name)
+        key = " ".join(sorted(tokens))
+        if not key:
+            return CourtMatch(name, None, 0.0, "none")
+
+        exact = [pk for pk in self._by_key.get(key, []) if self._allowed(pk, appel, first_instance)]
+        if exact:
+            pk, _ = self._rank(exact, lambda c: 1.0, parent_id)
+            return CourtMatch(name, pk, 1.0, "exact")
+
+        candidates = {pk for t in tokens for pk in self._by_token.get(t, ()) if self._allowed(pk, appel, first_instance)}
+        method = "tokens" if candidates else "fuzzy"
+        if not candidates:
+            candidates = [pk for pk in self.courts if self._allowed(pk, appel, first_instance)]
+        pk, score = self._rank(candidates, lambda c: soft_jaccard(tokens, c.tokens), parent_id)
+        if pk is not None and score >= self.min_score:
+            return CourtMatch(name, pk, round(score, 3), method)
+        return CourtMatch(name, None, round(score, 3), "none")
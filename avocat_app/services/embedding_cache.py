@@ -0,0 +1,237 @@
+"""Cache des embeddings (requêtes de recherche et documents), clé (modèle, sha256 du texte normalisé).
+
+Deux niveaux :
+
+- LRU en mémoire par processus (EMBEDDING_CACHE_MEMORY_ITEMS vecteurs) ;
+- table `embedding_cache` partagée, pour les modèles distants (Voyage) :
+  l'appel réseau coûte bien plus qu'une lecture en base. Les embeddings
+  hash-bow locaux ne passent que par le LRU.
+
+La table est bornée à EMBEDDING_CACHE_MAX_ROWS lignes : toutes les
+EVICT_EVERY insertions, les lignes les moins récemment utilisées au-delà
+sont supprimées. `last_used_at` n'est rafraîchi qu'une fois par
+TOUCH_SECONDS pour ne pas écrire à chaque lecture.
+
+Compteurs par processus (`stats()`) : hits mémoire / table, misses, taux de
+succès, journalisés toutes les LOG_EVERY lectures ; `python manage.py
+embedding_cache` affiche l'état de la table.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ITEMS = 2048
+MAX_ROWS = 200_000
+EVICT_EVERY = 500
+TOUCH_SECONDS = 3600
+LOG_EVERY = 1000         # lectures entre deux journalisations des compteurs
+
+_SPACES = re.compile(r"\s+")
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def cache_key(text: str) -> str:
+    """sha256 du texte normalisé (embeddings.normalize_text, espaces réduits)."""
+    from .embeddings import normalize_text
+
+    norm = _SPACES.sub(" ", normalize_text(text or "")).strip()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+def _shared(model: str) -> bool:
+    from .embeddings import hash_model_name
+
+    return model != hash_model_name()
+
+
+class _Lru:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+            return vec
+
+    def put(self, key, vec: np.ndarray) -> None:
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_LRU: Optional[_Lru] = None
+_COUNTERS = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+_COUNTERS_LOCK = threading.Lock()
+_inserts_since_evict = 0
+
+
+def _lru() -> _Lru:
+    global _LRU
+    if _LRU is None:
+        _LRU = _Lru(int(_setting("EMBEDDING_CACHE_MEMORY_ITEMS", MEMORY_ITEMS)))
+    return _LRU
+
+
+def _count(**deltas) -> None:
+    with _COUNTERS_LOCK:
+        before = _COUNTERS["memory_hits"] + _COUNTERS["db_hits"] + _COUNTERS["misses"]
+        for name, n in deltas.items():
+            _COUNTERS[name] += n
+        after = _COUNTERS["memory_hits"] + _COUNTERS["db_hits"] + _COUNTERS["misses"]
+    if after // LOG_EVERY > before // LOG_EVERY:
+        logger.info("Cache d'embeddings : %s", stats())
+
+
+def get_many(model: str, texts: Sequence[str]) -> Dict[int, np.ndarray]:
+    """{position: vecteur} des textes déjà en cache (LRU puis table)."""
+    found: Dict[int, np.ndarray] = {}
+    keys = [cache_key(t) for t in texts]
+    lru = _lru()
+    missing: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        vec = lru.get((model, key))
+        if vec is not None:
+            found[i] = vec
+        else:
+            missing.setdefault(key, []).append(i)
+    memory_hits = len(found)
+
+    db_hits = 0
+    if missing and _shared(model):
+        from django.db import DatabaseError
+        from django.utils import timezone
+
+        from ..models import EmbeddingCache
+
+        try:
+            rows = list(EmbeddingCache.objects.filter(model=model, key__in=list(missing))
+                        .values_list("pk", "key", "vector", "last_used_at"))
+            stale = []
+            for pk, key, vec, last_used in rows:
+                lru.put((model, key), vec)
+                for i in missing.pop(key):
+                    found[i] = vec
+                    db_hits += 1
+                if last_used < timezone.now() - timedelta(seconds=TOUCH_SECONDS):
+                    stale.append(pk)
+            if stale:
+                EmbeddingCache.objects.filter(pk__in=stale).update(last_used_at=timezone.now())
+        except DatabaseError:
+            # Table absente (migration en attente) ou base indisponible : le cache est facultatif
+            logger.warning("Cache d'embeddings indisponible", exc_info=True)
+
+    _count(memory_hits=memory_hits, db_hits=db_hits, misses=sum(len(v) for v in missing.values()))
+    return found
+
+
+def get(model: str, text: str) -> Optional[np.ndarray]:
+    return get_many(model, [text]).get(0)
+
+
+def put_many(model: str, items: Sequence[Tuple[str, Sequence[float]]]) -> None:
+    """Enregistre des (texte, vecteur) dans les deux niveaux."""
+    global _inserts_since_evict
+    if not items:
+        return
+    lru = _lru()
+    fresh: Dict[str, np.ndarray] = {}
+    for text, vec in items:
+        key = cache_key(text)
+        arr = np.asarray(vec, dtype=np.float32)
+        lru.put((model, key), arr)
+        fresh[key] = arr
+    if not _shared(model):
+        return
+
+    from django.db import DatabaseError
+
+    from ..models import EmbeddingCache
+
+    try:
+        EmbeddingCache.objects.bulk_create(
+            [EmbeddingCache(model=model, key=key, vector=arr) for key, arr in fresh.items()],
+            ignore_conflicts=True,
+        )
+    except DatabaseError:
+        logger.warning("Cache d'embeddings : écriture impossible", exc_info=True)
+        return
+    _count(stored=len(fresh))
+    with _COUNTERS_LOCK:
+        _inserts_since_evict += len(fresh)
+        due = _inserts_since_evict >= EVICT_EVERY
+        if due:
+            _inserts_since_evict = 0
+    if due:
+        evict()
+
+
+def put(model: str, text: str, vec: Sequence[float]) -> None:
+    put_many(model, [(text, vec)])
+
+
+def evict(max_rows: Optional[int] = None) -> int:
+    """Supprime les lignes les moins récemment utilisées au-delà de `max_rows`. Retourne le nombre supprimé."""
+    from ..models import EmbeddingCache
+
+    limit = int(max_rows if max_rows is not None else _setting("EMBEDDING_CACHE_MAX_ROWS", MAX_ROWS))
+    total = EmbeddingCache.objects.count()
+    if total <= limit:
+        return 0
+    cutoff = list(EmbeddingCache.objects.order_by("-last_used_at")
+                  .values_list("last_used_at", flat=True)[limit:limit + 1])
+    if not cutoff:
+        return 0
+    deleted, _ = EmbeddingCache.objects.filter(last_used_at__lte=cutoff[0]).delete()
+    _count(evicted=deleted)
+    logger.info("Cache d'embeddings : %d ligne(s) évincée(s) (limite %d)", deleted, limit)
+    return deleted
+
+
+def clear(model: Optional[str] = None) -> int:
+    from ..models import EmbeddingCache
+
+    _lru().clear()
+    qs = EmbeddingCache.objects.all()
+    if model:
+        qs = qs.filter(model=model)
+    deleted, _ = qs.delete()
+    return deleted
+
+
+def stats() -> dict:
+    """Compteurs du processus courant ; `hit_rate` = (mémoire + table) / lectures."""
+    with _COUNTERS_LOCK:
+        data = dict(_COUNTERS)
+    lookups = data["memory_hits"] + data["db_hits"] + data["misses"]
+    data["lookups"] = lookups
+    data["hit_rate"] = round((data["memory_hits"] + data["db_hits"]) / lookups, 4) if lookups else 0.0
+    data["memory_items"] = len(_lru())
+    return data
@@ -7,7 +7,9 @@ Stratégie :
   haché normalisé L2). Pas d'API, fonctionne en dev, utile pour la
   recherche par mots-clés sémantiquement proches.
 
-Le résultat est toujours `list[float]` stockable en JSONField.
+Le résultat est toujours `list[float]` ; DecisionAnalysis.embedding le
+stocke en binaire (float32 par défaut, cf. models_fields.VectorField) et le
+relit en `np.ndarray`.
 """
 from __future__ import annotations
 
@@ -15,7 +17,8 @@ import hashlib
 import logging
 import math
 import re
-from typing import Iterable, List, Optional, Tuple
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
 
 import requests
 from django.conf import settings
@@ -33,7 +36,8 @@ _ARABIC_DIACRITICS = re.compile(r"[ً-ٰٟ]")
 _TOKEN_RE = re.compile(r"[\w؀-ۿ]+", re.UNICODE)
 
 
-def _normalize(text: str) -> str:
+def normalize_text(text: str) -> str:
+    """Minuscules, harakat retirés, أ/إ/آ → ا, ى → ي, ة → ه (partagé avec contumace_search)."""
     if not text:
         return ""
     t = text.lower()
@@ -44,6 +48,9 @@ def _normalize(text: str) -> str:
     return t
 
 
+_normalize = normalize_text
+
+
 def _tokenize(text: str) -> List[str]:
     return _TOKEN_RE.findall(_normalize(text))
 
@@ -66,39 +73,167 @@ def _hash_embedding(text: str, dim: int = DEFAULT_DIM) -> List[float]:
 
 # ---------- Voyage AI ----------
 
-def _voyage_embedding(text: str, *, model: str = VOYAGE_DEFAULT_MODEL) -> Optional[List[float]]:
+VOYAGE_MAX_CHARS = 8000
+VOYAGE_BATCH_SIZE = 64       # entrées par requête (l'API en accepte 128)
+VOYAGE_RETRIES = 4
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EmbeddingError(Exception):
+    """Appel Voyage AI en échec après les nouvelles tentatives."""
+
+
+def _voyage_url() -> str:
+    return getattr(settings, "VOYAGE_API_URL", "") or VOYAGE_API_URL
+
+
+def _voyage_limiter():
+    """Limiteur partagé par les threads du processus (VOYAGE_REQUESTS_PER_MINUTE)."""
+    global _LIMITER
+    if _LIMITER is None:
+        from .mahakim_sync import RateLimiter
+
+        rpm = float(getattr(settings, "VOYAGE_REQUESTS_PER_MINUTE", 0) or 0)
+        _LIMITER = RateLimiter(60.0 / rpm if rpm > 0 else 0.0)
+    return _LIMITER
+
+
+_LIMITER = None
+
+
+def voyage_embeddings(texts: List[str], *, model: str = VOYAGE_DEFAULT_MODEL) -> List[List[float]]:
+    """Embeddings d'un lot de textes en une requête (même ordre).
+
+    Respecte VOYAGE_REQUESTS_PER_MINUTE ; 429 / 5xx / erreurs réseau sont
+    retentés avec un délai doublé (ou le Retry-After de la réponse). Lève
+    EmbeddingError sans clé API ou après VOYAGE_RETRIES échecs.
+    """
     api_key = getattr(settings, "VOYAGE_API_KEY", "") or ""
     if not api_key:
+        raise EmbeddingError("VOYAGE_API_KEY absente")
+    payload = {"input": [(t or " ")[:VOYAGE_MAX_CHARS] for t in texts], "model": model}
+    delay = 1.0
+    for attempt in range(1, VOYAGE_RETRIES + 1):
+        _voyage_limiter().wait()
+        try:
+            r = requests.post(
+                _voyage_url(),
+                headers={"Authorization": f"Bearer {api_key}", "content-type": "application/json"},
+                json=payload,
+                timeout=60,
+            )
+        except requests.RequestException as e:
+            error, wait = str(e), delay
+        else:
+            if r.status_code < 400:
+                rows = sorted(r.json().get("data") or [], key=lambda d: d.get("index", 0))
+                vectors = [row.get("embedding") for row in rows]
+                if len(vectors) != len(texts) or not all(isinstance(v, list) for v in vectors):
+                    raise EmbeddingError(f"réponse Voyage incomplète ({len(vectors)}/{len(texts)})")
+                return [[float(x) for x in v] for v in vectors]
+            if r.status_code not in _RETRY_STATUSES:
+                raise EmbeddingError(f"Voyage HTTP {r.status_code}: {r.text[:200]}")
+            error = f"HTTP {r.status_code}"
+            try:
+                wait = float(r.headers.get("Retry-After") or delay)
+            except ValueError:
+                wait = delay
+        if attempt == VOYAGE_RETRIES:
+            raise EmbeddingError(f"Voyage indisponible après {attempt} tentatives : {error}")
+        logger.warning("Voyage AI (%s), nouvelle tentative dans %.1f s", error, wait)
+        time.sleep(wait)
+        delay *= 2
+    raise EmbeddingError("Voyage indisponible")
+
+
+def _voyage_embedding(text: str, *, model: str = VOYAGE_DEFAULT_MODEL) -> Optional[List[float]]:
+    if not getattr(settings, "VOYAGE_API_KEY", ""):
         return None
     try:
-        r = requests.post(
-            VOYAGE_API_URL,
-            headers={"Authorization": f"Bearer {api_key}", "content-type": "application/json"},
-            json={"input": text[:8000], "model": model},
-            timeout=30,
-        )
-        r.raise_for_status()
-        data = r.json()
-        emb = data.get("data", [{}])[0].get("embedding")
-        if isinstance(emb, list):
-            return [float(x) for x in emb]
-    except Exception:
+        return voyage_embeddings([text or ""], model=model)[0]
+    except EmbeddingError:
         logger.exception("Voyage AI embedding failed")
     return None
 
 
 # ---------- Public API ----------
 
+def hash_model_name() -> str:
+    return f"hash-bow-{DEFAULT_DIM}"
+
+
 def embed_text(text: str, *, prefer_real: bool = True) -> Tuple[List[float], str]:
     """Retourne (vecteur, nom_du_modèle).
 
-    En cas d'échec de l'API réelle, fallback sur le hash deterministe.
+    En cas d'échec de l'API réelle, fallback sur le hash deterministe. Les
+    vecteurs passent par services/embedding_cache (LRU + table).
     """
-    if prefer_real:
-        v = _voyage_embedding(text or "")
+    from . import embedding_cache
+
+    text = text or ""
+    if prefer_real and getattr(settings, "VOYAGE_API_KEY", ""):
+        cached = embedding_cache.get(VOYAGE_DEFAULT_MODEL, text)
+        if cached is not None:
+            return cached.tolist(), VOYAGE_DEFAULT_MODEL
+        v = _voyage_embedding(text)
         if v is not None:
+            embedding_cache.put(VOYAGE_DEFAULT_MODEL, text, v)
             return v, VOYAGE_DEFAULT_MODEL
-    return _hash_embedding(text or ""), f"hash-bow-{DEFAULT_DIM}"
+    model = hash_model_name()
+    cached = embedding_cache.get(model, text)
+    if cached is not None:
+        return cached.tolist(), model
+    v = _hash_embedding(text)
+    embedding_cache.put(model, text, v)
+    return v, model
+
+
+def embed_texts(texts: List[str], model: str) -> List[List[float]]:
+    """Lot de textes avec un modèle donné (hash-bow-* local, sinon Voyage). Lève EmbeddingError.
+
+    Seuls les textes absents du cache sont calculés (ou envoyés à l'API).
+    """
+    from . import embedding_cache
+
+    found = embedding_cache.get_many(model, texts)
+    todo: dict = {}  # clé de cache → positions (textes identiques envoyés une fois)
+    for i, t in enumerate(texts):
+        if i not in found:
+            todo.setdefault(embedding_cache.cache_key(t), []).append(i)
+    if todo:
+        batch = [texts[positions[0]] for positions in todo.values()]
+        if model == hash_model_name():
+            computed = [_hash_embedding(t or "") for t in batch]
+        else:
+            computed = voyage_embeddings(batch, model=model)
+        embedding_cache.put_many(model, list(zip(batch, computed)))
+        for positions, vec in zip(todo.values(), computed):
+            found.update((i, vec) for i in positions)
+    return [list(found[i]) if isinstance(found[i], list) else found[i].tolist() for i in range(len(texts))]
+
+
+def default_model() -> str:
+    return VOYAGE_DEFAULT_MODEL if getattr(settings, "VOYAGE_API_KEY", "") else hash_model_name()
+
+
+def analysis_text(analysis) -> str:
+    """Texte indexé d'une analyse : résumés, décision, texte source, motifs."""
+    parts = [
+        analysis.resume_ar or "",
+        analysis.resume_fr or "",
+        analysis.decision_essentielle or "",
+        analysis.source_text or "",
+    ]
+    for m in analysis.motifs or []:
+        if isinstance(m, dict):
+            parts.append(m.get("titre", "") or "")
+            parts.append(m.get("contenu", "") or "")
+    return "\n".join(p for p in parts if p).strip()
+
+
+def content_hash(text: str, model: str) -> str:
+    """Empreinte (modèle, texte) : un embedding n'est recalculé que si elle change."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
 
 
 def cosine_similarity(a: Iterable[float], b: Iterable[float]) -> float:
@@ -114,59 +249,218 @@ def cosine_similarity(a: Iterable[float], b: Iterable[float]) -> float:
     return dot / (na * nb)
 
 
+RRF_K = 10              # constante de la RRF : 60 (usuel) noie les correspondances exactes (bench_hybrid_search)
+CANDIDATES_FACTOR = 5   # candidats lus dans chaque index par résultat demandé
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Tuple[object, float]]], k: int = RRF_K):
+    """Fusionne des classements [(pk, score), ...] : somme des 1 / (k + rang) de chaque liste.
+
+    Retourne [(pk, score)] décroissant, score ramené à [0, 1] (1 = premier de
+    toutes les listes non vides) ; seuls les rangs comptent, les échelles de scores
+    (cosinus, BM25) n'ont pas à être comparables.
+    """
+    rankings = [r for r in rankings if r]
+    fused: dict = {}
+    for ranking in rankings:
+        for rank, (pk, _) in enumerate(ranking, start=1):
+            fused[pk] = fused.get(pk, 0.0) + 1.0 / (k + rank)
+    best = len(rankings) / (k + 1) if rankings else 1.0
+    return sorted(((pk, score / best) for pk, score in fused.items()), key=lambda kv: -kv[1])
+
+
 def search_decisions(query: str, *, top_k: int = 10):
-    """Recherche les DecisionAnalysis les plus similaires à la requête.
+    """Recherche les DecisionAnalysis les plus proches de la requête.
     Retourne [(analysis, score), ...] trié décroissant.
+
+    Candidats vectoriels : index ANN sur disque du modèle s'il existe
+    (services/ann_index.py), sinon index exact du processus
+    (services/vector_index.py). Avec SEARCH_HYBRID (défaut), ils sont
+    fusionnés par rang (reciprocal_rank_fusion, SEARCH_RRF_K) avec les
+    candidats BM25 de l'index lexical (services/lexical_index.py), qui
+    retrouve les termes exacts et numéros d'articles, y compris dans les
+    analyses sans embedding ; le score est alors celui de la fusion. Une
+    troisième liste classe les analyses par leur meilleur passage du texte
+    source (services/passages.py), qui couvre les jugements au-delà de la
+    troncature de l'embedding. Sans modèle réel (hash-bow), BM25 remplace
+    les vecteurs : ce n'est qu'un sac de mots plus grossier du même texte.
+    Seules les analyses retenues sont chargées.
+
+    Chaque analyse renvoyée porte `best_passage` : {"start", "end", "text"}
+    du passage de `source_text` le plus proche (vecteurs de passages, sinon
+    termes de la requête), ou None.
     """
     from ..models import DecisionAnalysis
+    from . import ann_index, lexical_index, passages
+    from .vector_index import ensure_fresh
 
     if not query or not query.strip():
         return []
 
-    q_vec, _model = embed_text(query)
-    analyses = (
+    hybrid = getattr(settings, "SEARCH_HYBRID", True)
+    depth = top_k * CANDIDATES_FACTOR if hybrid else top_k
+    q_vec, model = embed_text(query)
+    memory = ann = None
+    lexical_only = hybrid and model == hash_model_name()
+    if not lexical_only:
+        ann = ann_index.get(model)
+    if lexical_only:
+        hits = []
+    elif ann is not None:
+        hits = ann.search(q_vec, depth)
+    else:
+        memory = ensure_fresh()
+        hits = memory.search(model, q_vec, depth)
+    hits = [(pk, score) for pk, score in hits if score > 0]
+
+    if hybrid:
+        if hits:
+            # Supprimées ou ré-indexées avec un autre modèle depuis la dernière lecture de l'index
+            current = set(DecisionAnalysis.objects.filter(pk__in=[pk for pk, _ in hits], embedding_model=model)
+                          .values_list("pk", flat=True))
+            for pk, _ in hits:
+                if pk not in current and memory is not None:
+                    memory.remove(pk)
+            hits = [(pk, score) for pk, score in hits if pk in current]
+        passage_hits = [] if lexical_only else passages.search(model, q_vec, depth * 2)
+        spans = {pk: span for pk, _, span in passage_hits}
+        lexical = lexical_index.ensure_fresh().search(query, depth)
+        hits = reciprocal_rank_fusion(
+            [hits, [(pk, score) for pk, score, _ in passage_hits], lexical],
+            k=getattr(settings, "SEARCH_RRF_K", RRF_K),
+        )[:top_k]
+    else:
+        spans = {}
+    if not hits:
+        return []
+    found = (
         DecisionAnalysis.objects
         .select_related("decision", "decision__affaire")
-        .exclude(embedding__isnull=True)
+        .in_bulk([pk for pk, _ in hits])
     )
     scored = []
-    for a in analyses:
-        if not a.embedding:
+    for pk, score in hits:
+        analysis = found.get(pk)
+        if analysis is None or (not hybrid and analysis.embedding_model != model):
+            if memory is not None:
+                memory.remove(pk)
             continue
-        # Compatibilité dimension: comparer uniquement si dim match
-        if len(a.embedding) != len(q_vec):
-            continue
-        score = cosine_similarity(q_vec, a.embedding)
-        if score > 0:
-            scored.append((a, score))
-    scored.sort(key=lambda x: x[1], reverse=True)
-    return scored[:top_k]
+        text = analysis.source_text or ""
+        span = spans.get(pk) or passages.best_lexical_passage(text, query)
+        analysis.best_passage = None
+        if span and span[0] < len(text):
+            start, end = span[0], min(span[1], len(text))
+            analysis.best_passage = {"start": start, "end": end, "text": text[start:end]}
+        scored.append((analysis, score))
+    return scored
+
+
+REINDEX_FIELDS = ["embedding", "embedding_model", "embedding_hash", "updated_at"]
+
+
+def reindex_decisions(*, model: Optional[str] = None, since=None, workers: int = 4,
+                      batch_size: Optional[int] = None, force: bool = False,
+                      progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Recalcule les embeddings des analyses dont le texte (ou le modèle) a changé.
+
+    - `model` : modèle d'embedding (défaut : voyage-3 avec clé API, sinon hash) ;
+    - `since` : seulement les analyses modifiées depuis ce datetime ;
+    - `force` : ignorer les empreintes et tout recalculer.
+
+    Les textes sont envoyés par lots de `batch_size` à `workers` threads au
+    plus (limiteur et nouvelles tentatives dans voyage_embeddings) ; les
+    écritures se font par `bulk_update` dans le thread appelant, puis les
+    index vectoriels (mémoire, ANN) sont prévenus. Un lot en échec est
+    compté dans `failed` et laissé intact. `progress(stats)` est appelé
+    après chaque lot.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    from django.db.models import BooleanField, ExpressionWrapper, Q
+    from django.utils import timezone
+
+    from ..models import DecisionAnalysis
+    from . import ann_index
+    from .vector_index import INDEX
+
+    model = model or default_model()
+    batch_size = max(1, batch_size or int(getattr(settings, "VOYAGE_BATCH_SIZE", VOYAGE_BATCH_SIZE)))
+    workers = max(1, workers)
+
+    qs = (DecisionAnalysis.objects
+          .only("pk", "resume_ar", "resume_fr", "decision_essentielle", "source_text", "motifs",
+                "embedding_model", "embedding_hash")
+          .annotate(has_embedding=ExpressionWrapper(Q(embedding__isnull=False), output_field=BooleanField()))
+          .order_by("pk"))
+    if since is not None:
+        qs = qs.filter(updated_at__gte=since)
+
+    stats = {"total": qs.count(), "seen": 0, "indexed": 0, "unchanged": 0, "skipped": 0, "failed": 0,
+             "batches": 0, "started": time.monotonic()}
+
+    def embed(batch):
+        return batch, embed_texts([text for _, text, _ in batch], model)
+
+    def write(batch, vectors):
+        now = timezone.now()
+        rows = []
+        for (a, _, digest), vec in zip(batch, vectors):
+            a.embedding, a.embedding_model, a.embedding_hash, a.updated_at = vec, model, digest, now
+            rows.append(a)
+        DecisionAnalysis.objects.bulk_update(rows, REINDEX_FIELDS)
+        # bulk_update n'envoie pas post_save : prévenir les index nous-mêmes
+        for a in rows:
+            INDEX.upsert(a.pk, model, a.embedding)
+            ann_index.append_update(model, a.pk, a.embedding)
+        stats["indexed"] += len(rows)
+
+    def collect(done_futures):
+        for fut in done_futures:
+            stats["batches"] += 1
+            try:
+                batch, vectors = fut.result()
+            except EmbeddingError as e:
+                logger.error("Lot d'embeddings en échec (%d analyses) : %s", len(pending[fut]), e)
+                stats["failed"] += len(pending[fut])
+            else:
+                write(batch, vectors)
+            del pending[fut]
+            if progress:
+                progress(dict(stats))
+
+    pending = {}
+    batch = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        def submit(items):
+            # Au plus 2 lots en attente par thread : la mémoire reste bornée
+            while len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(embed, items)] = items
+
+        for a in qs.iterator(chunk_size=500):
+            stats["seen"] += 1
+            text = analysis_text(a)
+            if not text:
+                stats["skipped"] += 1
+                continue
+            digest = content_hash(text, model)
+            if not force and a.has_embedding and a.embedding_hash == digest and a.embedding_model == model:
+                stats["unchanged"] += 1
+                continue
+            batch.append((a, text, digest))
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    stats["seconds"] = round(time.monotonic() - stats.pop("started"), 2)
+    return stats
 
 
 def reindex_all_decisions() -> dict:
-    """Recalcule l'embedding de toutes les DecisionAnalysis ayant du contenu."""
-    from ..models import DecisionAnalysis
-    indexed = 0
-    skipped = 0
-    for a in DecisionAnalysis.objects.all().iterator():
-        text_parts = [
-            a.resume_ar or "",
-            a.resume_fr or "",
-            a.decision_essentielle or "",
-            a.source_text or "",
-        ]
-        if a.motifs:
-            for m in a.motifs:
-                if isinstance(m, dict):
-                    text_parts.append(m.get("titre", "") or "")
-                    text_parts.append(m.get("contenu", "") or "")
-        text = "\n".join(p for p in text_parts if p).strip()
-        if not text:
-            skipped += 1
-            continue
-        vec, model = embed_text(text)
-        a.embedding = vec
-        a.embedding_model = model
-        a.save(update_fields=["embedding", "embedding_model"])
-        indexed += 1
-    return {"indexed": indexed, "skipped": skipped}
+    """Compatibilité : `reindex_decisions()` avec les réglages par défaut."""
+    return reindex_decisions()
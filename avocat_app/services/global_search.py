@@ -0,0 +1,394 @@
+"""Index de la recherche globale (barre de recherche, une requête HTMX par frappe).
+
+`global_search` enchaînait quatre requêtes de quatre ou cinq `icontains`
+(Affaire, Partie, Juridiction, Avocat) : des `LIKE '%…%'` qui parcourent
+les tables entières. Chaque entité a désormais une ligne dans
+`search_document` : titre, sous-titre et lien déjà mis en forme pour
+`_global_search_results.html`, et texte normalisé (minuscules, harakat et
+accents retirés, أ/إ/آ → ا, ى → ي, ة → ه, chiffres ٠-٩ → 0-9, téléphone
+aussi en chiffres seuls).
+
+Index plein texte selon la base :
+
+- SQLite (bureau) : une table FTS5 `search_document_fts_<type>` par type
+  (tokenizer `trigram`, tenue à jour par triggers). Un type où un mot
+  courant est rare (un prénom parmi les affaires) ne parcourt ainsi que ses
+  propres listes, pas celles des 500 000 parties. Un mot de 3 lettres ou
+  plus est cherché comme sous-chaîne, un mot de 2 lettres en début de mot
+  (« مح » → محمد) ;
+- MySQL : index FULLTEXT `WITH PARSER ngram` (sous-chaînes dès 2 lettres) ;
+- autre base, ou FTS5 absent : `LIKE` sur la seule table d'index.
+
+Une seule instruction SQL : pour chaque type, les CANDIDATES documents
+correspondants les plus récemment (ré)indexés (UNION ALL), joints à leur
+ligne. Ils sont ensuite classés en Python (titre identique, titre commençant
+par la requête, mots en début de mot, sous-chaîne), PER_GROUP par type.
+
+Maintenance : post_save / post_delete des quatre modèles (suppression douce
+comprise) ; renommer une juridiction réindexe ses affaires (sous-titre).
+Les écritures groupées (bulk_create, update()) ne déclenchent pas de
+signal : appeler `index()` après l'écriture (synchronisation des
+juridictions de mahakim_jobs) ou `python manage.py rebuild_search_index`.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .embeddings import normalize_text
+
+logger = logging.getLogger(__name__)
+
+PER_GROUP = 5
+CANDIDATES = 40          # documents lus par type avant le classement final
+MAX_TEXT_CHARS = 4000    # objet d'une affaire : début seulement
+BATCH_SIZE = 2000
+
+FTS_PREFIX = "search_document_fts_"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_NON_DIGITS = re.compile(r"\D+")
+
+# Ordre d'affichage des groupes
+KINDS = {
+    "affaire": {
+        "model": "Affaire", "label": "القضايا", "icon": "bi-folder2",
+        "url": "cabinet:affaire_detail",
+        "fields": ("reference_interne", "reference_tribunal", "numero_dossier", "objet",
+                   "type_affaire__libelle", "juridiction_id",
+                   "juridiction__nomtribunal_ar", "juridiction__nomtribunal_fr"),
+    },
+    "partie": {
+        "model": "Partie", "label": "الأطراف", "icon": "bi-person",
+        "url": "cabinet:partie_detail",
+        "fields": ("nom_complet", "type_partie", "telephone", "cin_ou_rc", "email"),
+    },
+    "juridiction": {
+        "model": "Juridiction", "label": "المحاكم", "icon": "bi-building",
+        "url": "cabinet:juridiction_detail",
+        "fields": ("nomtribunal_ar", "nomtribunal_fr", "villetribunal_ar", "villetribunal_fr", "code"),
+    },
+    "avocat": {
+        "model": "Avocat", "label": "المحامون", "icon": "bi-person-badge",
+        "url": "cabinet:avocat_detail",
+        "fields": ("nom", "telephone", "email"),
+    },
+}
+KIND_BY_MODEL = {spec["model"]: kind for kind, spec in KINDS.items()}
+
+
+def normalize(text: str) -> str:
+    """Mots normalisés (arabe comme embeddings.normalize_text, accents latins retirés)."""
+    t = unicodedata.normalize("NFKD", normalize_text(text or "").translate(_DIGITS))
+    t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return " ".join(_TOKEN_RE.findall(t))
+
+
+def query_words(query: str) -> List[str]:
+    """Termes de la requête, sans doublon. Un mot d'une lettre est rattaché
+    au précédent (« REF-0 » → « ref 0 », cherché comme sous-chaîne)."""
+    terms: List[str] = []
+    pending = ""
+    for word in normalize(query).split():
+        if len(word) == 1:
+            if terms:
+                terms[-1] = f"{terms[-1]} {word}"
+            else:
+                pending = f"{pending} {word}".strip()
+            continue
+        terms.append(f"{pending} {word}".strip())
+        pending = ""
+    if pending and len(pending) >= 3:
+        terms.append(pending)
+    return list(dict.fromkeys(terms))
+
+
+# ---------- Documents ----------
+
+def _choices_display(model, field: str) -> Dict[str, str]:
+    return {str(k): str(v) for k, v in (model._meta.get_field(field).choices or [])}
+
+
+def build(kind: str, v: dict, *, partie_types: Optional[Dict[str, str]] = None) -> dict:
+    """Champs d'un SearchDocument à partir des valeurs (`.values(*fields)`) d'une entité."""
+    from django.urls import reverse
+
+    searchable: List[str]
+    if kind == "affaire":
+        title = v["reference_interne"]
+        court = v["juridiction__nomtribunal_ar"] or v["juridiction__nomtribunal_fr"] or ""
+        subtitle = f"{v['type_affaire__libelle']} — {court}"
+        searchable = [v["reference_interne"], v["reference_tribunal"], v["numero_dossier"],
+                      (v["objet"] or "")[:MAX_TEXT_CHARS]]
+    elif kind == "partie":
+        title = v["nom_complet"]
+        role = (partie_types or {}).get(v["type_partie"], v["type_partie"])
+        subtitle = f"{role} — {v['telephone'] or v['cin_ou_rc'] or v['email'] or ''}"
+        searchable = [v["nom_complet"], v["telephone"], _NON_DIGITS.sub("", v["telephone"] or ""),
+                      v["cin_ou_rc"], v["email"]]
+    elif kind == "juridiction":
+        title = v["nomtribunal_ar"] or v["nomtribunal_fr"] or v["code"]
+        subtitle = v["villetribunal_ar"] or v["villetribunal_fr"] or ""
+        searchable = [v["nomtribunal_ar"], v["nomtribunal_fr"], v["villetribunal_ar"],
+                      v["villetribunal_fr"], v["code"]]
+    else:
+        title = v["nom"]
+        subtitle = v["telephone"] or v["email"] or ""
+        searchable = [v["nom"], v["telephone"], _NON_DIGITS.sub("", v["telephone"] or ""), v["email"]]
+    return {
+        "kind": kind,
+        "object_id": str(v["pk"]),
+        "title": (title or "")[:255],
+        "subtitle": (subtitle or "")[:255],
+        "url": reverse(KINDS[kind]["url"], kwargs={"pk": v["pk"]}),
+        # Espace initial : « début de mot » vaut aussi pour le premier mot
+        "text": f" {normalize(' '.join(s for s in searchable if s))}",
+    }
+
+
+def _model(kind: str):
+    from django.apps import apps
+
+    return apps.get_model("avocat_app", KINDS[kind]["model"])
+
+
+def _documents(kind: str, qs) -> Iterable[dict]:
+    partie_types = _choices_display(_model("partie"), "type_partie") if kind == "partie" else None
+    for v in qs.values("pk", *KINDS[kind]["fields"]).iterator(chunk_size=BATCH_SIZE):
+        yield build(kind, v, partie_types=partie_types)
+
+
+def index(kind: str, pks: Sequence) -> int:
+    """(Ré)indexe des entités : supprimées (même en douceur) → retirées. Retourne le nombre indexé."""
+    from ..models import SearchDocument
+
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return 0
+    live = _model(kind).objects.filter(pk__in=pks, is_deleted=False)
+    docs = [SearchDocument(**d) for d in _documents(kind, live)]
+    remove(kind, pks)
+    SearchDocument.objects.bulk_create(docs, batch_size=BATCH_SIZE)
+    return len(docs)
+
+
+def remove(kind: str, pks: Sequence) -> None:
+    from ..models import SearchDocument
+
+    SearchDocument.objects.filter(kind=kind, object_id__in=[str(pk) for pk in pks]).delete()
+
+
+def rebuild(kinds: Optional[Sequence[str]] = None, *, progress=None) -> Dict[str, int]:
+    """Recalcule tout l'index (ou certains types)."""
+    from django.db import connection, transaction
+
+    from ..models import SearchDocument
+
+    counts = {}
+    for kind in kinds or KINDS:
+        with transaction.atomic():
+            stale = SearchDocument.objects.filter(kind=kind)
+            while True:
+                # Par lots : delete() charge les lignes pour les signaux post_delete
+                pks = list(stale.values_list("pk", flat=True)[:BATCH_SIZE])
+                if not pks:
+                    break
+                SearchDocument.objects.filter(pk__in=pks).delete()
+            batch, total = [], 0
+            for doc in _documents(kind, _model(kind).objects.filter(is_deleted=False)):
+                batch.append(SearchDocument(**doc))
+                if len(batch) >= BATCH_SIZE:
+                    SearchDocument.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+                    if progress:
+                        progress(kind, total)
+            SearchDocument.objects.bulk_create(batch)
+            counts[kind] = total + len(batch)
+    if engine() == "fts5":
+        with connection.cursor() as cursor:
+            for kind in kinds or KINDS:
+                cursor.execute(f"INSERT INTO {fts_table(kind)}({fts_table(kind)}) VALUES ('optimize')")
+    return counts
+
+
+# ---------- Index plein texte (DDL) ----------
+
+def fts_table(kind: str) -> str:
+    return f"{FTS_PREFIX}{kind}"
+
+
+def _sqlite_ddl(kind: str) -> tuple:
+    t = fts_table(kind)
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5("
+        "text, content='search_document', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON search_document "
+        f"WHEN new.kind = '{kind}' BEGIN INSERT INTO {t}(rowid, text) VALUES (new.id, new.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON search_document "
+        f"WHEN old.kind = '{kind}' BEGIN INSERT INTO {t}({t}, rowid, text) VALUES ('delete', old.id, old.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE OF kind, text ON search_document BEGIN "
+        f"INSERT INTO {t}({t}, rowid, text) SELECT 'delete', old.id, old.text WHERE old.kind = '{kind}'; "
+        f"INSERT INTO {t}(rowid, text) SELECT new.id, new.text WHERE new.kind = '{kind}'; END",
+    )
+
+
+# Tables et triggers créés par la migration 0046 (copie figée) ; repris par bench_global_search
+SQLITE_DDL = tuple(sql for kind in KINDS for sql in _sqlite_ddl(kind))
+_ENGINE: Dict[str, str] = {}
+
+
+def engine(using: str = "default") -> str:
+    """'fts5', 'mysql' ou 'like' selon la base et la présence de l'index."""
+    if using in _ENGINE:
+        return _ENGINE[using]
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor == "mysql":
+        found = "mysql"
+    elif conn.vendor == "sqlite":
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [fts_table(next(iter(KINDS)))])
+            found = "fts5" if cursor.fetchone() else "like"
+    else:
+        found = "like"
+    _ENGINE[using] = found
+    return found
+
+
+# ---------- Requêtes ----------
+
+def fts5_match(words: Sequence[str]) -> str:
+    """Expression MATCH trigram : tous les termes (2 lettres : début de mot)."""
+    return " AND ".join(f'" {w}"' if len(w) < 3 else f'"{w}"' for w in words)
+
+
+def fts5_sql(kinds: Sequence[str], candidates: int = CANDIDATES) -> str:
+    """Une instruction, placeholders `?` (un par type, même expression MATCH) ;
+    colonnes id, kind, title, subtitle, url."""
+    parts = [f"SELECT * FROM (SELECT rowid AS id FROM {fts_table(kind)} WHERE {fts_table(kind)} MATCH ? "
+             f"ORDER BY rowid DESC LIMIT {int(candidates)})" for kind in kinds]
+    return ("SELECT d.id, d.kind, d.title, d.subtitle, d.url FROM search_document d "
+            f"JOIN ({' UNION ALL '.join(parts)}) c ON c.id = d.id")
+
+
+def _candidates(words: Sequence[str], using: str = "default") -> List[tuple]:
+    from django.db import connections
+
+    kinds = list(KINDS)
+    mode = engine(using)
+    if mode == "fts5":
+        sql = fts5_sql(kinds).replace("?", "%s")
+        params = [fts5_match(words)] * len(kinds)
+    elif mode == "mysql":
+        boolean = " ".join(f'+"{w}"' for w in words)
+        sql = " UNION ALL ".join(
+            "(SELECT id, kind, title, subtitle, url FROM search_document WHERE kind = %s "
+            f"AND MATCH(text) AGAINST (%s IN BOOLEAN MODE) ORDER BY id DESC LIMIT {CANDIDATES})"
+            for _ in kinds
+        )
+        params = [p for kind in kinds for p in (kind, boolean)]
+    else:
+        from ..models import SearchDocument
+
+        rows = []
+        for kind in kinds:
+            qs = SearchDocument.objects.filter(kind=kind)
+            for w in words:
+                qs = qs.filter(text__contains=f" {w}" if len(w) < 3 else w)
+            rows += qs.order_by("-id").values_list("id", "kind", "title", "subtitle", "url")[:CANDIDATES]
+        return rows
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def score(title: str, words: Sequence[str], phrase: str) -> int:
+    """3 titre identique, 2 titre commençant par la requête, 1 mots en début de mot du titre, 0 sinon."""
+    norm = normalize(title)
+    if norm == phrase:
+        return 3
+    if norm.startswith(phrase):
+        return 2
+    padded = f" {norm}"
+    return 1 if all(f" {w}" in padded for w in words) else 0
+
+
+def search(query: str, per_group: int = PER_GROUP, using: str = "default") -> List[dict]:
+    """Groupes {label, icon, items: [{title, subtitle, url}]} pour `_global_search_results.html`."""
+    words = query_words(query)
+    if not words:
+        return []
+    return group(_candidates(words, using), words, normalize(query), per_group)
+
+
+def group(rows: List[tuple], words: Sequence[str], phrase: str, per_group: int = PER_GROUP) -> List[dict]:
+    """Classe les candidats (id, kind, title, subtitle, url) et les regroupe par type."""
+    # Plus récemment (ré)indexé d'abord, puis pertinence du titre (tri stable)
+    rows = sorted(rows, key=lambda r: -r[0])
+    rows.sort(key=lambda r: -score(r[2], words, phrase))
+    grouped: Dict[str, List[dict]] = {}
+    for _, kind, title, subtitle, url in rows:
+        items = grouped.setdefault(kind, [])
+        if len(items) < per_group:
+            items.append({"title": title, "subtitle": subtitle, "url": url})
+    return [
+        {"label": KINDS[kind]["label"], "icon": KINDS[kind]["icon"], "items": grouped[kind]}
+        for kind in KINDS if grouped.get(kind)
+    ]
+
+
+# ---------- Signaux ----------
+
+def _on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from django.db import transaction
+
+    kind = KIND_BY_MODEL[sender.__name__]
+    try:
+        # Point de sauvegarde : un échec n'interrompt pas la transaction de l'appelant
+        with transaction.atomic():
+            before = None
+            if kind == "juridiction":
+                from ..models import SearchDocument
+                before = (SearchDocument.objects.filter(kind=kind, object_id=str(instance.pk))
+                          .values_list("title", flat=True).first())
+            index(kind, [instance.pk])
+            if kind == "juridiction" and before is not None and before != _juridiction_title(instance):
+                # Nom affiché dans le sous-titre des affaires de cette juridiction
+                from ..models import Affaire
+                pks = list(Affaire.objects.filter(juridiction_id=instance.pk).values_list("pk", flat=True))
+                for i in range(0, len(pks), BATCH_SIZE):
+                    index("affaire", pks[i:i + BATCH_SIZE])
+    except Exception:
+        # L'index ne doit jamais faire échouer l'enregistrement de l'entité
+        logger.exception("Index de recherche globale : %s %s non indexé", kind, instance.pk)
+
+
+def _juridiction_title(juridiction) -> str:
+    return (juridiction.nomtribunal_ar or juridiction.nomtribunal_fr or juridiction.code or "")[:255]
+
+
+def _on_delete(sender, instance, **kwargs):
+    from django.db import transaction
+
+    try:
+        with transaction.atomic():
+            remove(KIND_BY_MODEL[sender.__name__], [instance.pk])
+    except Exception:
+        logger.exception("Index de recherche globale : suppression de %s impossible", instance.pk)
+
+
+for _spec in KINDS.values():
+    receiver(post_save, sender=f"avocat_app.{_spec['model']}",
+             dispatch_uid=f"global_search_save_{_spec['model']}")(_on_save)
+    receiver(post_delete, sender=f"avocat_app.{_spec['model']}",
+             dispatch_uid=f"global_search_delete_{_spec['model']}")(_on_delete)
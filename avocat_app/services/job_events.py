@@ -0,0 +1,198 @@
+"""Diffusion en direct (Server-Sent Events) de la progression des tâches.
+
+Un seul `ProgressHub` par processus web. Toutes les connexions SSE qui
+suivent une même tâche partagent son état : un thread unique relit en base,
+à intervalle fixe (JOBS_SSE_POLL_SECONDS), les tâches ayant au moins un
+abonné — une requête pour l'ensemble des tâches suivies, quel que soit le
+nombre d'onglets ouverts. Quand la tâche tourne dans le worker embarqué du
+même processus, `JobContext` publie directement chaque mise à jour.
+
+Format du flux : `event: progress` (données = `job_snapshot`), puis
+`event: end` quand la tâche est terminée. Le flux est fermé au bout de
+JOBS_SSE_MAX_SECONDS ; EventSource se reconnecte alors de lui-même.
+
+Chaque flux occupe un thread du serveur : sans JOBS_SSE_ENABLED (défaut,
+sûr avec des workers gunicorn `sync`) ou au-delà de JOBS_SSE_MAX_STREAMS
+flux ouverts dans le processus, `open_stream` refuse et la page passe au
+polling.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 1.0
+DEFAULT_MAX_SECONDS = 300
+DEFAULT_MAX_STREAMS = 8
+KEEPALIVE_SECONDS = 15
+TERMINAL_STATUSES = ("done", "error")
+
+
+class _Channel:
+    __slots__ = ("snapshot", "version", "subscribers")
+
+    def __init__(self):
+        self.snapshot: Optional[dict] = None
+        self.version = 0
+        self.subscribers = 0
+
+
+class ProgressHub:
+    """Dernier état connu de chaque tâche suivie, partagé entre les flux SSE."""
+
+    def __init__(self, poll_seconds: Optional[float] = None):
+        self._poll_seconds = poll_seconds
+        self._cond = threading.Condition()
+        self._channels: Dict[str, _Channel] = {}
+        self._poller: Optional[threading.Thread] = None
+
+    @property
+    def poll_seconds(self) -> float:
+        return self._poll_seconds or float(getattr(settings, "JOBS_SSE_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+
+    def publish(self, job_id, snapshot: dict) -> None:
+        """Enregistre un nouvel état ; ignoré si personne ne suit la tâche ou s'il est inchangé."""
+        with self._cond:
+            ch = self._channels.get(str(job_id))
+            if ch is None or ch.snapshot == snapshot:
+                return
+            ch.snapshot = snapshot
+            ch.version += 1
+            self._cond.notify_all()
+
+    def subscribe(self, job_id, snapshot: Optional[dict] = None) -> None:
+        with self._cond:
+            ch = self._channels.setdefault(str(job_id), _Channel())
+            ch.subscribers += 1
+            if snapshot is not None and ch.snapshot != snapshot:
+                ch.snapshot = snapshot
+                ch.version += 1
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, daemon=True, name="job-events")
+                self._poller.start()
+
+    def unsubscribe(self, job_id) -> None:
+        with self._cond:
+            ch = self._channels.get(str(job_id))
+            if ch is None:
+                return
+            ch.subscribers -= 1
+            if ch.subscribers <= 0:
+                del self._channels[str(job_id)]
+
+    def wait(self, job_id, after_version: int, timeout: float) -> Tuple[int, Optional[dict]]:
+        """Attend un état plus récent que `after_version` (ou l'expiration)."""
+        key = str(job_id)
+        with self._cond:
+            self._cond.wait_for(
+                lambda: key not in self._channels or self._channels[key].version > after_version,
+                timeout=timeout,
+            )
+            ch = self._channels.get(key)
+            if ch is None:
+                return after_version, None
+            return ch.version, ch.snapshot
+
+    def _poll_loop(self) -> None:
+        from django.db import connection
+
+        from ..models import BackgroundJob
+        from .jobs import job_snapshot
+
+        try:
+            while True:
+                with self._cond:
+                    ids = list(self._channels)
+                    if not ids:
+                        self._poller = None
+                        return
+                try:
+                    for job in BackgroundJob.objects.filter(pk__in=ids):
+                        self.publish(job.pk, job_snapshot(job))
+                except Exception:
+                    logger.exception("Lecture de la progression des tâches")
+                time.sleep(self.poll_seconds)
+        finally:
+            connection.close()
+
+
+hub = ProgressHub()
+
+
+def _event(name: str, data, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_job(job) -> Iterator[str]:
+    """Générateur SSE pour une tâche (à envelopper dans un StreamingHttpResponse)."""
+    from .jobs import job_snapshot
+
+    max_seconds = float(getattr(settings, "JOBS_SSE_MAX_SECONDS", DEFAULT_MAX_SECONDS))
+    deadline = time.monotonic() + max_seconds
+    hub.subscribe(job.pk, job_snapshot(job))
+    try:
+        yield "retry: 2000\n\n"
+        version = 0
+        while time.monotonic() < deadline:
+            new_version, snapshot = hub.wait(job.pk, version, timeout=KEEPALIVE_SECONDS)
+            if snapshot is None or new_version == version:
+                yield ": keepalive\n\n"
+                continue
+            version = new_version
+            yield _event("progress", snapshot, version)
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                yield _event("end", {"status": snapshot.get("status")})
+                return
+    finally:
+        hub.unsubscribe(job.pk)
+
+
+_streams = 0
+_streams_lock = threading.Lock()
+
+
+class _Stream:
+    """Itérateur SSE qui libère sa place à la fermeture de la réponse, même jamais lue."""
+
+    def __init__(self, job):
+        self._gen = stream_job(job)
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._gen)
+
+    def close(self):
+        global _streams
+        if self._closed:
+            return
+        self._closed = True
+        self._gen.close()
+        with _streams_lock:
+            _streams -= 1
+
+
+def open_stream(job) -> Optional[_Stream]:
+    """Flux SSE de `job`, ou None si les flux sont désactivés ou tous occupés."""
+    global _streams
+    if not getattr(settings, "JOBS_SSE_ENABLED", False):
+        return None
+    limit = int(getattr(settings, "JOBS_SSE_MAX_STREAMS", DEFAULT_MAX_STREAMS))
+    with _streams_lock:
+        if _streams >= limit:
+            return None
+        _streams += 1
+    return _Stream(job)
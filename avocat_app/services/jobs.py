@@ -0,0 +1,474 @@
+"""File de tâches durable adossée à la base (table `background_job`).
+
+Remplace les `threading.Thread` + dicts de module des vues mahakim : l'état
+d'une tâche survit au redémarrage, il est visible de tous les workers
+gunicorn, et le nombre de tâches simultanées est borné par le nombre de
+workers de file.
+
+- `enqueue(kind, payload)` crée la tâche (statut `queued`) ; avec `key`, une
+  seule tâche par clé (`dedup_key` unique) : un second appel retourne la
+  tâche existante (webhooks rejoués par l'expéditeur) ; avec
+  `@handler(kind, release_key=True)` la clé est libérée quand la tâche se
+  termine (une seule tâche *active* par clé) ;
+- `claim()` la réserve : `SELECT ... FOR UPDATE SKIP LOCKED` quand la base le
+  permet (MySQL 8, PostgreSQL), sinon UPDATE conditionnel (SQLite) ;
+- le handler reçoit un `JobContext` (progression, erreurs) ; un battement de
+  cœur périodique permet de détecter un worker mort (`requeue_stale`) ;
+- en cas d'exception la tâche est reprogrammée tant que
+  `attempts < max_attempts`, sinon marquée `error`. `JobFailed` termine en
+  erreur sans nouvelle tentative.
+
+Consommation : `python manage.py run_workers` (requis en production), ou le
+worker embarqué (JOBS_EMBEDDED_WORKER, poste desktop / développement) qui
+vide la file puis s'arrête. Deux voies séparées pour qu'un scraping de
+plusieurs minutes ne retarde pas une réponse attendue par un utilisateur :
+`interactive` (handlers `@handler(kind, interactive=True)` : réponses
+WhatsApp, analyse IA demandée depuis une page) et `batch` (tout le reste).
+Le worker embarqué lance un thread par voie ; `run_workers --lane` fait de
+même pour un service dédié.
+
+Les écritures de progression passent par `QuerySet.update()` afin de ne pas
+déclencher les signaux d'audit à chaque battement.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_STALE_SECONDS = 120
+DEFAULT_POLL_SECONDS = 2.0
+DEFAULT_RETRY_BACKOFF_SECONDS = 30
+DEFAULT_RETENTION_DAYS = 7
+PROGRESS_MIN_INTERVAL = 0.5
+
+_HANDLERS: Dict[str, Callable] = {}
+_RELEASE_KEY_KINDS: set = set()
+_INTERACTIVE_KINDS: set = set()
+
+LANES = ("interactive", "batch")
+
+
+class JobFailed(Exception):
+    """Échec définitif : le message est affiché tel quel, sans nouvelle tentative."""
+
+
+def handler(kind: str, *, release_key: bool = False, interactive: bool = False):
+    """Décorateur : enregistre `fn(ctx, **payload)` comme handler du type `kind`.
+
+    `release_key` : `dedup_key` remis à NULL en fin de tâche (succès ou échec
+    définitif), un nouvel `enqueue` avec la même clé crée alors une tâche.
+    `interactive` : tâche courte attendue par un utilisateur, exécutée par la
+    voie `interactive` (jamais derrière un scraping).
+    """
+    def deco(fn):
+        _HANDLERS[kind] = fn
+        if release_key:
+            _RELEASE_KEY_KINDS.add(kind)
+        if interactive:
+            _INTERACTIVE_KINDS.add(kind)
+        return fn
+    return deco
+
+
+def _handlers() -> Dict[str, Callable]:
+    from . import ai_jobs  # noqa: F401 — analyses IA des décisions
+    from . import mahakim_jobs  # noqa: F401 — enregistre les handlers mahakim
+    from . import pdf_text  # noqa: F401 — texte des PDF joints
+    from . import whatsapp_bot  # noqa: F401 — réponses aux messages WhatsApp entrants
+    return _HANDLERS
+
+
+def lane_filter(lane: Optional[str]):
+    """(kinds, exclude) à passer à `claim` pour la voie `lane` (None : toutes les tâches)."""
+    _handlers()
+    if lane == "interactive":
+        return sorted(_INTERACTIVE_KINDS), None
+    if lane == "batch":
+        return None, sorted(_INTERACTIVE_KINDS)
+    return None, None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def worker_name(suffix: str = "") -> str:
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{name}:{suffix}" if suffix else name
+
+
+# ---------- API ----------
+
+def enqueue(kind: str, payload: Optional[dict] = None, *, user=None, max_attempts: int = 1,
+            progress: Optional[dict] = None, message: str = "في الانتظار...",
+            key: Optional[str] = None):
+    """Ajoute une tâche à la file et réveille le worker embarqué si activé.
+
+    Avec `key`, retourne la tâche déjà enregistrée sous cette clé s'il y en a
+    une (sans réveiller le worker).
+    """
+    from django.db import IntegrityError, transaction
+
+    from ..models import BackgroundJob
+
+    if key:
+        existing = BackgroundJob.objects.filter(dedup_key=key).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            job = BackgroundJob.objects.create(
+                kind=kind,
+                dedup_key=key or None,
+                payload=payload or {},
+                progress=progress or {},
+                message=message,
+                max_attempts=max(1, max_attempts),
+                created_by=user if getattr(user, "is_authenticated", False) else None,
+            )
+    except IntegrityError:
+        if not key:
+            raise
+        # Course entre deux requêtes portant la même clé
+        return BackgroundJob.objects.get(dedup_key=key)
+    transaction.on_commit(ensure_embedded_worker)
+    return job
+
+
+def get_job(task_id, kind: Optional[str] = None, user=None):
+    """Tâche par id (None si inconnue ou id invalide).
+
+    Avec `user` (les endpoints passent `request.user`), None aussi pour une
+    tâche lancée par un autre utilisateur, sauf pour le staff.
+    """
+    from django.core.exceptions import ValidationError
+
+    from ..models import BackgroundJob
+
+    qs = BackgroundJob.objects.all()
+    if kind:
+        qs = qs.filter(kind=kind)
+    if user is not None and not user.is_staff:
+        qs = qs.filter(created_by_id=user.pk)
+    try:
+        return qs.filter(pk=task_id).first()
+    except (ValueError, ValidationError):
+        return None
+
+
+def visible_to(job, user) -> bool:
+    """Même règle que `get_job(user=...)`, pour une tâche déjà chargée."""
+    return bool(user.is_staff or job.created_by_id == user.pk)
+
+
+def job_snapshot(job) -> dict:
+    """Représentation JSON d'une tâche pour les endpoints de statut."""
+    data = dict(job.progress or {})
+    data.update({
+        "ok": True,
+        "status": job.status,
+        "message": job.message,
+        "errors": job.errors or [],
+        "result": job.result if job.status == job.DONE else None,
+    })
+    return data
+
+
+# ---------- Réservation ----------
+
+def claim(worker_id: str, kinds: Optional[Iterable[str]] = None,
+          exclude: Optional[Iterable[str]] = None):
+    """Réserve la prochaine tâche disponible pour `worker_id` (ou None).
+
+    `kinds` : seulement ces types (liste vide : aucun) ; `exclude` : sauf ces types.
+    """
+    from django.db import connection, transaction
+    from django.db.models import F
+
+    from ..models import BackgroundJob
+
+    now = timezone.now()
+    qs = BackgroundJob.objects.filter(status=BackgroundJob.QUEUED, available_at__lte=now)
+    if kinds is not None:
+        qs = qs.filter(kind__in=list(kinds))
+    if exclude:
+        qs = qs.exclude(kind__in=list(exclude))
+    qs = qs.order_by("available_at", "created_at")
+    claimed = dict(
+        status=BackgroundJob.RUNNING, locked_by=worker_id, heartbeat_at=now,
+        started_at=now, attempts=F("attempts") + 1,
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            rows = list(qs.select_for_update(skip_locked=True).values_list("pk", flat=True)[:1])
+            if not rows:
+                return None
+            pk = rows[0]
+            BackgroundJob.objects.filter(pk=pk).update(**claimed)
+    else:
+        # SQLite : pas de verrou de ligne ; compare-and-set sur le statut.
+        for pk in qs.values_list("pk", flat=True)[:10]:
+            if BackgroundJob.objects.filter(pk=pk, status=BackgroundJob.QUEUED).update(**claimed):
+                break
+        else:
+            return None
+    return BackgroundJob.objects.get(pk=pk)
+
+
+def requeue_stale(stale_seconds: Optional[float] = None) -> int:
+    """Reprogramme (ou met en erreur) les tâches dont le worker ne bat plus."""
+    from django.db.models import F
+
+    from ..models import BackgroundJob
+
+    stale_seconds = stale_seconds or _setting("JOBS_STALE_SECONDS", DEFAULT_STALE_SECONDS)
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status=BackgroundJob.RUNNING, heartbeat_at__lt=now - timedelta(seconds=stale_seconds),
+    )
+    failed_fields = dict(status=BackgroundJob.ERROR, finished_at=now, locked_by="",
+                         message="توقف العامل المسؤول عن المهمة قبل انتهائها")
+    exhausted = stale.filter(attempts__gte=F("max_attempts"))
+    failed = exhausted.filter(kind__in=_RELEASE_KEY_KINDS).update(dedup_key=None, **failed_fields)
+    failed += exhausted.update(**failed_fields)
+    retried = stale.filter(attempts__lt=F("max_attempts")).update(
+        status=BackgroundJob.QUEUED, available_at=now, locked_by="",
+    )
+    if failed or retried:
+        logger.warning("Tâches orphelines : %d reprogrammées, %d en erreur", retried, failed)
+    return failed + retried
+
+
+def purge_finished(days: Optional[int] = None) -> int:
+    """Supprime les tâches terminées depuis plus de `days` jours."""
+    from ..models import BackgroundJob
+
+    days = days if days is not None else _setting("JOBS_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    deleted, _ = BackgroundJob.objects.filter(
+        status__in=[BackgroundJob.DONE, BackgroundJob.ERROR],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+# ---------- Exécution ----------
+
+class JobContext:
+    """Vue d'une tâche en cours pour son handler."""
+
+    def __init__(self, job, worker_id: str):
+        self.job = job
+        self.worker_id = worker_id
+        self.progress = dict(job.progress or {})
+        self.message = job.message
+        self.errors = []
+        self._last_write = 0.0
+        self._last_phase = self.progress.get("phase")
+        self._stop = threading.Event()
+        self._beat = None
+
+    def update(self, message: Optional[str] = None, **fields) -> None:
+        """Met à jour la progression ; écriture limitée à ~2/s sauf changement de phase."""
+        self.progress.update(fields)
+        if message is not None:
+            self.message = message
+        phase = self.progress.get("phase")
+        if phase != self._last_phase or time.monotonic() - self._last_write >= PROGRESS_MIN_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_write = time.monotonic()
+        self._last_phase = self.progress.get("phase")
+        self._write(progress=self.progress, message=self.message, errors=self.errors,
+                    heartbeat_at=timezone.now())
+        self.publish(self.job.RUNNING)
+
+    def publish(self, status: str, result=None) -> None:
+        """Pousse l'état courant aux flux SSE de ce processus (voir job_events)."""
+        from .job_events import hub
+
+        hub.publish(self.job.pk, {
+            **self.progress,
+            "ok": True,
+            "status": status,
+            "message": self.message,
+            "errors": self.errors,
+            "result": result if status == self.job.DONE else None,
+        })
+
+    def _write(self, **fields) -> int:
+        from ..models import BackgroundJob
+
+        return BackgroundJob.objects.filter(pk=self.job.pk, locked_by=self.worker_id).update(**fields)
+
+    # Battement de cœur : prouve que le worker est vivant même si le handler
+    # reste longtemps bloqué (chargement d'une page, navigateur lent...).
+    def start_heartbeat(self) -> None:
+        interval = _setting("JOBS_HEARTBEAT_SECONDS", DEFAULT_HEARTBEAT_SECONDS)
+
+        def _beat():
+            from django.db import connection
+            try:
+                while not self._stop.wait(interval):
+                    self._write(heartbeat_at=timezone.now())
+            except Exception:
+                logger.exception("Battement de cœur de la tâche %s", self.job.pk)
+            finally:
+                connection.close()
+
+        self._beat = threading.Thread(target=_beat, daemon=True, name=f"job-heartbeat-{self.job.pk}")
+        self._beat.start()
+
+    def stop_heartbeat(self) -> None:
+        self._stop.set()
+        if self._beat is not None:
+            self._beat.join(timeout=5)
+
+
+def run_job(job, worker_id: str) -> str:
+    """Exécute une tâche réservée et enregistre son issue. Retourne le statut final."""
+    from ..models import BackgroundJob
+
+    ctx = JobContext(job, worker_id)
+    fn = _handlers().get(job.kind)
+    now = timezone.now
+    if fn is None:
+        ctx._write(status=BackgroundJob.ERROR, finished_at=now(), locked_by="",
+                   message=f"نوع مهمة غير معروف: {job.kind}")
+        return BackgroundJob.ERROR
+
+    result = None
+    finished = {"dedup_key": None} if job.kind in _RELEASE_KEY_KINDS else {}
+    ctx.start_heartbeat()
+    try:
+        result = fn(ctx, **(job.payload or {}))
+    except JobFailed as e:
+        status = BackgroundJob.ERROR
+        ctx.message = str(e)
+        ctx._write(status=status, finished_at=now(), progress=ctx.progress,
+                   message=ctx.message, errors=ctx.errors, locked_by="", **finished)
+    except Exception as e:
+        logger.exception("Tâche %s (%s) en échec", job.pk, job.kind)
+        if job.attempts < job.max_attempts:
+            status = BackgroundJob.QUEUED
+            backoff = _setting("JOBS_RETRY_BACKOFF_SECONDS", DEFAULT_RETRY_BACKOFF_SECONDS)
+            ctx.message = f"خطأ: {str(e)[:200]} — ستُعاد المحاولة"
+            ctx._write(status=status, locked_by="", progress=ctx.progress, message=ctx.message,
+                       available_at=now() + timedelta(seconds=backoff * 2 ** (job.attempts - 1)))
+        else:
+            status = BackgroundJob.ERROR
+            ctx.message = f"خطأ: {str(e)[:200]}"
+            ctx._write(status=status, finished_at=now(), progress=ctx.progress,
+                       message=ctx.message, errors=ctx.errors, locked_by="", **finished)
+    else:
+        status = BackgroundJob.DONE
+        ctx._write(status=status, finished_at=now(), progress=ctx.progress, result=result,
+                   message=ctx.message, errors=ctx.errors, locked_by="", **finished)
+    finally:
+        ctx.stop_heartbeat()
+    ctx.publish(status, result)
+    return status
+
+
+def work(worker_id: str, *, kinds: Optional[Iterable[str]] = None,
+         exclude: Optional[Iterable[str]] = None,
+         stop: Optional[threading.Event] = None, once: bool = False,
+         poll: Optional[float] = None) -> int:
+    """Boucle d'un worker : réserve et exécute les tâches jusqu'à `stop`.
+
+    Avec `once`, s'arrête dès que la file ne contient plus de tâche disponible.
+    """
+    poll = poll or _setting("JOBS_POLL_SECONDS", DEFAULT_POLL_SECONDS)
+    reap_every = _setting("JOBS_STALE_SECONDS", DEFAULT_STALE_SECONDS) / 2
+    last_reap = 0.0
+    processed = 0
+    while not (stop and stop.is_set()):
+        if time.monotonic() - last_reap >= reap_every:
+            requeue_stale()
+            last_reap = time.monotonic()
+        job = claim(worker_id, kinds, exclude)
+        if job is None:
+            if once:
+                break
+            if stop:
+                stop.wait(poll)
+            else:
+                time.sleep(poll)
+            continue
+        run_job(job, worker_id)
+        processed += 1
+    return processed
+
+
+# ---------- Worker embarqué ----------
+
+# Un thread par voie et par processus, arrêté quand sa voie est vide.
+_embedded_lock = threading.Lock()
+_embedded_wake: Dict[str, threading.Event] = {lane: threading.Event() for lane in LANES}
+_embedded_threads: Dict[str, threading.Thread] = {}
+
+
+def _has_pending_jobs(kinds=None, exclude=None) -> bool:
+    from ..models import BackgroundJob
+
+    qs = BackgroundJob.objects.filter(status=BackgroundJob.QUEUED)
+    if kinds is not None:
+        qs = qs.filter(kind__in=kinds)
+    if exclude:
+        qs = qs.exclude(kind__in=exclude)
+    return qs.exists()
+
+
+def _embedded_loop(lane: str) -> None:
+    from django.db import connection
+
+    worker_id = worker_name(f"embedded-{lane}")
+    wake = _embedded_wake[lane]
+    poll = _setting("JOBS_POLL_SECONDS", DEFAULT_POLL_SECONDS)
+    try:
+        kinds, exclude = lane_filter(lane)
+        while True:
+            wake.clear()
+            work(worker_id, kinds=kinds, exclude=exclude, once=True)
+            # Tâches reprogrammées (retry) : attendre leur créneau plutôt que s'arrêter
+            if not wake.is_set() and _has_pending_jobs(kinds, exclude):
+                wake.wait(poll)
+                continue
+            with _embedded_lock:
+                if not wake.is_set():
+                    _embedded_threads.pop(lane, None)
+                    return
+    except Exception:
+        logger.exception("Worker embarqué (%s) arrêté", lane)
+        with _embedded_lock:
+            _embedded_threads.pop(lane, None)
+    finally:
+        connection.close()
+
+
+def ensure_embedded_worker() -> None:
+    """Démarre (ou réveille) les threads worker de ce processus si JOBS_EMBEDDED_WORKER."""
+    if not _setting("JOBS_EMBEDDED_WORKER", True):
+        return
+    with _embedded_lock:
+        for lane in LANES:
+            _embedded_wake[lane].set()
+            thread = _embedded_threads.get(lane)
+            if thread is not None and thread.is_alive():
+                continue
+            thread = threading.Thread(target=_embedded_loop, args=(lane,), daemon=True,
+                                      name=f"jobs-embedded-{lane}")
+            _embedded_threads[lane] = thread
+            thread.start()
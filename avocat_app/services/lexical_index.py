@@ -0,0 +1,374 @@
+"""Index lexical (BM25) en mémoire des DecisionAnalysis, fusionné avec l'index vectoriel.
+
+Le bag-of-words haché des embeddings de repli (512 cases, collisions) classe
+mal les termes juridiques exacts et les numéros d'articles ; cet index les
+retrouve mot pour mot. search_decisions fusionne ses candidats avec ceux de
+l'index vectoriel par reciprocal rank fusion (embeddings.reciprocal_rank_fusion).
+
+- texte indexé : embeddings.analysis_text (résumés AR/FR, décision
+  essentielle, texte source, motifs) ;
+- termes : embeddings._tokenize (normalize_text : harakat, أ/إ/آ, ى, ة),
+  chiffres arabes-indiens ramenés à 0-9 (« الفصل ٤٥٠ » = « الفصل 450 »),
+  mots vides retirés, racinisation légère de l'arabe (préfixes و/ال/بال/…,
+  suffixes ات/ون/ين/ها/…) et pluriels/accents du français ;
+- postings compacts : vocabulaire → plage d'un tableau int32 des numéros de
+  documents et d'un tableau uint16 des fréquences (CSR), plus un petit
+  dictionnaire pour les documents modifiés depuis le build ;
+- maintenance calquée sur vector_index : build paresseux, `post_save` /
+  `post_delete` dans le processus, relecture par `updated_at` toutes les
+  VECTOR_INDEX_REFRESH_SECONDS, reconstruction après
+  VECTOR_INDEX_MAX_AGE_SECONDS ou quand les modifications dépassent
+  DELTA_RATIO du build.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .embeddings import _tokenize, analysis_text
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+DELTA_RATIO = 0.2          # documents réindexés hors build / documents du build avant reconstruction
+DELTA_MIN = 1000
+MAX_TF = 65535
+
+TEXT_FIELDS = ("resume_ar", "resume_fr", "decision_essentielle", "source_text", "motifs")
+
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+_ARABIC_CHAR = re.compile(r"[؀-ۿ]")
+_AR_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+_AR_SUFFIXES = ("هما", "كما", "تين", "ها", "ان", "ات", "ون", "ين", "يه", "يا", "ه", "ي")
+
+STOPWORDS = frozenset("""
+في من على الى عن مع او ان ما لا لم لن قد كل هذا هذه ذلك تلك التي الذي الذين هو هي هم
+كان كانت بين حيث بعد قبل عند اذا ثم غير الا و ب ل ف
+le la les de des du un une et en au aux par pour sur dans que qui ne pas est sont
+il elle ils a l d se sa son ses ce cette ces ou avec
+""".split())
+
+
+def _stem_ar(tok: str) -> str:
+    """Racinisation légère (type light10) : un préfixe puis un suffixe, racine d'au moins 3 lettres."""
+    if len(tok) > 3 and tok[0] == "و" and not tok.startswith("ال"):
+        tok = tok[1:]
+    for p in _AR_PREFIXES:
+        if tok.startswith(p) and len(tok) - len(p) >= 3:
+            tok = tok[len(p):]
+            break
+    for s in _AR_SUFFIXES:
+        if tok.endswith(s) and len(tok) - len(s) >= 3:
+            tok = tok[:-len(s)]
+            break
+    return tok
+
+
+def _stem_latin(tok: str) -> str:
+    tok = "".join(c for c in unicodedata.normalize("NFKD", tok) if not unicodedata.combining(c))
+    if len(tok) > 3 and tok[-1] in "sx":
+        tok = tok[:-1]
+    return tok
+
+
+@lru_cache(maxsize=200_000)
+def _term(tok: str) -> str:
+    """Terme d'un mot déjà normalisé ('' = ignoré)."""
+    tok = tok.translate(_DIGITS)
+    if tok in STOPWORDS:
+        return ""
+    if tok.isdigit():
+        return tok.lstrip("0") or "0"
+    if len(tok) < 2:
+        return ""
+    return _stem_ar(tok) if _ARABIC_CHAR.search(tok) else _stem_latin(tok)
+
+
+def terms(text: str) -> List[str]:
+    """Termes indexés d'un texte (l'ordre et les répétitions sont conservés)."""
+    out = []
+    for tok in _tokenize(text):
+        term = _term(tok)
+        if term:
+            out.append(term)
+    return out
+
+
+class LexicalIndex:
+    """Postings BM25 d'un corpus, protégés par un verrou (workers multi-threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.built_at = 0.0      # time.monotonic() du dernier chargement complet
+        self.refreshed_at = 0.0  # ... de la dernière relecture (complète ou delta)
+        self.watermark = None    # plus grand updated_at vu en base
+        self.watermark_pks = set()  # pk déjà lus à cet updated_at (non relus au delta suivant)
+
+    def _reset(self) -> None:
+        self.vocab: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.post_docs = np.zeros(0, dtype=np.int32)
+        self.post_tfs = np.zeros(0, dtype=np.uint16)
+        self.delta: Dict[str, List[Tuple[int, int]]] = {}
+        self.delta_docs = 0
+        self.pks: List[object] = []
+        self.rows: Dict[object, int] = {}
+        self.doc_len = np.zeros(1024, dtype=np.float32)
+        self.live = np.zeros(1024, dtype=bool)
+        self.n_live = 0
+        self.total_len = 0.0
+
+    def __len__(self) -> int:
+        return self.n_live
+
+    # ---------- Maintenance ----------
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+            self.built_at = self.refreshed_at = 0.0
+            self.watermark = None
+            self.watermark_pks = set()
+
+    def load(self, docs: Iterable[Tuple[object, str]]) -> int:
+        """(Re)construit l'index à partir de (pk, texte). Retourne le nombre de documents."""
+        vocab: Dict[str, int] = {}
+        t_ids, d_ords, tfs = array("i"), array("i"), array("H")
+        pks: List[object] = []
+        lengths = array("f")
+        for pk, text in docs:
+            counts = Counter(terms(text))
+            if not counts:
+                continue
+            ordinal = len(pks)
+            pks.append(pk)
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                t_ids.append(vocab.setdefault(term, len(vocab)))
+                d_ords.append(ordinal)
+                tfs.append(min(tf, MAX_TF))
+
+        t = np.frombuffer(t_ids, dtype=np.int32) if t_ids else np.zeros(0, dtype=np.int32)
+        order = np.argsort(t, kind="stable")
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(t, minlength=len(vocab)))
+        n = len(pks)
+        doc_len = np.zeros(max(1024, n * 2), dtype=np.float32)
+        doc_len[:n] = np.frombuffer(lengths, dtype=np.float32) if n else []
+        live = np.zeros(len(doc_len), dtype=bool)
+        live[:n] = True
+
+        now = time.monotonic()
+        with self._lock:
+            self.vocab, self.offsets = vocab, offsets
+            self.post_docs = np.frombuffer(d_ords, dtype=np.int32)[order] if d_ords else np.zeros(0, np.int32)
+            self.post_tfs = np.frombuffer(tfs, dtype=np.uint16)[order] if tfs else np.zeros(0, np.uint16)
+            self.delta, self.delta_docs = {}, 0
+            self.pks, self.rows = pks, {pk: i for i, pk in enumerate(pks)}
+            self.doc_len, self.live = doc_len, live
+            self.n_live, self.total_len = n, float(doc_len[:n].sum())
+            self.built_at = self.refreshed_at = now
+        return n
+
+    def upsert(self, pk, text: Optional[str]) -> None:
+        """Remplace les termes d'un document ; sans texte exploitable → retiré."""
+        counts = Counter(terms(text or ""))
+        with self._lock:
+            if not self.built_at:
+                return
+            self._remove(pk)
+            if not counts:
+                return
+            ordinal = len(self.pks)
+            if ordinal >= len(self.doc_len):
+                self.doc_len = np.concatenate([self.doc_len, np.zeros_like(self.doc_len)])
+                self.live = np.concatenate([self.live, np.zeros_like(self.live)])
+            self.pks.append(pk)
+            self.rows[pk] = ordinal
+            length = sum(counts.values())
+            self.doc_len[ordinal] = length
+            self.live[ordinal] = True
+            self.n_live += 1
+            self.total_len += length
+            for term, tf in counts.items():
+                self.delta.setdefault(term, []).append((ordinal, min(tf, MAX_TF)))
+            self.delta_docs += 1
+
+    def remove(self, pk) -> None:
+        with self._lock:
+            self._remove(pk)
+
+    def _remove(self, pk) -> None:
+        ordinal = self.rows.pop(pk, None)
+        if ordinal is None:
+            return
+        self.live[ordinal] = False
+        self.n_live -= 1
+        self.total_len -= float(self.doc_len[ordinal])
+
+    def stale(self) -> bool:
+        """Trop de documents hors build (postings morts, df approchées) : à reconstruire."""
+        return self.delta_docs > max(DELTA_MIN, DELTA_RATIO * len(self.pks))
+
+    # ---------- Recherche ----------
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        tid = self.vocab.get(term)
+        if tid is None:
+            docs = np.zeros(0, dtype=np.int32)
+            tfs = np.zeros(0, dtype=np.float32)
+        else:
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            docs, tfs = self.post_docs[lo:hi], self.post_tfs[lo:hi].astype(np.float32)
+        extra = self.delta.get(term)
+        if extra:
+            more = np.asarray(extra, dtype=np.int64)
+            docs = np.concatenate([docs, more[:, 0].astype(np.int32)])
+            tfs = np.concatenate([tfs, more[:, 1].astype(np.float32)])
+        return docs, tfs
+
+    def search(self, query: str, k: int) -> List[Tuple[object, float]]:
+        """[(pk, score BM25)] des k documents les mieux classés, score décroissant."""
+        q_terms = set(terms(query))
+        if not q_terms or k <= 0:
+            return []
+        with self._lock:
+            n = len(self.pks)
+            if not self.n_live:
+                return []
+            avgdl = self.total_len / self.n_live
+            scores = np.zeros(n, dtype=np.float32)
+            for term in q_terms:
+                docs, tf = self._postings(term)
+                if not docs.size:
+                    continue
+                df = min(docs.size, self.n_live)
+                idf = math.log(1.0 + (self.n_live - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[docs] / avgdl)
+                scores[docs] += idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+            scores[~self.live[:n]] = 0.0
+            hit = np.flatnonzero(scores > 0)
+            if not hit.size:
+                return []
+            if hit.size > k:
+                hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+            hit = hit[np.argsort(-scores[hit], kind="stable")]
+            return [(self.pks[i], float(scores[i])) for i in hit]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": self.n_live,
+                "terms": len(self.vocab) + sum(1 for t in self.delta if t not in self.vocab),
+                "postings": int(self.post_docs.size) + sum(len(v) for v in self.delta.values()),
+                "delta_documents": self.delta_docs,
+                "bytes": int(self.post_docs.nbytes + self.post_tfs.nbytes + self.offsets.nbytes),
+            }
+
+
+# ---------- Index des DecisionAnalysis (processus courant) ----------
+
+INDEX = LexicalIndex()
+_BUILD_LOCK = threading.Lock()
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def document_text(values: dict) -> str:
+    return analysis_text(SimpleNamespace(**{f: values.get(f) for f in TEXT_FIELDS}))
+
+
+def ensure_fresh() -> LexicalIndex:
+    """Même cycle que vector_index.ensure_fresh (délais VECTOR_INDEX_*), plus la reconstruction sur delta."""
+    from .vector_index import MAX_AGE_SECONDS, REFRESH_SECONDS
+
+    now = time.monotonic()
+    max_age = float(_setting("VECTOR_INDEX_MAX_AGE_SECONDS", MAX_AGE_SECONDS))
+    refresh = float(_setting("VECTOR_INDEX_REFRESH_SECONDS", REFRESH_SECONDS))
+    if INDEX.built_at and now - INDEX.built_at <= max_age and now - INDEX.refreshed_at <= refresh \
+            and not INDEX.stale():
+        return INDEX
+    with _BUILD_LOCK:
+        now = time.monotonic()
+        if not INDEX.built_at or now - INDEX.built_at > max_age or INDEX.stale():
+            rebuild()
+        elif now - INDEX.refreshed_at > refresh:
+            _refresh_delta()
+    return INDEX
+
+
+def rebuild() -> int:
+    """Recharge tout l'index depuis la base. Retourne le nombre de documents."""
+    from django.db.models import Max
+
+    from ..models import DecisionAnalysis
+
+    t0 = time.perf_counter()
+    watermark = DecisionAnalysis.all_objects.aggregate(m=Max("updated_at"))["m"]
+    seen = set(DecisionAnalysis.all_objects.filter(updated_at=watermark).values_list("pk", flat=True))
+    rows = DecisionAnalysis.objects.values("pk", *TEXT_FIELDS).iterator(chunk_size=500)
+    count = INDEX.load((row["pk"], document_text(row)) for row in rows)
+    INDEX.watermark, INDEX.watermark_pks = watermark, seen
+    logger.info("Index lexical : %d document(s), %s, construit en %.2f s",
+                count, INDEX.stats(), time.perf_counter() - t0)
+    return count
+
+
+def _refresh_delta() -> None:
+    from ..models import DecisionAnalysis
+
+    qs = DecisionAnalysis.all_objects.all()
+    if INDEX.watermark is not None:
+        # __gte : une écriture de même updated_at peut suivre la lecture précédente ;
+        # les pk déjà lus à ce instant sont sautés
+        qs = qs.filter(updated_at__gte=INDEX.watermark)
+    watermark, seen = INDEX.watermark, set(INDEX.watermark_pks)
+    for row in qs.values("pk", "is_deleted", "updated_at", *TEXT_FIELDS).iterator(chunk_size=500):
+        pk, updated_at = row["pk"], row["updated_at"]
+        if updated_at == INDEX.watermark and pk in INDEX.watermark_pks:
+            continue
+        INDEX.upsert(pk, None if row["is_deleted"] else document_text(row))
+        if watermark is None or updated_at > watermark:
+            watermark, seen = updated_at, {pk}
+        elif updated_at == watermark:
+            seen.add(pk)
+    INDEX.watermark, INDEX.watermark_pks = watermark, seen
+    INDEX.refreshed_at = time.monotonic()
+
+
+@receiver(post_save, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(TEXT_FIELDS) and not instance.is_deleted:
+        return  # ré-indexation de l'embedding seule : le texte n'a pas changé
+    if set(TEXT_FIELDS) & instance.get_deferred_fields():
+        return  # texte non chargé : repris par la relecture suivante
+    if instance.is_deleted:
+        INDEX.remove(instance.pk)
+    else:
+        INDEX.upsert(instance.pk, analysis_text(instance))
+
+
+@receiver(post_delete, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_delete(sender, instance, **kwargs):
+    INDEX.remove(instance.pk)
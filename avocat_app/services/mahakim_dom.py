@@ -0,0 +1,363 @@
+"""Parseurs lxml des pages mahakim.ma (instantanés DOM).
+
+Le scraper lit `page_source` une fois par état de la page (résultats
+affichés, onglet « الأطراف » ouvert, sous-tableau déplié…) et délègue
+l'extraction à ces fonctions, au lieu d'un `execute_script` par ligne et
+par champ. Les sorties reprennent celles des anciens scripts JS
+(`textContent.trim()` des cellules), sauf pour `procedures()` : l'ancien
+script prenait les lignes de *tous* les `p-tabpanel` (les parties de
+l'onglet « الأطراف », s'il était déjà rendu, passaient pour des
+procédures) ; seul le premier onglet ayant des lignes est lu désormais.
+
+Une ligne d'expansion PrimeNG (`tr.tr-expand` / `tr.p-datatable-row-expansion`)
+n'existe dans le DOM que tant qu'elle est dépliée : la première du document
+est donc le sous-tableau ouvert, la dernière le plus imbriqué.
+
+Fonctions pures (ni Selenium ni Django) : testables sur les pages
+enregistrées par `mahakim_replay`.
+"""
+from __future__ import annotations
+
+import re
+from datetime import date, datetime
+from typing import List, Optional
+
+import lxml.html
+
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y")
+
+_EXPANSION = ("tr-expand", "p-datatable-row-expansion")
+
+
+def _cls(name: str) -> str:
+    """Prédicat XPath « a la classe CSS `name` »."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_IS_EXPANSION = f"({_cls('tr-expand')} or {_cls('p-datatable-row-expansion')})"
+_NEXT_ENABLED = f".//*[{_cls('p-paginator-next')} and not({_cls('p-disabled')})]"
+
+
+def document(html: str):
+    """HTML → élément racine lxml (None si vide ou illisible)."""
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return None
+
+
+def row_fragment(html: str):
+    """outerHTML d'un <tr> → élément lxml (None si vide ; le parseur HTML exige un <table>)."""
+    if not html or not html.strip():
+        return None
+    doc = document(f"<table><tbody>{html}</tbody></table>")
+    rows = doc.xpath("//tbody/tr") if doc is not None else []
+    return rows[0] if rows else None
+
+
+def text(el) -> str:
+    """Équivalent de `el.textContent.trim()`."""
+    return el.text_content().strip() if el is not None else ""
+
+
+def body_text(doc) -> str:
+    """Texte de la page (scripts et styles exclus), pour les replis par regex."""
+    if doc is None:
+        return ""
+    body = doc.find("body")
+    root = body if body is not None else doc
+    nodes = root.xpath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+    return "\n".join(t.strip() for t in nodes if t.strip())
+
+
+def parse_date(value: str) -> Optional[date]:
+    value = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def is_expansion(tr) -> bool:
+    return any(c in (tr.get("class") or "").split() for c in _EXPANSION)
+
+
+def data_rows(tbody) -> list:
+    """Lignes directes d'un tbody, hors lignes d'expansion."""
+    if tbody is None:
+        return []
+    return [tr for tr in tbody.xpath("./tr") if not is_expansion(tr)]
+
+
+def cells(tr) -> list:
+    return tr.xpath(".//td")
+
+
+def cell_texts(tr, keys) -> dict:
+    tds = cells(tr)
+    return {key: text(tds[i]) if i < len(tds) else "" for i, key in enumerate(keys)}
+
+
+def has_next_page(el) -> bool:
+    """Bouton « suivant » actif dans le paginateur de `el`."""
+    return el is not None and bool(el.xpath(_NEXT_ENABLED))
+
+
+def expansions(doc) -> list:
+    """Lignes d'expansion dépliées, dans l'ordre du document."""
+    return doc.xpath(f"//tr[{_IS_EXPANSION}]") if doc is not None else []
+
+
+def _first_tbody(el):
+    found = el.xpath(".//tbody") if el is not None else []
+    return found[0] if found else None
+
+
+# ---------- Fiche dossier (suivi dossier) ----------
+
+def card_info(doc) -> dict:
+    """Libellé → valeur des blocs `.cm-child-dossier`."""
+    out = {}
+    if doc is None:
+        return out
+    for child in doc.xpath(f"//*[{_cls('cm-child-dossier')}]"):
+        labels = child.xpath(f".//*[{_cls('cm-div-label')}]//label | .//label")
+        values = child.xpath(f".//*[{_cls('cm-div-value')}]//p | .//*[{_cls('cm-div-value')}] | .//p")
+        if not labels or not values:
+            continue
+        key = re.sub(r"[:\s]+$", "", text(labels[0]))
+        val = text(values[0])
+        if key and val:
+            out[key] = val
+    return out
+
+
+def _panel_rows(panel) -> list:
+    return panel.xpath(f".//p-table//tbody/tr | .//*[{_cls('p-datatable')}]//tbody/tr")
+
+
+def procedures(doc) -> List[dict]:
+    """Lignes du premier onglet (لائحة الإجراءات) : date, type, référence."""
+    if doc is None:
+        return []
+    rows = []
+    for panel in doc.xpath("//p-tabpanel"):
+        rows = _panel_rows(panel)
+        if rows:
+            break
+    if not rows:
+        rows = doc.xpath(f"//p-table//tbody/tr | //*[{_cls('p-datatable-tbody')}]//tr")
+    out = []
+    for tr in rows:
+        if len(cells(tr)) >= 2:
+            out.append(cell_texts(tr, ("date", "type", "reference")))
+    return out
+
+
+def parties(doc) -> List[dict]:
+    """Lignes du second onglet (لائحة الأطراف), une fois celui-ci affiché."""
+    if doc is None:
+        return []
+    panels = doc.xpath("//p-tabpanel")
+    if not panels:
+        return []
+    panel = panels[1] if len(panels) > 1 else panels[0]
+    out = []
+    for tr in _panel_rows(panel):
+        if len(cells(tr)) >= 2:
+            out.append(cell_texts(tr, ("role", "name", "lawyers")))
+    return out
+
+
+def tab_count(doc) -> int:
+    if doc is None:
+        return 0
+    return len(doc.xpath(f"//p-tabview//li[@role='presentation'] | //*[{_cls('p-tabview-nav')}]/li"))
+
+
+def affaire_result(results_doc, parties_doc=None) -> dict:
+    """Même dictionnaire que l'ancien `_parse_results` à partir des instantanés."""
+    parsed = {
+        "statut_mahakim": None,
+        "prochaine_audience": None,
+        "juge": None,
+        "observations": None,
+        "card_info": {},
+        "procedures": [],
+        "parties": [],
+    }
+    parsed["card_info"] = card_info(results_doc)
+
+    procs = procedures(results_doc)
+    if procs:
+        parsed["procedures"] = procs
+        if procs[0].get("type"):
+            parsed["statut_mahakim"] = procs[0]["type"]
+        for proc in procs:
+            if proc.get("date"):
+                parsed["prochaine_audience"] = parse_date(proc["date"])
+                if parsed["prochaine_audience"]:
+                    break
+        obs_parts = []
+        for proc in procs[:10]:
+            row_text = " | ".join(p for p in (proc.get("date", ""), proc.get("type", ""), proc.get("reference", "")) if p)
+            if row_text:
+                obs_parts.append(row_text)
+        if obs_parts:
+            parsed["observations"] = "\n".join(obs_parts)
+
+    parsed["parties"] = parties(parties_doc if parties_doc is not None else results_doc)
+
+    if not parsed["statut_mahakim"] and not parsed["procedures"]:
+        page_text = body_text(results_doc)
+        for pattern in (r"الحالة\s*[:\s]*(.+)", r"حالة القضية\s*[:\s]*(.+)"):
+            match = re.search(pattern, page_text)
+            if match:
+                parsed["statut_mahakim"] = match.group(1).strip()[:200]
+                break
+        if not parsed["prochaine_audience"]:
+            for pattern in (r"الجلسة القادمة\s*[:\s]*([\d/\-\.]+)", r"تاريخ الجلسة\s*[:\s]*([\d/\-\.]+)"):
+                match = re.search(pattern, page_text)
+                if match:
+                    parsed["prochaine_audience"] = parse_date(match.group(1))
+                    break
+        for pattern in (r"القاضي\s*[:\s]*(.+)", r"المستشار المقرر\s*[:\s]*(.+)"):
+            match = re.search(pattern, page_text)
+            if match:
+                parsed["juge"] = match.group(1).strip()[:200]
+                break
+    return parsed
+
+
+# ---------- جدول الجلسات ----------
+
+def _main_tbody(doc):
+    tables = doc.xpath("//*[@id='pr_id_5']") or doc.xpath("//p-table")
+    if not tables:
+        return None
+    direct = tables[0].xpath(f"./div/*[{_cls('p-datatable-wrapper')}]/table/tbody")
+    return direct[0] if direct else _first_tbody(tables[0])
+
+
+def session_rows(doc) -> List[dict]:
+    """Lignes du tableau principal : heure, salle, division, nombre de dossiers."""
+    if doc is None:
+        return []
+    out = []
+    for tr in data_rows(_main_tbody(doc)):
+        tds = cells(tr)
+        count_text = ""
+        if len(tds) > 3:
+            btn = tds[3].xpath(".//button")
+            count_text = text(btn[0]) if btn else text(tds[3])
+        m = re.search(r"(\d+)", count_text or "0")
+        out.append({
+            "time": text(tds[0]) if tds else "",
+            "room": text(tds[1]) if len(tds) > 1 else "",
+            "division": text(tds[2]) if len(tds) > 2 else "",
+            "files_count": int(m.group(1)) if m else 0,
+            "files": [],
+            "_expandable": len(tds) > 3 and bool(tds[3].xpath(".//button")),
+        })
+    return out
+
+
+def _expansion_tbody(exp):
+    tables = exp.xpath(".//p-table") if exp is not None else []
+    return _first_tbody(tables[0]) if tables else None
+
+
+def session_files(doc) -> List[dict]:
+    """Dossiers du sous-tableau « ملفات الجلسة » déplié (page courante)."""
+    exps = expansions(doc)
+    if not exps:
+        return []
+    out = []
+    for tr in data_rows(_expansion_tbody(exps[0])):
+        tds = cells(tr)
+        entry = cell_texts(tr, ("numero", "date_enregistrement", "type_procedure", "decision", "prochaine_audience"))
+        entry["parties"] = []
+        last_btn = tds[-1].xpath(".//button") if tds else []
+        entry["_has_parties"] = bool(last_btn) and last_btn[0].get("disabled") is None
+        out.append(entry)
+    return out
+
+
+def session_files_has_next(doc) -> bool:
+    exps = expansions(doc)
+    return bool(exps) and has_next_page(exps[0])
+
+
+def session_parties(doc) -> List[dict]:
+    """Parties du sous-sous-tableau « الأطراف » (expansion la plus imbriquée)."""
+    exps = expansions(doc)
+    if not exps:
+        return []
+    out = []
+    for tr in data_rows(_expansion_tbody(exps[-1])):
+        if len(cells(tr)) >= 2:
+            out.append(cell_texts(tr, ("sifa", "nom")))
+    return out
+
+
+def session_parties_has_next(doc) -> bool:
+    exps = expansions(doc)
+    return bool(exps) and has_next_page(exps[-1])
+
+
+# ---------- المسطرة الغيابية ----------
+
+CONTUMACE_KEYS = ("cour_appel", "numero_dossier", "nom_accuse", "nom_pere", "nom_mere", "numero_carte")
+
+
+def contumace_rows(doc) -> List[Optional[dict]]:
+    """Lignes de la page courante (None pour une ligne incomplète, pour garder les index)."""
+    if doc is None:
+        return []
+    rows = [tr for tr in doc.xpath("//p-table//tbody/tr") if not is_expansion(tr)]
+    return [cell_texts(tr, CONTUMACE_KEYS) if len(cells(tr)) >= 6 else None for tr in rows]
+
+
+def contumace_details(exp) -> str:
+    """Texte du motif dans une ligne d'expansion dépliée."""
+    if exp is None:
+        return ""
+    texts = []
+    container = exp.xpath(f".//*[{_cls('cm-dossier-procedurecontumace')}]")
+    if container:
+        paras = container[0].xpath(".//p")
+        if paras:
+            texts = [t for t in (text(p) for p in paras) if t]
+        else:
+            t = text(container[0])
+            if t:
+                texts.append(t)
+    else:
+        for el in exp.xpath(f".//p | .//div[{_cls('text-justify')}] | .//div[{_cls('details-content')}]"):
+            t = text(el)
+            if t and len(t) > 10:
+                texts.append(t)
+        if not texts and text(exp):
+            texts.append(text(exp))
+    return "\n".join(texts).strip()
+
+
+# ---------- Listes déroulantes PrimeNG ----------
+
+def dropdown_items(doc, formcontrolname: str) -> List[dict]:
+    """Options déjà rendues d'un p-dropdown (panneau ouvert ou attaché au composant)."""
+    if doc is None:
+        return []
+    dd = doc.xpath(f"//p-dropdown[@formcontrolname='{formcontrolname}']")
+    if not dd:
+        return []
+    items = dd[0].xpath(f".//li[@role='option'] | .//li[{_cls('p-dropdown-item')}]")
+    return [
+        {"id": str(i), "name": t}
+        for i, t in enumerate(text(li) for li in items)
+        if t and len(t) > 1
+    ]
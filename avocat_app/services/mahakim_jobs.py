@@ -0,0 +1,415 @@
+"""Handlers de la file de tâches pour mahakim.ma.
+
+Repris des threads de `views.py` (fetch_mahakim_ids, sync_contumace_mahakim,
+sync_all_mahakim) : même logique, mais la progression est écrite dans
+`BackgroundJob` via le `JobContext` au lieu d'un dict de module.
+
+المسطرة الغيابية est ingérée en flux : une page scrapée = un upsert groupé
++ un point de reprise, la mémoire et la perte en cas d'échec restent bornées.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from .jobs import JobFailed, handler
+
+logger = logging.getLogger(__name__)
+
+SELENIUM_MISSING = "مكتبة Selenium غير مثبتة. قم بتثبيتها: pip install selenium"
+
+FETCH_IDS = "mahakim.fetch_ids"
+SYNC_CONTUMACE = "mahakim.sync_contumace"
+SYNC_ALL = "mahakim.sync_all"
+TAX_CALCULATE = "mahakim.tax_calculate"
+SYNC_SESSIONS = "mahakim.sync_sessions"
+
+
+@handler(FETCH_IDS)
+def fetch_mahakim_ids(ctx, headless=False, timeout=120):
+    """Récupère les IDs mahakim des juridictions et les rattache à la base."""
+    try:
+        from .mahakim_scraper import MahakimScraper
+    except ImportError:
+        raise JobFailed(SELENIUM_MISSING)
+
+    def _progress(phase, current, total, name, message):
+        ctx.update(phase=phase, current=current, total=total, name=name, message=message)
+
+    with MahakimScraper(headless=headless, timeout=timeout) as scraper:
+        data = scraper.fetch_tribunal_ids(progress_callback=_progress)
+
+    ctx.update(phase="saving", message="جاري تحديث قاعدة البيانات...")
+    result = link_tribunal_ids(data)
+
+    msg_parts = [f"تم جلب {result['total_fetched']} محكمة", f"تم ربط {result['matched']}"]
+    if result["inserted"]:
+        msg_parts.append(f"تم إنشاء {result['inserted']} محكمة جديدة")
+    if result["unmatched"]:
+        msg_parts.append(f"لم يُطابَق {len(result['unmatched'])}")
+
+    ctx.errors = data.get("errors", [])
+    ctx.update(phase="done", message=" — ".join(msg_parts))
+    return result
+
+
+def link_tribunal_ids(data):
+    """Rattache les tribunaux de `fetch_tribunal_ids` à la table Juridiction.
+
+    Rapprochement en mémoire (services/court_matcher.py), puis un seul
+    `bulk_update` (id_mahakim, TribunalParent manquant) et un `bulk_create`
+    pour les tribunaux de 1ère instance inconnus dont la cour d'appel est
+    connue. Chaque élément reçoit `matched_id`, `match_score`, `match_method`.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from ..models import Juridiction, TypeJuridiction
+    from . import global_search
+    from .court_matcher import CourtMatcher
+
+    matcher = CourtMatcher.from_db()
+    changes = {}  # pk → {"id_mahakim": ..., "TribunalParent_id": ...}
+    unmatched = []
+
+    def _resolve(item, appel, parent_id=None):
+        name = item.get("name", "").strip()
+        match = matcher.match(name, appel=appel, parent_id=parent_id)
+        if not match.matched:
+            # Repli sans filtre de rattachement ; un tribunal de 1ère instance ne devient jamais une cour d'appel
+            match = matcher.match(name, parent_id=parent_id, first_instance=not appel)
+        item.update(matched_id=match.juridiction_id, match_score=match.score, match_method=match.method)
+        return match
+
+    for item in data.get("appel", []):
+        mahakim_id = str(item.get("id", "")).strip()
+        if not item.get("name", "").strip() or not mahakim_id:
+            continue
+        match = _resolve(item, appel=True)
+        if match.matched:
+            changes.setdefault(match.juridiction_id, {})["id_mahakim"] = mahakim_id
+        else:
+            unmatched.append(item["name"].strip())
+
+    new_courts = []
+    type_pi = None
+    for item in data.get("premiere_instance", []):
+        name = item.get("name", "").strip()
+        mahakim_id = str(item.get("id", "")).strip()
+        parent_name = item.get("parent_appel_name", "").strip()
+        if not name or not mahakim_id:
+            continue
+
+        parent_id = None
+        if parent_name:
+            parent = matcher.match(parent_name, appel=True)
+            parent_id = parent.juridiction_id
+
+        match = _resolve(item, appel=False, parent_id=parent_id)
+        if match.matched:
+            change = changes.setdefault(match.juridiction_id, {})
+            change["id_mahakim"] = mahakim_id
+            court = matcher.courts[match.juridiction_id]
+            if parent_id and court.parent_id is None and parent_id != court.pk:
+                change["TribunalParent_id"] = parent_id
+            continue
+
+        # Auto-insert : nouvelle juridiction rattachée à sa cour d'appel
+        if parent_id and type_pi is None:
+            type_pi = TypeJuridiction.objects.filter(code_type="TPI").first() or False
+        if parent_id and type_pi:
+            new_courts.append(Juridiction(
+                code=mahakim_id,
+                nomtribunal_ar=name,
+                nomtribunal_fr=name,
+                type=type_pi,
+                TribunalParent_id=parent_id,
+                id_mahakim=mahakim_id,
+            ))
+        else:
+            unmatched.append(name)
+
+    with transaction.atomic():
+        now = timezone.now()
+        objs = list(Juridiction.objects.filter(pk__in=list(changes)).only("pk", "id_mahakim", "TribunalParent"))
+        for obj in objs:
+            for field, value in changes[obj.pk].items():
+                setattr(obj, field, value)
+            obj.updated_at = now
+        Juridiction.objects.bulk_update(objs, ["id_mahakim", "TribunalParent", "updated_at"], batch_size=500)
+        Juridiction.objects.bulk_create(new_courts, batch_size=500)
+        if new_courts:
+            # bulk_create n'envoie pas post_save ; pk relus par id_mahakim (MySQL ne les renvoie pas)
+            new_pks = Juridiction.objects.filter(
+                id_mahakim__in=[c.id_mahakim for c in new_courts]
+            ).values_list("pk", flat=True)
+            global_search.index("juridiction", list(new_pks))
+
+    return {
+        "appel": data.get("appel", []),
+        "premiere_instance": data.get("premiere_instance", []),
+        "matched": len(changes) + len(new_courts),
+        "inserted": len(new_courts),
+        "unmatched": unmatched,
+        "total_fetched": len(data.get("appel", [])) + len(data.get("premiere_instance", [])),
+    }
+
+
+class KnownKeys:
+    """Clés (numero_dossier, cour_appel) déjà en base, en empreintes de 8 octets.
+
+    Un entier par dossier au lieu d'un tuple de deux chaînes : l'ensemble
+    reste compact même pour des centaines de milliers de lignes.
+    """
+
+    def __init__(self, keys=()):
+        self._digests = set()
+        self.update(keys)
+
+    @staticmethod
+    def _digest(key):
+        raw = "\x1f".join(key).encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+    @classmethod
+    def from_db(cls):
+        from ..models import ContumaceRecord
+
+        # all_objects : un dossier supprimé par l'utilisateur n'est pas re-scrapé
+        return cls(
+            ContumaceRecord.all_objects
+            .values_list("numero_dossier", "cour_appel")
+            .iterator(chunk_size=5000)
+        )
+
+    def update(self, keys):
+        self._digests.update(self._digest(k) for k in keys)
+
+    def __contains__(self, key):
+        return self._digest(key) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+
+class ContumaceCheckpoint:
+    """Dernière page المسطرة الغيابية persistée, pour reprendre après un échec."""
+
+    def __init__(self, search_query=None, path=None):
+        from django.conf import settings
+
+        self.query = search_query or ""
+        custom = path or getattr(settings, "MAHAKIM_CONTUMACE_CHECKPOINT", "")
+        self.path = Path(custom) if custom else (
+            Path(settings.MEDIA_ROOT) / "mahakim" / "contumace_checkpoint.json"
+        )
+        self.max_age_hours = float(getattr(settings, "MAHAKIM_CONTUMACE_CHECKPOINT_HOURS", 24))
+
+    def resume_page(self):
+        """Page à analyser ensuite (1 si pas de reprise valable pour cette recherche)."""
+        from django.utils import timezone
+        from django.utils.dateparse import parse_datetime
+
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 1
+        updated = parse_datetime(data.get("updated_at") or "")
+        if data.get("query", "") != self.query or updated is None:
+            return 1
+        if timezone.now() - updated > timedelta(hours=self.max_age_hours):
+            return 1
+        return int(data.get("page", 0)) + 1
+
+    def mark(self, page, total_pages):
+        from django.utils import timezone
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "query": self.query,
+            "page": page,
+            "total_pages": total_pages,
+            "updated_at": timezone.now().isoformat(),
+        }), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+CONTUMACE_FIELDS = ("nom_accuse", "nom_pere", "nom_mere", "numero_carte", "details_text")
+
+
+def save_contumace_page(records):
+    """Upsert groupé d'une page sur (numero_dossier, cour_appel). Retourne les clés écrites."""
+    from django.db import connection, transaction
+
+    from ..models import ContumaceRecord
+    from .contumace_search import index_keys, record_search_text
+
+    objs = {}
+    for rec in records:
+        if not rec.get("numero_dossier"):
+            continue
+        key = (rec["numero_dossier"], rec.get("cour_appel", ""))
+        obj = ContumaceRecord(
+            numero_dossier=key[0],
+            cour_appel=key[1],
+            **{f: rec.get(f, "") for f in CONTUMACE_FIELDS},
+        )
+        # bulk_create n'appelle pas save() : texte de recherche posé ici
+        obj.search_text = record_search_text(obj)
+        objs[key] = obj
+    if not objs:
+        return []
+
+    # MySQL n'accepte pas de cible de conflit explicite
+    unique = (["numero_dossier", "cour_appel"]
+              if connection.features.supports_update_conflicts_with_target else None)
+    with transaction.atomic():
+        ContumaceRecord.objects.bulk_create(
+            list(objs.values()), update_conflicts=True, unique_fields=unique,
+            update_fields=[*CONTUMACE_FIELDS, "search_text", "updated_at"],
+        )
+        index_keys(list(objs))
+    return list(objs)
+
+
+@handler(SYNC_CONTUMACE)
+def sync_contumace(ctx, search_query=None, headless=False, timeout=60, resume=True):
+    """Scrape la page المسطرة الغيابية et enregistre les nouveaux dossiers page par page.
+
+    Chaque page est écrite en base dès qu'elle est analysée, puis notée dans
+    le point de reprise : après un échec, la tâche suivante (nouvelle
+    tentative ou relance manuelle) repart de la page suivante.
+    """
+    try:
+        from .mahakim_scraper import MahakimScraper, MahakimScrapeError
+    except ImportError:
+        raise JobFailed(SELENIUM_MISSING)
+
+    def _progress(phase, current_page, total_pages, records_count, message):
+        ctx.update(phase=phase, current_page=current_page, total_pages=total_pages,
+                   records_count=records_count, message=message)
+
+    checkpoint = ContumaceCheckpoint(search_query)
+    start_page = checkpoint.resume_page() if resume else 1
+    # Clés déjà en base : le scraper saute ces lignes (pas de clic التفاصيل)
+    known = KnownKeys.from_db()
+
+    saved = 0
+    # Don't use 'with' — on error we keep the browser open for debugging
+    scraper = MahakimScraper(headless=headless, timeout=timeout)
+    try:
+        scraper._create_driver()
+        pages = scraper.scrape_contumace(
+            search_query=search_query,
+            progress_callback=_progress,
+            existing_keys=known,
+            start_page=start_page,
+        )
+        for page in pages:
+            keys = save_contumace_page(page["records"])
+            known.update(keys)
+            saved += len(keys)
+            checkpoint.mark(page["page"], page["total_pages"])
+    except MahakimScrapeError as e:
+        raise JobFailed(f"{e} — المتصفح مفتوح للتشخيص (تم حفظ {saved} سجل)")
+    except Exception as e:
+        logger.exception("Erreur sync contumace: %s", e)
+        raise JobFailed(f"خطأ: {str(e)[:200]} — المتصفح مفتوح للتشخيص")
+
+    # Success: close browser, forget the resume point
+    scraper.close()
+    checkpoint.clear()
+
+    ctx.update(phase="done", records_count=saved, message=f"تم جلب وحفظ {saved} سجل بنجاح")
+    return {"saved": saved, "start_page": start_page}
+
+
+class _CommandOutput:
+    """Flux stdout de `call_command` : chaque ligne devient le message de la tâche."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def write(self, text):
+        line = (text or "").strip()
+        if line:
+            self.ctx.update(message=line[:500])
+
+    def flush(self):
+        pass
+
+
+@handler(SYNC_ALL)
+def sync_all_mahakim(ctx, plan=True, budget=None):
+    """Lance `sync_mahakim` (mode planifié par défaut) dans le worker."""
+    from django.core.management import call_command
+
+    options = {"plan": plan}
+    if budget:
+        options["budget"] = budget
+    ctx.update(phase="sync", message="جاري المزامنة...")
+    call_command("sync_mahakim", stdout=_CommandOutput(ctx), **options)
+    ctx.update(phase="done")
+    return None
+
+
+@handler(TAX_CALCULATE)
+def tax_calculate(ctx, nature, type_maqal, categorie, type_qadiya, type_talab="", montant=0, estimates=True):
+    """Calcul de taxe absent du cache local (ou estimation à vérifier) : Selenium puis enregistrement."""
+    from . import tax_engine
+
+    try:
+        import selenium  # noqa: F401
+    except ImportError:
+        raise JobFailed(SELENIUM_MISSING)
+
+    result = tax_engine.calculate(
+        nature, type_maqal, categorie, type_qadiya, type_talab, montant,
+        progress_callback=lambda msg: ctx.update(phase="calc", message=msg),
+        estimates=estimates,
+    )
+    if not result or not result.get("success"):
+        raise JobFailed((result or {}).get("error_message") or "فشل الحساب")
+    ctx.update(phase="done", message=f"المجموع: {result['total']}" if result["total"] else "تم الحساب")
+    return result
+
+
+@handler(SYNC_SESSIONS)
+def sync_sessions(ctx, juridiction_ids, date_from, date_to=None, type_seance="",
+                  workers=1, refresh=False, headless=True):
+    """Programmes d'audiences pour plusieurs juridictions et plusieurs jours."""
+    from . import mahakim_sessions
+
+    try:
+        import selenium  # noqa: F401
+    except ImportError:
+        raise JobFailed(SELENIUM_MISSING)
+
+    dates = mahakim_sessions.date_range(date_from, date_to or date_from)
+    ctx.update(phase="sessions", current=0, total=len(juridiction_ids) * len(dates),
+               message="جاري جلب جداول الجلسات...")
+
+    def _progress(done, total, label):
+        ctx.update(current=done, total=total, message=f"{label} ({done}/{total})")
+
+    summary = mahakim_sessions.fetch_schedules(
+        juridiction_ids, dates, type_seance=type_seance, workers=workers,
+        refresh=refresh, headless=headless, progress=_progress,
+    )
+    ctx.update(phase="done", message=(
+        f"تم جلب {summary['fetched']} جدول ({summary['cached']} من الذاكرة)"
+        f" — {summary['files']} ملف، {summary['matched']} مرتبط بقضايا المكتب"
+        + (f" — فشل {summary['failed']}" if summary["failed"] else "")
+    ))
+    return summary
@@ -0,0 +1,258 @@
+"""Planification incrémentale de la synchronisation mahakim.ma.
+
+Au lieu de re-scraper toutes les affaires à chaque passage, `sync_mahakim
+--plan` ne traite que les plus utiles, dans l'ordre d'une priorité calculée
+à partir de :
+- l'ancienneté de la dernière synchronisation (`MahakimSyncState.last_sync_at`,
+  à défaut le dernier `MahakimSyncResult.date_sync`) ;
+- la proximité d'une audience (Audience.date_audience à venir ou tout juste
+  passée, ou la prochaine audience annoncée par le portail) ;
+- la stabilité du dossier : une empreinte (hash) du dernier résultat permet
+  de savoir si le portail a changé ; un dossier qui ne bouge plus est
+  re-vérifié moins souvent ;
+- les échecs consécutifs (recul progressif).
+
+Les affaires en phase CLOTURE sont ignorées.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULT_MIN_AGE_HOURS = 6
+DEFAULT_SECONDS_PER_AFFAIRE = 25.0
+
+# Score d'une affaire jamais synchronisée (toujours servie en premier)
+NEVER_SYNCED_SCORE = 1000.0
+# Fenêtre "audience tout juste passée" : le résultat (renvoi, jugement) est à récupérer
+RECENT_HEARING_DAYS = 3
+
+
+def result_fingerprint(result: dict) -> str:
+    """Empreinte SHA-256 du contenu utile d'un résultat scraper (hors raw_html)."""
+    payload = {
+        "statut": result.get("statut_mahakim") or "",
+        "prochaine_audience": str(result.get("prochaine_audience") or ""),
+        "juge": result.get("juge") or "",
+        "observations": result.get("observations") or "",
+        "procedures": result.get("procedures") or [],
+        "parties": result.get("parties") or [],
+    }
+    blob = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def hearing_urgency(hearing: Optional[date], today: date) -> float:
+    """Poids lié à la date d'audience la plus pertinente (0.5 sans audience connue)."""
+    if hearing is None:
+        return 0.5
+    days = (hearing - today).days
+    if -RECENT_HEARING_DAYS <= days <= 0:
+        return 3.0
+    if days <= 7:
+        return 2.0
+    if days <= 30:
+        return 1.0
+    return 0.25
+
+
+def compute_priority(*, last_sync_at: Optional[datetime], hearing: Optional[date],
+                     unchanged_count: int = 0, failure_count: int = 0,
+                     now: Optional[datetime] = None) -> float:
+    """Priorité d'une affaire : plus elle est élevée, plus la resynchronisation est utile."""
+    now = now or timezone.now()
+    if last_sync_at is None:
+        return NEVER_SYNCED_SCORE
+    age_days = max(0.0, (now - last_sync_at).total_seconds() / 86400)
+    urgency = hearing_urgency(hearing, timezone.localdate(now))
+    volatility = 1.0 / (1.0 + 0.25 * unchanged_count)
+    return age_days * (1.0 + urgency) * volatility / (1.0 + failure_count)
+
+
+# ---------- Budget ----------
+
+_BUDGET_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$", re.IGNORECASE)
+
+
+@dataclass
+class Budget:
+    """Budget d'un passage : nombre de requêtes et/ou durée maximale (secondes)."""
+    requests: Optional[int] = None
+    seconds: Optional[float] = None
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "Budget":
+        """'50' → 50 requêtes ; '90s', '30m', '2h' → durée."""
+        if not value:
+            return cls()
+        m = _BUDGET_RE.match(str(value))
+        if not m:
+            raise ValueError(f"budget invalide: {value!r} (ex: 50, 30m, 2h)")
+        amount, unit = float(m.group(1)), m.group(2).lower()
+        if not unit:
+            return cls(requests=int(amount))
+        return cls(seconds=amount * {"s": 1, "m": 60, "h": 3600}[unit])
+
+    def max_requests(self, workers: int = 1) -> Optional[int]:
+        """Nombre de requêtes à planifier (durée convertie via une durée moyenne par affaire)."""
+        caps = []
+        if self.requests is not None:
+            caps.append(self.requests)
+        if self.seconds is not None:
+            per = float(getattr(settings, "MAHAKIM_PLAN_SECONDS_PER_AFFAIRE", DEFAULT_SECONDS_PER_AFFAIRE))
+            caps.append(max(1, int(self.seconds * max(1, workers) / max(per, 1.0))))
+        return min(caps) if caps else None
+
+
+# ---------- Plan ----------
+
+def plan_affaires(*, limit: Optional[int] = None, min_age_hours: Optional[float] = None,
+                  now: Optional[datetime] = None, persist: bool = True) -> List[Tuple[object, float]]:
+    """Affaires à synchroniser, triées par priorité décroissante : [(affaire, score), ...].
+
+    Les affaires synchronisées depuis moins de `min_age_hours` sont écartées
+    (délai divisé par 4 si une audience tombe à aujourd'hui ± RECENT_HEARING_DAYS).
+    Les priorités calculées sont enregistrées dans `MahakimSyncState.priority`
+    (sauf `persist=False`, ex. `sync_mahakim --plan --dry-run`).
+    """
+    from django.db.models import Min, OuterRef, Q, Subquery
+
+    from ..models import MahakimSyncResult, MahakimSyncState, PhaseAffaire
+    from .mahakim_sync import syncable_affaires
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    if min_age_hours is None:
+        min_age_hours = float(getattr(settings, "MAHAKIM_PLAN_MIN_AGE_HOURS", DEFAULT_MIN_AGE_HOURS))
+    fresh_after = now - timedelta(hours=min_age_hours)
+    hot_fresh_after = now - timedelta(hours=min_age_hours / 4)
+    hearing_from = now - timedelta(days=RECENT_HEARING_DAYS)
+
+    affaires = (
+        syncable_affaires()
+        .exclude(phase=PhaseAffaire.CLOTURE)
+        .select_related("code_categorie", "juridiction", "juridiction__TribunalParent", "mahakim_state")
+        .annotate(
+            next_audience=Min(
+                "audience__date_audience",
+                filter=Q(audience__date_audience__gte=hearing_from, audience__is_deleted=False),
+            ),
+            # Sous-requête : un second JOIN (résultats × audiences) multiplierait les lignes
+            last_result_at=Subquery(
+                MahakimSyncResult.all_objects.filter(affaire=OuterRef("pk"))
+                .order_by("-date_sync").values("date_sync")[:1]
+            ),
+        )
+    )
+
+    scored = []
+    states = []
+    for affaire in affaires:
+        state = getattr(affaire, "mahakim_state", None)
+        if state is None:
+            state = MahakimSyncState(affaire=affaire)
+        last_sync = state.last_sync_at or affaire.last_result_at
+        candidates = [d for d in (_as_date(affaire.next_audience), state.prochaine_audience) if d]
+        upcoming = [d for d in candidates if d >= today - timedelta(days=RECENT_HEARING_DAYS)]
+        hearing = min(upcoming) if upcoming else None
+
+        hot = hearing is not None and abs((hearing - today).days) <= RECENT_HEARING_DAYS
+        if last_sync and last_sync > (hot_fresh_after if hot else fresh_after):
+            continue
+
+        score = compute_priority(
+            last_sync_at=last_sync, hearing=hearing,
+            unchanged_count=state.unchanged_count, failure_count=state.failure_count, now=now,
+        )
+        state.priority = score
+        if state.last_sync_at is None and last_sync is not None:
+            state.last_sync_at = last_sync
+        states.append(state)
+        scored.append((affaire, score))
+
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    if limit is not None:
+        scored = scored[:limit]
+
+    if persist:
+        _save_states(states, ["priority", "last_sync_at"])
+    return scored
+
+
+# ---------- Mise à jour après synchronisation ----------
+
+def record_results(pairs: Iterable[Tuple[object, dict]], now: Optional[datetime] = None,
+                   last_results: Optional[dict] = None) -> None:
+    """Met à jour l'état de fraîcheur après synchronisation : [(affaire_id, result), ...].
+
+    `last_results` : {str(affaire_id): pk du MahakimSyncResult le plus récent}.
+    """
+    from ..models import MahakimSyncState
+
+    now = now or timezone.now()
+    pairs = [(str(aid), res) for aid, res in pairs if aid]
+    if not pairs:
+        return
+    existing = {
+        str(s.affaire_id): s
+        for s in MahakimSyncState.objects.filter(affaire_id__in=[aid for aid, _ in pairs])
+    }
+
+    for aid, result in pairs:
+        state = existing.get(aid)
+        if state is None:
+            state = existing[aid] = MahakimSyncState(affaire_id=aid)
+        state.last_sync_at = now
+        if result.get("success"):
+            digest = result_fingerprint(result)
+            if digest == state.last_hash:
+                state.unchanged_count += 1
+            else:
+                state.last_hash = digest
+                state.last_changed_at = now
+                state.unchanged_count = 0
+            state.last_success_at = now
+            state.failure_count = 0
+            state.prochaine_audience = _as_date(result.get("prochaine_audience"))
+        else:
+            state.failure_count += 1
+        if last_results and aid in last_results:
+            state.last_result_id = last_results[aid]
+        state.priority = 0.0
+
+    _save_states(existing.values(), [
+        "last_sync_at", "last_success_at", "last_changed_at", "last_hash",
+        "unchanged_count", "failure_count", "prochaine_audience", "priority", "last_result",
+    ])
+
+
+def _save_states(states, fields) -> None:
+    """Upsert groupé (MySQL n'accepte pas de cible de conflit explicite)."""
+    from django.db import connection
+
+    from ..models import MahakimSyncState
+
+    states = list(states)
+    if not states:
+        return
+    unique = ["affaire"] if connection.features.supports_update_conflicts_with_target else None
+    MahakimSyncState.objects.bulk_create(
+        states, update_conflicts=True, unique_fields=unique, update_fields=fields,
+    )
@@ -0,0 +1,281 @@
+"""Enregistrement et rejeu hors ligne des pages mahakim.ma.
+
+Enregistrement : `MahakimScraper(record_dir=...)` (ou variable d'environnement
+MAHAKIM_RECORD_DIR) sauvegarde, juste avant chaque étape de parsing, le DOM
+courant (`page_source`) et les corps JSON des réponses réseau lues via CDP.
+Chaque session de scraping produit un dossier :
+
+    <record_dir>/<YYYYmmdd-HHMMSS>-<pid>/
+        0001_affaire_results.html
+        0001_affaire_results.json   {step, url, meta, captured_at, network: [...]}
+        0002_contumace_page.html
+        ...
+
+Rejeu : `ReplayScraper` charge un instantané (scripts retirés, paginateurs
+neutralisés) dans un Chrome headless local et exécute le parseur de l'étape,
+sans réseau et sans les attentes du scraper (`Waiter.enabled = False`). Utilisé par la
+commande `mahakim_replay` pour comparer les sorties à une référence
+(`*.expected.json`) et mesurer le temps de chaque parseur.
+
+Rejeu DOM (`replay_dom_step`, option `--dom` de la commande) : les
+fonctions lxml de `mahakim_dom` sont appliquées directement au fichier
+HTML, sans navigateur. Références séparées (`*.dom.expected.json`) : pas
+de clic, donc pas de motif contumace ni de pages suivantes.
+
+Ce module n'importe pas Django (comme mahakim_scraper).
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+RECORD_ENV = "MAHAKIM_RECORD_DIR"
+
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.IGNORECASE | re.DOTALL)
+_BASE_RE = re.compile(r"<base\b[^>]*>", re.IGNORECASE)
+
+
+# ---------- Enregistrement ----------
+
+class ScrapeRecorder:
+    """Écrit les instantanés DOM et les réponses réseau d'une session de scraping."""
+
+    def __init__(self, root: os.PathLike):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = Path(root) / f"{stamp}-{os.getpid()}"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.seq = 0
+        self._current: Optional[dict] = None
+        self._current_file: Optional[Path] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["ScrapeRecorder"]:
+        root = os.environ.get(RECORD_ENV)
+        return cls(root) if root else None
+
+    def snapshot(self, step: str, html: str, url: str = "", **meta) -> None:
+        """Nouvelle étape : DOM complet + métadonnées (les réponses réseau suivantes s'y rattachent)."""
+        self.seq += 1
+        base = f"{self.seq:04d}_{step}"
+        (self.path / f"{base}.html").write_text(html or "", encoding="utf-8")
+        self._current = {
+            "step": step,
+            "url": url,
+            "meta": meta,
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "network": [],
+        }
+        self._current_file = self.path / f"{base}.json"
+        self._save()
+
+    def network(self, url: str, mime: str, body: str) -> None:
+        """Corps d'une réponse JSON lue via CDP (Network.getResponseBody)."""
+        if self._current is None:
+            self.snapshot("network", "", url)
+        self._current["network"].append({"url": url, "mime": mime, "body": body})
+        self._save()
+
+    def _save(self) -> None:
+        self._current_file.write_text(
+            json.dumps(self._current, ensure_ascii=False, indent=1), encoding="utf-8",
+        )
+
+
+# ---------- Lecture d'un enregistrement ----------
+
+@dataclass
+class RecordedStep:
+    seq: int
+    step: str
+    html_path: Path
+    url: str = ""
+    meta: dict = field(default_factory=dict)
+    network: List[dict] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return self.html_path.stem
+
+    @property
+    def expected_path(self) -> Path:
+        return self.html_path.with_suffix(".expected.json")
+
+    @property
+    def dom_expected_path(self) -> Path:
+        return self.html_path.with_suffix(".dom.expected.json")
+
+
+def load_recording(path: os.PathLike, steps: Optional[Iterable[str]] = None) -> List[RecordedStep]:
+    """Étapes enregistrées dans `path` (un dossier de session ou un dossier de sessions)."""
+    wanted = set(steps or [])
+    found = []
+    for meta_file in sorted(Path(path).rglob("[0-9][0-9][0-9][0-9]_*.json")):
+        if meta_file.name.endswith(".expected.json"):
+            continue
+        data = json.loads(meta_file.read_text(encoding="utf-8"))
+        if wanted and data.get("step") not in wanted:
+            continue
+        found.append(RecordedStep(
+            seq=int(meta_file.name[:4]),
+            step=data.get("step", ""),
+            html_path=meta_file.with_suffix(".html"),
+            url=data.get("url", ""),
+            meta=data.get("meta") or {},
+            network=data.get("network") or [],
+        ))
+    return found
+
+
+def sanitize_snapshot(html: str) -> str:
+    """Retire les scripts (Angular ne doit pas redémarrer) et la balise <base>."""
+    return _BASE_RE.sub("", _SCRIPT_RE.sub("", html or ""))
+
+
+def to_jsonable(value):
+    """Sortie de parseur → structure JSON stable (dates en ISO, tuples en listes)."""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+# ---------- Rejeu ----------
+
+# Étape enregistrée → parseur à rejouer
+PARSERS: Dict[str, Callable] = {
+    "affaire_results": lambda s, step: s._parse_results(),
+    "session_results": lambda s, step: s._parse_session_results(),
+    "session_files": lambda s, step: s._parse_session_files(),
+    "session_parties": lambda s, step: s._parse_session_parties(),
+    "contumace_page": lambda s, step: s._parse_contumace_page(set()),
+    "dropdown": lambda s, step: s._extract_dropdown_options(step.meta.get("formcontrolname", "tribunal")),
+}
+
+# Étape enregistrée → parseur lxml (sans navigateur)
+DOM_PARSERS: Dict[str, Callable] = {
+    "affaire_results": lambda doc, step: _dom().affaire_result(doc),
+    "affaire_parties": lambda doc, step: _dom().parties(doc),
+    "session_results": lambda doc, step: _dom().session_rows(doc),
+    "session_files": lambda doc, step: _dom().session_files(doc),
+    "session_parties": lambda doc, step: _dom().session_parties(doc),
+    "contumace_page": lambda doc, step: _dom().contumace_rows(doc),
+    "dropdown": lambda doc, step: _dom().dropdown_items(doc, step.meta.get("formcontrolname", "tribunal")),
+}
+
+
+def _dom():
+    from . import mahakim_dom
+    return mahakim_dom
+
+
+def _replay_scraper_class():
+    from .mahakim_scraper import MahakimScraper
+
+    class ReplayScraper(MahakimScraper):
+        """MahakimScraper branché sur des instantanés locaux au lieu du site."""
+
+        def __init__(self, headless=True, timeout=30):
+            super().__init__(headless=headless, timeout=timeout, record_dir=False)
+            self._replay_network: List[dict] = []
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="mahakim_replay_")
+
+        def close(self):
+            super().close()
+            self._tmpdir.cleanup()
+
+        def _perf_log(self):
+            return []
+
+        def _flush_perf_logs(self):
+            pass
+
+        def _network_json_bodies(self):
+            for item in self._replay_network:
+                yield item.get("url", ""), item.get("body", "")
+
+        def load(self, step: RecordedStep) -> None:
+            if not self.driver:
+                self._create_driver()
+            html = sanitize_snapshot(step.html_path.read_text(encoding="utf-8"))
+            target = Path(self._tmpdir.name) / step.html_path.name
+            target.write_text(html, encoding="utf-8")
+            self.driver.get(target.as_uri())
+            # Sans Angular, « suivant » ne change pas de page : boucle infinie sinon
+            self.driver.execute_script(
+                "document.querySelectorAll('.p-paginator-next').forEach("
+                "function(b){ b.classList.add('p-disabled'); });"
+            )
+            self._replay_network = step.network
+
+        @contextmanager
+        def no_wait(self):
+            self.waits.enabled = False
+            try:
+                yield
+            finally:
+                self.waits.enabled = True
+
+        def run(self, step: RecordedStep):
+            parser = PARSERS[step.step]
+            with self.no_wait():
+                return parser(self, step)
+
+    return ReplayScraper
+
+
+def ReplayScraper(*args, **kwargs):
+    """Fabrique (import paresseux de selenium via mahakim_scraper)."""
+    return _replay_scraper_class()(*args, **kwargs)
+
+
+@dataclass
+class StepTiming:
+    name: str
+    step: str
+    load_ms: float
+    parse_ms: List[float]
+
+    @property
+    def median_ms(self) -> float:
+        return statistics.median(self.parse_ms)
+
+    @property
+    def min_ms(self) -> float:
+        return min(self.parse_ms)
+
+
+def replay_step(scraper, step: RecordedStep, repeat: int = 1):
+    """Rejoue une étape `repeat` fois. Retourne (sortie JSON, StepTiming)."""
+    t0 = time.perf_counter()
+    scraper.load(step)
+    load_ms = (time.perf_counter() - t0) * 1000
+    timings = []
+    output = None
+    for i in range(max(1, repeat)):
+        if i:
+            scraper.load(step)  # le parseur peut avoir cliqué / modifié le DOM
+        t0 = time.perf_counter()
+        output = scraper.run(step)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return to_jsonable(output), StepTiming(step.name, step.step, load_ms, timings)
+
+
+def replay_dom_step(step: RecordedStep, repeat: int = 1):
+    """Applique le parseur lxml de l'étape au HTML enregistré. Retourne (sortie JSON, StepTiming)."""
+    t0 = time.perf_counter()
+    html = step.html_path.read_text(encoding="utf-8")
+    load_ms = (time.perf_counter() - t0) * 1000
+    parser = DOM_PARSERS[step.step]
+    timings = []
+    output = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        output = parser(_dom().document(html), step)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return to_jsonable(output), StepTiming(step.name, step.step, load_ms, timings)
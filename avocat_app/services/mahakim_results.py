@@ -0,0 +1,237 @@
+"""Stockage des résultats de synchronisation mahakim.ma (MahakimSyncResult).
+
+- Déduplication : l'empreinte du contenu utile (`result_fingerprint`, hors
+  HTML) est conservée dans `content_hash`. Une synchronisation réussie dont
+  l'empreinte est celle du dernier résultat de l'affaire ne crée pas de
+  ligne : seuls `last_seen_at` et `seen_count` de ce résultat avancent.
+- HTML brut : compressé (zlib) dans `mahakim_raw_html`, une ligne par
+  contenu distinct (SHA-256), partagée entre résultats.
+- Dernier résultat : pointeur `MahakimSyncState.last_result`, tenu à jour
+  par `record_results` ; `latest_results()` le lit pour les listes.
+- `prune()` : rétention (commande `prune_mahakim_syncs`).
+"""
+from __future__ import annotations
+
+import hashlib
+import zlib
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+COMPRESS_LEVEL = 6
+DEFAULT_RETENTION_DAYS = 180
+
+
+def compress_html(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL)
+
+
+def decompress_html(data) -> str:
+    return zlib.decompress(bytes(data)).decode("utf-8") if data else ""
+
+
+def html_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def row_result(obj) -> dict:
+    """Résultat au format du scraper reconstitué à partir d'une ligne MahakimSyncResult."""
+    return {
+        "success": obj.success,
+        "statut_mahakim": obj.statut_mahakim,
+        "prochaine_audience": obj.prochaine_audience,
+        "juge": obj.juge,
+        "observations": obj.observations,
+        "procedures": obj.procedures_json or [],
+        "parties": obj.parties_json or [],
+    }
+
+
+def store_html(texts: Iterable[str]) -> Dict[str, int]:
+    """Enregistre les HTML absents de la table ; retourne {sha256: pk}."""
+    from ..models import MahakimRawHtml
+
+    by_sha = {html_digest(t): t for t in texts if t}
+    if not by_sha:
+        return {}
+    known = dict(MahakimRawHtml.objects.filter(sha256__in=list(by_sha)).values_list("sha256", "pk"))
+    missing = [
+        MahakimRawHtml(sha256=sha, data=compress_html(text), size=len(text))
+        for sha, text in by_sha.items() if sha not in known
+    ]
+    if missing:
+        MahakimRawHtml.objects.bulk_create(missing, ignore_conflicts=True)
+        known.update(MahakimRawHtml.objects
+                     .filter(sha256__in=[m.sha256 for m in missing])
+                     .values_list("sha256", "pk"))
+    return known
+
+
+def latest_results(affaire_ids: Iterable) -> Dict[str, object]:
+    """Dernier MahakimSyncResult par affaire ({str(affaire_id): résultat}), sans raw_html.
+
+    Lit le pointeur `MahakimSyncState.last_result` ; les affaires sans
+    pointeur (synchronisées avant son introduction) passent par l'index
+    (affaire, -date_sync).
+    """
+    from ..models import MahakimSyncResult, MahakimSyncState
+
+    ids = {str(a) for a in affaire_ids if a}
+    if not ids:
+        return {}
+    pointers = dict(MahakimSyncState.objects
+                    .filter(affaire_id__in=ids, last_result__isnull=False)
+                    .values_list("affaire_id", "last_result_id"))
+    out = {
+        str(r.affaire_id): r
+        for r in MahakimSyncResult.objects.defer("raw_html").filter(pk__in=list(pointers.values()))
+    }
+    missing = ids - set(out)
+    if missing:
+        for r in (MahakimSyncResult.objects.defer("raw_html")
+                  .filter(affaire_id__in=missing).order_by("affaire_id", "-date_sync")):
+            out.setdefault(str(r.affaire_id), r)
+    return out
+
+
+def latest_result(affaire_id):
+    return latest_results([affaire_id]).get(str(affaire_id))
+
+
+def save_results(pairs: Iterable[Tuple[object, dict]], now=None) -> Tuple[list, list]:
+    """Enregistre des résultats du scraper [(affaire_id, result), ...].
+
+    Retourne (résultats créés, pks des résultats inchangés confirmés).
+    Met aussi à jour l'état de fraîcheur (`record_results`).
+    """
+    from django.db import transaction
+    from django.db.models import F
+
+    from ..models import MahakimSyncResult
+    from .mahakim_planner import record_results, result_fingerprint
+    from .mahakim_sync import RAW_HTML_MAX_CHARS, build_sync_result
+
+    now = now or timezone.now()
+    pairs = [(aid, res) for aid, res in pairs if aid]
+    latest = latest_results(aid for aid, _ in pairs)
+    html_ids = store_html(
+        (res.get("raw_html") or "")[:RAW_HTML_MAX_CHARS] for _, res in pairs if res.get("success")
+    )
+
+    created, seen = [], []
+    for aid, res in pairs:
+        key = str(aid)
+        digest = result_fingerprint(res) if res.get("success") else ""
+        prev = latest.get(key)
+        if digest and prev is not None and prev.success and prev.content_hash == digest:
+            seen.append(prev.pk)
+            continue
+        obj = build_sync_result(aid, res)
+        obj.content_hash = digest
+        raw = (res.get("raw_html") or "")[:RAW_HTML_MAX_CHARS]
+        obj.html_id = html_ids.get(html_digest(raw)) if raw and res.get("success") else None
+        created.append(obj)
+        latest[key] = obj
+
+    with transaction.atomic():
+        MahakimSyncResult.objects.bulk_create(created)
+        if seen:
+            MahakimSyncResult.objects.filter(pk__in=seen).update(
+                last_seen_at=now, seen_count=F("seen_count") + 1,
+            )
+        record_results(pairs, now=now, last_results={
+            str(aid): latest[str(aid)].pk for aid, _ in pairs
+        })
+    return created, seen
+
+
+# ---------- Rétention ----------
+
+def _hard_delete(qs) -> int:
+    """Suppression définitive (le QuerySet des modèles soft-delete ne fait qu'un UPDATE)."""
+    from django.db import models
+
+    return models.QuerySet.delete(qs)[0]
+
+
+def retention_days() -> int:
+    return int(getattr(settings, "MAHAKIM_SYNC_RETENTION_DAYS", DEFAULT_RETENTION_DAYS))
+
+
+def dedupe(affaire_ids: Optional[Iterable] = None, dry_run: bool = False) -> int:
+    """Fusionne les résultats réussis identiques consécutifs d'une même affaire (historique).
+
+    La première ligne de chaque série est conservée, avec `last_seen_at` et
+    `seen_count` cumulés. Retourne le nombre de lignes supprimées.
+    """
+    from django.db import transaction
+
+    from ..models import MahakimSyncResult
+
+    qs = MahakimSyncResult.all_objects.filter(affaire__isnull=False)
+    if affaire_ids is not None:
+        qs = qs.filter(affaire_id__in=list(affaire_ids))
+    rows = qs.order_by("affaire_id", "date_sync").values_list(
+        "pk", "affaire_id", "success", "content_hash", "date_sync", "last_seen_at", "seen_count",
+    )
+
+    keep: Dict[object, dict] = {}
+    drop: List[object] = []
+    prev = None  # (affaire_id, pk conservé, success, content_hash, seen_count)
+    for pk, aid, success, digest, date_sync, last_seen, count in rows.iterator(chunk_size=2000):
+        if prev and prev[0] == aid and success and prev[2] and digest and digest == prev[3]:
+            merged = keep.setdefault(prev[1], {"last_seen_at": None, "seen_count": prev[4]})
+            merged["last_seen_at"] = last_seen or date_sync
+            merged["seen_count"] += count
+            drop.append(pk)
+            continue
+        prev = (aid, pk, success, digest, count)
+
+    if dry_run or not drop:
+        return len(drop)
+    with transaction.atomic():
+        for pk, values in keep.items():
+            MahakimSyncResult.all_objects.filter(pk=pk).update(**values)
+        for i in range(0, len(drop), 500):
+            _hard_delete(MahakimSyncResult.all_objects.filter(pk__in=drop[i:i + 500]))
+        refresh_pointers()
+    return len(drop)
+
+
+def refresh_pointers() -> None:
+    """Recalcule `MahakimSyncState.last_result` là où il est vide."""
+    from ..models import MahakimSyncState
+
+    states = list(MahakimSyncState.objects.filter(last_result__isnull=True))
+    latest = latest_results(s.affaire_id for s in states)
+    changed = []
+    for state in states:
+        result = latest.get(str(state.affaire_id))
+        if result is not None:
+            state.last_result_id = result.pk
+            changed.append(state)
+    MahakimSyncState.objects.bulk_update(changed, ["last_result"], batch_size=500)
+
+
+def prune(days: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Supprime les résultats plus anciens que `days` jours (le dernier de chaque affaire est gardé)
+    et les HTML compressés qui ne sont plus référencés."""
+    from django.db.models import Q
+
+    from ..models import MahakimRawHtml, MahakimSyncResult, MahakimSyncState
+
+    days = retention_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    protected = MahakimSyncState.objects.filter(last_result__isnull=False).values("last_result_id")
+    old = (MahakimSyncResult.all_objects
+           .filter(date_sync__lt=cutoff)
+           .filter(Q(last_seen_at__isnull=True) | Q(last_seen_at__lt=cutoff))
+           .exclude(pk__in=protected))
+    orphans = MahakimRawHtml.objects.filter(results__isnull=True)
+    if dry_run:
+        return {"results": old.count(), "html": orphans.count()}
+    results = _hard_delete(old)
+    html = MahakimRawHtml.objects.filter(results__isnull=True).delete()[0]
+    return {"results": results, "html": html}
@@ -21,34 +21,66 @@ Stratégie d'extraction:
   On utilise Chrome DevTools Protocol (CDP) pour intercepter les réponses HTTP
   de l'API Angular. Cela donne les vrais idJuridiction/nomJuridiction sans
   dépendre du rendu DOM de PrimeNG.
+
+Attentes: pas de pause fixe. Après chaque action le scraper attend que le
+réseau soit au repos (log performance CDP) et que la page soit stable
+(zone Angular, animations), ou une condition sur les éléments, avec des
+délais appris des latences observées (services/mahakim_waits.py).
 """
 import json as _json
 import logging
 import re
-import time
 from datetime import datetime
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
     TimeoutException, NoSuchElementException, WebDriverException,
 )
 
+from . import mahakim_dom
+from .mahakim_replay import ScrapeRecorder
+from .mahakim_waits import Waiter, WaitMetrics
+
 logger = logging.getLogger(__name__)
 
 MAHAKIM_URL = "https://www.mahakim.ma/#/suivi/dossier-suivi"
 
+# Lignes d'expansion PrimeNG affichées : arguments[1] → au moins / au plus arguments[0]
+_EXPANSIONS_JS = """
+    var n = Array.prototype.filter.call(
+        document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion'),
+        function(r) { return r.offsetHeight > 0; }
+    ).length;
+    return arguments[1] ? n >= arguments[0] : n <= arguments[0];
+"""
+
+
+class MahakimScrapeError(Exception):
+    """Échec du scraping ; le message (en arabe) est affichable tel quel."""
+
 
 class MahakimScraper:
     """Scraping du portail mahakim.ma (Angular/PrimeNG)."""
 
-    def __init__(self, headless=True, timeout=30):
+    def __init__(self, headless=True, timeout=30, record_dir=None):
         self.headless = headless
         self.timeout = timeout
         self.driver = None
+        # Attentes événementielles (services/mahakim_waits.py) ; mesures dans
+        # MAHAKIM_WAIT_METRICS si défini
+        self.waits = Waiter(timeout, drain=self._perf_log, metrics=WaitMetrics.from_env())
+        self._perf_responses = []
+        # Enregistrement des pages pour rejeu hors ligne (commande mahakim_replay) ;
+        # None → variable d'environnement MAHAKIM_RECORD_DIR, False → désactivé
+        if record_dir:
+            self.recorder = ScrapeRecorder(record_dir)
+        elif record_dir is None:
+            self.recorder = ScrapeRecorder.from_env()
+        else:
+            self.recorder = None
 
     def _create_driver(self):
         opts = Options()
@@ -64,11 +96,14 @@ class MahakimScraper:
         try:
             self.driver = webdriver.Chrome(options=opts)
             self.driver.set_page_load_timeout(self.timeout)
+            self.waits.driver = self.driver
+            self.waits.network.reset()
         except WebDriverException as e:
             logger.error("Impossible de lancer Chrome/Chromium: %s", e)
             raise
 
     def close(self):
+        self.waits.metrics.log_summary()
         if self.driver:
             try:
                 self.driver.quit()
@@ -88,12 +123,95 @@ class MahakimScraper:
     # Interception réseau via Chrome DevTools Protocol
     # ------------------------------------------------------------------
 
+    def _perf_log(self):
+        """
+        Lit les nouvelles entrées du log performance (get_log les consomme).
+        Toutes alimentent le suivi réseau des attentes ; les réponses sont
+        gardées pour `_network_json_bodies`.
+        """
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            logger.debug("Erreur lecture logs performance: %s", e)
+            return []
+        self.waits.network.feed(entries)
+        self._perf_responses.extend(
+            e for e in entries if '"Network.responseReceived"' in e.get('message', '')
+        )
+        return entries
+
     def _flush_perf_logs(self):
         """Vide les logs performance (pour ne pas relire d'anciens résultats)."""
+        self._perf_log()
+        self._perf_responses = []
+
+    def _network_json_bodies(self):
+        """
+        Corps des réponses JSON vues depuis la dernière lecture des logs CDP.
+        Yields (url, body). Chaque corps est enregistré si le recorder est actif.
+        """
+        self._perf_log()
+        logs, self._perf_responses = self._perf_responses, []
+        for entry in logs:
+            try:
+                msg = _json.loads(entry['message'])['message']
+                if msg['method'] != 'Network.responseReceived':
+                    continue
+                params = msg['params']
+                resp = params.get('response', {})
+                url = resp.get('url', '')
+                mime = resp.get('mimeType', '')
+
+                # Ne garder que les réponses JSON
+                if 'json' not in mime and 'javascript' not in mime:
+                    continue
+
+                body_resp = self.driver.execute_cdp_cmd(
+                    'Network.getResponseBody', {'requestId': params['requestId']}
+                )
+                body = body_resp.get('body', '')
+            except Exception:
+                continue
+            if self.recorder and 'json' in mime:
+                self.recorder.network(url, mime, body)
+            yield url, body
+
+    def _snapshot(self, step, **meta):
+        """
+        DOM courant (`page_source`, un seul aller-retour WebDriver) parsé par lxml.
+        Enregistré pour le rejeu si le recorder est actif. None si illisible.
+        """
+        if not self.driver:
+            return None
         try:
-            self.driver.get_log('performance')
-        except Exception:
-            pass
+            with self.waits.timed(step, "snapshot"):
+                html = self.driver.page_source
+        except WebDriverException as e:
+            logger.warning("page_source (%s) impossible: %s", step, e)
+            return None
+        if self.recorder:
+            try:
+                self.recorder.snapshot(step, html, self.driver.current_url, **meta)
+            except Exception as e:
+                logger.warning("Enregistrement %s impossible: %s", step, e)
+        return mahakim_dom.document(html)
+
+    def _wait_expansions(self, step, count, opened=True):
+        """Attend au moins (`opened`) / au plus `count` lignes d'expansion affichées, puis la stabilité."""
+        ok = self.waits.until_js(step, _EXPANSIONS_JS, count, opened, timeout=10)
+        self.waits.settle(step)
+        return bool(ok)
+
+    def _visible_expansion_html(self, innermost=False):
+        """outerHTML de la ligne d'expansion affichée (la plus imbriquée si `innermost`)."""
+        return self.driver.execute_script("""
+            var rows = Array.prototype.filter.call(
+                document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion'),
+                function(r) { return r.offsetHeight > 0; }
+            );
+            if (!rows.length) return '';
+            return (arguments[0] ? rows[rows.length - 1] : rows[0]).outerHTML;
+        """, innermost)
 
     def _extract_tribunal_data_from_network(self):
         """
@@ -104,53 +222,30 @@ class MahakimScraper:
             list of lists: chaque sous-liste = [{id: str, name: str}, ...]
         """
         all_results = []
-        try:
-            logs = self.driver.get_log('performance')
-            for entry in logs:
-                try:
-                    msg = _json.loads(entry['message'])['message']
-                    if msg['method'] != 'Network.responseReceived':
-                        continue
-                    params = msg['params']
-                    request_id = params['requestId']
-                    resp = params.get('response', {})
-                    url = resp.get('url', '')
-                    mime = resp.get('mimeType', '')
-
-                    # Ne garder que les réponses JSON
-                    if 'json' not in mime and 'javascript' not in mime:
-                        continue
+        for url, body in self._network_json_bodies():
+            try:
+                data = _json.loads(body)
+            except Exception:
+                continue
 
-                    try:
-                        body_resp = self.driver.execute_cdp_cmd(
-                            'Network.getResponseBody', {'requestId': request_id}
+            # Chercher un tableau d'objets avec idJuridiction
+            if isinstance(data, list) and len(data) > 0:
+                first = data[0]
+                if isinstance(first, dict) and 'idJuridiction' in first:
+                    options = [
+                        {
+                            "id": str(item['idJuridiction']),
+                            "name": str(item.get('nomJuridiction', ''))
+                        }
+                        for item in data
+                        if isinstance(item, dict) and item.get('nomJuridiction')
+                    ]
+                    if options:
+                        logger.info(
+                            "CDP: trouvé %d juridictions dans %s",
+                            len(options), url
                         )
-                        data = _json.loads(body_resp.get('body', ''))
-                    except Exception:
-                        continue
-
-                    # Chercher un tableau d'objets avec idJuridiction
-                    if isinstance(data, list) and len(data) > 0:
-                        first = data[0]
-                        if isinstance(first, dict) and 'idJuridiction' in first:
-                            options = [
-                                {
-                                    "id": str(item['idJuridiction']),
-                                    "name": str(item.get('nomJuridiction', ''))
-                                }
-                                for item in data
-                                if item.get('nomJuridiction')
-                            ]
-                            if options:
-                                logger.info(
-                                    "CDP: trouvé %d juridictions dans %s",
-                                    len(options), url
-                                )
-                                all_results.append(options)
-                except Exception:
-                    continue
-        except Exception as e:
-            logger.warning("Erreur lecture logs performance: %s", e)
+                        all_results.append(options)
 
         return all_results
 
@@ -160,11 +255,10 @@ class MahakimScraper:
 
     def _wait_for_angular(self):
         """Attend que l'app Angular soit chargée."""
-        wait = WebDriverWait(self.driver, self.timeout)
-        wait.until(EC.presence_of_element_located(
+        self.waits.until("form_load", EC.presence_of_element_located(
             (By.CSS_SELECTOR, 'input[formcontrolname="numero"]')
         ))
-        time.sleep(1)
+        self.waits.settle("form_load")
 
     def _fill_input(self, formcontrolname, value):
         """Remplit un champ input Angular."""
@@ -189,13 +283,14 @@ class MahakimScraper:
           1. Intercepter les réponses HTTP (CDP) → vrais IDs
           2. ng.getComponent (dev mode)
           3. Scan récursif des propriétés internes Angular (__ngContext__)
-          4. Clic JS + async polling des <li> rendus
+          4. Items <li> déjà présents dans l'instantané DOM (lxml)
+          5. Clic JS + async polling des <li> rendus
         """
+        doc = self._snapshot("dropdown", formcontrolname=formcontrolname)
         selector = f'p-dropdown[formcontrolname="{formcontrolname}"]'
 
         # Vérifier que le dropdown existe
-        dds = self.driver.find_elements(By.CSS_SELECTOR, selector)
-        if not dds:
+        if doc is not None and not doc.xpath(f"//p-dropdown[@formcontrolname='{formcontrolname}']"):
             logger.warning("Dropdown %s non trouvé", formcontrolname)
             return []
 
@@ -281,7 +376,12 @@ class MahakimScraper:
         except Exception:
             pass
 
-        # --- Méthode 4: Clic JS + polling async des items rendus ---
+        # --- Méthode 4: items déjà rendus dans l'instantané (panneau ouvert) ---
+        options = mahakim_dom.dropdown_items(doc, formcontrolname)
+        if options:
+            return options
+
+        # --- Méthode 5: Clic JS + polling async des items rendus ---
         return self._extract_dropdown_options_click_js(formcontrolname)
 
     def _extract_dropdown_options_click_js(self, formcontrolname):
@@ -353,13 +453,21 @@ class MahakimScraper:
             logger.warning("Clic JS + polling échoué pour %s: %s", formcontrolname, e)
             return []
 
+    def _wait_dropdown_open(self, formcontrolname):
+        """Attend que le panneau d'un p-dropdown affiche ses options."""
+        return self.waits.until_js(f"open_{formcontrolname}", """
+            return document.querySelectorAll(
+                'li[role="option"], li.p-dropdown-item, .p-dropdown-items li, ul[role="listbox"] li'
+            ).length > 0;
+        """, timeout=5)
+
     def _select_dropdown_by_name(self, formcontrolname, name):
         """Sélectionne une option dans un p-dropdown par son texte visible."""
         selector = f'p-dropdown[formcontrolname="{formcontrolname}"]'
         try:
-            # Ouvrir le dropdown via JS
+            # Ouvrir le dropdown via JS (le script ci-dessous attend encore les items)
             self._js_click(f'{selector} div.p-dropdown')
-            time.sleep(1.5)
+            self._wait_dropdown_open(formcontrolname)
 
             # Chercher et cliquer l'item correspondant via JS
             found = self.driver.execute_async_script("""
@@ -393,7 +501,7 @@ class MahakimScraper:
             """, name)
 
             if found:
-                time.sleep(0.5)
+                self.waits.settle(f"select_{formcontrolname}")
                 return True
 
             logger.warning("Option '%s' non trouvée dans %s", name, formcontrolname)
@@ -407,7 +515,7 @@ class MahakimScraper:
         selector = f'p-dropdown[formcontrolname="{formcontrolname}"]'
         try:
             self._js_click(f'{selector} div.p-dropdown')
-            time.sleep(1.5)
+            self._wait_dropdown_open(formcontrolname)
 
             found = self.driver.execute_async_script("""
                 var callback = arguments[arguments.length - 1];
@@ -437,7 +545,7 @@ class MahakimScraper:
             """, int(index))
 
             if found:
-                time.sleep(0.5)
+                self.waits.settle(f"select_{formcontrolname}")
                 return True
             return False
         except Exception as e:
@@ -456,7 +564,11 @@ class MahakimScraper:
             if not is_checked:
                 box = container.find_element(By.CSS_SELECTOR, '.p-checkbox-box')
                 box.click()
-                time.sleep(2)
+                # Le dropdown des tribunaux de 1ère instance apparaît et se charge
+                self.waits.until("checkbox_primaires", EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, 'p-dropdown[formcontrolname="tribunaux_primaires"]')
+                ), timeout=5, required=False)
+                self.waits.settle("checkbox_primaires")
         except NoSuchElementException:
             logger.warning("Checkbox si_tribunaux_primaires non trouvée")
 
@@ -472,7 +584,7 @@ class MahakimScraper:
             if is_checked:
                 box = container.find_element(By.CSS_SELECTOR, '.p-checkbox-box')
                 box.click()
-                time.sleep(2)
+                self.waits.settle("checkbox_primaires")
         except NoSuchElementException:
             pass
 
@@ -527,7 +639,7 @@ class MahakimScraper:
 
             # Remplir mark pour déclencher le chargement du dropdown tribunal
             self._fill_input("mark", "1604")
-            time.sleep(3)
+            self.waits.settle("fill_mark")
 
             # --- Étape 1: Extraire les cours d'appel ---
             _notify("init", 0, 0, "", "جاري استخراج محاكم الاستئناف...")
@@ -578,7 +690,7 @@ class MahakimScraper:
                         continue
 
                     # Attendre la réponse API pour les tribunaux de 1ère instance
-                    time.sleep(3)
+                    self.waits.settle("load_tribunaux_primaires")
 
                     # Lire les données réseau capturées
                     pi_options = self._extract_dropdown_options("tribunaux_primaires")
@@ -690,24 +802,20 @@ class MahakimScraper:
 
             # 1. Remplir le numéro
             self._fill_input("numero", str(numero))
-            time.sleep(1)
 
             # 2. Remplir le code catégorie (mark)
             self._fill_input("mark", str(code_categorie))
-            time.sleep(1)
 
-            # 3. Remplir l'année
+            # 3. Remplir l'année (mark + année chargent la liste des tribunaux)
             self._fill_input("annee", str(annee))
-            time.sleep(2)
+            self.waits.settle("fill_mark")
 
             # 4. Sélectionner le tribunal
             if is_premiere_instance:
                 if nom_tribunal_appel:
                     self._select_dropdown_by_name("tribunal", nom_tribunal_appel)
-                    time.sleep(1)
 
                 self._ensure_checkbox_checked()
-                time.sleep(2)
 
                 if nom_tribunal:
                     self._select_dropdown_by_name("tribunaux_primaires", nom_tribunal)
@@ -719,31 +827,25 @@ class MahakimScraper:
                 elif id_mahakim_tribunal:
                     self._select_dropdown_by_index("tribunal", id_mahakim_tribunal)
 
-            time.sleep(1)
-
             # 5. Cliquer sur بحث (submit)
             try:
-                submit_btn = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (By.CSS_SELECTOR, 'button.btn-add[type="submit"], button.btn-add, button[type="submit"]')
-                    )
-                )
+                submit_btn = self.waits.until("submit", EC.element_to_be_clickable(
+                    (By.CSS_SELECTOR, 'button.btn-add[type="submit"], button.btn-add, button[type="submit"]')
+                ), timeout=10)
                 submit_btn.click()
             except TimeoutException:
                 result["error_message"] = "زر البحث غير موجود في الصفحة"
                 return result
 
-            # 6. Attendre les résultats
-            time.sleep(4)
+            # 6. Attendre les résultats (réponse de la recherche + rendu)
+            self.waits.settle("affaire_search")
 
             # 7. Capturer le HTML brut
             try:
-                results_area = WebDriverWait(self.driver, self.timeout).until(
-                    EC.presence_of_element_located((
-                        By.CSS_SELECTOR,
-                        "p-table, .p-datatable, table, .result-container, .card-body"
-                    ))
-                )
+                results_area = self.waits.until("affaire_results", EC.presence_of_element_located((
+                    By.CSS_SELECTOR,
+                    "p-table, .p-datatable, table, .result-container, .card-body"
+                )))
                 result["raw_html"] = results_area.get_attribute("outerHTML")
             except TimeoutException:
                 result["raw_html"] = self.driver.find_element(
@@ -786,187 +888,30 @@ class MahakimScraper:
             p-tabview
               tab "لائحة الإجراءات" → p-table (تاريخ, نوع, مرجع)
               tab "لائحة الأطراف" → p-table (الصفة, الاسم, المحامون)
-        """
-        parsed = {
-            "statut_mahakim": None,
-            "prochaine_audience": None,
-            "juge": None,
-            "observations": None,
-            "card_info": {},
-            "procedures": [],
-            "parties": [],
-        }
 
+        Deux instantanés DOM parsés par lxml (services/mahakim_dom.py) : la
+        page telle qu'affichée (fiche + procédures), puis après un clic sur
+        l'onglet des parties.
+        """
+        doc = self._snapshot("affaire_results")
+        parties_doc = None
         try:
-            # --- 1. Extract structured card info (div.cm-card-dossier) ---
-            card_info = self.driver.execute_script("""
-                var result = {};
-                var children = document.querySelectorAll('.cm-child-dossier');
-                children.forEach(function(child) {
-                    var label = child.querySelector('.cm-div-label label, label');
-                    var value = child.querySelector('.cm-div-value p, .cm-div-value, p');
-                    if (label && value) {
-                        var key = label.textContent.trim().replace(/[:\\s]+$/, '');
-                        var val = value.textContent.trim();
-                        if (key && val) result[key] = val;
-                    }
-                });
-                return result;
-            """)
-            if card_info:
-                parsed["card_info"] = card_info
-
-            # --- 2. Extract procedures list (first tab: لائحة الإجراءات) ---
-            procedures = self.driver.execute_script("""
-                var procs = [];
-                // Try clicking the first tab to ensure it's active
-                var tabs = document.querySelectorAll('p-tabview li[role="presentation"], .p-tabview-nav li');
-                if (tabs.length > 0) tabs[0].click && tabs[0].querySelector('a,span')?.click();
-
-                // Wait a tick for Angular rendering, then parse
-                var tables = document.querySelectorAll('p-tabpanel p-table tbody tr, p-tabpanel .p-datatable tbody tr');
-                if (tables.length === 0) {
-                    // Fallback: first p-table in the page
-                    tables = document.querySelectorAll('p-table tbody tr, .p-datatable-tbody tr');
-                }
-                tables.forEach(function(tr) {
-                    var cells = tr.querySelectorAll('td');
-                    if (cells.length >= 2) {
-                        procs.push({
-                            date: (cells[0] || {}).textContent?.trim() || '',
-                            type: (cells[1] || {}).textContent?.trim() || '',
-                            reference: (cells[2] || {}).textContent?.trim() || ''
-                        });
-                    }
-                });
-                return procs;
-            """)
-            if procedures:
-                parsed["procedures"] = procedures
-
-                # Derive statut_mahakim from latest procedure type
-                if procedures[0].get("type"):
-                    parsed["statut_mahakim"] = procedures[0]["type"]
-
-                # Derive prochaine_audience from procedures dates
-                for proc in procedures:
-                    date_str = proc.get("date", "")
-                    if date_str:
-                        for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y"):
-                            try:
-                                parsed["prochaine_audience"] = datetime.strptime(date_str, fmt).date()
-                                break
-                            except ValueError:
-                                continue
-                        if parsed["prochaine_audience"]:
-                            break
-
-                # Build observations from procedures summary
-                obs_parts = []
-                for proc in procedures[:10]:
-                    parts = [proc.get("date", ""), proc.get("type", ""), proc.get("reference", "")]
-                    row_text = " | ".join(p for p in parts if p)
-                    if row_text:
-                        obs_parts.append(row_text)
-                if obs_parts:
-                    parsed["observations"] = "\n".join(obs_parts)
-
-            # --- 3. Extract parties list (second tab: لائحة الأطراف) ---
-            parties = self.driver.execute_script("""
-                var pts = [];
-                // Click the second tab
-                var tabs = document.querySelectorAll('p-tabview li[role="presentation"], .p-tabview-nav li');
-                if (tabs.length > 1) {
-                    var link = tabs[1].querySelector('a, span');
-                    if (link) link.click();
-                }
-                return new Promise(function(resolve) {
-                    setTimeout(function() {
-                        var panels = document.querySelectorAll('p-tabpanel');
-                        var panel = panels.length > 1 ? panels[1] : panels[0];
-                        if (panel) {
-                            var rows = panel.querySelectorAll('p-table tbody tr, .p-datatable tbody tr');
-                            rows.forEach(function(tr) {
-                                var cells = tr.querySelectorAll('td');
-                                if (cells.length >= 2) {
-                                    pts.push({
-                                        role: (cells[0] || {}).textContent?.trim() || '',
-                                        name: (cells[1] || {}).textContent?.trim() || '',
-                                        lawyers: (cells[2] || {}).textContent?.trim() || ''
-                                    });
-                                }
-                            });
-                        }
-                        resolve(pts);
-                    }, 800);
-                });
-            """)
-            # execute_script doesn't handle promises, use execute_async_script
-            try:
-                parties = self.driver.execute_async_script("""
-                    var callback = arguments[arguments.length - 1];
-                    var pts = [];
+            if mahakim_dom.tab_count(doc) > 1:
+                self.driver.execute_script("""
                     var tabs = document.querySelectorAll('p-tabview li[role="presentation"], .p-tabview-nav li');
-                    if (tabs.length > 1) {
-                        var link = tabs[1].querySelector('a, span');
-                        if (link) link.click();
-                    }
-                    setTimeout(function() {
-                        var panels = document.querySelectorAll('p-tabpanel');
-                        var panel = panels.length > 1 ? panels[1] : panels[0];
-                        if (panel) {
-                            var rows = panel.querySelectorAll('p-table tbody tr, .p-datatable tbody tr');
-                            rows.forEach(function(tr) {
-                                var cells = tr.querySelectorAll('td');
-                                if (cells.length >= 2) {
-                                    pts.push({
-                                        role: (cells[0] || {}).textContent?.trim() || '',
-                                        name: (cells[1] || {}).textContent?.trim() || '',
-                                        lawyers: (cells[2] || {}).textContent?.trim() || ''
-                                    });
-                                }
-                            });
-                        }
-                        callback(pts);
-                    }, 800);
+                    var link = tabs.length > 1 ? tabs[1].querySelector('a, span') : null;
+                    if (link) link.click();
                 """)
-            except Exception:
-                pass
-            if parties:
-                parsed["parties"] = parties
-
-            # --- 4. Fallback: regex-based extraction if structured parsing found nothing ---
-            if not parsed["statut_mahakim"] and not parsed["procedures"]:
-                page_text = self.driver.find_element(By.TAG_NAME, "body").text
-                for pattern in [r'الحالة\s*[:\s]*(.+)', r'حالة القضية\s*[:\s]*(.+)']:
-                    match = re.search(pattern, page_text)
-                    if match:
-                        parsed["statut_mahakim"] = match.group(1).strip()[:200]
-                        break
-
-                if not parsed["prochaine_audience"]:
-                    for pattern in [r'الجلسة القادمة\s*[:\s]*([\d/\-\.]+)', r'تاريخ الجلسة\s*[:\s]*([\d/\-\.]+)']:
-                        match = re.search(pattern, page_text)
-                        if match:
-                            date_str = match.group(1).strip()
-                            for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y"):
-                                try:
-                                    parsed["prochaine_audience"] = datetime.strptime(date_str, fmt).date()
-                                    break
-                                except ValueError:
-                                    continue
-                            break
-
-                for pattern in [r'القاضي\s*[:\s]*(.+)', r'المستشار المقرر\s*[:\s]*(.+)']:
-                    match = re.search(pattern, page_text)
-                    if match:
-                        parsed["juge"] = match.group(1).strip()[:200]
-                        break
+                self.waits.settle("affaire_parties_tab")
+                parties_doc = self._snapshot("affaire_parties")
+        except WebDriverException as e:
+            logger.warning("Onglet des parties inaccessible: %s", e)
 
+        try:
+            return mahakim_dom.affaire_result(doc, parties_doc)
         except Exception as e:
             logger.warning("Erreur lors du parsing des résultats: %s", e)
-
-        return parsed
+            return mahakim_dom.affaire_result(None)
 
     # ------------------------------------------------------------------
     # scrape_sessions — مزامنة جدول الجلسات
@@ -1013,32 +958,27 @@ class MahakimScraper:
             self.driver.get(self.SESSIONS_URL)
 
             # Wait for Angular — the sessions page has different form controls
-            wait = WebDriverWait(self.driver, self.timeout)
-            wait.until(EC.presence_of_element_located(
+            self.waits.until("sessions_load", EC.presence_of_element_located(
                 (By.CSS_SELECTOR,
                  'p-dropdown[formcontrolname="tribunal"], '
                  'p-calendar[formcontrolname="date_seance"], '
                  'input[formcontrolname], p-dropdown')
             ))
-            time.sleep(2)
+            self.waits.settle("sessions_load")
 
             # 1. Optionally select type_seance
             if type_seance:
                 try:
                     self._select_dropdown_by_name("type_seance", type_seance)
-                    time.sleep(1)
                 except Exception:
                     logger.warning("Could not select type_seance: %s", type_seance)
-            time.sleep(2)
 
             # 2. Select tribunal
             _notify("selecting", "جاري اختيار المحكمة...")
             if is_premiere_instance:
                 if nom_tribunal_appel:
                     self._select_dropdown_by_name("tribunal", nom_tribunal_appel)
-                    time.sleep(1)
                 self._ensure_checkbox_checked()
-                time.sleep(2)
                 if nom_tribunal:
                     self._select_dropdown_by_name("tribunaux_primaires", nom_tribunal)
                 elif id_mahakim_tribunal:
@@ -1048,7 +988,6 @@ class MahakimScraper:
                     self._select_dropdown_by_name("tribunal", nom_tribunal)
                 elif id_mahakim_tribunal:
                     self._select_dropdown_by_index("tribunal", id_mahakim_tribunal)
-            time.sleep(1)
 
             # 3. Set date
             _notify("date", "جاري تعيين التاريخ...")
@@ -1066,41 +1005,34 @@ class MahakimScraper:
                 )
                 cal_input.clear()
                 cal_input.send_keys(date_str)
-                time.sleep(1)
                 # Close calendar overlay by clicking outside
                 self.driver.execute_script("document.body.click();")
-                time.sleep(0.5)
+                self.waits.settle("sessions_date")
             except NoSuchElementException:
                 logger.warning("Calendar input not found for date_seance")
 
-
-
             # 4. Submit
             _notify("searching", "جاري البحث...")
             try:
-                submit_btn = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (By.CSS_SELECTOR,
-                         'button.btn-add[type="submit"], button.btn-add, button[type="submit"]')
-                    )
-                )
+                submit_btn = self.waits.until("submit", EC.element_to_be_clickable(
+                    (By.CSS_SELECTOR,
+                     'button.btn-add[type="submit"], button.btn-add, button[type="submit"]')
+                ), timeout=10)
                 submit_btn.click()
             except TimeoutException:
                 result["error_message"] = "زر البحث غير موجود في الصفحة"
                 return result
 
             # 5. Wait for results
-            time.sleep(5)
+            self.waits.settle("sessions_search")
             _notify("parsing", "جاري تحليل النتائج...")
 
             # 6. Capture raw HTML
             try:
-                results_area = WebDriverWait(self.driver, self.timeout).until(
-                    EC.presence_of_element_located((
-                        By.CSS_SELECTOR,
-                        "p-table, .p-datatable, table, .result-container"
-                    ))
-                )
+                results_area = self.waits.until("sessions_results", EC.presence_of_element_located((
+                    By.CSS_SELECTOR,
+                    "p-table, .p-datatable, table, .result-container"
+                )))
                 result["raw_html"] = results_area.get_attribute("outerHTML")
             except TimeoutException:
                 result["raw_html"] = self.driver.find_element(
@@ -1139,70 +1071,21 @@ class MahakimScraper:
         - Click ملفات → sub-table: رقم الملف | تاريخ التسجيل | نوع الإجراء | القرار | تاريخ الجلسة المقبلة | الأطراف
         - Click الأطراف → sub-sub-table: الصفة | اسم الطرف
         - Pagination exists at each sub-table level
+
+        Les lignes sont lues sur un instantané DOM (lxml) ; seuls les clics
+        d'ouverture / fermeture passent par le navigateur.
         """
         sessions = []
         try:
-            # Count main data rows in the outer table
-            main_row_count = self.driver.execute_script("""
-                var mainTable = document.querySelector('#pr_id_5, p-table');
-                if (!mainTable) return 0;
-                var tbody = mainTable.querySelector(':scope > div > .p-datatable-wrapper > table > tbody');
-                if (!tbody) tbody = mainTable.querySelector('tbody');
-                if (!tbody) return 0;
-                var count = 0;
-                tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                    if (!tr.classList.contains('tr-expand') &&
-                        !tr.classList.contains('p-datatable-row-expansion')) count++;
-                });
-                return count;
-            """)
-            logger.info("Sessions: found %d main rows", main_row_count or 0)
+            rows = mahakim_dom.session_rows(self._snapshot("session_results"))
+            logger.info("Sessions: found %d main rows", len(rows))
 
-            if not main_row_count:
-                return sessions
-
-            for idx in range(main_row_count):
-                # Extract basic fields for this session row
-                row_data = self.driver.execute_script("""
-                    var mainTable = document.querySelector('#pr_id_5, p-table');
-                    var tbody = mainTable.querySelector(':scope > div > .p-datatable-wrapper > table > tbody');
-                    if (!tbody) tbody = mainTable.querySelector('tbody');
-                    var dataRows = [];
-                    tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                        if (!tr.classList.contains('tr-expand') &&
-                            !tr.classList.contains('p-datatable-row-expansion')) dataRows.push(tr);
-                    });
-                    var row = dataRows[arguments[0]];
-                    if (!row) return null;
-                    var cells = row.querySelectorAll('td');
-                    var countText = '';
-                    if (cells[3]) {
-                        var btn = cells[3].querySelector('button');
-                        countText = btn ? btn.textContent.trim() : cells[3].textContent.trim();
-                    }
-                    return {
-                        time: (cells[0] || {}).textContent?.trim() || '',
-                        room: (cells[1] || {}).textContent?.trim() || '',
-                        division: (cells[2] || {}).textContent?.trim() || '',
-                        files_count_text: countText,
-                    };
-                """, idx)
-
-                if not row_data:
+            for idx, session in enumerate(rows):
+                expandable = session.pop("_expandable")
+                if not expandable:
+                    sessions.append(session)
                     continue
 
-                count_text = row_data.get("files_count_text", "0")
-                count_match = re.search(r'(\d+)', count_text)
-                files_count = int(count_match.group(1)) if count_match else 0
-
-                session = {
-                    "time": row_data.get("time", ""),
-                    "room": row_data.get("room", ""),
-                    "division": row_data.get("division", ""),
-                    "files_count": files_count,
-                    "files": [],
-                }
-
                 # Click the ملفات button to expand sub-table
                 clicked = self.driver.execute_script("""
                     var mainTable = document.querySelector('#pr_id_5, p-table');
@@ -1224,7 +1107,7 @@ class MahakimScraper:
                 """, idx)
 
                 if clicked:
-                    time.sleep(2)
+                    self._wait_expansions("session_files_open", 1)
                     # Parse all files from the expanded sub-table (with pagination)
                     session["files"] = self._parse_session_files()
 
@@ -1247,7 +1130,7 @@ class MahakimScraper:
                             }
                         }
                     """)
-                    time.sleep(1)
+                    self._wait_expansions("session_files_close", 0, opened=False)
 
                 sessions.append(session)
 
@@ -1265,204 +1148,103 @@ class MahakimScraper:
                                 decision, prochaine_audience, parties: [{sifa, nom}]}
         """
         all_files = []
-        page = 1
 
         while True:
-            # Parse visible file rows in the expanded sub-table
-            file_count = self.driver.execute_script("""
-                // Find the visible expansion row
-                var expRow = null;
-                var expRows = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                for (var i = 0; i < expRows.length; i++) {
-                    if (expRows[i].offsetHeight > 0) { expRow = expRows[i]; break; }
-                }
-                if (!expRow) return 0;
-                var subTable = expRow.querySelector('p-table');
-                if (!subTable) return 0;
-                var tbody = subTable.querySelector('tbody');
-                if (!tbody) return 0;
-                var count = 0;
-                tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                    if (!tr.classList.contains('tr-expand') &&
-                        !tr.classList.contains('p-datatable-row-expansion')) count++;
-                });
-                return count;
-            """)
-
-            if not file_count:
+            doc = self._snapshot("session_files")
+            files = mahakim_dom.session_files(doc)
+            if not files:
                 break
 
-            for fidx in range(file_count):
-                file_data = self.driver.execute_script("""
-                    var expRow = null;
-                    var expRows = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                    for (var i = 0; i < expRows.length; i++) {
-                        if (expRows[i].offsetHeight > 0) { expRow = expRows[i]; break; }
-                    }
-                    if (!expRow) return null;
-                    var subTable = expRow.querySelector('p-table');
-                    var tbody = subTable.querySelector('tbody');
-                    var dataRows = [];
-                    tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                        if (!tr.classList.contains('tr-expand') &&
-                            !tr.classList.contains('p-datatable-row-expansion')) dataRows.push(tr);
-                    });
-                    var row = dataRows[arguments[0]];
-                    if (!row) return null;
-                    var cells = row.querySelectorAll('td');
-                    return {
-                        numero: (cells[0] || {}).textContent?.trim() || '',
-                        date_enregistrement: (cells[1] || {}).textContent?.trim() || '',
-                        type_procedure: (cells[2] || {}).textContent?.trim() || '',
-                        decision: (cells[3] || {}).textContent?.trim() || '',
-                        prochaine_audience: (cells[4] || {}).textContent?.trim() || '',
-                    };
-                """, fidx)
-
-                if not file_data:
-                    continue
-
-                file_entry = {
-                    "numero": file_data.get("numero", ""),
-                    "date_enregistrement": file_data.get("date_enregistrement", ""),
-                    "type_procedure": file_data.get("type_procedure", ""),
-                    "decision": file_data.get("decision", ""),
-                    "prochaine_audience": file_data.get("prochaine_audience", ""),
-                    "parties": [],
-                }
-
-                # Click الأطراف button to expand parties
-                party_clicked = self.driver.execute_script("""
-                    var expRow = null;
-                    var expRows = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                    for (var i = 0; i < expRows.length; i++) {
-                        if (expRows[i].offsetHeight > 0) { expRow = expRows[i]; break; }
-                    }
-                    if (!expRow) return false;
-                    var subTable = expRow.querySelector('p-table');
-                    var tbody = subTable.querySelector('tbody');
-                    var dataRows = [];
-                    tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                        if (!tr.classList.contains('tr-expand') &&
-                            !tr.classList.contains('p-datatable-row-expansion')) dataRows.push(tr);
-                    });
-                    var row = dataRows[arguments[0]];
-                    if (!row) return false;
-                    var cells = row.querySelectorAll('td');
-                    // الأطراف button is in the last cell
-                    var lastCell = cells[cells.length - 1];
-                    if (lastCell) {
-                        var btn = lastCell.querySelector('button');
-                        if (btn && !btn.disabled) { btn.click(); return true; }
-                    }
-                    return false;
-                """, fidx)
+            for fidx, file_entry in enumerate(files):
+                if file_entry.pop("_has_parties"):
+                    # Click الأطراف button (last cell) to expand parties
+                    party_clicked = self.driver.execute_script("""
+                        var expRow = null;
+                        var expRows = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
+                        for (var i = 0; i < expRows.length; i++) {
+                            if (expRows[i].offsetHeight > 0) { expRow = expRows[i]; break; }
+                        }
+                        if (!expRow) return false;
+                        var subTable = expRow.querySelector('p-table');
+                        var tbody = subTable.querySelector('tbody');
+                        var dataRows = [];
+                        tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
+                            if (!tr.classList.contains('tr-expand') &&
+                                !tr.classList.contains('p-datatable-row-expansion')) dataRows.push(tr);
+                        });
+                        var row = dataRows[arguments[0]];
+                        if (!row) return false;
+                        var cells = row.querySelectorAll('td');
+                        var lastCell = cells[cells.length - 1];
+                        if (lastCell) {
+                            var btn = lastCell.querySelector('button');
+                            if (btn && !btn.disabled) { btn.click(); return true; }
+                        }
+                        return false;
+                    """, fidx)
 
-                if party_clicked:
-                    time.sleep(1)
-                    # Parse parties from the expanded sub-sub-table
-                    file_entry["parties"] = self._parse_session_parties()
+                    if party_clicked:
+                        self._wait_expansions("session_parties_open", 2)
+                        # Parse parties from the expanded sub-sub-table
+                        file_entry["parties"] = self._parse_session_parties()
 
-                    # Close parties panel
-                    self.driver.execute_script("""
-                        // Find the innermost visible expansion row (parties)
-                        var allExp = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                        var innermost = null;
-                        for (var i = allExp.length - 1; i >= 0; i--) {
-                            if (allExp[i].offsetHeight > 0) { innermost = allExp[i]; break; }
-                        }
-                        if (innermost) {
-                            var btn = innermost.querySelector('button.btn-table-close');
-                            if (!btn) {
-                                var btns = innermost.querySelectorAll('button');
-                                for (var b = 0; b < btns.length; b++) {
-                                    if (btns[b].textContent.indexOf('إغلاق') !== -1) {
-                                        btn = btns[b]; break;
+                        # Close parties panel
+                        self.driver.execute_script("""
+                            // Find the innermost visible expansion row (parties)
+                            var allExp = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
+                            var innermost = null;
+                            for (var i = allExp.length - 1; i >= 0; i--) {
+                                if (allExp[i].offsetHeight > 0) { innermost = allExp[i]; break; }
+                            }
+                            if (innermost) {
+                                var btn = innermost.querySelector('button.btn-table-close');
+                                if (!btn) {
+                                    var btns = innermost.querySelectorAll('button');
+                                    for (var b = 0; b < btns.length; b++) {
+                                        if (btns[b].textContent.indexOf('إغلاق') !== -1) {
+                                            btn = btns[b]; break;
+                                        }
                                     }
                                 }
+                                if (btn) btn.click();
                             }
-                            if (btn) btn.click();
-                        }
-                    """)
-                    time.sleep(0.5)
+                        """)
+                        self._wait_expansions("session_parties_close", 1, opened=False)
 
                 all_files.append(file_entry)
 
-            # Check if there's a next page in the files sub-table paginator
-            has_next = self.driver.execute_script("""
-                var expRow = null;
-                var expRows = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                for (var i = 0; i < expRows.length; i++) {
-                    if (expRows[i].offsetHeight > 0) { expRow = expRows[i]; break; }
-                }
-                if (!expRow) return false;
-                var nextBtn = expRow.querySelector('.p-paginator-next:not(.p-disabled)');
-                if (nextBtn) { nextBtn.click(); return true; }
-                return false;
-            """)
-
-            if has_next:
-                page += 1
-                time.sleep(1.5)
-            else:
+            # Next page in the files sub-table paginator
+            if not mahakim_dom.session_files_has_next(doc):
                 break
+            self._click_expansion_next(innermost=False)
+            self.waits.settle("session_files_page")
 
         return all_files
 
+    def _click_expansion_next(self, innermost):
+        """Clique « suivant » dans le paginateur de la ligne d'expansion affichée."""
+        return self.driver.execute_script("""
+            var rows = Array.prototype.filter.call(
+                document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion'),
+                function(r) { return r.offsetHeight > 0; }
+            );
+            if (!rows.length) return false;
+            var row = arguments[0] ? rows[rows.length - 1] : rows[0];
+            var nextBtn = row.querySelector('.p-paginator-next:not(.p-disabled)');
+            if (nextBtn) { nextBtn.click(); return true; }
+            return false;
+        """, innermost)
+
     def _parse_session_parties(self):
         """Parse parties from the innermost expanded sub-table (الأطراف)."""
         parties = []
-        page = 1
         while True:
-            page_parties = self.driver.execute_script("""
-                // Find the innermost visible expansion row
-                var allExp = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                var innermost = null;
-                for (var i = allExp.length - 1; i >= 0; i--) {
-                    if (allExp[i].offsetHeight > 0) { innermost = allExp[i]; break; }
-                }
-                if (!innermost) return [];
-                var subTable = innermost.querySelector('p-table');
-                if (!subTable) return [];
-                var tbody = subTable.querySelector('tbody');
-                if (!tbody) return [];
-                var result = [];
-                tbody.querySelectorAll(':scope > tr').forEach(function(tr) {
-                    if (tr.classList.contains('tr-expand') ||
-                        tr.classList.contains('p-datatable-row-expansion')) return;
-                    var cells = tr.querySelectorAll('td');
-                    if (cells.length >= 2) {
-                        result.push({
-                            sifa: (cells[0] || {}).textContent?.trim() || '',
-                            nom: (cells[1] || {}).textContent?.trim() || '',
-                        });
-                    }
-                });
-                return result;
-            """)
-
-            if page_parties:
-                parties.extend(page_parties)
-
-            # Check pagination in parties sub-table
-            has_next = self.driver.execute_script("""
-                var allExp = document.querySelectorAll('tr.tr-expand, tr.p-datatable-row-expansion');
-                var innermost = null;
-                for (var i = allExp.length - 1; i >= 0; i--) {
-                    if (allExp[i].offsetHeight > 0) { innermost = allExp[i]; break; }
-                }
-                if (!innermost) return false;
-                var nextBtn = innermost.querySelector('.p-paginator-next:not(.p-disabled)');
-                if (nextBtn) { nextBtn.click(); return true; }
-                return false;
-            """)
-
-            if has_next:
-                page += 1
-                time.sleep(1)
-            else:
+            doc = self._snapshot("session_parties")
+            parties.extend(mahakim_dom.session_parties(doc))
+            if not mahakim_dom.session_parties_has_next(doc):
                 break
-
+            self._click_expansion_next(innermost=True)
+            self.waits.settle("session_parties_page")
         return parties
 
     # ------------------------------------------------------------------
@@ -1472,28 +1254,28 @@ class MahakimScraper:
     CONTUMACE_URL = "https://www.mahakim.ma/#/procedure-contumace"
 
     def scrape_contumace(self, search_query=None, progress_callback=None,
-                         existing_keys=None):
+                         existing_keys=None, start_page=1):
         """
         Scrape la page publique المسطرة الغيابية (procédure par contumace).
 
+        Générateur : produit une entrée par page dès qu'elle est analysée,
+        pour que l'appelant la persiste avant de passer à la suivante
+            {"page": n, "total_pages": t, "records": [...], "skipped": k}
+
         Pour chaque ligne on vérifie d'abord si (numero_dossier, cour_appel) existe
         déjà en BD. Si oui on skip. Sinon on clique sur "التفاصيل" pour récupérer
         le motif complet, puis on ferme et on passe à la ligne suivante.
 
-        En cas d'erreur le navigateur reste ouvert pour diagnostic.
+        En cas d'erreur le navigateur reste ouvert pour diagnostic et
+        MahakimScrapeError est levée (message en arabe).
 
         Args:
             search_query: texte de recherche global (optionnel)
             progress_callback: callable(phase, current_page, total_pages, records_count, message)
-            existing_keys: set of (numero_dossier, cour_appel) tuples already in DB
+            existing_keys: conteneur de tuples (numero_dossier, cour_appel) déjà en BD
+                (tout objet supportant `in` ; l'appelant peut l'enrichir entre deux pages)
+            start_page: reprise — les pages précédentes sont sautées sans analyse
         """
-        result = {
-            "success": False,
-            "records": [],
-            "total_pages": 0,
-            "error_message": None,
-        }
-
         def _notify(phase, current_page=0, total_pages=0, records_count=0, message=""):
             if progress_callback:
                 try:
@@ -1504,18 +1286,19 @@ class MahakimScraper:
         if not self.driver:
             self._create_driver()
 
+        total_pages = 0
+        records_count = 0
         try:
             _notify("init", message="جاري فتح صفحة المسطرة الغيابية...")
             logger.info("Navigation vers mahakim.ma contumace page")
             self.driver.get(self.CONTUMACE_URL)
 
             # Wait for Angular to load the page
-            wait = WebDriverWait(self.driver, self.timeout)
-            wait.until(EC.presence_of_element_located(
+            self.waits.until("contumace_load", EC.presence_of_element_located(
                 (By.CSS_SELECTOR,
                  'p-table, .cm-search-parent, .p-datatable')
             ))
-            time.sleep(2)
+            self.waits.settle("contumace_load")
 
             # If search query, type it in the global search input
             if search_query:
@@ -1528,7 +1311,7 @@ class MahakimScraper:
                     )
                     search_input.clear()
                     search_input.send_keys(search_query)
-                    time.sleep(2)
+                    self.waits.settle("contumace_search")
                 except NoSuchElementException:
                     logger.warning("Global search input not found on contumace page")
 
@@ -1537,60 +1320,76 @@ class MahakimScraper:
             total_pages = self._contumace_get_total_pages()
             if total_pages == 0:
                 total_pages = 1
-            result["total_pages"] = total_pages
 
-            _existing = existing_keys or set()
-            all_records = []
+            _existing = existing_keys if existing_keys is not None else set()
             skipped = 0
 
-            for page_num in range(1, total_pages + 1):
-                _notify("page", page_num, total_pages, len(all_records),
+            # Reprise : avancer jusqu'à start_page sans analyser les lignes
+            start_page = max(1, min(start_page or 1, total_pages))
+            for page_num in range(1, start_page):
+                _notify("resume", page_num, total_pages, 0,
+                        f"استئناف من الصفحة {start_page} — تجاوز الصفحة {page_num}...")
+                if not self._contumace_next_page():
+                    logger.warning("Cannot reach resume page %d (stopped at %d)", start_page, page_num)
+                    start_page = page_num
+                    break
+
+            for page_num in range(start_page, total_pages + 1):
+                _notify("page", page_num, total_pages, records_count,
                         f"جاري تحليل الصفحة {page_num} من {total_pages}..."
                         + (f" (تم تجاوز {skipped})" if skipped else ""))
 
                 # Parse current page rows (with details expansion, skipping existing)
                 page_records, page_skipped = self._parse_contumace_page(_existing)
-                all_records.extend(page_records)
+                records_count += len(page_records)
                 skipped += page_skipped
 
-                _notify("page", page_num, total_pages, len(all_records),
-                        f"تم تحليل الصفحة {page_num} — {len(all_records)} جديد"
+                yield {
+                    "page": page_num,
+                    "total_pages": total_pages,
+                    "records": page_records,
+                    "skipped": page_skipped,
+                }
+
+                _notify("page", page_num, total_pages, records_count,
+                        f"تم تحليل الصفحة {page_num} — {records_count} جديد"
                         + (f" / {skipped} موجود" if skipped else ""))
 
                 # Go to next page if not last
-                if page_num < total_pages:
-                    try:
-                        next_btn = self.driver.find_element(
-                            By.CSS_SELECTOR, '.p-paginator-next:not(.p-disabled)'
-                        )
-                        next_btn.click()
-                        time.sleep(2)
-                    except NoSuchElementException:
-                        logger.warning("Next page button not found at page %d", page_num)
-                        break
-
-            result["records"] = all_records
-            result["success"] = True
+                if page_num < total_pages and not self._contumace_next_page():
+                    logger.warning("Next page button not found at page %d", page_num)
+                    break
 
         except TimeoutException:
-            result["error_message"] = "انتهت مهلة الانتظار — الموقع لا يستجيب. المتصفح مفتوح للتشخيص."
             logger.error("Timeout lors du scraping contumace mahakim.ma")
+            raise MahakimScrapeError("انتهت مهلة الانتظار — الموقع لا يستجيب. المتصفح مفتوح للتشخيص.")
         except WebDriverException as e:
             err_str = str(e)
+            logger.error("WebDriver error contumace: %s", e)
             if "no such window" in err_str or "web view not found" in err_str:
-                result["error_message"] = "تم إغلاق المتصفح بشكل غير متوقع"
+                raise MahakimScrapeError("تم إغلاق المتصفح بشكل غير متوقع")
             elif "ERR_INTERNET_DISCONNECTED" in err_str or "ERR_NAME_NOT_RESOLVED" in err_str:
-                result["error_message"] = "لا يوجد اتصال بالإنترنت أو الموقع غير متاح"
-            else:
-                result["error_message"] = f"خطأ في المتصفح: {err_str[:200]}"
-            logger.error("WebDriver error contumace: %s", e)
+                raise MahakimScrapeError("لا يوجد اتصال بالإنترنت أو الموقع غير متاح")
+            raise MahakimScrapeError(f"خطأ في المتصفح: {err_str[:200]}")
+        except MahakimScrapeError:
+            raise
         except Exception as e:
-            result["error_message"] = f"خطأ غير متوقع: {str(e)[:200]}"
             logger.exception("Erreur inattendue lors du scraping contumace")
+            raise MahakimScrapeError(f"خطأ غير متوقع: {str(e)[:200]}")
 
-        _notify("done", result.get("total_pages", 0), result.get("total_pages", 0),
-                len(result["records"]), "تم")
-        return result
+        _notify("done", total_pages, total_pages, records_count, "تم")
+
+    def _contumace_next_page(self):
+        """Clique sur « suivant » du paginateur. False si le bouton est absent/désactivé."""
+        try:
+            next_btn = self.driver.find_element(
+                By.CSS_SELECTOR, '.p-paginator-next:not(.p-disabled)'
+            )
+        except NoSuchElementException:
+            return False
+        next_btn.click()
+        self.waits.settle("contumace_page_next")
+        return True
 
     def _contumace_get_total_pages(self):
         """
@@ -1610,7 +1409,7 @@ class MahakimScraper:
             )
             if last_btn:
                 last_btn[0].click()
-                time.sleep(2)
+                self.waits.settle("contumace_pages")
 
                 # Now the last page button should be highlighted — read its number
                 highlighted = self.driver.find_elements(
@@ -1627,7 +1426,7 @@ class MahakimScraper:
                         )
                         if first_btn:
                             first_btn[0].click()
-                            time.sleep(2)
+                            self.waits.settle("contumace_pages")
 
                         return total
 
@@ -1648,7 +1447,7 @@ class MahakimScraper:
                     )
                     if first_btn:
                         first_btn[0].click()
-                        time.sleep(2)
+                        self.waits.settle("contumace_pages")
 
                     return max_page
             else:
@@ -1679,47 +1478,9 @@ class MahakimScraper:
         skipped = 0
         _existing = existing_keys or set()
         try:
-            # Count how many data rows on this page
-            row_count = self.driver.execute_script("""
-                var count = 0;
-                var rows = document.querySelectorAll('p-table tbody tr');
-                rows.forEach(function(tr) {
-                    if (!tr.classList.contains('tr-expand') &&
-                        !tr.classList.contains('p-datatable-row-expansion')) {
-                        count++;
-                    }
-                });
-                return count;
-            """)
-
-            if not row_count:
-                return records, skipped
-
-            for idx in range(row_count):
-                # Extract basic fields for this row
-                row_data = self.driver.execute_script("""
-                    var dataRows = [];
-                    var rows = document.querySelectorAll('p-table tbody tr');
-                    rows.forEach(function(tr) {
-                        if (!tr.classList.contains('tr-expand') &&
-                            !tr.classList.contains('p-datatable-row-expansion')) {
-                            dataRows.push(tr);
-                        }
-                    });
-                    var row = dataRows[arguments[0]];
-                    if (!row) return null;
-                    var cells = row.querySelectorAll('td');
-                    if (cells.length < 6) return null;
-                    return {
-                        cour_appel: (cells[0] || {}).textContent?.trim() || '',
-                        numero_dossier: (cells[1] || {}).textContent?.trim() || '',
-                        nom_accuse: (cells[2] || {}).textContent?.trim() || '',
-                        nom_pere: (cells[3] || {}).textContent?.trim() || '',
-                        nom_mere: (cells[4] || {}).textContent?.trim() || '',
-                        numero_carte: (cells[5] || {}).textContent?.trim() || '',
-                    };
-                """, idx)
+            rows = mahakim_dom.contumace_rows(self._snapshot("contumace_page"))
 
+            for idx, row_data in enumerate(rows):
                 if not row_data:
                     continue
 
@@ -1730,15 +1491,7 @@ class MahakimScraper:
                     logger.debug("Skipping existing record: %s", key)
                     continue
 
-                record = {
-                    "cour_appel": row_data.get("cour_appel", ""),
-                    "numero_dossier": row_data.get("numero_dossier", ""),
-                    "nom_accuse": row_data.get("nom_accuse", ""),
-                    "nom_pere": row_data.get("nom_pere", ""),
-                    "nom_mere": row_data.get("nom_mere", ""),
-                    "numero_carte": row_data.get("numero_carte", ""),
-                    "details_text": "",
-                }
+                record = dict(row_data, details_text="")
 
                 # Click the "التفاصيل" button for this row to expand details
                 try:
@@ -1769,56 +1522,14 @@ class MahakimScraper:
                     """, idx)
 
                     if clicked:
-                        time.sleep(1)  # Wait for expansion animation
+                        self._wait_expansions("contumace_details_open", 1)
 
-                        # Extract the expanded details/motif text
-                        expanded_text = self.driver.execute_script("""
-                            // Find the currently visible expansion row
-                            var expandRows = document.querySelectorAll(
-                                'tr.tr-expand, tr.p-datatable-row-expansion'
-                            );
-                            var texts = [];
-                            for (var i = 0; i < expandRows.length; i++) {
-                                var er = expandRows[i];
-                                if (er.offsetHeight > 0 && er.offsetParent !== null) {
-                                    // Try specific contumace class first
-                                    var container = er.querySelector('.cm-dossier-procedurecontumace');
-                                    if (container) {
-                                        // Get all paragraph text
-                                        var paras = container.querySelectorAll('p');
-                                        if (paras.length > 0) {
-                                            paras.forEach(function(p) {
-                                                var t = p.textContent?.trim();
-                                                if (t) texts.push(t);
-                                            });
-                                        } else {
-                                            // No <p> tags, get the container text directly
-                                            var t = container.textContent?.trim();
-                                            if (t) texts.push(t);
-                                        }
-                                    } else {
-                                        // Fallback: get all text from expansion row
-                                        var allP = er.querySelectorAll('p, div.text-justify, div.details-content');
-                                        if (allP.length > 0) {
-                                            allP.forEach(function(el) {
-                                                var t = el.textContent?.trim();
-                                                if (t && t.length > 10) texts.push(t);
-                                            });
-                                        }
-                                        if (texts.length === 0) {
-                                            var t = er.textContent?.trim();
-                                            if (t) texts.push(t);
-                                        }
-                                    }
-                                    break; // Only process the first visible expansion
-                                }
-                            }
-                            return texts.join('\\n');
-                        """)
-                        record["details_text"] = (expanded_text or "").strip()
+                        # Motif : outerHTML de la ligne dépliée, parsé par lxml
+                        record["details_text"] = mahakim_dom.contumace_details(
+                            mahakim_dom.row_fragment(self._visible_expansion_html())
+                        )
 
                         # Close the expanded row
-                        time.sleep(0.5)
                         self.driver.execute_script("""
                             var expandRows = document.querySelectorAll(
                                 'tr.tr-expand, tr.p-datatable-row-expansion'
@@ -1844,13 +1555,12 @@ class MahakimScraper:
                                 }
                             }
                         """)
-                        time.sleep(1)  # Wait for close animation
+                        self._wait_expansions("contumace_details_close", 0, opened=False)
 
                 except Exception as e:
                     logger.debug("Could not expand details for row %d: %s", idx, e)
 
                 records.append(record)
-                time.sleep(0.5)  # Small pause between rows
 
         except Exception as e:
             logger.warning("Error parsing contumace page: %s", e)
@@ -1912,13 +1622,12 @@ class MahakimScraper:
         try:
             _notify("جاري فتح صفحة حاسبة الرسوم...")
             self.driver.get(self.TAX_CALC_URL)
-            time.sleep(3)
 
             # Wait for page to load
-            WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'select, input[type="radio"]'))
-            )
-            time.sleep(1)
+            self.waits.until("tax_load", EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'select, input[type="radio"]')
+            ))
+            self.waits.settle("tax_load")
 
             # --- Extract nature radio buttons ---
             natures = self.driver.execute_script("""
@@ -1955,7 +1664,7 @@ class MahakimScraper:
                     var r = document.getElementById('{nat_id}');
                     if (r) r.click();
                 """)
-                time.sleep(1.5)
+                self.waits.settle("tax_nature")
 
                 # Get نوع المقال options (first select)
                 type_maqal_options = self._tax_get_select_options_by_position(0)
@@ -1974,7 +1683,7 @@ class MahakimScraper:
 
                     # Select this type_maqal
                     self._tax_select_option_by_position(0, tm_val)
-                    time.sleep(1)
+                    self.waits.settle("tax_type_maqal")
 
                     # Get صنف القضية options (second select)
                     categories = self._tax_get_select_options_by_position(1)
@@ -1988,7 +1697,7 @@ class MahakimScraper:
 
                         # Select this category
                         self._tax_select_option_by_position(1, cat_val)
-                        time.sleep(0.8)
+                        self.waits.settle("tax_categorie")
 
                         # Get نوع القضية options (third select)
                         types_qadiya = self._tax_get_select_options_by_position(2)
@@ -2055,12 +1764,11 @@ class MahakimScraper:
         try:
             _notify("جاري فتح حاسبة الرسوم...")
             self.driver.get(self.TAX_CALC_URL)
-            time.sleep(3)
 
-            WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'select, input[type="radio"]'))
-            )
-            time.sleep(1)
+            self.waits.until("tax_load", EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'select, input[type="radio"]')
+            ))
+            self.waits.settle("tax_load")
 
             # 1. Click nature radio
             _notify("اختيار طبيعة الاستخلاص...")
@@ -2072,27 +1780,26 @@ class MahakimScraper:
                     if (label.indexOf(target) !== -1) r.click();
                 });
             """, nature)
-            time.sleep(1.5)
+            self.waits.settle("tax_nature")
 
             # 2. Select نوع المقال
             _notify("اختيار نوع المقال...")
             self._tax_select_option_by_position(0, type_maqal)
-            time.sleep(1)
+            self.waits.settle("tax_type_maqal")
 
             # 3. Select صنف القضية
             _notify("اختيار صنف القضية...")
             self._tax_select_option_by_position(1, categorie)
-            time.sleep(1)
+            self.waits.settle("tax_categorie")
 
             # 4. Select نوع القضية
             _notify("اختيار نوع القضية...")
             self._tax_select_option_by_position(2, type_qadiya)
-            time.sleep(1)
+            self.waits.settle("tax_type_qadiya")
 
             # 5. Select نوع الطلب
             _notify("اختيار نوع الطلب...")
             self._tax_select_option_by_position(-1, type_talab)
-            time.sleep(0.5)
 
             # 6. Fill montant
             _notify("إدخال المبلغ...")
@@ -2113,7 +1820,6 @@ class MahakimScraper:
                     }
                 }
             """, str(montant))
-            time.sleep(0.5)
 
             # 7. Click Calculate
             _notify("جاري الحساب...")
@@ -2127,7 +1833,7 @@ class MahakimScraper:
                     }
                 }
             """)
-            time.sleep(3)
+            self.waits.settle("tax_calculate")
 
             # 8. Read result
             result_data = self.driver.execute_script("""
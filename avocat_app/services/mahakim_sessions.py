@@ -0,0 +1,287 @@
+"""Programme des audiences mahakim.ma (جدول الجلسات) : récupération groupée et cache.
+
+- `fetch_schedules()` récupère un ensemble (juridictions × dates) : les
+  programmes encore frais en base (< MAHAKIM_SESSIONS_TTL_HOURS) sont relus
+  tels quels, les autres sont répartis sur `workers` navigateurs, chacun
+  réutilisant la même session Chrome pour toute sa liste. Le délai minimal
+  entre deux recherches (MAHAKIM_MIN_INTERVAL_SECONDS) est partagé.
+- Chaque programme est stocké dans `SessionSchedule` (JSON d'affichage) et
+  ses dossiers dans `SessionScheduleFile` (une ligne par dossier, indexée
+  par juridiction/date et par numéro de dossier).
+- `match_files()` rattache en bloc les dossiers du rôle à nos `Affaire`
+  (numéro/code/année) et à l'`Audience` du même jour : deux requêtes quel
+  que soit le nombre de dossiers.
+
+Les threads workers ne touchent pas la base : les résultats reviennent par
+une file au thread appelant, qui écrit.
+"""
+from __future__ import annotations
+
+import logging
+import queue as _queue
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .mahakim_sync import RateLimiter, default_min_interval, split_shards
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_HOURS = 6.0
+_NUMERO_RE = re.compile(r"(\d+)\s*/\s*(\d+)\s*/\s*(\d{4})")
+
+
+def parse_date(value) -> date:
+    """date, « dd/mm/yyyy » ou « yyyy-mm-dd »."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or "").strip()
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Date invalide: {value!r}")
+
+
+def date_range(start, end) -> List[date]:
+    start, end = parse_date(start), parse_date(end)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def split_numero(numero: str) -> Tuple[str, str, str]:
+    """« 1234/1606/2026 » → ("1234", "1606", "2026") ; ("", "", "") si non reconnu."""
+    m = _NUMERO_RE.search(numero or "")
+    return m.groups() if m else ("", "", "")
+
+
+def ttl() -> timedelta:
+    return timedelta(hours=float(getattr(settings, "MAHAKIM_SESSIONS_TTL_HOURS", DEFAULT_TTL_HOURS)))
+
+
+def session_target(juridiction) -> dict:
+    """Arguments de `scrape_sessions` pour une juridiction (1ère instance → via sa cour d'appel)."""
+    if juridiction.TribunalParent_id:
+        parent = juridiction.TribunalParent
+        return {
+            "id_mahakim_tribunal": parent.id_mahakim or juridiction.id_mahakim or None,
+            "is_premiere_instance": True,
+            "nom_tribunal": juridiction.nomtribunal_ar,
+            "nom_tribunal_appel": parent.nomtribunal_ar,
+        }
+    return {
+        "id_mahakim_tribunal": juridiction.id_mahakim or None,
+        "is_premiere_instance": False,
+        "nom_tribunal": juridiction.nomtribunal_ar,
+        "nom_tribunal_appel": None,
+    }
+
+
+# ---------- Rapprochement avec nos affaires ----------
+
+def match_files(rows: Sequence[dict], juridiction_id=None, date_seance=None) -> None:
+    """Renseigne `affaire_id` / `audience_id` dans chaque ligne (dict) du rôle, en bloc."""
+    from ..models import Affaire, Audience
+
+    keys = {(r["numero_dossier"], r["code_categorie"], r["annee"]) for r in rows if r.get("numero_dossier")}
+    if not keys:
+        return
+    candidates: Dict[tuple, List[tuple]] = {}
+    qs = (Affaire.objects
+          .filter(numero_dossier__in={k[0] for k in keys}, annee_dossier__in={k[2] for k in keys})
+          .values_list("pk", "numero_dossier", "code_categorie__code", "annee_dossier", "juridiction_id"))
+    for pk, num, code, annee, jur in qs:
+        key = (num, code or "", annee)
+        if key in keys:
+            candidates.setdefault(key, []).append((pk, jur))
+
+    def _pick(options):
+        # Même numéro dans deux juridictions : préférer celle du rôle
+        for pk, jur in options:
+            if jur == juridiction_id:
+                return pk
+        return options[0][0]
+
+    by_key = {key: _pick(opts) for key, opts in candidates.items()}
+    audiences = {}
+    if by_key and date_seance:
+        for aud_pk, aff_pk in (Audience.objects
+                               .filter(affaire_id__in=set(by_key.values()), date_audience__date=date_seance)
+                               .values_list("pk", "affaire_id")):
+            audiences.setdefault(aff_pk, aud_pk)
+
+    for r in rows:
+        aff = by_key.get((r.get("numero_dossier"), r.get("code_categorie"), r.get("annee")))
+        r["affaire_id"] = aff
+        r["audience_id"] = audiences.get(aff) if aff else None
+
+
+def _file_rows(sessions: Iterable[dict]) -> List[dict]:
+    rows = []
+    for s in sessions or []:
+        for f in s.get("files") or []:
+            num, code, annee = split_numero(f.get("numero", ""))
+            rows.append({
+                "heure": (s.get("time") or "")[:20],
+                "salle": (s.get("room") or "")[:100],
+                "division": (s.get("division") or "")[:200],
+                "numero": (f.get("numero") or "")[:50],
+                "numero_dossier": num[:20],
+                "code_categorie": code[:10],
+                "annee": annee,
+                "date_enregistrement": (f.get("date_enregistrement") or "")[:30],
+                "type_procedure": (f.get("type_procedure") or "")[:255],
+                "decision": f.get("decision") or "",
+                "prochaine_audience": (f.get("prochaine_audience") or "")[:30],
+                "parties": f.get("parties") or [],
+            })
+    return rows
+
+
+def save_schedule(juridiction_id, date_seance, type_seance: str, result: dict):
+    """Enregistre le résultat de `scrape_sessions` (remplace le programme précédent)."""
+    from django.db import transaction
+    from django.utils import timezone
+
+    from ..models import SessionSchedule, SessionScheduleFile
+
+    sessions = result.get("sessions") or []
+    rows = _file_rows(sessions) if result.get("success") else []
+    match_files(rows, juridiction_id, date_seance)
+    with transaction.atomic():
+        schedule, _ = SessionSchedule.objects.update_or_create(
+            juridiction_id=juridiction_id, date_seance=date_seance, type_seance=type_seance or "",
+            defaults={
+                "sessions": sessions,
+                "sessions_count": len(sessions),
+                "files_count": len(rows),
+                "success": bool(result.get("success")),
+                "error_message": result.get("error_message"),
+                "fetched_at": timezone.now(),
+            },
+        )
+        SessionScheduleFile.objects.filter(schedule=schedule).delete()
+        SessionScheduleFile.objects.bulk_create([
+            SessionScheduleFile(schedule=schedule, juridiction_id=juridiction_id, date_seance=date_seance, **r)
+            for r in rows
+        ])
+    return schedule
+
+
+def fresh_schedule(juridiction_id, date_seance, type_seance: str = ""):
+    """Programme en cache encore valide, ou None."""
+    from django.utils import timezone
+
+    from ..models import SessionSchedule
+
+    return (SessionSchedule.objects
+            .filter(juridiction_id=juridiction_id, date_seance=date_seance, type_seance=type_seance or "",
+                    success=True, fetched_at__gte=timezone.now() - ttl())
+            .first())
+
+
+def matches_for(schedule) -> List[dict]:
+    """Dossiers du programme rattachés à une affaire du cabinet."""
+    return [
+        {
+            "numero": f.numero,
+            "heure": f.heure,
+            "affaire_id": str(f.affaire_id),
+            "reference_interne": f.affaire.reference_interne,
+            "audience_id": str(f.audience_id) if f.audience_id else None,
+        }
+        for f in schedule.files.filter(affaire__isnull=False).select_related("affaire")
+    ]
+
+
+# ---------- Récupération groupée ----------
+
+def _worker(targets, results, limiter, headless, timeout, stop):
+    from .mahakim_scraper import MahakimScraper
+
+    scraper = MahakimScraper(headless=headless, timeout=timeout)
+    try:
+        for target in targets:
+            if stop.is_set():
+                break
+            limiter.wait()
+            kwargs = dict(target["scrape"])
+            try:
+                result = scraper.scrape_sessions(
+                    date_seance=target["date"], type_seance=target["type_seance"] or None, **kwargs,
+                )
+            except Exception as e:  # navigateur perdu : on repart sur un nouveau
+                logger.exception("scrape_sessions %s", target["key"])
+                result = {"success": False, "sessions": [], "error_message": str(e)[:200]}
+                scraper.close()
+            results.put((target, result))
+    finally:
+        scraper.close()
+        results.put(None)
+
+
+def fetch_schedules(juridiction_ids: Iterable, dates: Iterable, type_seance: str = "",
+                    workers: int = 1, refresh: bool = False, headless: bool = True, timeout: int = 30,
+                    progress: Optional[Callable[[int, int, str], None]] = None) -> dict:
+    """Programmes de toutes les paires (juridiction, date). Retourne un résumé."""
+    from ..models import Juridiction
+
+    jurs = Juridiction.objects.select_related("TribunalParent").in_bulk(list(juridiction_ids))
+    dates = sorted({parse_date(d) for d in dates})
+    summary = {"total": len(jurs) * len(dates), "cached": 0, "fetched": 0, "failed": 0, "files": 0, "matched": 0}
+
+    targets = []
+    for jur in jurs.values():
+        for d in dates:
+            if not refresh and fresh_schedule(jur.pk, d, type_seance):
+                summary["cached"] += 1
+                continue
+            targets.append({
+                "key": (jur.pk, d),
+                "date": d,
+                "type_seance": type_seance or "",
+                "scrape": session_target(jur),
+                "label": f"{jur.nomtribunal_ar} — {d:%d/%m/%Y}",
+            })
+    if not targets:
+        return summary
+
+    results: "_queue.Queue" = _queue.Queue()
+    limiter = RateLimiter(default_min_interval())
+    stop = threading.Event()
+    shards = split_shards(targets, max(1, workers))
+    threads = [
+        threading.Thread(target=_worker, args=(shard, results, limiter, headless, timeout, stop),
+                         daemon=True, name=f"mahakim-sessions-{i + 1}")
+        for i, shard in enumerate(shards)
+    ]
+    for t in threads:
+        t.start()
+
+    running, done = len(threads), 0
+    try:
+        while running:
+            item = results.get()
+            if item is None:
+                running -= 1
+                continue
+            target, result = item
+            jur_pk, d = target["key"]
+            schedule = save_schedule(jur_pk, d, target["type_seance"], result)
+            done += 1
+            if schedule.success:
+                summary["fetched"] += 1
+                summary["files"] += schedule.files_count
+                summary["matched"] += schedule.files.filter(affaire__isnull=False).count()
+            else:
+                summary["failed"] += 1
+            if progress:
+                progress(done, len(targets), target["label"])
+    finally:
+        stop.set()
+    return summary
@@ -0,0 +1,244 @@
+"""Synchronisation par lots des affaires avec mahakim.ma.
+
+Utilisé par la commande `sync_mahakim` :
+- `syncable_affaires()` : queryset des affaires ayant une référence structurée
+  (numéro / code / année) ;
+- `scrape_kwargs()` : paramètres de `MahakimScraper.scrape_affaire` dérivés
+  de la juridiction de l'affaire (même logique que la vue unitaire) ;
+- `run_shard()` : boucle d'un worker (un navigateur par worker) ;
+- `RateLimiter` : délai minimal entre deux recherches, partagé par tous les
+  processus pour rester poli envers le portail ;
+- `SyncCheckpoint` : liste des affaires déjà traitées, pour reprendre un lot
+  interrompu sans tout recommencer.
+
+Les workers ne touchent pas la base : ils reçoivent des dicts picklables et
+renvoient les résultats au processus parent qui les écrit par lots
+(`mahakim_results.save_results`).
+Ce module n'importe donc pas les modèles au niveau global (compatibilité
+avec le mode `spawn` de multiprocessing, utilisé sur macOS).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_INTERVAL_SECONDS = 2.0
+RAW_HTML_MAX_CHARS = 50000
+
+
+# ---------- Sélection des affaires ----------
+
+def syncable_affaires():
+    """Affaires ayant numéro de dossier, code catégorie et année renseignés."""
+    from ..models import Affaire
+
+    return (
+        Affaire.objects.filter(
+            numero_dossier__isnull=False,
+            code_categorie__isnull=False,
+            annee_dossier__isnull=False,
+        )
+        .exclude(numero_dossier="")
+        .exclude(annee_dossier="")
+    )
+
+
+def scrape_kwargs(affaire) -> dict:
+    """Arguments de `scrape_affaire` pour une affaire (sans accès DB ensuite)."""
+    kwargs = {
+        "numero": affaire.numero_dossier,
+        "code_categorie": affaire.code_categorie.code,
+        "annee": affaire.annee_dossier,
+        "id_mahakim_tribunal": None,
+        "is_premiere_instance": False,
+        "nom_tribunal": None,
+        "nom_tribunal_appel": None,
+    }
+    jur = affaire.juridiction
+    if jur:
+        kwargs["id_mahakim_tribunal"] = jur.id_mahakim
+        kwargs["nom_tribunal"] = jur.nomtribunal_ar
+        if jur.TribunalParent_id:
+            kwargs["is_premiere_instance"] = True
+            kwargs["nom_tribunal_appel"] = jur.TribunalParent.nomtribunal_ar
+    return kwargs
+
+
+def build_sync_result(affaire_id, result: dict):
+    """Instance MahakimSyncResult (non sauvegardée) à partir d'un résultat scraper.
+
+    Le HTML brut n'y est pas recopié : `mahakim_results.save_results` le
+    stocke compressé et dédupliqué.
+    """
+    from ..models import MahakimSyncResult
+
+    return MahakimSyncResult(
+        affaire_id=affaire_id,
+        sync_type="dossier",
+        statut_mahakim=result.get("statut_mahakim"),
+        prochaine_audience=result.get("prochaine_audience"),
+        juge=result.get("juge"),
+        observations=result.get("observations"),
+        success=result.get("success", False),
+        error_message=result.get("error_message"),
+        procedures_json=result.get("procedures") or None,
+        parties_json=result.get("parties") or None,
+    )
+
+
+# ---------- Politesse ----------
+
+class RateLimiter:
+    """Espace les recherches d'au moins `interval` secondes.
+
+    Avec `ctx` (contexte multiprocessing), l'état est en mémoire partagée et
+    l'objet peut être transmis aux processus workers à leur création.
+    """
+
+    def __init__(self, interval: float, ctx=None):
+        self.interval = max(0.0, float(interval))
+        if ctx is not None:
+            self._next = ctx.Value("d", 0.0, lock=False)
+            self._lock = ctx.Lock()
+        else:
+            self._next = None
+            self._next_local = 0.0
+            self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Bloque jusqu'au prochain créneau libre. Retourne le temps attendu."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.time()
+            current = self._next.value if self._next is not None else self._next_local
+            slot = max(now, current)
+            if self._next is not None:
+                self._next.value = slot + self.interval
+            else:
+                self._next_local = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def default_min_interval() -> float:
+    return float(getattr(settings, "MAHAKIM_MIN_INTERVAL_SECONDS", DEFAULT_MIN_INTERVAL_SECONDS))
+
+
+# ---------- Reprise ----------
+
+class SyncCheckpoint:
+    """Fichier JSON listant les affaires déjà synchronisées dans le lot courant.
+
+    Écrit après chaque flush en base : tout id présent dans le fichier a
+    son MahakimSyncResult persisté.
+    """
+
+    def __init__(self, path: Optional[os.PathLike] = None):
+        self.path = Path(path) if path else self.default_path()
+        self.done: Set[str] = set()
+        self.started_at: Optional[str] = None
+
+    @staticmethod
+    def default_path() -> Path:
+        custom = getattr(settings, "MAHAKIM_SYNC_CHECKPOINT", "")
+        if custom:
+            return Path(custom)
+        return Path(settings.MEDIA_ROOT) / "mahakim" / "sync_checkpoint.json"
+
+    def load(self) -> "SyncCheckpoint":
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return self
+        self.done = set(str(x) for x in data.get("done", []))
+        self.started_at = data.get("started_at")
+        return self
+
+    def start(self) -> None:
+        from django.utils import timezone
+
+        self.done = set()
+        self.started_at = timezone.now().isoformat()
+        self.save()
+
+    def mark(self, ids: Iterable[str]) -> None:
+        self.done.update(str(x) for x in ids)
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"started_at": self.started_at, "done": sorted(self.done)}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ---------- Workers ----------
+
+def split_shards(jobs: List[dict], workers: int) -> List[List[dict]]:
+    """Répartit les jobs en `workers` lots entrelacés (charge équilibrée)."""
+    workers = max(1, min(workers, len(jobs) or 1))
+    return [jobs[i::workers] for i in range(workers)]
+
+
+def run_shard(jobs: List[dict], emit: Callable[[dict], None], limiter: RateLimiter,
+              *, headless: bool = True, timeout: int = 30, worker: int = 0,
+              deadline: Optional[float] = None) -> None:
+    """Synchronise une liste de jobs `{affaire_id, label, kwargs}` avec un seul navigateur.
+
+    Chaque résultat est transmis via `emit({affaire_id, label, worker, result})`.
+    Passé `deadline` (timestamp `time.time()`), les jobs restants sont abandonnés.
+    """
+    from .mahakim_scraper import MahakimScraper
+
+    with MahakimScraper(headless=headless, timeout=timeout) as scraper:
+        for job in jobs:
+            if deadline is not None and time.time() >= deadline:
+                logger.info("Budget temps épuisé (worker %s)", worker)
+                break
+            limiter.wait()
+            result = scraper.scrape_affaire(**job["kwargs"])
+            if result.get("raw_html"):
+                result["raw_html"] = result["raw_html"][:RAW_HTML_MAX_CHARS]
+            emit({
+                "affaire_id": job["affaire_id"],
+                "label": job["label"],
+                "worker": worker,
+                "result": result,
+            })
+
+
+def shard_process(jobs, queue, limiter, headless, timeout, worker, deadline=None):
+    """Point d'entrée d'un processus worker : les résultats passent par `queue`.
+
+    Un `None` final signale la fin du worker ; une erreur fatale (ex: Chrome
+    introuvable) est remontée sous la forme `{"worker", "fatal"}`.
+    """
+    try:
+        run_shard(jobs, queue.put, limiter, headless=headless, timeout=timeout,
+                  worker=worker, deadline=deadline)
+    except Exception as e:  # le parent doit être informé, pas bloqué
+        logger.exception("Worker mahakim %s arrêté", worker)
+        queue.put({"worker": worker, "fatal": str(e)[:200]})
+    finally:
+        queue.put(None)
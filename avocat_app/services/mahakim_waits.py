@@ -0,0 +1,305 @@
+"""Attentes événementielles du scraper mahakim.ma (à la place des `time.sleep` fixes).
+
+Trois signaux, combinés par `Waiter.settle()` :
+
+- stabilité Angular : `getAllAngularTestabilities().isStable()` (zone sans
+  requête ni timer en attente), `document.readyState`, aucune animation
+  (`.ng-animating`) ; sur les pages sans Angular (caisse en ligne),
+  `jQuery.active == 0` ;
+- réseau au repos : le log performance CDP déjà activé par le scraper est
+  suivi par `NetworkTracker` (requêtes XHR/Fetch/Document en vol) ; le
+  réseau est au repos quand rien n'est en vol depuis QUIET secondes
+  (mesurées aussi à partir du début de l'attente, pour laisser partir la
+  requête déclenchée par un clic) ;
+- conditions sur les éléments : `Waiter.until()` (expected_conditions ou
+  prédicat JS), avec un délai appris des latences observées pour la même
+  étape (`LatencyModel`).
+
+Chaque attente est chronométrée dans `WaitMetrics` (étape, type, durée,
+succès) ; avec MAHAKIM_WAIT_METRICS=/chemin/fichier.jsonl les mesures sont
+aussi ajoutées à ce fichier, une ligne JSON par attente.
+
+Ce module n'importe pas Django (comme mahakim_scraper).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENV = "MAHAKIM_WAIT_METRICS"
+
+POLL = 0.1            # s entre deux vérifications
+QUIET = 0.4           # s sans requête en vol → réseau au repos
+STALE_REQUEST = 15.0  # s : requête en vol ignorée au-delà (long polling)
+SETTLE_TIMEOUT = 10.0
+
+# Délai adaptatif : FACTOR × 90e centile des latences observées + MARGIN
+LATENCY_SAMPLES = 30
+LATENCY_MIN_SAMPLES = 3
+LATENCY_FACTOR = 3.0
+LATENCY_MARGIN = 1.0
+MIN_TIMEOUT = 2.0
+
+_TRACKED_TYPES = {"XHR", "Fetch", "Document"}
+
+STABLE_JS = """
+    if (document.readyState !== 'complete') return false;
+    if (window.getAllAngularTestabilities) {
+        var t = window.getAllAngularTestabilities();
+        for (var i = 0; i < t.length; i++) { if (!t[i].isStable()) return false; }
+    }
+    if (window.jQuery && window.jQuery.active) return false;
+    return !document.querySelector('.ng-animating');
+"""
+
+
+class NetworkTracker:
+    """Requêtes en vol d'après les évènements Network.* du log performance."""
+
+    def __init__(self):
+        self.inflight: Dict[str, float] = {}
+        self.last_activity = 0.0
+
+    def feed(self, entries: Iterable[dict]) -> None:
+        now = time.monotonic()
+        for entry in entries:
+            try:
+                msg = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = msg.get("method", "")
+            if not method.startswith("Network."):
+                continue
+            params = msg.get("params") or {}
+            rid = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                url = (params.get("request") or {}).get("url", "")
+                if params.get("type") in _TRACKED_TYPES and not url.startswith("data:"):
+                    self.inflight[rid] = now
+                    self.last_activity = now
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                if self.inflight.pop(rid, None) is not None:
+                    self.last_activity = now
+
+    def pending(self) -> int:
+        now = time.monotonic()
+        return sum(1 for started in self.inflight.values() if now - started < STALE_REQUEST)
+
+    def quiet_since(self, start: float) -> float:
+        """Secondes de repos (0 si une requête est en vol), comptées au plus tôt depuis `start`."""
+        if self.pending():
+            return 0.0
+        return time.monotonic() - max(self.last_activity, start)
+
+    def reset(self) -> None:
+        self.inflight.clear()
+
+
+class LatencyModel:
+    """Latences observées par étape → délai d'attente adapté."""
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self._seen: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=samples))
+
+    def observe(self, step: str, seconds: float) -> None:
+        self._seen[step].append(seconds)
+
+    def timeout(self, step: str, ceiling: float) -> float:
+        seen = sorted(self._seen.get(step) or ())
+        if len(seen) < LATENCY_MIN_SAMPLES:
+            return ceiling
+        p90 = seen[min(len(seen) - 1, int(len(seen) * 0.9))]
+        return max(MIN_TIMEOUT, min(ceiling, p90 * LATENCY_FACTOR + LATENCY_MARGIN))
+
+
+# Partagé par les scrapers du processus (navigateurs en parallèle, syncs successives)
+LATENCIES = LatencyModel()
+
+
+class WaitMetrics:
+    """Durée de chaque attente ; résumé par étape, export JSONL optionnel."""
+
+    def __init__(self, path: Optional[os.PathLike] = None):
+        self.path = path
+        self.records: List[dict] = []
+
+    @classmethod
+    def from_env(cls) -> "WaitMetrics":
+        return cls(os.environ.get(METRICS_ENV) or None)
+
+    @classmethod
+    def load(cls, path: os.PathLike) -> "WaitMetrics":
+        """Relit un fichier JSONL écrit par `record` (commande mahakim_wait_metrics)."""
+        metrics = cls()
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    metrics.records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return metrics
+
+    def record(self, step: str, kind: str, seconds: float, ok: bool, **extra) -> None:
+        rec = {"step": step, "kind": kind, "ms": round(seconds * 1000, 1), "ok": ok, **extra}
+        self.records.append(rec)
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(
+                        {"at": datetime.now().isoformat(timespec="milliseconds"), **rec},
+                        ensure_ascii=False,
+                    ) + "\n")
+            except OSError as e:
+                logger.warning("Écriture des mesures d'attente impossible (%s): %s", self.path, e)
+                self.path = None
+
+    def summary(self) -> List[dict]:
+        """[{step, kind, count, total_ms, max_ms, timeouts}] trié par temps total décroissant."""
+        by_key: Dict[tuple, dict] = {}
+        for r in self.records:
+            agg = by_key.setdefault((r["step"], r["kind"]), {
+                "step": r["step"], "kind": r["kind"], "count": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0,
+            })
+            agg["count"] += 1
+            agg["total_ms"] += r["ms"]
+            agg["max_ms"] = max(agg["max_ms"], r["ms"])
+            agg["timeouts"] += 0 if r["ok"] else 1
+        return sorted(by_key.values(), key=lambda a: -a["total_ms"])
+
+    def log_summary(self, top: int = 10) -> None:
+        rows = self.summary()
+        if not rows:
+            return
+        total = sum(r["total_ms"] for r in rows)
+        logger.info("Attentes mahakim : %.1f s au total", total / 1000)
+        for r in rows[:top]:
+            logger.info(
+                "  %-28s %-7s n=%-4d total=%8.0f ms max=%7.0f ms timeouts=%d",
+                r["step"], r["kind"], r["count"], r["total_ms"], r["max_ms"], r["timeouts"],
+            )
+
+
+class Waiter:
+    """Attentes d'un scraper : `driver` est renseigné par le scraper à la création de Chrome.
+
+    `drain` lit les nouvelles entrées du log performance et les transmet à
+    `network.feed`. `enabled=False` (rejeu hors ligne) : aucune attente, les
+    conditions sont évaluées une fois.
+    """
+
+    def __init__(self, timeout: float, drain: Callable[[], list], network: Optional[NetworkTracker] = None,
+                 metrics: Optional[WaitMetrics] = None, latencies: Optional[LatencyModel] = None):
+        self.driver = None
+        self.timeout = timeout
+        self.drain = drain
+        self.network = network if network is not None else NetworkTracker()
+        self.metrics = metrics if metrics is not None else WaitMetrics()
+        self.latencies = latencies if latencies is not None else LATENCIES
+        self.enabled = True
+
+    @contextmanager
+    def timed(self, step: str, kind: str):
+        """Chronomètre un bloc ; le bloc signale un échec par `state["ok"] = False`."""
+        state = {"ok": True}
+        t0 = time.perf_counter()
+        try:
+            yield state
+        finally:
+            self.metrics.record(step, kind, time.perf_counter() - t0, state["ok"])
+
+    def _stable(self) -> bool:
+        try:
+            return bool(self.driver.execute_script(STABLE_JS))
+        except WebDriverException:
+            return True
+
+    def angular(self, step: str, timeout: Optional[float] = None) -> bool:
+        """Attend la stabilité de la page (Angular / jQuery / animations)."""
+        if not self.enabled:
+            return True
+        deadline = time.monotonic() + (timeout or SETTLE_TIMEOUT)
+        with self.timed(step, "angular") as state:
+            while not self._stable():
+                if time.monotonic() >= deadline:
+                    state["ok"] = False
+                    break
+                time.sleep(POLL)
+        return state["ok"]
+
+    def network_idle(self, step: str, quiet: float = QUIET, timeout: Optional[float] = None) -> bool:
+        """Attend `quiet` secondes sans requête en vol (depuis le début de l'attente au plus tôt)."""
+        if not self.enabled:
+            return True
+        start = time.monotonic()
+        deadline = start + (timeout or SETTLE_TIMEOUT)
+        with self.timed(step, "network") as state:
+            while True:
+                self.drain()
+                if self.network.quiet_since(start) >= quiet:
+                    break
+                if time.monotonic() >= deadline:
+                    state["ok"] = False
+                    logger.debug("%s : %d requête(s) encore en vol", step, self.network.pending())
+                    break
+                time.sleep(POLL)
+        return state["ok"]
+
+    def settle(self, step: str, timeout: Optional[float] = None) -> bool:
+        """Réseau au repos puis page stable — remplace la pause fixe après une action."""
+        if not self.enabled:
+            return True
+        ok = self.network_idle(step, timeout=timeout)
+        return self.angular(step, timeout=timeout) and ok
+
+    def until(self, step: str, condition: Callable, timeout: Optional[float] = None,
+              required: bool = True):
+        """Attend `condition(driver)` (expected_conditions ou callable) et retourne sa valeur.
+
+        Le délai est d'abord celui appris pour `step` (LatencyModel) ; une
+        attente `required` se prolonge ensuite jusqu'à `timeout` (défaut :
+        timeout du scraper) puis lève TimeoutException. Une attente non
+        requise s'arrête au délai appris et retourne None.
+        """
+        if not self.enabled:
+            try:
+                return condition(self.driver) or None
+            except WebDriverException:
+                return None
+        ceiling = timeout or self.timeout
+        learned = self.latencies.timeout(step, ceiling)
+        t0 = time.perf_counter()
+        with self.timed(step, "element") as state:
+            try:
+                value = WebDriverWait(self.driver, learned, poll_frequency=POLL).until(condition)
+            except TimeoutException:
+                remaining = ceiling - (time.perf_counter() - t0)
+                if not required or remaining <= 0:
+                    state["ok"] = False
+                    if required:
+                        raise
+                    return None
+                logger.info("%s : plus lent que prévu (%.1f s), attente prolongée", step, learned)
+                try:
+                    value = WebDriverWait(self.driver, remaining, poll_frequency=POLL).until(condition)
+                except TimeoutException:
+                    state["ok"] = False
+                    raise
+            self.latencies.observe(step, time.perf_counter() - t0)
+            return value
+
+    def until_js(self, step: str, script: str, *args, timeout: Optional[float] = None,
+                 required: bool = False):
+        """`until` avec un prédicat JavaScript (`return ...;`)."""
+        return self.until(step, lambda d: d.execute_script(script, *args), timeout=timeout, required=required)
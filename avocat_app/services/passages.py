@@ -0,0 +1,341 @@
+"""Passages des jugements longs : découpage, embeddings par passage, recherche et surlignage.
+
+L'embedding d'une analyse couvre résumés, motifs et texte source mis bout à
+bout ; Voyage tronque à VOYAGE_MAX_CHARS, la plus grande partie d'un long
+jugement n'est donc jamais cherchable. Ici, `source_text` est découpé en
+passages qui se chevauchent (PASSAGE_CHARS caractères, PASSAGE_OVERLAP de
+recouvrement, coupés de préférence en fin de paragraphe ou de phrase),
+chacun embarqué séparément dans `decision_passage` :
+
+- seuls les offsets [start, end) sont stockés, pas le texte ; les vecteurs
+  sont en float16 (PASSAGE_EMBEDDING_STORAGE) ;
+- au plus PASSAGE_MAX_PER_DECISION passages par analyse ;
+- index : `PASSAGES` (VectorIndex en mémoire, même cycle de relecture que
+  vector_index) ou, au-delà de ANN_MIN_VECTORS passages, index ANN sur
+  disque sous la clé `<modèle>+passages` (`rebuild_ann_index`) ;
+- search_decisions fusionne le classement des analyses par meilleur passage
+  avec les autres listes et renvoie ce passage (offsets) pour le surlignage.
+
+Sans modèle réel (hash-bow), pas de passages en base : l'index BM25 couvre
+déjà tout le texte, le passage surligné est choisi par `best_lexical_passage`.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+PASSAGE_CHARS = 2000
+PASSAGE_OVERLAP = 200
+MAX_PER_DECISION = 32
+STORAGE = "float16"
+SUFFIX = "+passages"      # clé des index ANN de passages : "<modèle>+passages"
+WRITE_BATCH = 256         # passages embarqués puis écrits ensemble
+
+_BREAKS = ("\n\n", "\n", ". ", "؛ ", "; ", "، ", ", ", " ")
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def index_key(model: str) -> str:
+    return f"{model}{SUFFIX}"
+
+
+def split(text: str, size: Optional[int] = None, overlap: Optional[int] = None,
+          limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Offsets [(start, end)] de passages d'au plus `size` caractères qui se recouvrent d'environ `overlap`.
+
+    Chaque passage finit de préférence sur un saut de paragraphe, puis de
+    ligne, une fin de phrase ou de proposition, à défaut une espace (dans
+    sa seconde moitié) ; le suivant reprend au début du mot.
+    """
+    size = max(200, int(size or _setting("PASSAGE_CHARS", PASSAGE_CHARS)))
+    overlap = min(size // 2, max(0, int(overlap if overlap is not None else
+                                        _setting("PASSAGE_OVERLAP", PASSAGE_OVERLAP))))
+    limit = int(limit or _setting("PASSAGE_MAX_PER_DECISION", MAX_PER_DECISION))
+    spans: List[Tuple[int, int]] = []
+    n = len(text or "")
+    start = 0
+    while start < n and len(spans) < limit:
+        while start < n and text[start].isspace():
+            start += 1
+        if start >= n:
+            break
+        end = min(n, start + size)
+        if end < n:
+            for sep in _BREAKS:
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep.rstrip())
+                    break
+        stop = end
+        while stop > start and text[stop - 1].isspace():
+            stop -= 1
+        spans.append((start, stop))
+        if end >= n:
+            break
+        nxt = max(end - overlap, start + 1)
+        space = text.find(" ", nxt, end)
+        start = space + 1 if space != -1 and nxt > 0 and not text[nxt - 1].isspace() else nxt
+    return spans
+
+
+def _signature(text: str, model: str) -> str:
+    from .embeddings import content_hash
+
+    params = (f"{_setting('PASSAGE_CHARS', PASSAGE_CHARS)}:{_setting('PASSAGE_OVERLAP', PASSAGE_OVERLAP)}:"
+              f"{_setting('PASSAGE_MAX_PER_DECISION', MAX_PER_DECISION)}")
+    return content_hash(f"{params}\0{text}", model)
+
+
+# ---------- Écriture ----------
+
+def reindex_passages(*, model: Optional[str] = None, since=None, force: bool = False,
+                     analyses: Optional[Sequence[object]] = None,
+                     batch_size: Optional[int] = None) -> dict:
+    """Redécoupe et ré-embarque les textes sources qui ont changé (ou tous avec `force`).
+
+    `analyses` : limiter à ces pk (analyze_decision). Les passages d'une
+    analyse sont remplacés en bloc dans une transaction ; un lot en échec
+    (EmbeddingError) est compté dans `failed` et laissé intact.
+    """
+    from django.db.models import Q
+
+    from ..models import DecisionAnalysis, DecisionPassage
+    from .embeddings import EmbeddingError, default_model, embed_texts, hash_model_name
+
+    model = model or default_model()
+    stats = {"analyses": 0, "indexed": 0, "passages": 0, "unchanged": 0, "cleared": 0, "failed": 0,
+             "started": time.monotonic()}
+    if model == hash_model_name():
+        stats["seconds"] = 0.0
+        stats.pop("started")
+        return stats
+    batch_size = max(1, int(batch_size or WRITE_BATCH))
+
+    qs = DecisionAnalysis.objects.order_by("pk")
+    if analyses is not None:
+        qs = qs.filter(pk__in=list(analyses))
+    if since is not None:
+        qs = qs.filter(updated_at__gte=since)
+    known: Dict[object, str] = dict(
+        DecisionPassage.objects.filter(embedding_model=model, analysis__in=qs)
+        .values_list("analysis_id", "source_hash").distinct()
+    )
+
+    pending: List[Tuple[object, str, str, List[Tuple[int, int]]]] = []
+
+    def flush():
+        texts = [text[s:e] for _, text, _, spans in pending for s, e in spans]
+        try:
+            vectors = embed_texts(texts, model) if texts else []
+        except EmbeddingError as e:
+            logger.error("Passages : lot en échec (%d analyses) : %s", len(pending), e)
+            stats["failed"] += len(pending)
+        else:
+            rows, it = [], iter(vectors)
+            for pk, _, digest, spans in pending:
+                rows.extend(
+                    (pk, i, s, e, next(it), digest) for i, (s, e) in enumerate(spans)
+                )
+            _replace(model, [pk for pk, *_ in pending], rows)
+            stats["indexed"] += len(pending)
+            stats["passages"] += len(rows)
+        pending.clear()
+
+    for pk, text in qs.filter(~Q(source_text="") & Q(source_text__isnull=False)) \
+            .values_list("pk", "source_text").iterator(chunk_size=200):
+        stats["analyses"] += 1
+        digest = _signature(text, model)
+        if not force and known.get(pk) == digest:
+            stats["unchanged"] += 1
+            continue
+        spans = split(text)
+        if not spans:
+            continue
+        pending.append((pk, text, digest, spans))
+        if sum(len(p[3]) for p in pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+
+    # Texte source vidé depuis le dernier découpage
+    emptied = list(qs.filter(Q(source_text="") | Q(source_text__isnull=True), pk__in=list(known))
+                   .values_list("pk", flat=True))
+    if emptied:
+        _replace(model, emptied, [])
+        stats["cleared"] = len(emptied)
+
+    stats["seconds"] = round(time.monotonic() - stats.pop("started"), 2)
+    return stats
+
+
+def _replace(model: str, analysis_ids: List[object], rows) -> None:
+    """Remplace les passages `model` de ces analyses par rows [(analysis, position, start, end, vec, hash)]."""
+    from django.db import transaction
+
+    from ..models import DecisionPassage
+    from ..models_fields import encode_vector
+    from . import ann_index
+
+    storage = _setting("PASSAGE_EMBEDDING_STORAGE", STORAGE)
+    with transaction.atomic():
+        old = list(DecisionPassage.objects.filter(analysis_id__in=analysis_ids, embedding_model=model)
+                   .values_list("pk", flat=True))
+        DecisionPassage.objects.filter(pk__in=old).delete()
+        created = DecisionPassage.objects.bulk_create([
+            DecisionPassage(analysis_id=pk, position=i, start=s, end=e, embedding_model=model,
+                            embedding=encode_vector(vec, storage), source_hash=digest)
+            for pk, i, s, e, vec, digest in rows
+        ], batch_size=500)
+    # bulk_create n'envoie pas post_save : prévenir les index nous-mêmes
+    key = index_key(model)
+    for pk in old:
+        PASSAGES.remove(pk)
+        ann_index.append_update(key, pk, None)
+    for passage, row in zip(created, rows):
+        PASSAGES.upsert(passage.pk, model, row[4])
+        ann_index.append_update(key, passage.pk, row[4])
+
+
+# ---------- Index des passages (processus courant) ----------
+
+PASSAGES = VectorIndex()
+_BUILD_LOCK = threading.Lock()
+
+
+def ensure_fresh() -> VectorIndex:
+    """Comme vector_index.ensure_fresh : build paresseux, relecture par `created_at`, reconstruction périodique.
+
+    Les passages ne sont jamais modifiés, seulement remplacés : les
+    suppressions faites par d'autres processus sont écartées à la lecture
+    (search) puis oubliées à la reconstruction suivante.
+    """
+    from .vector_index import MAX_AGE_SECONDS, REFRESH_SECONDS
+
+    now = time.monotonic()
+    max_age = float(_setting("VECTOR_INDEX_MAX_AGE_SECONDS", MAX_AGE_SECONDS))
+    refresh = float(_setting("VECTOR_INDEX_REFRESH_SECONDS", REFRESH_SECONDS))
+    if PASSAGES.built_at and now - PASSAGES.built_at <= max_age and now - PASSAGES.refreshed_at <= refresh:
+        return PASSAGES
+    with _BUILD_LOCK:
+        now = time.monotonic()
+        if not PASSAGES.built_at or now - PASSAGES.built_at > max_age:
+            rebuild()
+        elif now - PASSAGES.refreshed_at > refresh:
+            _refresh_delta()
+    return PASSAGES
+
+
+def _disk_models() -> List[str]:
+    from .ann_index import disk_models
+
+    return [m[:-len(SUFFIX)] for m in disk_models() if m.endswith(SUFFIX)]
+
+
+def rebuild() -> int:
+    from django.db.models import Max
+
+    from ..models import DecisionPassage
+
+    t0 = time.perf_counter()
+    watermark = DecisionPassage.objects.aggregate(m=Max("created_at"))["m"]
+    excluded = _disk_models()
+    rows = (DecisionPassage.objects.filter(analysis__is_deleted=False).exclude(embedding_model__in=excluded)
+            .exclude(embedding__isnull=True).values_list("pk", "embedding_model", "embedding")
+            .iterator(chunk_size=2000))
+    count = PASSAGES.load(rows, excluded=excluded)
+    PASSAGES.watermark = watermark
+    logger.info("Index des passages : %d vecteur(s) chargés en %.2f s", count, time.perf_counter() - t0)
+    return count
+
+
+def _refresh_delta() -> None:
+    from ..models import DecisionPassage
+
+    qs = DecisionPassage.objects.exclude(embedding__isnull=True)
+    if PASSAGES.watermark is not None:
+        qs = qs.filter(created_at__gte=PASSAGES.watermark)
+    watermark = PASSAGES.watermark
+    for pk, model, emb, created_at in qs.values_list("pk", "embedding_model", "embedding", "created_at") \
+            .iterator(chunk_size=2000):
+        PASSAGES.upsert(pk, model, emb)
+        if watermark is None or created_at > watermark:
+            watermark = created_at
+    PASSAGES.watermark = watermark
+    PASSAGES.refreshed_at = time.monotonic()
+
+
+@receiver(post_delete, sender="avocat_app.DecisionPassage")
+def decision_passage_post_delete(sender, instance, **kwargs):
+    PASSAGES.remove(instance.pk)
+
+
+# ---------- Recherche ----------
+
+def search(model: str, query_vec, k: int) -> List[Tuple[object, float, Tuple[int, int]]]:
+    """Analyses classées par leur meilleur passage : [(analysis_pk, cosinus, (start, end))].
+
+    `k` passages sont lus (ANN `<modèle>+passages` s'il existe, sinon
+    l'index en mémoire) ; leurs offsets sont relus en base, ce qui écarte
+    aussi les passages remplacés entre-temps.
+    """
+    from ..models import DecisionPassage
+    from . import ann_index
+
+    ann = ann_index.get(index_key(model))
+    memory = None
+    if ann is not None:
+        hits = ann.search(query_vec, k)
+    else:
+        memory = ensure_fresh()
+        hits = memory.search(model, query_vec, k)
+    hits = [(pk, score) for pk, score in hits if score > 0]
+    if not hits:
+        return []
+    spans = {
+        pk: (analysis_id, start, end)
+        for pk, analysis_id, start, end in DecisionPassage.objects
+        .filter(pk__in=[pk for pk, _ in hits], embedding_model=model)
+        .values_list("pk", "analysis_id", "start", "end")
+    }
+    best: Dict[object, Tuple[float, Tuple[int, int]]] = {}
+    for pk, score in hits:
+        span = spans.get(pk)
+        if span is None:
+            if memory is not None:
+                memory.remove(pk)
+            continue
+        analysis_id, start, end = span
+        if analysis_id not in best:  # hits triés : le premier est le meilleur
+            best[analysis_id] = (score, (start, end))
+    return [(pk, score, span) for pk, (score, span) in best.items()]
+
+
+def best_lexical_passage(text: str, query: str) -> Optional[Tuple[int, int]]:
+    """Passage de `text` qui contient le plus de termes de la requête (BM25 simplifié), None sans terme commun."""
+    from .lexical_index import terms
+
+    wanted = set(terms(query))
+    if not text or not wanted:
+        return None
+    best, best_score = None, 0.0
+    for start, end in split(text):
+        found = [t for t in terms(text[start:end]) if t in wanted]
+        # Termes distincts d'abord, répétitions ensuite
+        score = len(set(found)) + 0.1 * min(len(found), 20)
+        if score > best_score:
+            best, best_score = (start, end), score
+    return best
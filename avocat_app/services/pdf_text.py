@@ -0,0 +1,287 @@
+"""Texte des PDF joints (PieceJointe), extrait une seule fois par contenu.
+
+`ai_client.extract_text_from_pdf` relisait tout le PDF avec pypdf à chaque
+analyse. Le texte est désormais conservé dans `piece_text` (zlib + début de
+chaque page) et relu par l'analyse IA (donc les embeddings et les passages),
+la fiche de l'attachement et l'index de recherche.
+
+- `get_text(piece)` / `get(piece)` : texte à jour, extrait au besoin ;
+- une ligne est périmée quand le nom ou la taille du fichier change ;
+  files_views l'invalide explicitement (écrasement sous le même nom) ;
+- avant toute lecture, le sha256 du fichier est cherché parmi les textes
+  existants : un même PDF joint à deux affaires n'est lu qu'une fois ;
+- au-delà de PDF_TEXT_PARALLEL_MIN_PAGES pages, les plages de
+  PDF_TEXT_PAGES_PER_CHUNK pages sont réparties sur un pool de processus
+  (`spawn`, PDF_TEXT_WORKERS) : pypdf est du Python pur, les threads ne
+  paralléliseraient rien. Lecture séquentielle dans l'application de bureau
+  (DESKTOP_MODE, binaire PyInstaller) ;
+- chaque nouveau PDF est extrait en tâche de fond (`pdf.extract_text`) ;
+  `python manage.py extract_pdf_text` rattrape l'existant.
+
+Les fonctions exécutées dans le pool n'utilisent ni la base ni les modèles
+(compatibilité `spawn`).
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .jobs import handler
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_TEXT = "pdf.extract_text"
+
+PAGES_PER_CHUNK = 16
+PARALLEL_MIN_PAGES = 32
+PAGE_SEPARATOR = "\n\n"
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def is_pdf(piece) -> bool:
+    name = getattr(piece.fichier, "name", "") or ""
+    return piece.type_piece == "PDF" or name.lower().endswith(".pdf")
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------- Extraction (sans base : exécutable dans le pool) ----------
+
+def _reader(path: str):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader  # type: ignore
+    return PdfReader(path)
+
+
+def read_pages(path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Texte des pages [start, end) ; une page illisible donne ''."""
+    reader = _reader(path)
+    pages = reader.pages
+    out = []
+    for i in range(start, len(pages) if end is None else min(end, len(pages))):
+        try:
+            out.append(pages[i].extract_text() or "")
+        except Exception:
+            out.append("")
+    return out
+
+
+def _parallel_allowed() -> bool:
+    """Pas de pool dans l'application de bureau (binaire figé, worker embarqué)."""
+    return not getattr(sys, "frozen", False) and not _setting("DESKTOP_MODE", False)
+
+
+def _workers() -> int:
+    workers = int(_setting("PDF_TEXT_WORKERS", 0) or 0)
+    return workers if workers > 0 else min(4, os.cpu_count() or 1)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool():
+    """Pool de processus partagé par le processus courant (créé au premier gros PDF)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            _POOL = ProcessPoolExecutor(max_workers=_workers(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_reset_pool, wait=True)
+        return _POOL
+
+
+def _reset_pool(wait: bool = False) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=wait, cancel_futures=True)
+        _POOL = None
+
+
+def extract_pages(path: str) -> List[str]:
+    """Texte de chaque page ; les gros PDF sont découpés par plages sur le pool."""
+    total = len(_reader(path).pages)
+    chunk = max(1, int(_setting("PDF_TEXT_PAGES_PER_CHUNK", PAGES_PER_CHUNK)))
+    if (total < int(_setting("PDF_TEXT_PARALLEL_MIN_PAGES", PARALLEL_MIN_PAGES)) or _workers() < 2
+            or not _parallel_allowed()):
+        return read_pages(path, 0, total)
+
+    from concurrent.futures.process import BrokenProcessPool
+
+    starts = range(0, total, chunk)
+    try:
+        futures = [_pool().submit(read_pages, path, s, s + chunk) for s in starts]
+        return [page for f in futures for page in f.result()]
+    except BrokenProcessPool:
+        # Worker tué (mémoire, signal) : pool recréé au prochain appel, lecture séquentielle
+        logger.warning("Pool d'extraction PDF interrompu, lecture séquentielle de %s", path)
+        _reset_pool()
+        return read_pages(path, 0, total)
+
+
+# ---------- Cache en base ----------
+
+def text_of(row) -> str:
+    return zlib.decompress(bytes(row.text)).decode("utf-8") if row.text else ""
+
+
+def pages_of(row) -> List[str]:
+    """Pages du texte stocké (séparateur retiré)."""
+    text, offsets = text_of(row), list(row.page_offsets or [])
+    bounds = offsets[1:] + [len(text) + len(PAGE_SEPARATOR)]
+    return [text[start:end - len(PAGE_SEPARATOR)] for start, end in zip(offsets, bounds)]
+
+
+def page_at(row, position: int) -> int:
+    """Numéro de page (1-based) contenant l'offset `position` du texte."""
+    from bisect import bisect_right
+
+    return max(1, bisect_right(list(row.page_offsets or []), position))
+
+
+def _file_state(piece):
+    path = piece.fichier.path
+    return path, os.path.getsize(path)
+
+
+def is_fresh(row, piece) -> bool:
+    try:
+        _, size = _file_state(piece)
+    except (OSError, ValueError, NotImplementedError):
+        return False
+    return row.file_name == piece.fichier.name and row.file_size == size
+
+
+def cached(piece):
+    """Ligne à jour pour cette pièce, sans extraction (None sinon)."""
+    from ..models import PieceText
+
+    row = PieceText.objects.filter(piece=piece).first()
+    return row if row is not None and is_fresh(row, piece) else None
+
+
+def get(piece, *, force: bool = False):
+    """PieceText à jour (extrait au besoin), None si la pièce n'est pas un PDF lisible."""
+    if not piece.fichier or not is_pdf(piece):
+        return None
+    row = None if force else cached(piece)
+    if row is not None:
+        return row
+    try:
+        return extract(piece, force=force)
+    except (OSError, ValueError, NotImplementedError):
+        logger.warning("PDF introuvable pour la pièce %s", piece.pk, exc_info=True)
+        return None
+
+
+def get_text(piece) -> str:
+    row = get(piece)
+    return text_of(row) if row is not None and not row.error else ""
+
+
+def extract(piece, *, force: bool = False):
+    """Extrait (ou recopie, même sha256) le texte du fichier de `piece` et l'enregistre."""
+    from django.utils import timezone
+
+    from ..models import PieceText
+
+    path, size = _file_state(piece)
+    digest = file_hash(path)
+    started = time.monotonic()
+    same = None
+    if not force:
+        same = (PieceText.objects.filter(content_hash=digest, error="")
+                .exclude(piece=piece).only("text", "page_offsets", "chars").first())
+    if same is not None:
+        blob, offsets, chars, error = bytes(same.text), list(same.page_offsets), same.chars, ""
+    else:
+        error = ""
+        try:
+            pages = extract_pages(path)
+        except Exception as e:
+            logger.exception("Extraction PDF impossible (%s)", path)
+            pages, error = [], str(e)[:500]
+        offsets, position = [], 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + len(PAGE_SEPARATOR)
+        text = PAGE_SEPARATOR.join(pages)
+        blob, chars = zlib.compress(text.encode("utf-8"), 6), len(text)
+
+    # update_or_create : deux extractions simultanées de la même pièce gardent la dernière
+    row, _ = PieceText.objects.update_or_create(piece=piece, defaults={
+        "content_hash": digest, "file_name": piece.fichier.name, "file_size": size,
+        "text": blob, "page_offsets": offsets, "chars": chars, "error": error,
+        "seconds": round(time.monotonic() - started, 3), "extracted_at": timezone.now(),
+    })
+    logger.info("Texte PDF %s : %d pages, %d caractères en %.2f s%s", piece.pk, len(offsets), chars,
+                row.seconds, " (copie d'un contenu identique)" if same is not None else "")
+    return row
+
+
+def invalidate(piece) -> None:
+    """Supprime le texte stocké de la pièce (fichier remplacé)."""
+    from ..models import PieceText
+
+    PieceText.objects.filter(piece_id=piece.pk).delete()
+
+
+# ---------- Tâche de fond ----------
+
+@handler(EXTRACT_TEXT)
+def extract_text_job(ctx, piece_id):
+    from ..models import PieceJointe
+
+    piece = PieceJointe.all_objects.filter(pk=piece_id).first()
+    if piece is None or not piece.fichier or not is_pdf(piece):
+        return {"pages": 0}
+    ctx.update(phase="extract", message="جاري استخراج النص من ملف PDF...")
+    row = get(piece)
+    return {"pages": len(row.page_offsets) if row else 0, "chars": row.chars if row else 0}
+
+
+@receiver(post_save, sender="avocat_app.PieceJointe")
+def _schedule_extraction(sender, instance, **kwargs):
+    if not instance.fichier or not is_pdf(instance):
+        return
+    try:
+        from avocat_app.sync_signals import _is_suppressed
+    except ImportError:
+        _is_suppressed = None
+    if _is_suppressed is not None and _is_suppressed():
+        return  # lignes tirées par la synchronisation : le binaire arrive plus tard
+    if cached(instance) is not None:
+        return
+    from django.db import transaction
+
+    from .jobs import enqueue
+
+    transaction.on_commit(lambda: enqueue(EXTRACT_TEXT, {"piece_id": str(instance.pk)},
+                                          message="استخراج النص في الانتظار..."))
@@ -0,0 +1,78 @@
+"""Recherche d'une Partie par numéro de téléphone (bot WhatsApp, portail client).
+
+Chaque Partie porte deux colonnes dérivées de `telephone`, recalculées à
+chaque `save()` :
+
+- `telephone_e164` : numéro normalisé comme pour l'envoi Twilio
+  (`twilio_client._normalize_to_e164` : 06… → +2126…) ;
+- `telephone_suffix` : ses SUFFIX_LEN derniers chiffres, indexé.
+
+Les formats saisis varient (0612…, +212 6 12…, 00212…) mais les 8 derniers
+chiffres sont stables : la recherche est un accès par index sur le suffixe,
+puis le numéro E.164 exact est préféré parmi les quelques candidats. Le
+temps de réponse du webhook ne dépend plus du nombre de clients.
+
+Backfill : migration 0038, puis `python manage.py rebuild_phone_index`
+après un import fait hors de l'ORM.
+"""
+from __future__ import annotations
+
+import re
+from typing import Tuple
+
+SUFFIX_LEN = 8
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def phone_suffix(phone: str) -> str:
+    return _NON_DIGITS.sub("", str(phone or ""))[-SUFFIX_LEN:]
+
+
+def phone_keys(phone: str) -> Tuple[str, str]:
+    """(E.164 ou "", suffixe) pour un numéro saisi librement ou reçu de Twilio."""
+    from .twilio_client import _normalize_to_e164
+
+    raw = str(phone or "").replace("whatsapp:", "").strip()
+    if not raw:
+        return "", ""
+    return _normalize_to_e164(raw) or "", phone_suffix(raw)
+
+
+def find_partie_by_phone(phone: str):
+    """Partie dont le téléphone se termine par les mêmes SUFFIX_LEN chiffres (E.164 exact en priorité)."""
+    from ..models import Partie
+
+    e164, suffix = phone_keys(phone)
+    if not suffix:
+        return None
+    candidates = list(Partie.objects.filter(telephone_suffix=suffix).order_by("created_at")[:20])
+    for p in candidates:
+        if e164 and p.telephone_e164 == e164:
+            return p
+    return candidates[0] if candidates else None
+
+
+def rebuild(batch_size: int = 1000) -> Tuple[int, int]:
+    """Recalcule les colonnes dérivées de toutes les parties. Retourne (parcourues, modifiées)."""
+    from ..models import Partie
+
+    seen = changed = 0
+    batch = []
+    for p in Partie.all_objects.only("pk", "telephone", "telephone_e164", "telephone_suffix").iterator(
+        chunk_size=batch_size,
+    ):
+        seen += 1
+        keys = phone_keys(p.telephone)
+        if keys != (p.telephone_e164, p.telephone_suffix):
+            p.telephone_e164, p.telephone_suffix = keys
+            batch.append(p)
+        if len(batch) >= batch_size:
+            Partie.all_objects.bulk_update(batch, ["telephone_e164", "telephone_suffix"])
+            changed += len(batch)
+            batch = []
+    if batch:
+        Partie.all_objects.bulk_update(batch, ["telephone_e164", "telephone_suffix"])
+        changed += len(batch)
+    return seen, changed
+
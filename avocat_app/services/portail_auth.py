@@ -19,6 +19,7 @@ from django.conf import settings
 from django.utils import timezone
 
 from ..models import Partie, PortailAccess
+from .phone_lookup import find_partie_by_phone
 
 
 PORTAIL_COOKIE_NAME = "portail_session"
@@ -42,16 +43,8 @@ def find_partie(identifier: str) -> Optional[Partie]:
     # Email
     if "@" in identifier:
         return Partie.objects.filter(email__iexact=identifier).first()
-    # Téléphone : matcher sur les 8 derniers chiffres
-    digits = re.sub(r"\D", "", identifier)
-    if not digits:
-        return None
-    last8 = digits[-8:]
-    for p in Partie.objects.exclude(telephone__isnull=True).exclude(telephone__exact=""):
-        tdigits = re.sub(r"\D", "", p.telephone or "")
-        if tdigits.endswith(last8):
-            return p
-    return None
+    # Téléphone : index sur les 8 derniers chiffres
+    return find_partie_by_phone(identifier)
 
 
 def issue_token(partie: Partie, *, request=None, ttl_hours: int = DEFAULT_TOKEN_TTL_HOURS) -> PortailAccess:
@@ -0,0 +1,330 @@
+"""Calcul des taxes judiciaires avec mémoïsation (caisseenligne.justice.gov.ma).
+
+`MahakimScraper.calculate_tax` ouvre Chrome et remplit le formulaire à chaque
+appel. Ici, chaque résultat obtenu du site est conservé dans
+`TaxCalculationSample`, et un calcul est servi, dans l'ordre :
+
+1. mémoire du processus (LRU) — même combinaison, même montant ;
+2. table `tax_calculation_sample` — résultat déjà obtenu du site ;
+3. règle inférée — pour une combinaison (nature, type_maqal, categorie,
+   type_qadiya, type_talab) et une tranche de montant (ordre de grandeur),
+   au moins TAX_RULE_MIN_SAMPLES échantillons tous égaux (taxe fixe) ou
+   alignés (taxe fixe + proportionnelle) ; appliquée uniquement entre le
+   plus petit et le plus grand montant observés de la tranche. Le total
+   extrapolé n'a pas été vérifié sur le site : il est servi comme
+   estimation (`estimate: True`), et `estimates=False` l'écarte ;
+4. Selenium, puis enregistrement du nouvel échantillon.
+
+La commande `prewarm_tax_cache` alimente la table pour les combinaisons
+les plus demandées.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ("nature", "type_maqal", "categorie", "type_qadiya", "type_talab")
+MEMO_SIZE = 4096
+CENT = Decimal("0.01")
+
+# « 1 234,50 » / « 1.234,50 » (groupes de 3 chiffres) ou « 1234.50 »
+_NUMBER = r"\d{1,3}(?:[ \u00a0\u202f.,]\d{3})+(?:[.,]\d{1,2})?(?!\d)|\d+(?:[.,]\d{1,2})?"
+_TOTAL_RE = re.compile(r"المجموع[^\d]{0,40}(" + _NUMBER + ")")
+
+
+def _money(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def bracket_of(montant: Decimal) -> int:
+    """Tranche = ordre de grandeur du montant (0 pour moins de 10 DH)."""
+    return int(math.floor(math.log10(montant))) if montant >= 10 else 0
+
+
+def parse_amount(raw: str) -> Optional[Decimal]:
+    """« 1 234,50 », « 1.234,50 », « 1234.50 » → Decimal."""
+    s = re.sub(r"\s", "", raw or "").strip(".,")
+    if not s:
+        return None
+    if "," in s and "." in s:
+        # Le dernier séparateur est le séparateur décimal
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    elif "," in s:
+        head, _, tail = s.rpartition(",")
+        s = f"{head.replace(',', '')}.{tail}" if len(tail) in (1, 2) else s.replace(",", "")
+    elif s.count(".") > 1 or (s.count(".") == 1 and len(s.rpartition(".")[2]) == 3):
+        s = s.replace(".", "")
+    return _money(s)
+
+
+def parse_total(text: str) -> Optional[Decimal]:
+    """Montant qui suit « المجموع » dans le texte du résultat, sinon None.
+
+    Pas de repli sur le plus grand nombre du texte : ce serait souvent le
+    montant demandé, et un total faux fausserait les règles inférées.
+    """
+    m = _TOTAL_RE.search(text or "")
+    return parse_amount(m.group(1)) if m else None
+
+
+# ---------- Inférence de la formule ----------
+
+@dataclass(frozen=True)
+class TaxRule:
+    """total = fixe + taux × montant, valable sur [lo, hi]."""
+    fixed: Decimal
+    rate: Decimal
+    lo: Decimal
+    hi: Decimal
+    samples: int
+
+    def applies(self, montant: Decimal) -> bool:
+        return self.lo <= montant <= self.hi
+
+    def total(self, montant: Decimal) -> Decimal:
+        return (self.fixed + self.rate * montant).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def infer_rule(samples: Sequence[Tuple[Decimal, Decimal]], min_samples: int = 3,
+               tolerance: Decimal = Decimal("0.5")) -> Optional[TaxRule]:
+    """Règle fixe ou affine cohérente avec tous les échantillons (montant, total), sinon None."""
+    points = sorted({m: t for m, t in samples if t is not None}.items())
+    if len(points) < min_samples:
+        return None
+    (m1, t1), (m2, t2) = points[0], points[-1]
+    if m2 == m1:
+        return None
+    rate = (t2 - t1) / (m2 - m1)
+    fixed = t1 - rate * m1
+    for m, t in points:
+        if abs(fixed + rate * m - t) > tolerance:
+            return None
+    if abs(rate) < Decimal("1e-9"):
+        rate = Decimal(0)
+    return TaxRule(fixed=fixed, rate=rate, lo=m1, hi=m2, samples=len(points))
+
+
+# ---------- Mémoire du processus ----------
+
+class _Memo:
+    """LRU des résultats + règles par (combinaison, tranche)."""
+
+    def __init__(self, size: int = MEMO_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.results: "OrderedDict[tuple, dict]" = OrderedDict()
+        self.rules: Dict[tuple, Optional[TaxRule]] = {}
+        self.stats = {"memo": 0, "cache": 0, "rule": 0, "site": 0}
+
+    def get(self, key):
+        with self.lock:
+            value = self.results.get(key)
+            if value is not None:
+                self.results.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.results[key] = value
+            self.results.move_to_end(key)
+            while len(self.results) > self.size:
+                self.results.popitem(last=False)
+
+    def forget_rules(self, combo):
+        """Nouvel échantillon pour `combo` : règles et résultats estimés à recalculer."""
+        with self.lock:
+            for k in [k for k in self.rules if k[0] == combo]:
+                del self.rules[k]
+            for k in [k for k, v in self.results.items() if k[:-1] == combo and v["source"] == "rule"]:
+                del self.results[k]
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+            self.rules.clear()
+
+
+memo = _Memo()
+
+
+def _combo(params: dict) -> tuple:
+    return tuple((params.get(f) or "").strip() for f in KEY_FIELDS)
+
+
+def _rule_for(combo: tuple, bracket: int) -> Optional[TaxRule]:
+    from ..models import TaxCalculationSample
+
+    key = (combo, bracket)
+    with memo.lock:
+        if key in memo.rules:
+            return memo.rules[key]
+    rows = (TaxCalculationSample.objects
+            .filter(bracket=bracket, total__isnull=False, **dict(zip(KEY_FIELDS, combo)))
+            .values_list("montant", "total"))
+    rule = infer_rule(list(rows), min_samples=int(getattr(settings, "TAX_RULE_MIN_SAMPLES", 3)))
+    with memo.lock:
+        memo.rules[key] = rule
+    return rule
+
+
+def _response(total, text="", html="", source="", error=None, estimate=False) -> dict:
+    return {
+        "success": error is None,
+        "total": str(total) if total is not None else None,
+        "result_text": text,
+        "result_html": html,
+        "source": source,
+        "estimate": estimate,
+        "error_message": error,
+    }
+
+
+def lookup(nature, type_maqal, categorie, type_qadiya, type_talab, montant,
+           estimates: bool = True) -> Optional[dict]:
+    """Résultat sans appel au site (mémoire, table, règle), ou None.
+
+    `estimates=False` : seulement des totaux obtenus du site, jamais une règle extrapolée.
+    """
+    from django.db.models import F
+
+    from ..models import TaxCalculationSample
+
+    amount = _money(montant)
+    if amount is None:
+        return None
+    combo = _combo(dict(zip(KEY_FIELDS, (nature, type_maqal, categorie, type_qadiya, type_talab))))
+    key = combo + (amount,)
+
+    cached = memo.get(key)
+    if cached is not None and (estimates or not cached["estimate"]):
+        memo.stats["memo"] += 1
+        return cached
+
+    sample = (TaxCalculationSample.objects
+              .filter(montant=amount, **dict(zip(KEY_FIELDS, combo)))
+              .only("pk", "total", "result_text", "result_html").first())
+    if sample is not None:
+        TaxCalculationSample.objects.filter(pk=sample.pk).update(hits=F("hits") + 1)
+        memo.stats["cache"] += 1
+        result = _response(sample.total, sample.result_text, sample.result_html, "cache")
+        memo.put(key, result)
+        return result
+
+    if not estimates:
+        return None
+    rule = _rule_for(combo, bracket_of(amount))
+    if rule is not None and rule.applies(amount):
+        memo.stats["rule"] += 1
+        total = rule.total(amount)
+        result = _response(total, f"المجموع: {total} درهم (تقدير محلي غير مؤكد)", "", "rule", estimate=True)
+        memo.put(key, result)
+        return result
+    return None
+
+
+def store(nature, type_maqal, categorie, type_qadiya, type_talab, montant, data: dict) -> Optional[dict]:
+    """Enregistre un résultat du site (dict de `calculate_tax`) et invalide les règles de la combinaison."""
+    from ..models import TaxCalculationSample
+
+    amount = _money(montant)
+    if amount is None or not data.get("success"):
+        return None
+    combo = _combo(dict(zip(KEY_FIELDS, (nature, type_maqal, categorie, type_qadiya, type_talab))))
+    total = parse_total(data.get("result_text", ""))
+    TaxCalculationSample.objects.update_or_create(
+        montant=amount, **dict(zip(KEY_FIELDS, combo)),
+        defaults={
+            "bracket": bracket_of(amount),
+            "total": total,
+            "result_text": data.get("result_text", ""),
+            "result_html": data.get("result_html", ""),
+        },
+    )
+    memo.forget_rules(combo)
+    result = _response(total, data.get("result_text", ""), data.get("result_html", ""), "site")
+    memo.put(combo + (amount,), result)
+    return result
+
+
+def calculate(nature, type_maqal, categorie, type_qadiya, type_talab, montant,
+              scraper=None, progress_callback: Optional[Callable] = None, estimates: bool = True) -> dict:
+    """Calcul mémoïsé ; Selenium seulement en cas d'absence locale.
+
+    `scraper` : MahakimScraper déjà ouvert (réutilisé pour plusieurs calculs),
+    sinon un navigateur headless est lancé pour ce calcul. `estimates=False` :
+    une estimation par règle ne suffit pas, le site est interrogé.
+    """
+    args = (nature, type_maqal, categorie, type_qadiya, type_talab, montant)
+    found = lookup(*args, estimates=estimates)
+    if found is not None:
+        return found
+    if _money(montant) is None:
+        return _response(None, source="", error="مبلغ غير صالح")
+
+    if scraper is None:
+        from .mahakim_scraper import MahakimScraper
+
+        with MahakimScraper(headless=True) as own:
+            data = own.calculate_tax(*args, progress_callback=progress_callback)
+    else:
+        data = scraper.calculate_tax(*args, progress_callback=progress_callback)
+
+    if not data.get("success"):
+        return _response(None, source="site", error=data.get("error_message") or "فشل الحساب")
+    memo.stats["site"] += 1
+    return store(*args, data)
+
+
+# ---------- Pré-chauffage ----------
+
+def default_amounts() -> List[Decimal]:
+    raw = getattr(settings, "TAX_PREWARM_AMOUNTS", None) or [1000, 5000, 10000, 20000, 50000, 100000, 500000, 1000000]
+    return [a for a in (_money(x) for x in raw) if a is not None]
+
+
+def tree_combinations(options_tree: dict) -> List[dict]:
+    """Combinaisons (sans montant) décrites par l'arbre de `TaxCalculatorCache`."""
+    types_talab = [t.get("value", "") for t in options_tree.get("types_talab", [])
+                   if t.get("value") and t.get("label") != "اختيار"] or [""]
+    combos = []
+    for nature, nat in (options_tree.get("natures") or {}).items():
+        for tm in nat.get("type_maqal", []):
+            for cat in tm.get("categories", []):
+                for tq in cat.get("types_qadiya", []):
+                    value = tq.get("value") if isinstance(tq, dict) else tq
+                    for tt in types_talab:
+                        combos.append({
+                            "nature": nature, "type_maqal": tm.get("value", ""),
+                            "categorie": cat.get("value", ""), "type_qadiya": value,
+                            "type_talab": tt,
+                        })
+    return combos
+
+
+def popular_combinations(limit: int) -> List[dict]:
+    """Combinaisons les plus consultées (somme des hits des échantillons)."""
+    from django.db.models import Count, Sum
+
+    from ..models import TaxCalculationSample
+
+    rows = (TaxCalculationSample.objects
+            .values(*KEY_FIELDS)
+            .annotate(h=Sum("hits"), n=Count("id"))
+            .order_by("-h", "-n")[:limit])
+    return [{f: r[f] for f in KEY_FIELDS} for r in rows]
@@ -13,6 +13,13 @@ from urllib.parse import urlparse
 from django.conf import settings
 
 
+def compute_signature(url: str, params, auth_token: str) -> str:
+    """Signature X-Twilio-Signature attendue pour `url` + paramètres POST."""
+    payload = url + "".join(k + v for k, v in sorted(params))
+    mac = hmac.new(auth_token.encode("utf-8"), payload.encode("utf-8"), hashlib.sha1)
+    return base64.b64encode(mac.digest()).decode()
+
+
 def validate_twilio_signature(request) -> bool:
     """Retourne True si la signature X-Twilio-Signature est valide.
 
@@ -31,8 +38,5 @@ def validate_twilio_signature(request) -> bool:
     # Twilio attend l'URL sans le port standard, etc. — on garde tel quel
     parsed = urlparse(url)
     # Concaténer URL + params triés
-    params = sorted(request.POST.items())
-    payload = url + "".join(k + v for k, v in params)
-    mac = hmac.new(auth_token.encode("utf-8"), payload.encode("utf-8"), hashlib.sha1)
-    expected = base64.b64encode(mac.digest()).decode()
+    expected = compute_signature(url, request.POST.items(), auth_token)
     return hmac.compare_digest(expected, signature)
@@ -0,0 +1,302 @@
+"""Index vectoriel en mémoire pour la recherche jurisprudentielle (search_decisions).
+
+Par processus et par `embedding_model`, une matrice float32 (n × dim) des
+embeddings normalisés L2 et le tableau des ids correspondants :
+
+- construction paresseuse à la première recherche (`values_list` sur
+  id / embedding_model / embedding, sans jointure) ;
+- tenu à jour par `post_save` / `post_delete` sur DecisionAnalysis dans le
+  processus courant, et toutes les VECTOR_INDEX_REFRESH_SECONDS par une
+  relecture des lignes modifiées depuis le dernier `updated_at` vu (écritures
+  des autres workers gunicorn, du worker de tâches) ; reconstruction
+  complète après VECTOR_INDEX_MAX_AGE_SECONDS (suppressions définitives,
+  lignes reçues par la synchronisation avec un `updated_at` antérieur) ;
+- les modèles qui ont un index ANN sur disque (ann_index) ne sont pas
+  chargés : la matrice complète serait trop lourde par worker ;
+- requête : un produit matrice-vecteur puis `argpartition` pour le top-k.
+
+Les objets sont ensuite chargés par un seul `in_bulk` (search_decisions).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 30.0
+MAX_AGE_SECONDS = 3600.0
+
+
+def normalized(vec: Sequence[float]) -> Optional[np.ndarray]:
+    """Vecteur float32 de norme 1 (None si vide ou nul)."""
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v)) if v.size else 0.0
+    if not norm or not np.isfinite(norm):
+        return None
+    return v / norm
+
+
+class VectorSegment:
+    """Vecteurs d'un même modèle : matrice à capacité croissante, suppression par permutation."""
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.matrix = np.zeros((max(1, capacity), dim), dtype=np.float32)
+        self.ids: List[object] = []
+        self.rows: Dict[object, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, pk, vec: np.ndarray) -> None:
+        row = self.rows.get(pk)
+        if row is None:
+            row = len(self.ids)
+            if row >= len(self.matrix):
+                grown = np.zeros((len(self.matrix) * 2, self.dim), dtype=np.float32)
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+            self.ids.append(pk)
+            self.rows[pk] = row
+        self.matrix[row] = vec
+
+    def extend(self, pks: Sequence[object], block: np.ndarray) -> None:
+        """Ajout groupé de vecteurs déjà normalisés (ids absents du segment)."""
+        start, n = len(self.ids), len(pks)
+        if start + n > len(self.matrix):
+            grown = np.zeros((max(start + n, len(self.matrix) * 2), self.dim), dtype=np.float32)
+            grown[:start] = self.matrix[:start]
+            self.matrix = grown
+        self.matrix[start:start + n] = block
+        for i, pk in enumerate(pks):
+            self.rows[pk] = start + i
+        self.ids.extend(pks)
+
+    def remove(self, pk) -> bool:
+        row = self.rows.pop(pk, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+        return True
+
+    def top_k(self, q: np.ndarray, k: int) -> List[Tuple[object, float]]:
+        n = len(self.ids)
+        if not n or k <= 0:
+            return []
+        scores = self.matrix[:n] @ q
+        k = min(k, n)
+        idx = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in idx]
+
+
+class VectorIndex:
+    """Segments par modèle d'embedding, protégés par un verrou (workers multi-threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segments: Dict[str, VectorSegment] = {}
+        self._models: Dict[object, str] = {}
+        self.excluded: Set[str] = set()  # modèles servis par un index ANN sur disque (ann_index)
+        self.built_at = 0.0      # time.monotonic() du dernier chargement complet
+        self.refreshed_at = 0.0  # ... de la dernière relecture (complète ou delta)
+        self.watermark = None    # plus grand updated_at vu en base
+
+    # ---------- Maintenance ----------
+
+    def clear(self) -> None:
+        with self._lock:
+            self._segments.clear()
+            self._models.clear()
+            self.built_at = self.refreshed_at = 0.0
+            self.watermark = None
+
+    def upsert(self, pk, model: Optional[str], embedding) -> None:
+        """Ajoute ou remplace un vecteur ; sans modèle ou vecteur exploitable → retiré."""
+        vec = normalized(embedding) if model and embedding is not None else None
+        with self._lock:
+            if not self.built_at:
+                return
+            if vec is None or model in self.excluded:
+                self._remove(pk)
+                return
+            if self._models.get(pk) not in (None, model):
+                self._remove(pk)
+            seg = self._segments.get(model)
+            if seg is None:
+                seg = self._segments[model] = VectorSegment(vec.size)
+            elif seg.dim != vec.size:
+                logger.warning("Embedding %s ignoré : dimension %d ≠ %d (%s)", pk, vec.size, seg.dim, model)
+                self._remove(pk)
+                return
+            seg.upsert(pk, vec)
+            self._models[pk] = model
+
+    def remove(self, pk) -> None:
+        with self._lock:
+            self._remove(pk)
+
+    def _remove(self, pk) -> None:
+        model = self._models.pop(pk, None)
+        if model is not None:
+            self._segments[model].remove(pk)
+
+    def load(self, rows: Iterable[Tuple[object, str, Sequence[float]]], chunk: int = 2048,
+             excluded: Iterable[str] = ()) -> int:
+        """(Re)construit l'index à partir de (pk, modèle, embedding). Retourne le nombre de vecteurs."""
+        excluded = set(excluded)
+        segments: Dict[str, VectorSegment] = {}
+        models: Dict[object, str] = {}
+        dims: Dict[str, int] = {}
+        pending: Dict[str, Tuple[list, list]] = {}
+
+        def flush(model):
+            pks, vecs = pending.pop(model)
+            block = np.asarray(vecs, dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1)
+            ok = np.isfinite(norms) & (norms > 0)
+            block = block[ok] / norms[ok, None]
+            pks = [pk for pk, keep in zip(pks, ok) if keep]
+            seg = segments.get(model)
+            if seg is None:
+                seg = segments[model] = VectorSegment(block.shape[1], capacity=max(1024, len(pks)))
+            seg.extend(pks, block)
+            models.update((pk, model) for pk in pks)
+
+        for pk, model, emb in rows:
+            if not model or model in excluded or emb is None or not len(emb):
+                continue
+            if len(emb) != dims.setdefault(model, len(emb)):
+                continue
+            pks, vecs = pending.setdefault(model, ([], []))
+            pks.append(pk)
+            vecs.append(emb)
+            if len(pks) >= chunk:
+                flush(model)
+        for model in list(pending):
+            flush(model)
+
+        now = time.monotonic()
+        with self._lock:
+            self._segments, self._models, self.excluded = segments, models, excluded
+            self.built_at = self.refreshed_at = now
+        return len(models)
+
+    # ---------- Recherche ----------
+
+    def search(self, model: str, query: Sequence[float], k: int) -> List[Tuple[object, float]]:
+        """[(pk, cosinus)] des k vecteurs du modèle `model` les plus proches, score décroissant."""
+        q = normalized(query)
+        if q is None:
+            return []
+        with self._lock:
+            seg = self._segments.get(model)
+            if seg is None or seg.dim != q.size:
+                return []
+            return seg.top_k(q, k)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {model: len(seg) for model, seg in self._segments.items()}
+
+
+# ---------- Index des DecisionAnalysis (processus courant) ----------
+
+INDEX = VectorIndex()
+_BUILD_LOCK = threading.Lock()
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def _rows(qs):
+    return qs.exclude(embedding__isnull=True).values_list("pk", "embedding_model", "embedding").iterator(
+        chunk_size=2000,
+    )
+
+
+def ensure_fresh() -> VectorIndex:
+    """Index des analyses actives : construit au besoin, puis relu par delta ou reconstruit selon l'âge.
+
+    Le chargement se fait hors du verrou des données : les recherches des
+    autres threads continuent sur l'ancien index pendant une reconstruction.
+    """
+    now = time.monotonic()
+    max_age = float(_setting("VECTOR_INDEX_MAX_AGE_SECONDS", MAX_AGE_SECONDS))
+    refresh = float(_setting("VECTOR_INDEX_REFRESH_SECONDS", REFRESH_SECONDS))
+    if INDEX.built_at and now - INDEX.built_at <= max_age and now - INDEX.refreshed_at <= refresh:
+        return INDEX
+    with _BUILD_LOCK:
+        now = time.monotonic()
+        if not INDEX.built_at or now - INDEX.built_at > max_age:
+            rebuild()
+        elif now - INDEX.refreshed_at > refresh:
+            _refresh_delta()
+    return INDEX
+
+
+def rebuild() -> int:
+    """Recharge tout l'index depuis la base. Retourne le nombre de vecteurs."""
+    from django.db.models import Max
+
+    from ..models import DecisionAnalysis
+    from .ann_index import disk_models
+
+    t0 = time.perf_counter()
+    # Relevé avant la lecture : une écriture concurrente sera reprise au prochain delta
+    watermark = DecisionAnalysis.all_objects.aggregate(m=Max("updated_at"))["m"]
+    excluded = disk_models()
+    count = INDEX.load(_rows(DecisionAnalysis.objects.exclude(embedding_model__in=excluded)), excluded=excluded)
+    INDEX.watermark = watermark
+    logger.info("Index vectoriel : %d embedding(s) chargés en %.2f s", count, time.perf_counter() - t0)
+    return count
+
+
+def _refresh_delta() -> None:
+    from ..models import DecisionAnalysis
+
+    qs = DecisionAnalysis.all_objects.all()
+    if INDEX.watermark is not None:
+        qs = qs.filter(updated_at__gte=INDEX.watermark)
+    watermark = INDEX.watermark
+    for pk, model, emb, deleted, updated_at in qs.values_list(
+        "pk", "embedding_model", "embedding", "is_deleted", "updated_at",
+    ).iterator(chunk_size=2000):
+        INDEX.upsert(pk, None if deleted else model, None if deleted else emb)
+        if watermark is None or updated_at > watermark:
+            watermark = updated_at
+    INDEX.watermark = watermark
+    INDEX.refreshed_at = time.monotonic()
+
+
+@receiver(post_save, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if "embedding" in instance.get_deferred_fields():
+        return
+    if instance.is_deleted:
+        INDEX.remove(instance.pk)
+    else:
+        INDEX.upsert(instance.pk, instance.embedding_model, instance.embedding)
+
+
+@receiver(post_delete, sender="avocat_app.DecisionAnalysis")
+def decision_analysis_post_delete(sender, instance, **kwargs):
+    INDEX.remove(instance.pk)
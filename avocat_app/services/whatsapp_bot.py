@@ -9,6 +9,11 @@ Commandes reconnues (en arabe, français, anglais) :
 
 Si le numéro n'est pas reconnu comme Partie, le bot répond poliment et
 propose de contacter le cabinet.
+
+Par défaut (WHATSAPP_WEBHOOK_ASYNC) le webhook ne fait que mettre le
+message en file (`enqueue_inbound`, idempotent par MessageSid) et répond
+aussitôt ; un worker de la file de tâches calcule la réponse et l'envoie
+par l'API REST Twilio (`reply_to_inbound`).
 """
 from __future__ import annotations
 
@@ -19,6 +24,8 @@ from typing import Optional
 from django.utils import timezone
 
 from ..models import Affaire, AffairePartie, Audience, Depense, Recette, Partie, WhatsAppMessage
+from .jobs import handler
+from .phone_lookup import find_partie_by_phone
 
 logger = logging.getLogger(__name__)
 
@@ -33,19 +40,8 @@ def _normalize_phone(phone: str) -> str:
 
 
 def _find_partie_by_phone(phone_e164: str) -> Optional[Partie]:
-    """Cherche une Partie par téléphone normalisé.
-    Compare la fin du numéro (8 derniers chiffres) pour tolérer les formats."""
-    if not phone_e164:
-        return None
-    last8 = re.sub(r"\D", "", phone_e164)[-8:]
-    if not last8:
-        return None
-    candidates = Partie.objects.exclude(telephone__isnull=True).exclude(telephone__exact="")
-    for p in candidates:
-        digits = re.sub(r"\D", "", p.telephone or "")
-        if digits.endswith(last8):
-            return p
-    return None
+    """Cherche une Partie par téléphone (index sur les 8 derniers chiffres, voir phone_lookup)."""
+    return find_partie_by_phone(phone_e164)
 
 
 def _menu_text() -> str:
@@ -144,18 +140,11 @@ def _route_command(body: str, partie: Optional[Partie]) -> str:
     return _menu_text()
 
 
-def handle_inbound_message(from_number: str, body: str, *, profile_name: str = "",
-                           message_sid: str = "") -> str:
-    """Point d'entrée appelé par le webhook Twilio.
-
-    Stocke le message inbound, route la commande, persiste le message outbound
-    de réponse (sans appel API — Twilio renvoie la réponse via TwiML), et
-    retourne le texte à inclure dans la réponse TwiML.
-    """
-    phone = _normalize_phone(from_number)
-    partie = _find_partie_by_phone(phone)
-
-    # Journaliser le message reçu
+def _log_inbound(phone: str, partie: Optional[Partie], body: str, profile_name: str,
+                 message_sid: str) -> None:
+    """Journalise le message reçu (une seule fois par MessageSid)."""
+    if message_sid and WhatsAppMessage.objects.filter(direction="inbound", twilio_sid=message_sid).exists():
+        return
     WhatsAppMessage.objects.create(
         direction="inbound",
         affaire=None,
@@ -166,16 +155,96 @@ def handle_inbound_message(from_number: str, body: str, *, profile_name: str = "
         twilio_sid=message_sid or "",
     )
 
-    reply = _route_command(body, partie)
 
-    # Journaliser la réponse (status='sent' car Twilio va la transmettre via TwiML)
+def _log_outbound(phone: str, partie: Optional[Partie], profile_name: str, reply: str, *,
+                  status: str, sid: str = "", error: Optional[str] = None) -> None:
     WhatsAppMessage.objects.create(
         direction="outbound",
         to_number=phone,
         to_name=(partie.nom_complet if partie else profile_name) or "",
         body=reply,
-        status="sent",
-        sent_at=timezone.now(),
+        status=status,
+        twilio_sid=sid or "",
+        error_message=error,
+        sent_at=timezone.now() if status in ("sent", "dry_run") else None,
     )
 
+
+def handle_inbound_message(from_number: str, body: str, *, profile_name: str = "",
+                           message_sid: str = "") -> str:
+    """Traitement synchrone (WHATSAPP_WEBHOOK_ASYNC=False).
+
+    Stocke le message inbound, route la commande, persiste le message outbound
+    de réponse (sans appel API — Twilio renvoie la réponse via TwiML), et
+    retourne le texte à inclure dans la réponse TwiML.
+    """
+    phone = _normalize_phone(from_number)
+    partie = _find_partie_by_phone(phone)
+    _log_inbound(phone, partie, body, profile_name, message_sid)
+    reply = _route_command(body, partie)
+    # status='sent' car Twilio va la transmettre via TwiML
+    _log_outbound(phone, partie, profile_name, reply, status="sent")
     return reply
+
+
+# ---------- Traitement asynchrone (webhook → file → worker) ----------
+
+INBOUND_JOB = "whatsapp_inbound"
+INBOUND_MAX_ATTEMPTS = 3
+
+
+def enqueue_inbound(params) -> object:
+    """Met en file le message reçu (données POST brutes de Twilio), une fois par MessageSid.
+
+    Seul travail fait dans la requête du webhook : un SELECT et un INSERT sur
+    background_job. Twilio peut rejouer un webhook lent : la clé `MessageSid`
+    ramène alors la tâche existante.
+    """
+    from .jobs import enqueue
+
+    message_sid = params.get("MessageSid", "")
+    return enqueue(
+        INBOUND_JOB,
+        {
+            "from_number": params.get("From", ""),
+            "body": params.get("Body", ""),
+            "profile_name": params.get("ProfileName", ""),
+            "message_sid": message_sid,
+            "received_at": timezone.now().isoformat(),
+        },
+        key=f"whatsapp:{message_sid}" if message_sid else None,
+        max_attempts=INBOUND_MAX_ATTEMPTS,
+        message="رسالة واتساب واردة",
+    )
+
+
+def reply_to_inbound(from_number: str, body: str, *, profile_name: str = "", message_sid: str = "",
+                     final_attempt: bool = True):
+    """Journalise le message, calcule la réponse et l'envoie par l'API REST Twilio.
+
+    Un envoi en échec n'est journalisé qu'à la dernière tentative (sinon la
+    tâche est rejouée). Retourne le SendResult.
+    """
+    from .twilio_client import send_whatsapp
+
+    phone = _normalize_phone(from_number)
+    partie = _find_partie_by_phone(phone)
+    _log_inbound(phone, partie, body, profile_name, message_sid)
+    reply = _route_command(body, partie)
+    result = send_whatsapp(phone, reply)
+    if result.ok or final_attempt:
+        _log_outbound(phone, partie, profile_name, reply,
+                      status=result.status, sid=result.sid or "", error=result.error)
+    return result
+
+
+@handler(INBOUND_JOB, interactive=True)
+def _inbound_job(ctx, from_number="", body="", profile_name="", message_sid="", received_at=None):
+    result = reply_to_inbound(
+        from_number, body, profile_name=profile_name, message_sid=message_sid,
+        final_attempt=ctx.job.attempts >= ctx.job.max_attempts,
+    )
+    if not result.ok:
+        raise RuntimeError(result.error or "فشل إرسال الرد")
+    ctx.message = "تم إرسال الرد"
+    return {"status": result.status, "sid": result.sid}
@@ -0,0 +1,39 @@
+"""Objets minimaux (affaire, décisions, analyses) pour les tests."""
+import datetime
+
+from django.utils import timezone
+
+
+def make_affaire(reference="T-001"):
+    from ..models import Affaire, Avocat, Barreau, Juridiction, StatutAffaire, TypeAffaire, TypeJuridiction
+
+    type_juridiction = TypeJuridiction.objects.create(
+        libelle="محكمة اختبار", libelle_fr="Tribunal test", code_type="TEST", niveau="ا", description="")
+    return Affaire.objects.create(
+        reference_interne=reference,
+        type_affaire=TypeAffaire.objects.create(code="TST", libelle="اختبار", libelle_fr="Test"),
+        statut_affaire=StatutAffaire.objects.create(libelle="جارية", libelle_fr="En cours"),
+        juridiction=Juridiction.objects.create(code="TST", type=type_juridiction),
+        avocat_responsable=Avocat.objects.create(nom="محامي", barreau=Barreau.objects.create(nom="هيئة")),
+        date_ouverture=datetime.date(2026, 1, 1),
+    )
+
+
+def make_decisions(count):
+    from ..models import Decision
+
+    affaire = make_affaire()
+    return [
+        Decision.objects.create(affaire=affaire, numero_decision=f"{i}/2026", date_prononce=timezone.now(),
+                                resumé=f"حكمت المحكمة في الملف رقم {i} برفض الطلب")
+        for i in range(count)
+    ]
+
+
+def make_analyses(count):
+    from ..models import DecisionAnalysis
+
+    return [
+        DecisionAnalysis.objects.create(decision=decision, resume_ar=f"ملخص الحكم رقم {i} في نزاع تجاري")
+        for i, decision in enumerate(make_decisions(count))
+    ]
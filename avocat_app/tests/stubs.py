@@ -0,0 +1,55 @@
+"""Serveurs HTTP locaux remplaçant les API externes le temps d'un test.
+
+`StubServer` remplace Voyage AI (VOYAGE_API_URL) ou Anthropic
+(ANTHROPIC_API_URL) : il répond selon une liste de statuts (429, 529,
+5xx...) puis 200, et garde les corps reçus et leurs instants pour vérifier
+le nombre d'appels et leur espacement.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    """Serveur HTTP local : `statuses` donne le statut des premiers appels, 200 ensuite."""
+
+    def __init__(self, respond, statuses=()):
+        self.respond = respond
+        self.statuses = list(statuses)
+        self.requests = []
+        self.times = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests.append(body)
+                    stub.times.append(time.monotonic())
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                if status == 200:
+                    out, headers = json.dumps(stub.respond(body)).encode(), {"Content-Type": "application/json"}
+                else:
+                    out, headers = b'{"error": "stub"}', {"Retry-After": "0"}
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,51 @@
+"""Analyse IA d'une décision mise en file : une tâche par décision, suivie par son auteur."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import BackgroundJob
+from .factories import make_decisions
+
+
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if "idle_token" not in m], JOBS_EMBEDDED_WORKER=False)
+class DecisionAnalyzeViewTests(TestCase):
+    def setUp(self):
+        self.decision = make_decisions(1)[0]
+        users = get_user_model().objects
+        self.owner = self.client_for(users.create_superuser("owner", password="x"))
+        # Toutes les permissions de page, mais pas staff : ne voit que ses tâches
+        self.other = self.client_for(users.create_user("other", password="x", is_superuser=True))
+
+    def client_for(self, user):
+        client = Client(HTTP_HOST="127.0.0.1")
+        client.force_login(user)
+        return client
+
+    def analyze(self, client):
+        return client.post(reverse("cabinet:decision_ai_analyze", args=[self.decision.pk]),
+                           {"source_text": "نص الحكم"}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def status(self, client, task_id):
+        return client.get(reverse("cabinet:decision_ai_analyze_status", args=[self.decision.pk]),
+                          {"task_id": task_id})
+
+    def test_job_is_followed_by_its_owner_only(self):
+        task_id = self.analyze(self.owner).json()["task_id"]
+        self.assertEqual(self.status(self.owner, task_id).json()["status"], BackgroundJob.QUEUED)
+        self.assertEqual(self.status(self.other, task_id).status_code, 404)
+        events = self.other.get(reverse("cabinet:job_events"), {"task_id": task_id})
+        self.assertEqual(events.status_code, 404)
+
+    def test_second_user_is_told_the_analysis_is_running(self):
+        self.analyze(self.owner)
+        response = self.analyze(self.other)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()["ok"])
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+        page = self.other.get(reverse("cabinet:decision_detail", args=[self.decision.pk]))
+        self.assertNotContains(page, 'id="aiJobBox"')
+        self.assertContains(page, "بطلب من مستخدم آخر")
+        page = self.owner.get(reverse("cabinet:decision_detail", args=[self.decision.pk]))
+        self.assertContains(page, 'id="aiJobBox"')
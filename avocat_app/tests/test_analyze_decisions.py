@@ -0,0 +1,56 @@
+"""Commande analyze_decisions contre une API Messages locale (529, limites de débit)."""
+import io
+import json
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from ..services import ai_client
+from .factories import make_decisions
+from .stubs import StubServer
+
+
+def claude_response(body):
+    """Réponse Messages : le JSON d'analyse attendu par ai_client, dans un bloc ```json."""
+    analysis = {
+        "resume_ar": f"ملخص ({len(body['messages'][0]['content'])})", "resume_fr": "Résumé",
+        "decision_essentielle": "رفض الطلب", "parties_extraites": [],
+        "motifs": [{"titre": "التعليل", "contenu": "عدم الإثبات"}],
+        "delai_appel_jours": "30", "dates_importantes": [],
+    }
+    text = "```json\n" + json.dumps(analysis, ensure_ascii=False) + "\n```"
+    return {"content": [{"type": "text", "text": text}]}
+
+
+@override_settings(ANTHROPIC_API_KEY="test-key", ANTHROPIC_DRY_RUN=False, ANTHROPIC_REQUESTS_PER_MINUTE=0)
+class AnalyzeDecisionsCommandTests(TransactionTestCase):
+    # TransactionTestCase : les threads de la commande lisent et écrivent le cache d'analyses
+    def setUp(self):
+        ai_client._LIMITER = None
+        self.addCleanup(setattr, ai_client, "_LIMITER", None)
+
+    def analyze(self, stub, *args):
+        out = io.StringIO()
+        with override_settings(ANTHROPIC_API_URL=stub.url):
+            call_command("analyze_decisions", "--workers=2", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_retries_overload_rate_limits_and_reuses_cache(self):
+        from ..models import DecisionAnalysis
+
+        decisions = make_decisions(3)
+        # 529 (surcharge) un appel sur deux au début
+        with StubServer(claude_response, statuses=[529, 200, 529, 200, 529]) as stub:
+            first = self.analyze(stub, "--rpm=600")
+            calls = len(stub.requests)
+            second = self.analyze(stub, "--all")
+
+        self.assertIn("Analysées: 3 | Depuis le cache: 0", first)
+        self.assertEqual(calls, 6)  # 3 analyses + 3 nouvelles tentatives
+        gaps = [b - a for a, b in zip(stub.times, stub.times[1:calls])]
+        self.assertGreaterEqual(min(gaps), 0.09)  # --rpm=600 : un appel toutes les 0,1 s
+        self.assertIn("Analysées: 0 | Depuis le cache: 3", second)
+        self.assertEqual(len(stub.requests), calls)
+        analyses = DecisionAnalysis.objects.filter(decision__in=decisions)
+        self.assertEqual(analyses.filter(error_message="", is_dry_run=False).count(), 3)
+        self.assertEqual(set(analyses.values_list("decision_essentielle", flat=True)), {"رفض الطلب"})
@@ -0,0 +1,58 @@
+"""Recherche approchée par trigrammes dans المسطرة الغيابية."""
+from django.test import TestCase
+
+from ..models import ContumaceRecord, ContumaceSearchGram
+from ..services import contumace_search
+
+
+def record(numero, nom, **fields):
+    return ContumaceRecord.objects.create(
+        cour_appel=fields.pop("cour_appel", "محكمة الاستئناف بفاس"), numero_dossier=numero, nom_accuse=nom, **fields)
+
+
+class ContumaceSearchTests(TestCase):
+    def setUp(self):
+        self.idrissi = record("2025/2601/15", "أحمد الإدريسي", nom_pere="عبد الله", numero_carte="C123456")
+        self.bennani = record("2025/2601/16", "فاطمة الزهراء بناني", nom_mere="خديجة")
+        self.alaoui = record("2024/2601/90", "يوسف العلوي", cour_appel="محكمة الاستئناف بمراكش")
+
+    def pks(self, query, **kwargs):
+        return [pk for pk, _ in contumace_search.search(query, **kwargs)]
+
+    def test_grams(self):
+        self.assertEqual(contumace_search.grams("احمد ب"), {"احم", "حمد"})
+        self.assertEqual(contumace_search.grams("في"), {"في"})
+
+    def test_search_text_is_normalized(self):
+        self.assertIn("احمد الادريسي", self.idrissi.search_text)
+        self.assertIn("بناني", self.bennani.search_text)
+        self.assertTrue(ContumaceSearchGram.objects.filter(record=self.idrissi, gram="ادر").exists())
+
+    def test_spelling_variants_find_the_record(self):
+        for query in ("احمد الادريسي", "أحمد الإدريسى", "الادريسي", "الإدريس"):
+            with self.subTest(query=query):
+                self.assertEqual(self.pks(query)[0], self.idrissi.pk)
+        self.assertEqual(self.pks("فاطمه الزهراء"), [self.bennani.pk])
+
+    def test_unrelated_name_finds_nothing(self):
+        self.assertEqual(self.pks("كريم التازي"), [])
+
+    def test_exact_file_or_card_number_ranks_first(self):
+        results = contumace_search.search("C123456")
+        self.assertEqual(results[0], (self.idrissi.pk, 2.0))
+        self.assertEqual(self.pks("2024/2601/90")[0], self.alaoui.pk)
+
+    def test_soft_deleted_records_are_hidden(self):
+        self.alaoui.delete()
+        self.assertNotIn(self.alaoui.pk, self.pks("يوسف العلوي"))
+
+    def test_index_follows_updates_and_rebuild(self):
+        self.bennani.nom_accuse = "سعاد المريني"
+        self.bennani.save()
+        self.assertEqual(self.pks("المريني"), [self.bennani.pk])
+        self.assertEqual(self.pks("بناني"), [])
+
+        ContumaceSearchGram.objects.all().delete()
+        self.assertEqual(self.pks("المريني"), [])
+        self.assertEqual(contumace_search.rebuild(), 3)
+        self.assertEqual(self.pks("المريني"), [self.bennani.pk])
@@ -0,0 +1,62 @@
+"""Rapprochement des noms de juridictions (`CourtMatcher`), entièrement en mémoire."""
+from django.test import SimpleTestCase
+
+from ..services.court_matcher import CourtMatcher, court_tokens
+
+FES_CA, FES_TPI, SEFROU, TAZA_FES, TAZA_CA, TAZA = 1, 2, 3, 4, 6, 5
+
+
+def matcher():
+    court = CourtMatcher.court
+    return CourtMatcher([
+        court(FES_CA, "محكمة الاستئناف بفاس", None, "CA"),
+        court(FES_TPI, "المحكمة الابتدائية بفاس", FES_CA, "TPI"),
+        court(SEFROU, "المحكمة الابتدائية بصفرو", None, "TPI"),
+        court(TAZA_FES, "المحكمة الابتدائية بتازة", FES_CA, "TPI"),
+        court(TAZA, "المحكمة الابتدائية بتازة", TAZA_CA, "TPI"),
+        court(TAZA_CA, "محكمة الاستئناف بتازة", None, "CA"),
+    ])
+
+
+class CourtMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = matcher()
+
+    def test_court_tokens(self):
+        self.assertEqual(court_tokens("المحكمة الابتدائية بالرباط"), {"محكمه", "ابتداييه", "رباط"})
+        self.assertEqual(court_tokens(None), frozenset())
+
+    def test_exact_match_ignores_spelling_variants(self):
+        match = self.matcher.match("محكمة الإستئناف بفاس")
+        self.assertEqual((match.juridiction_id, match.method, match.score), (FES_CA, "exact", 1.0))
+
+    def test_typo_matches_on_tokens(self):
+        match = self.matcher.match("المحكمة الابتداية بفاس")
+        self.assertEqual((match.juridiction_id, match.method), (FES_TPI, "tokens"))
+        self.assertGreaterEqual(match.score, 0.9)
+
+    def test_appel_filter(self):
+        self.assertIsNone(self.matcher.match("المحكمة الابتدائية بفاس", appel=True).juridiction_id)
+        self.assertEqual(self.matcher.match("محكمة الاستئناف بفاس", appel=True).juridiction_id, FES_CA)
+
+    def test_first_instance_never_resolves_to_a_cour_d_appel(self):
+        # Régression : le repli sans `appel` rattachait ce nom à la cour d'appel de Fès
+        self.assertIsNone(self.matcher.match("محكمة الاستئناف بفاس", first_instance=True).juridiction_id)
+        match = self.matcher.match("المحكمة الابتدائية بصفرو", first_instance=True)
+        self.assertEqual((match.juridiction_id, match.method), (SEFROU, "exact"))
+
+    def test_parent_breaks_ties_between_homonyms(self):
+        self.assertEqual(self.matcher.match("المحكمة الابتدائية بتازة", parent_id=TAZA_CA).juridiction_id, TAZA)
+        self.assertEqual(self.matcher.match("المحكمة الابتدائية بتازة", parent_id=FES_CA).juridiction_id, TAZA_FES)
+
+    def test_below_min_score_is_not_matched(self):
+        for name in ("محكمة النقض", "استئناف فاس", ""):
+            with self.subTest(name=name):
+                match = self.matcher.match(name)
+                self.assertFalse(match.matched)
+                self.assertIsNone(match.juridiction_id)
+
+    def test_add_replaces_a_court(self):
+        self.matcher.add(CourtMatcher.court(SEFROU, "المحكمة الابتدائية بميسور", None, "TPI"))
+        self.assertIsNone(self.matcher.match("المحكمة الابتدائية بصفرو").juridiction_id)
+        self.assertEqual(self.matcher.match("المحكمة الابتدائية بميسور").juridiction_id, SEFROU)
@@ -0,0 +1,71 @@
+"""Client Voyage AI et réindexation des embeddings contre un serveur local.
+
+    DJANGO_SETTINGS_MODULE=desktop.settings_desktop python manage.py test avocat_app
+"""
+import hashlib
+import tempfile
+
+from django.test import TransactionTestCase, override_settings
+
+from ..services import embeddings
+from .factories import make_analyses
+from .stubs import StubServer
+
+
+def voyage_response(body):
+    """Vecteurs déterministes (16 dimensions) pour chaque entrée."""
+    def vector(text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255 for b in digest[:16]]
+
+    return {"model": body["model"], "data": [{"index": i, "embedding": vector(t)} for i, t in enumerate(body["input"])]}
+
+
+@override_settings(VOYAGE_API_KEY="test-key", VOYAGE_REQUESTS_PER_MINUTE=0)
+class VoyageEmbeddingsTests(TransactionTestCase):
+    # TransactionTestCase : reindex_decisions écrit le cache d'embeddings depuis ses threads
+    def setUp(self):
+        embeddings._LIMITER = None
+        ann_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(ann_dir.cleanup)
+        ann_settings = override_settings(ANN_INDEX_DIR=ann_dir.name)
+        ann_settings.enable()
+        self.addCleanup(ann_settings.disable)
+
+    def test_retries_rate_limit_and_server_errors(self):
+        with StubServer(voyage_response, statuses=[429, 503, 502]) as stub, \
+                override_settings(VOYAGE_API_URL=stub.url):
+            vectors = embeddings.voyage_embeddings(["أ", "ب"])
+        self.assertEqual(len(stub.requests), 4)
+        self.assertEqual(vectors, [voyage_response({"model": "", "input": ["أ", "ب"]})["data"][i]["embedding"]
+                                   for i in range(2)])
+
+    def test_gives_up_after_retries(self):
+        with StubServer(voyage_response, statuses=[503] * embeddings.VOYAGE_RETRIES) as stub, \
+                override_settings(VOYAGE_API_URL=stub.url):
+            with self.assertRaises(embeddings.EmbeddingError):
+                embeddings.voyage_embeddings(["أ"])
+        self.assertEqual(len(stub.requests), embeddings.VOYAGE_RETRIES)
+
+    def test_client_error_is_not_retried(self):
+        with StubServer(voyage_response, statuses=[400]) as stub, override_settings(VOYAGE_API_URL=stub.url):
+            with self.assertRaises(embeddings.EmbeddingError):
+                embeddings.voyage_embeddings(["أ"])
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_reindex_skips_unchanged_embedding_hash(self):
+        analyses = make_analyses(3)
+        with StubServer(voyage_response, statuses=[429]) as stub, override_settings(VOYAGE_API_URL=stub.url):
+            first = embeddings.reindex_decisions(model="voyage-3", workers=1)
+            calls = len(stub.requests)
+            second = embeddings.reindex_decisions(model="voyage-3", workers=1)
+
+            analyses[0].resume_ar += " مع تعديل"
+            analyses[0].save()
+            third = embeddings.reindex_decisions(model="voyage-3", workers=1)
+
+        self.assertEqual((first["indexed"], first["failed"]), (3, 0))
+        self.assertEqual(calls, 2)  # 429 puis un lot de 3
+        self.assertEqual((second["indexed"], second["unchanged"]), (0, 3))
+        self.assertEqual((third["indexed"], third["unchanged"]), (1, 2))
+        self.assertEqual([body["input"] for body in stub.requests[calls:]], [[embeddings.analysis_text(analyses[0])]])
@@ -0,0 +1,71 @@
+"""Recherche globale : termes de la requête, expression FTS5, classement et regroupement."""
+from django.test import SimpleTestCase, TestCase
+
+from ..models import Partie
+from ..services import global_search
+from ..services.global_search import fts5_match, group, normalize, query_words
+
+
+class QueryTests(SimpleTestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("Élodie  Café ٠٦١٢ أحمد"), "elodie cafe 0612 احمد")
+
+    def test_query_words(self):
+        self.assertEqual(query_words("أحمد  الإدريسي أحمد"), ["احمد", "الادريسي"])
+        self.assertEqual(query_words("مح"), ["مح"])
+        self.assertEqual(query_words("Élodie ٠٦١٢"), ["elodie", "0612"])
+
+    def test_single_letters_join_their_neighbour(self):
+        self.assertEqual(query_words("REF-0"), ["ref 0"])
+        self.assertEqual(query_words("a b c"), ["a b c"])
+        self.assertEqual(query_words("x"), [])
+        self.assertEqual(query_words("  "), [])
+
+    def test_fts5_match(self):
+        # Moins de 3 lettres : début de mot (le texte indexé commence par une espace)
+        self.assertEqual(fts5_match(["مح", "احمد", "ref 0"]), '" مح" AND "احمد" AND "ref 0"')
+
+
+class GroupTests(SimpleTestCase):
+    def rows(self):
+        # (id, kind, title, subtitle, url)
+        return [
+            (1, "partie", "محمد العلوي", "", "/p/1"),
+            (2, "affaire", "REF-2", "", "/a/2"),
+            (3, "partie", "أحمد محمد", "", "/p/3"),
+            (4, "partie", "محمد", "", "/p/4"),
+            (5, "partie", "عبد الحميد", "", "/p/5"),
+            (6, "partie", "محمد بناني", "", "/p/6"),
+        ]
+
+    def test_titles_are_ranked_then_most_recent_first(self):
+        groups = group(self.rows(), ["محمد"], "محمد")
+        self.assertEqual([g["label"] for g in groups], ["القضايا", "الأطراف"])
+        titles = [item["title"] for item in groups[1]["items"]]
+        # identique, commence par la requête (récent d'abord), mot en début de mot, sous-chaîne
+        self.assertEqual(titles, ["محمد", "محمد بناني", "محمد العلوي", "أحمد محمد", "عبد الحميد"])
+
+    def test_per_group_limit(self):
+        groups = group(self.rows(), ["محمد"], "محمد", per_group=2)
+        self.assertEqual([len(g["items"]) for g in groups], [1, 2])
+        self.assertEqual(groups[1]["items"][0], {"title": "محمد", "subtitle": "", "url": "/p/4"})
+
+    def test_no_rows(self):
+        self.assertEqual(group([], ["x"], "x"), [])
+
+
+class SearchTests(TestCase):
+    def parties(self, query):
+        # Les juridictions créées par les migrations sont indexées aussi
+        return [item["url"] for g in global_search.search(query) if g["label"] == "الأطراف" for item in g["items"]]
+
+    def test_search_finds_indexed_parties(self):
+        p = Partie.objects.create(type_partie="Demandeur", nom_complet="محمد الإدريسي", telephone="0612345678")
+        Partie.objects.create(type_partie="Défendeur", nom_complet="فاطمة بناني")
+
+        for query in ("مح", "الادريسى", "0612345678", "محمد ادريس"):
+            with self.subTest(query=query):
+                self.assertEqual(self.parties(query), [p.get_absolute_url()])
+
+        p.delete()
+        self.assertEqual(self.parties("الإدريسي"), [])
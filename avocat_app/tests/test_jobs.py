@@ -0,0 +1,180 @@
+"""File de tâches `background_job` : réservation, nouvelles tentatives, tâches orphelines."""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import BackgroundJob
+from ..services import jobs
+
+ECHO = "test.echo"
+FLAKY = "test.flaky"
+FAILED = "test.failed"
+INTERACTIVE = "test.interactive"
+ONE_AT_A_TIME = "test.one_at_a_time"
+
+
+@jobs.handler(ECHO)
+def _echo(ctx, value=None):
+    ctx.update("تم", phase="done", current=1)
+    return {"value": value}
+
+
+@jobs.handler(FLAKY)
+def _flaky(ctx):
+    raise RuntimeError("boom")
+
+
+@jobs.handler(FAILED)
+def _failed(ctx):
+    raise jobs.JobFailed("لا فائدة من إعادة المحاولة")
+
+
+@jobs.handler(INTERACTIVE, interactive=True)
+def _interactive(ctx):
+    return "ok"
+
+
+@jobs.handler(ONE_AT_A_TIME, release_key=True)
+def _one_at_a_time(ctx):
+    return "ok"
+
+
+@override_settings(JOBS_EMBEDDED_WORKER=False, JOBS_RETRY_BACKOFF_SECONDS=10)
+class JobQueueTests(TestCase):
+    def claim_and_run(self, kinds=None):
+        job = jobs.claim("test-worker", kinds)
+        self.assertIsNotNone(job)
+        return jobs.run_job(job, "test-worker"), BackgroundJob.objects.get(pk=job.pk)
+
+    def test_claim_takes_each_job_once_in_order(self):
+        first = jobs.enqueue(ECHO, {"value": 1})
+        second = jobs.enqueue(ECHO, {"value": 2})
+
+        claimed = jobs.claim("w1")
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), (BackgroundJob.RUNNING, "w1", 1))
+        self.assertEqual(jobs.claim("w2").pk, second.pk)
+        self.assertIsNone(jobs.claim("w3"))
+
+    def test_claim_skips_future_jobs_and_other_kinds(self):
+        jobs.enqueue(FLAKY)
+        later = jobs.enqueue(ECHO)
+        BackgroundJob.objects.filter(pk=later.pk).update(available_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertIsNone(jobs.claim("w1", kinds=[ECHO]))
+        self.assertEqual(jobs.claim("w1", kinds=[FLAKY]).kind, FLAKY)
+
+    def test_success_stores_result_and_progress(self):
+        jobs.enqueue(ECHO, {"value": "x"})
+        status, job = self.claim_and_run()
+        self.assertEqual(status, BackgroundJob.DONE)
+        self.assertEqual(job.result, {"value": "x"})
+        self.assertEqual((job.progress["phase"], job.message, job.locked_by), ("done", "تم", ""))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.job_snapshot(job)["result"], {"value": "x"})
+
+    def test_retry_backoff_doubles_then_gives_up(self):
+        jobs.enqueue(FLAKY, max_attempts=3)
+        delays = []
+        for _ in range(2):
+            before = timezone.now()
+            with self.assertLogs(jobs.logger, "ERROR"):
+                status, job = self.claim_and_run()
+            self.assertEqual(status, BackgroundJob.QUEUED)
+            delays.append(round((job.available_at - before).total_seconds()))
+            BackgroundJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        self.assertEqual(delays, [10, 20])
+
+        with self.assertLogs(jobs.logger, "ERROR"):
+            status, job = self.claim_and_run()
+        self.assertEqual((status, job.attempts), (BackgroundJob.ERROR, 3))
+        self.assertIn("boom", job.message)
+
+    def test_job_failed_is_not_retried(self):
+        jobs.enqueue(FAILED, max_attempts=3)
+        status, job = self.claim_and_run()
+        self.assertEqual((status, job.attempts), (BackgroundJob.ERROR, 1))
+        self.assertEqual(job.message, "لا فائدة من إعادة المحاولة")
+
+    def test_unknown_kind_fails(self):
+        jobs.enqueue("test.unknown")
+        status, job = self.claim_and_run()
+        self.assertEqual(status, BackgroundJob.ERROR)
+
+    @override_settings(JOBS_STALE_SECONDS=60)
+    def test_requeue_stale(self):
+        retry = jobs.enqueue(ECHO, max_attempts=2)
+        exhausted = jobs.enqueue(ECHO)
+        alive = jobs.enqueue(ECHO)
+        for _ in range(3):
+            jobs.claim("dead-worker")
+        BackgroundJob.objects.exclude(pk=alive.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+
+        with self.assertLogs(jobs.logger, "WARNING"):
+            self.assertEqual(jobs.requeue_stale(), 2)
+        statuses = dict(BackgroundJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[retry.pk], BackgroundJob.QUEUED)
+        self.assertEqual(statuses[exhausted.pk], BackgroundJob.ERROR)
+        self.assertEqual(statuses[alive.pk], BackgroundJob.RUNNING)
+        self.assertEqual(jobs.claim("w1").pk, retry.pk)
+
+    def test_get_job_is_limited_to_its_owner(self):
+        users = get_user_model().objects
+        owner = users.create_user("owner")
+        other = users.create_user("other")
+        staff = users.create_user("staff", is_staff=True)
+        job = jobs.enqueue(ECHO, user=owner)
+
+        self.assertEqual(jobs.get_job(job.pk, user=owner), job)
+        self.assertEqual(jobs.get_job(str(job.pk), kind=ECHO, user=staff), job)
+        self.assertIsNone(jobs.get_job(job.pk, user=other))
+        self.assertIsNone(jobs.get_job(job.pk, kind=FLAKY))
+        self.assertIsNone(jobs.get_job("pas-un-id"))
+
+    def test_enqueue_with_key_returns_existing_job(self):
+        first = jobs.enqueue(ECHO, {"value": 1}, key="whatsapp:SM1")
+        again = jobs.enqueue(ECHO, {"value": 2}, key="whatsapp:SM1")
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        self.assertNotEqual(jobs.enqueue(ECHO, key="whatsapp:SM2").pk, first.pk)
+
+    def test_lanes_split_interactive_kinds(self):
+        batch = jobs.enqueue(ECHO)
+        interactive = jobs.enqueue(INTERACTIVE)
+
+        kinds, exclude = jobs.lane_filter("interactive")
+        self.assertIn(INTERACTIVE, kinds)
+        self.assertNotIn(ECHO, kinds)
+        self.assertEqual(jobs.claim("w-interactive", kinds, exclude).pk, interactive.pk)
+        self.assertIsNone(jobs.claim("w-interactive", kinds, exclude))
+
+        kinds, exclude = jobs.lane_filter("batch")
+        self.assertEqual(jobs.claim("w-batch", kinds, exclude).pk, batch.pk)
+        self.assertEqual(jobs.lane_filter(None), (None, None))
+
+    def test_release_key_frees_the_key_when_the_job_ends(self):
+        first = jobs.enqueue(ONE_AT_A_TIME, key="decision:1")
+        self.assertEqual(jobs.enqueue(ONE_AT_A_TIME, key="decision:1").pk, first.pk)
+        status, job = self.claim_and_run()
+        self.assertEqual((status, job.dedup_key), (BackgroundJob.DONE, None))
+        self.assertNotEqual(jobs.enqueue(ONE_AT_A_TIME, key="decision:1").pk, first.pk)
+
+    @override_settings(JOBS_STALE_SECONDS=60)
+    def test_release_key_on_stale_exhausted_job(self):
+        job = jobs.enqueue(ONE_AT_A_TIME, key="decision:2")
+        jobs.claim("dead-worker")
+        BackgroundJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+        with self.assertLogs(jobs.logger, "WARNING"):
+            jobs.requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.dedup_key), (BackgroundJob.ERROR, None))
+
+    def test_visible_to(self):
+        users = get_user_model().objects
+        owner, other = users.create_user("owner"), users.create_user("other")
+        job = jobs.enqueue(ECHO, user=owner)
+        self.assertTrue(jobs.visible_to(job, owner))
+        self.assertFalse(jobs.visible_to(job, other))
+        self.assertTrue(jobs.visible_to(job, users.create_user("staff", is_staff=True)))
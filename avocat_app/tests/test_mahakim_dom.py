@@ -0,0 +1,95 @@
+"""Parseurs lxml de `mahakim_dom` sur les pages enregistrées de `fixtures/mahakim`."""
+from datetime import date
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from ..services import mahakim_dom
+
+SESSION = Path(__file__).parent / "fixtures" / "mahakim" / "20260105-101500-4242"
+
+PROCEDURES = [
+    {"date": "12/03/2026", "type": "جلسة", "reference": "تأخير للمداولة"},
+    {"date": "26/02/2026", "type": "جلسة", "reference": "إدلاء بمذكرة"},
+    {"date": "15/01/2026", "type": "تسجيل", "reference": ""},
+]
+PARTIES = [
+    {"role": "مدعي", "name": "شركة الأطلس للتوزيع", "lawyers": "ذ. ياسين العلوي"},
+    {"role": "مدعى عليه", "name": "محمد بن علي", "lawyers": ""},
+]
+
+
+def page(name):
+    return mahakim_dom.document((SESSION / f"{name}.html").read_text(encoding="utf-8"))
+
+
+class AffairePageTests(SimpleTestCase):
+    def setUp(self):
+        self.results = page("0001_affaire_results")
+        self.parties_tab = page("0002_affaire_parties")
+
+    def test_card_info(self):
+        self.assertEqual(mahakim_dom.card_info(self.results), {
+            "المحكمة": "المحكمة الابتدائية التجارية بالدار البيضاء",
+            "رقم الملف": "1234/8205/2025",
+            "نوع القضية": "الأداء",
+            "الموضوع": "أداء مبلغ مالي",
+        })
+
+    def test_procedures(self):
+        self.assertEqual(mahakim_dom.procedures(self.results), PROCEDURES)
+
+    def test_procedures_skip_rendered_parties_tab(self):
+        # L'ancien script JS lisait tous les p-tabpanel : 5 lignes ici
+        self.assertEqual(mahakim_dom.procedures(self.parties_tab), PROCEDURES)
+
+    def test_parties(self):
+        self.assertEqual(mahakim_dom.parties(self.parties_tab), PARTIES)
+        self.assertEqual(mahakim_dom.parties(self.results), [])  # onglet pas encore affiché
+
+    def test_tab_count(self):
+        self.assertEqual(mahakim_dom.tab_count(self.results), 2)
+
+    def test_affaire_result(self):
+        parsed = mahakim_dom.affaire_result(self.results, self.parties_tab)
+        self.assertEqual(parsed["statut_mahakim"], "جلسة")
+        self.assertEqual(parsed["prochaine_audience"], date(2026, 3, 12))
+        self.assertEqual(parsed["observations"].splitlines(), [
+            "12/03/2026 | جلسة | تأخير للمداولة",
+            "26/02/2026 | جلسة | إدلاء بمذكرة",
+            "15/01/2026 | تسجيل",
+        ])
+        self.assertEqual(parsed["procedures"], PROCEDURES)
+        self.assertEqual(parsed["parties"], PARTIES)
+
+    def test_affaire_result_falls_back_to_page_text(self):
+        doc = mahakim_dom.document(
+            "<html><body><div>حالة القضية : في طور المداولة</div>"
+            "<div>الجلسة القادمة : 02/04/2026</div><div>القاضي : ذ. بناني</div></body></html>"
+        )
+        parsed = mahakim_dom.affaire_result(doc)
+        self.assertEqual(parsed["statut_mahakim"], "في طور المداولة")
+        self.assertEqual(parsed["prochaine_audience"], date(2026, 4, 2))
+        self.assertEqual(parsed["juge"], "ذ. بناني")
+
+    def test_unreadable_page(self):
+        self.assertIsNone(mahakim_dom.document("  "))
+        self.assertEqual(mahakim_dom.procedures(None), [])
+        self.assertEqual(mahakim_dom.parties(None), [])
+        self.assertEqual(mahakim_dom.affaire_result(None)["card_info"], {})
+
+
+class ContumacePageTests(SimpleTestCase):
+    def test_rows_keep_indexes(self):
+        rows = mahakim_dom.contumace_rows(page("0003_contumace_page"))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], {
+            "cour_appel": "محكمة الاستئناف بفاس", "numero_dossier": "2025/2601/15",
+            "nom_accuse": "أحمد الإدريسي", "nom_pere": "عبد الله", "nom_mere": "فاطمة",
+            "numero_carte": "C123456",
+        })
+        self.assertEqual(rows[1]["numero_carte"], "")
+        self.assertIsNone(rows[2])  # ligne incomplète (colspan)
+
+    def test_next_page_disabled(self):
+        self.assertFalse(mahakim_dom.has_next_page(page("0003_contumace_page")))
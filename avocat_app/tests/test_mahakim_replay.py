@@ -0,0 +1,140 @@
+"""Harnais d'enregistrement / rejeu mahakim.ma sur la session de `fixtures/mahakim`.
+
+Le rejeu dans Chrome (`ReplayScraper`) est sauté si aucun navigateur n'est
+installé ; `ScraperReplayTests` fait passer les pages enregistrées par
+`MahakimScraper` avec un driver qui ne sert que `page_source`.
+"""
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from ..services import mahakim_replay
+from ..services.mahakim_replay import (
+    ScrapeRecorder, load_recording, replay_step, sanitize_snapshot, to_jsonable,
+)
+
+RECORDING = Path(__file__).parent / "fixtures" / "mahakim"
+
+
+def chrome_available() -> bool:
+    return any(shutil.which(name) for name in ("chromedriver", "google-chrome", "chromium", "chromium-browser"))
+
+
+class RecordingTests(SimpleTestCase):
+    def test_recorder_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            recorder = ScrapeRecorder(root)
+            recorder.snapshot("dropdown", "<html><body>أ</body></html>", "https://www.mahakim.ma/#/x",
+                              formcontrolname="tribunal")
+            recorder.network("https://www.mahakim.ma/api/tribunaux", "application/json", '{"data": []}')
+            recorder.snapshot("contumace_page", "<html></html>")
+
+            steps = load_recording(root)
+            self.assertEqual([(s.seq, s.step) for s in steps], [(1, "dropdown"), (2, "contumace_page")])
+            self.assertEqual(steps[0].meta, {"formcontrolname": "tribunal"})
+            self.assertEqual(steps[0].network[0]["body"], '{"data": []}')
+            self.assertEqual(steps[1].network, [])
+            self.assertEqual(steps[0].html_path.read_text(encoding="utf-8"), "<html><body>أ</body></html>")
+            self.assertEqual([s.step for s in load_recording(root, ["contumace_page"])], ["contumace_page"])
+
+    def test_recording_ignores_expected_outputs(self):
+        steps = load_recording(RECORDING)
+        self.assertTrue(steps)
+        for step in steps:
+            self.assertTrue(step.html_path.exists())
+            self.assertNotIn("expected", step.name)
+
+    def test_sanitize_snapshot_strips_scripts_and_base(self):
+        html = '<head><base href="/"><script src="main.js"></script></head><body><SCRIPT>x()</SCRIPT>نص</body>'
+        self.assertEqual(sanitize_snapshot(html), "<head></head><body>نص</body>")
+
+
+@unittest.skipUnless(chrome_available(), "Chrome / chromedriver non installé")
+class ReplayScraperTests(SimpleTestCase):
+    def setUp(self):
+        self.steps = {s.step: s for s in load_recording(RECORDING)}
+        self.scraper = mahakim_replay.ReplayScraper()
+        self.addCleanup(self.scraper.close)
+
+    def test_affaire_results(self):
+        output, timing = replay_step(self.scraper, self.steps["affaire_results"])
+        self.assertEqual(output["card_info"]["رقم الملف"], "1234/8205/2025")
+        self.assertEqual(output["procedures"][0], {"date": "12/03/2026", "type": "جلسة", "reference": "تأخير للمداولة"})
+        self.assertEqual(output["statut_mahakim"], "جلسة")
+        self.assertEqual(output["prochaine_audience"], "2026-03-12")
+        self.assertEqual(len(timing.parse_ms), 1)
+
+    def test_contumace_page(self):
+        (records, skipped), _ = replay_step(self.scraper, self.steps["contumace_page"])
+        self.assertEqual([r["numero_dossier"] for r in records], ["2025/2601/15", "2025/2601/16"])
+        self.assertEqual(skipped, 0)
+
+
+class RecordedPageDriver:
+    """WebDriver réduit à `page_source` : renvoie les pages enregistrées dans l'ordre.
+
+    Les `execute_script` (clics) sont sans effet : l'état suivant de la page est
+    l'instantané suivant.
+    """
+
+    def __init__(self, *paths):
+        self.pages = [p.read_text(encoding="utf-8") for p in paths]
+        self.current_url = "https://www.mahakim.ma/"
+
+    @property
+    def page_source(self):
+        return self.pages.pop(0) if len(self.pages) > 1 else self.pages[0]
+
+    def execute_script(self, *args):
+        return None
+
+    def quit(self):
+        pass
+
+
+class ScraperReplayTests(SimpleTestCase):
+    """MahakimScraper (snapshots + parseurs lxml) sur la session enregistrée, sans Chrome."""
+
+    def setUp(self):
+        self.steps = {s.step: s for s in load_recording(RECORDING)}
+
+    def scraper(self, *steps, record_dir=False):
+        from ..services.mahakim_scraper import MahakimScraper
+
+        scraper = MahakimScraper(record_dir=record_dir)
+        scraper.driver = RecordedPageDriver(*(self.steps[s].html_path for s in steps))
+        scraper.waits.enabled = False
+        self.addCleanup(scraper.close)
+        return scraper
+
+    def test_affaire_results_match_dom_reference(self):
+        with tempfile.TemporaryDirectory() as root:
+            parsed = self.scraper("affaire_results", "affaire_parties", record_dir=root)._parse_results()
+            rerecorded = load_recording(root)
+            self.assertEqual([s.step for s in rerecorded], ["affaire_results", "affaire_parties"])
+            self.assertEqual(rerecorded[1].html_path.read_text(encoding="utf-8"),
+                             self.steps["affaire_parties"].html_path.read_text(encoding="utf-8"))
+
+        expected = json.loads(self.steps["affaire_results"].dom_expected_path.read_text(encoding="utf-8"))
+        expected["parties"] = json.loads(self.steps["affaire_parties"].dom_expected_path.read_text(encoding="utf-8"))
+        self.assertEqual(to_jsonable(parsed), expected)
+
+    def test_contumace_page(self):
+        known = {("2025/2601/16", "محكمة الاستئناف بفاس")}
+        records, skipped = self.scraper("contumace_page")._parse_contumace_page(known)
+        self.assertEqual(skipped, 1)
+        self.assertEqual([r["numero_dossier"] for r in records], ["2025/2601/15"])
+        self.assertEqual(records[0]["details_text"], "")
+
+    def test_dom_check_command(self):
+        out = io.StringIO()
+        call_command("mahakim_replay", str(RECORDING), "--dom", "--check", stdout=out)
+        self.assertNotIn("ÉCART", out.getvalue())
+        self.assertNotIn("pas de référence", out.getvalue())
+        self.assertIn(f"{len(self.steps)} étape(s) rejouée(s)", out.getvalue())
@@ -0,0 +1,65 @@
+"""Recherche d'une Partie par téléphone via les colonnes dérivées `telephone_e164` / `telephone_suffix`."""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import Partie
+from ..services import phone_lookup
+
+
+def partie(nom, telephone, **fields):
+    return Partie.objects.create(type_partie="Demandeur", nom_complet=nom, telephone=telephone, **fields)
+
+
+class PhoneKeysTests(TestCase):
+    def test_phone_keys(self):
+        self.assertEqual(phone_lookup.phone_keys("06 12 34 56 78"), ("+212612345678", "12345678"))
+        self.assertEqual(phone_lookup.phone_keys("whatsapp:+212612345678"), ("+212612345678", "12345678"))
+        self.assertEqual(phone_lookup.phone_keys("00212612345678"), ("+212612345678", "12345678"))
+        self.assertEqual(phone_lookup.phone_keys("12345678"), ("", "12345678"))
+        self.assertEqual(phone_lookup.phone_keys(None), ("", ""))
+
+    def test_save_fills_derived_columns(self):
+        p = partie("أحمد", "0612345678")
+        self.assertEqual((p.telephone_e164, p.telephone_suffix), ("+212612345678", "12345678"))
+        p.telephone = "+212 7 00 11 22 33"
+        p.save(update_fields=["telephone"])
+        p.refresh_from_db()
+        self.assertEqual((p.telephone_e164, p.telephone_suffix), ("+212700112233", "00112233"))
+
+
+class FindPartieByPhoneTests(TestCase):
+    def test_any_format_finds_the_partie(self):
+        p = partie("أحمد", "0612345678")
+        for phone in ("whatsapp:+212612345678", "+212 6 12 34 56 78", "00212612345678", "0612345678"):
+            with self.subTest(phone=phone):
+                self.assertEqual(phone_lookup.find_partie_by_phone(phone), p)
+
+    def test_exact_e164_wins_over_older_suffix_match(self):
+        # Même 8 derniers chiffres, indicatif différent
+        older = partie("فاطمة", "+33612345678", created_at=timezone.now() - timedelta(days=1))
+        local = partie("أحمد", "0612345678")
+        self.assertEqual(phone_lookup.find_partie_by_phone("whatsapp:+212612345678"), local)
+        self.assertEqual(phone_lookup.find_partie_by_phone("12345678"), older)
+
+    def test_no_match(self):
+        partie("أحمد", "0612345678")
+        self.assertIsNone(phone_lookup.find_partie_by_phone("+212699999999"))
+        self.assertIsNone(phone_lookup.find_partie_by_phone(""))
+        partie("بدون هاتف", None)
+        self.assertIsNone(phone_lookup.find_partie_by_phone("whatsapp:"))
+
+    def test_soft_deleted_partie_is_ignored(self):
+        partie("أحمد", "0612345678").delete()
+        self.assertIsNone(phone_lookup.find_partie_by_phone("+212612345678"))
+
+    def test_rebuild_backfills_rows_written_outside_the_orm(self):
+        p = partie("أحمد", "0612345678")
+        partie("فاطمة", "")
+        Partie.objects.filter(pk=p.pk).update(telephone_e164="", telephone_suffix="")
+        self.assertIsNone(phone_lookup.find_partie_by_phone("+212612345678"))
+
+        self.assertEqual(phone_lookup.rebuild(batch_size=1), (2, 1))
+        self.assertEqual(phone_lookup.find_partie_by_phone("+212612345678"), p)
+        self.assertEqual(phone_lookup.rebuild(), (2, 0))
@@ -0,0 +1,92 @@
+"""Taxes judiciaires mémoïsées : échantillons du site, règles inférées (estimations) et vérification."""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import BackgroundJob, TaxCalculationSample
+from ..services import tax_engine
+from ..services.tax_engine import infer_rule, parse_total
+
+COMBO = {"nature": "رسوم قضائية", "type_maqal": "مقال افتتاحي", "categorie": "مدني",
+         "type_qadiya": "أداء", "type_talab": ""}
+
+
+def sample(montant, total):
+    return TaxCalculationSample.objects.create(
+        montant=Decimal(montant), bracket=tax_engine.bracket_of(Decimal(montant)), total=Decimal(total),
+        result_text=f"المجموع: {total} درهم", **COMBO)
+
+
+class RuleTests(SimpleTestCase):
+    def test_infer_rule(self):
+        rule = infer_rule([(Decimal(1000), Decimal(110)), (Decimal(5000), Decimal(150)),
+                           (Decimal(9000), Decimal(190))])
+        self.assertEqual((rule.fixed, rule.rate), (Decimal(100), Decimal("0.01")))
+        self.assertEqual(rule.total(Decimal(2500)), Decimal("125.00"))
+        self.assertFalse(rule.applies(Decimal(9500)))
+        self.assertIsNone(infer_rule([(Decimal(1000), Decimal(110)), (Decimal(5000), Decimal(150)),
+                                      (Decimal(9000), Decimal(500))]))
+
+    def test_parse_total(self):
+        self.assertEqual(parse_total("المبلغ 10000 — المجموع : 1 234,50 درهم"), Decimal("1234.50"))
+        self.assertIsNone(parse_total("10000 درهم"))
+
+
+class LookupTests(TestCase):
+    def setUp(self):
+        tax_engine.memo.clear()
+        self.addCleanup(tax_engine.memo.clear)
+        for montant, total in ((1000, 110), (5000, 150), (9000, 190)):
+            sample(montant, total)
+
+    def test_site_sample_is_verified(self):
+        result = tax_engine.lookup(montant="5000", **COMBO)
+        self.assertEqual((result["total"], result["source"], result["estimate"]), ("150.00", "cache", False))
+        self.assertEqual(tax_engine.lookup(montant="5000", estimates=False, **COMBO), result)
+
+    def test_rule_result_is_an_estimate(self):
+        result = tax_engine.lookup(montant="2500", **COMBO)
+        self.assertEqual((result["total"], result["source"], result["estimate"]), ("125.00", "rule", True))
+        self.assertIn("غير مؤكد", result["result_text"])
+        # Servi depuis la mémoire, toujours comme estimation
+        self.assertTrue(tax_engine.lookup(montant="2500", **COMBO)["estimate"])
+
+    def test_estimates_false_skips_the_rule(self):
+        tax_engine.lookup(montant="2500", **COMBO)
+        self.assertIsNone(tax_engine.lookup(montant="2500", estimates=False, **COMBO))
+
+    def test_site_result_replaces_the_estimate(self):
+        tax_engine.lookup(montant="2500", **COMBO)
+        tax_engine.store(montant="2500", data={"success": True, "result_text": "المجموع: 126,00"}, **COMBO)
+        result = tax_engine.lookup(montant="2500", estimates=False, **COMBO)
+        self.assertEqual((result["total"], result["estimate"]), ("126.00", False))
+
+
+@override_settings(MIDDLEWARE=[m for m in settings.MIDDLEWARE if "idle_token" not in m], JOBS_EMBEDDED_WORKER=False)
+class TaxCalculateViewTests(TestCase):
+    def setUp(self):
+        tax_engine.memo.clear()
+        self.addCleanup(tax_engine.memo.clear)
+        for montant, total in ((1000, 110), (5000, 150), (9000, 190)):
+            sample(montant, total)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        self.client.force_login(get_user_model().objects.create_user("avocat", password="x"))
+
+    def calculate(self, **extra):
+        return self.client.post(reverse("cabinet:tax_calculate"), json.dumps({**COMBO, "montant": "2500", **extra}),
+                                content_type="application/json").json()
+
+    def test_estimate_is_flagged(self):
+        data = self.calculate()
+        self.assertEqual((data["ok"], data["total"], data["estimate"]), (True, "125.00", True))
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_verify_queues_a_site_calculation(self):
+        data = self.calculate(verify=True)
+        job = BackgroundJob.objects.get(pk=data["task_id"])
+        self.assertEqual(job.kind, "mahakim.tax_calculate")
+        self.assertIs(job.payload["estimates"], False)
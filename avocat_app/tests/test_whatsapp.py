@@ -0,0 +1,36 @@
+"""Webhook Twilio WhatsApp en mode asynchrone (mise en file par MessageSid)."""
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import BackgroundJob
+from ..services.whatsapp_bot import INBOUND_JOB
+
+
+@override_settings(
+    MIDDLEWARE=[m for m in settings.MIDDLEWARE if "idle_token" not in m],
+    TWILIO_AUTH_TOKEN="", WHATSAPP_WEBHOOK_ASYNC=True, JOBS_EMBEDDED_WORKER=False,
+)
+class WhatsAppWebhookTests(TestCase):
+    def post(self, sid="SM0001"):
+        return Client(HTTP_HOST="127.0.0.1").post(reverse("cabinet:whatsapp_webhook"), {
+            "From": "whatsapp:+212600000001", "Body": "مرحبا", "ProfileName": "Test", "MessageSid": sid,
+        })
+
+    def test_message_is_queued_once_per_sid(self):
+        for _ in range(2):
+            response = self.post()
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"<Response></Response>", response.content)
+        job = BackgroundJob.objects.get(kind=INBOUND_JOB)
+        self.assertEqual(job.payload["message_sid"], "SM0001")
+        self.assertEqual(job.dedup_key, "whatsapp:SM0001")
+
+    def test_queue_failure_asks_twilio_to_retry(self):
+        with mock.patch("avocat_app.services.whatsapp_bot.enqueue_inbound", side_effect=RuntimeError("db")), \
+                self.assertLogs("avocat_app.views", "ERROR"):
+            response = self.post()
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(BackgroundJob.objects.exists())
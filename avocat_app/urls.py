@@ -214,20 +214,25 @@ urlpatterns = [
     path("mahakim/fetch-ids/", views.fetch_mahakim_ids, name="mahakim_fetch_ids"),
     path("mahakim/fetch-ids-status/", views.fetch_mahakim_ids_status, name="mahakim_fetch_ids_status"),
     path("mahakim/fetch-ids-export/", views.fetch_mahakim_ids_export, name="mahakim_fetch_ids_export"),
+    path("jobs/events/", views.job_events, name="job_events"),
     path("affaires/<uuid:pk>/sync-mahakim/", views.sync_affaire_mahakim, name="affaire_sync_mahakim"),
     path("affaires/<uuid:pk>/sync-preview/", views.mahakim_preview_single, name="mahakim_preview_single"),
     path("mahakim/sync-sessions/", views.sync_sessions_mahakim, name="mahakim_sync_sessions"),
+    path("mahakim/sync-sessions-batch/", views.sync_sessions_batch_mahakim, name="mahakim_sync_sessions_batch"),
     path("mahakim/preview-sessions/", views.mahakim_preview_sessions, name="mahakim_preview_sessions"),
     path("mahakim/tribunaux-pi/", views.get_tribunaux_pi, name="mahakim_tribunaux_pi"),
 
     # ====== المسطرة الغيابية (Contumace) ======
     path("contumace/", views.ContumaceListView.as_view(), name="contumace_list"),
+    path("contumace/lookup/", views.contumace_lookup, name="contumace_lookup"),
     path("mahakim/sync-contumace/", views.sync_contumace_mahakim, name="mahakim_sync_contumace"),
     path("mahakim/sync-contumace-status/", views.contumace_sync_status, name="mahakim_sync_contumace_status"),
     path("mahakim/preview-contumace/", views.mahakim_preview_contumace, name="mahakim_preview_contumace"),
 
     # ====== حاسبة الرسوم القضائية (Tax Calculator — حساب محلي) ======
     path("tax-calculator/", views.TaxCalculatorView.as_view(), name="tax_calculator"),
+    path("tax-calculator/calculate/", views.tax_calculate, name="tax_calculate"),
+    path("tax-calculator/status/", views.tax_calculate_status, name="tax_calculate_status"),
 
     # ====== Document viewer & print ======
     path("viewer/", views.document_viewer, name="document_viewer"),
@@ -255,6 +260,8 @@ urlpatterns = [
 
     # ====== AI — Analyse de décision (Claude) ======
     path("decisions/<uuid:pk>/ai-analyze/", views.decision_ai_analyze, name="decision_ai_analyze"),
+    path("decisions/<uuid:pk>/ai-analyze/status/", views.decision_ai_analyze_status,
+         name="decision_ai_analyze_status"),
 
     # ====== WhatsApp Webhook entrant (Twilio) ======
     path("webhooks/twilio/whatsapp/", views.whatsapp_webhook, name="whatsapp_webhook"),
@@ -4,11 +4,12 @@ from typing import Any, Dict
 from datetime import timedelta
 import calendar
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.db.models import Q, Sum
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.db.models import Case, IntegerField, Q, Sum, When
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
@@ -28,7 +29,7 @@ from .models import (
     Audience, Mesure, Expertise, Decision, Notification, VoieDeRecours,
     Execution, Depense, Recette, PieceJointe, Utilisateur, Tache, Alerte, Expert, Barreau,
     Avertissement, PhaseAffaire, DocumentRequirement, MahakimSyncResult,
-    ContumaceRecord, WhatsAppTemplate, WhatsAppMessage, DecisionAnalysis,
+    ContumaceRecord, WhatsAppTemplate, WhatsAppMessage, DecisionAnalysis, TaxCalculatorCache,
 )
 
 from .filters import AffaireFilter, DepenseFilter, RecetteFilter, PieceJointeFilter, AudienceFilter
@@ -432,79 +433,10 @@ def global_search(request: HttpRequest) -> HttpResponse:
         ctx["too_short"] = True
         return render(request, "_partials/_global_search_results.html", ctx)
 
-    LIMIT = 5
+    # Une requête sur l'index search_document (FTS5 / FULLTEXT), pas de LIKE '%q%'
+    from .services import global_search as search_index
 
-    affaires = (
-        Affaire.objects.select_related("juridiction", "type_affaire")
-        .filter(
-            Q(reference_interne__icontains=q)
-            | Q(reference_tribunal__icontains=q)
-            | Q(numero_dossier__icontains=q)
-            | Q(objet__icontains=q)
-        )[:LIMIT]
-    )
-    parties = (
-        Partie.objects.filter(
-            Q(nom_complet__icontains=q)
-            | Q(telephone__icontains=q)
-            | Q(cin_ou_rc__icontains=q)
-            | Q(email__icontains=q)
-        )[:LIMIT]
-    )
-    juridictions = (
-        Juridiction.objects.filter(
-            Q(nomtribunal_ar__icontains=q)
-            | Q(nomtribunal_fr__icontains=q)
-            | Q(villetribunal_ar__icontains=q)
-            | Q(villetribunal_fr__icontains=q)
-            | Q(code__icontains=q)
-        )[:LIMIT]
-    )
-    avocats = (
-        Avocat.objects.filter(
-            Q(nom__icontains=q) | Q(telephone__icontains=q) | Q(email__icontains=q)
-        )[:LIMIT]
-    )
-
-    groups = []
-    if affaires:
-        groups.append({
-            "label": "القضايا", "icon": "bi-folder2",
-            "items": [{
-                "title": a.reference_interne,
-                "subtitle": f"{a.type_affaire} — {a.juridiction.nomtribunal_ar or a.juridiction.nomtribunal_fr or ''}",
-                "url": a.get_absolute_url(),
-            } for a in affaires],
-        })
-    if parties:
-        groups.append({
-            "label": "الأطراف", "icon": "bi-person",
-            "items": [{
-                "title": p.nom_complet,
-                "subtitle": f"{p.get_type_partie_display()} — {p.telephone or p.cin_ou_rc or p.email or ''}",
-                "url": p.get_absolute_url(),
-            } for p in parties],
-        })
-    if juridictions:
-        groups.append({
-            "label": "المحاكم", "icon": "bi-building",
-            "items": [{
-                "title": j.nomtribunal_ar or j.nomtribunal_fr or j.code,
-                "subtitle": j.villetribunal_ar or j.villetribunal_fr or "",
-                "url": j.get_absolute_url(),
-            } for j in juridictions],
-        })
-    if avocats:
-        groups.append({
-            "label": "المحامون", "icon": "bi-person-badge",
-            "items": [{
-                "title": a.nom,
-                "subtitle": a.telephone or a.email or "",
-                "url": a.get_absolute_url(),
-            } for a in avocats],
-        })
-
-    ctx["groups"] = groups
+    ctx["groups"] = search_index.search(q, per_group=5)
     return render(request, "_partials/_global_search_results.html", ctx)
 
 
@@ -610,9 +542,7 @@ class AffaireDetail(SecureBase, NoPostOnReadOnlyMixin, DetailView):
         ctx["doc_checklist"] = doc_checklist
 
         # Last mahakim sync
-        ctx["last_mahakim_sync"] = (
-            MahakimSyncResult.objects.filter(affaire=affaire).order_by("-date_sync").first()
-        )
+        ctx["last_mahakim_sync"] = mahakim_results.latest_result(affaire.pk)
 
         return ctx
 
@@ -1311,12 +1241,28 @@ class DecisionDetail(SecureBase, DetailView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         try:
-            ctx["analysis"] = self.object.analysis
+            # Manager par défaut : sans l'embedding (inutile à l'affichage)
+            ctx["analysis"] = DecisionAnalysis.all_objects.get(decision=self.object)
         except DecisionAnalysis.DoesNotExist:
             ctx["analysis"] = None
+        # Passage trouvé par la recherche jurisprudentielle (?ps=&pe=) : surligné dans le texte source
+        text = (ctx["analysis"].source_text or "") if ctx["analysis"] else ""
+        try:
+            ps, pe = int(self.request.GET["ps"]), int(self.request.GET["pe"])
+        except (KeyError, ValueError):
+            ps = pe = None
+        if ps is not None and 0 <= ps < pe <= len(text):
+            ctx["source_parts"] = (text[:ps], text[ps:pe], text[pe:])
+        else:
+            ctx["source_parts"] = None
         ctx["pdf_pieces"] = list(
             self.object.affaire.pieces.filter(type_piece="PDF").order_by("-date_ajout")[:20]
         )
+        # Analyse IA en file ou en cours : la page suit la tâche (si lancée par cet utilisateur)
+        from .services.ai_jobs import pending_job
+        from .services.jobs import visible_to
+        ctx["ai_job"] = pending_job(self.object.pk)
+        ctx["ai_job_foreign"] = bool(ctx["ai_job"] and not visible_to(ctx["ai_job"], self.request.user))
         return ctx
 
 class DecisionCreate(UIPermRequiredMixin, SecureBase, HTMXModalFormMixin, CreateView):
@@ -1692,6 +1638,14 @@ class PieceJointeDetail(SecureBase, DetailView):
     template_name = "avocat/piecejointe_detail.html"
     permission_required = "cabinet.view_piecejointe"
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # Texte déjà extrait (services/pdf_text.py) : pas d'extraction pendant la requête
+        from .services import pdf_text
+        row = pdf_text.cached(self.object) if self.object.fichier and pdf_text.is_pdf(self.object) else None
+        ctx["extracted_pages"] = list(enumerate(pdf_text.pages_of(row), start=1)) if row and not row.error else None
+        return ctx
+
 class PieceJointeCreate(UIPermRequiredMixin, SecureBase, ModalCreateView, CreateView):
     ui_perm = "ui_btn_add"
     model = PieceJointe
@@ -2571,23 +2525,21 @@ class AvertissementCreateForAffaire(SecureBase, HTMXModalFormMixin, CreateView):
 # MAHAKIM.MA SYNC — مزامنة مع بوابة محاكم
 # =============================================================
 
-import threading
 import logging as _logging
-import uuid as _uuid
 from io import BytesIO
 
-_mahakim_logger = _logging.getLogger(__name__)
+from .services import contumace_search, mahakim_jobs, mahakim_results, mahakim_sessions, tax_engine
+from .services.job_events import open_stream
+from .services.jobs import enqueue as enqueue_job, get_job, job_snapshot
 
-# --- Background task tracking for fetch_mahakim_ids ---
-_mahakim_fetch_lock = threading.Lock()
-_mahakim_fetch_tasks = {}  # task_id → {status, phase, current, total, name, message, result, errors}
+_mahakim_logger = _logging.getLogger(__name__)
 
 
 @login_required
 def mahakim_preview_single(request, pk):
     """Preview modal before syncing a single affaire."""
     affaire = get_object_or_404(Affaire, pk=pk)
-    last_sync = MahakimSyncResult.objects.filter(affaire=affaire).order_by("-date_sync").first()
+    last_sync = mahakim_results.latest_result(affaire.pk)
     html = render_to_string("modals/_mahakim_preview.html", {
         "mode": "preview_single",
         "affaire": affaire,
@@ -2654,19 +2606,7 @@ def sync_affaire_mahakim(request, pk):
             )
 
 
-        sync_obj = MahakimSyncResult.objects.create(
-            affaire=affaire,
-            sync_type='dossier',
-            statut_mahakim=result.get("statut_mahakim"),
-            prochaine_audience=result.get("prochaine_audience"),
-            juge=result.get("juge"),
-            observations=result.get("observations"),
-            raw_html=(result.get("raw_html") or "")[:50000],
-            success=result.get("success", False),
-            error_message=result.get("error_message"),
-            procedures_json=result.get("procedures") or None,
-            parties_json=result.get("parties") or None,
-        )
+        mahakim_results.save_results([(affaire.pk, result)])
 
         if result["success"]:
             return JsonResponse({
@@ -2723,17 +2663,13 @@ class MahakimSyncListView(SecureBase, NoPostOnReadOnlyMixin, ListView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         # Ajouter le dernier sync pour chaque affaire
-        affaire_ids = [a.pk for a in ctx["object_list"]]
-        latest_syncs = {}
-        for sync in MahakimSyncResult.objects.filter(affaire_id__in=affaire_ids).order_by("affaire_id", "-date_sync"):
-            if sync.affaire_id not in latest_syncs:
-                latest_syncs[sync.affaire_id] = sync
+        latest_syncs = mahakim_results.latest_results(a.pk for a in ctx["object_list"])
         # Build sync_data list for template
         sync_data = []
         for affaire in ctx["object_list"]:
             sync_data.append({
                 "affaire": affaire,
-                "sync": latest_syncs.get(affaire.pk),
+                "sync": latest_syncs.get(str(affaire.pk)),
             })
         ctx["sync_data"] = sync_data
         ctx["total_syncable"] = self.get_queryset().count()
@@ -2741,238 +2677,68 @@ class MahakimSyncListView(SecureBase, NoPostOnReadOnlyMixin, ListView):
 
 
 def sync_all_mahakim(request):
-    """Lance la synchronisation de toutes les affaires en arrière-plan."""
+    """Met en file la synchronisation de toutes les affaires (mode planifié)."""
     if not request.user.is_authenticated:
         return JsonResponse({"ok": False, "message": "غير مسموح"}, status=403)
 
     if request.method != "POST":
         return JsonResponse({"ok": False, "message": "POST فقط"}, status=405)
 
-    from django.core.management import call_command
-
-    def _run_sync():
-        try:
-            call_command("sync_mahakim")
-        except Exception as e:
-            _mahakim_logger.exception("Erreur sync_all_mahakim: %s", e)
-
-    thread = threading.Thread(target=_run_sync, daemon=True)
-    thread.start()
+    job = enqueue_job(mahakim_jobs.SYNC_ALL, {"plan": True}, user=request.user)
 
     return JsonResponse({
         "ok": True,
+        "task_id": str(job.pk),
         "message": "بدأت المزامنة في الخلفية. أعد تحميل الصفحة بعد دقائق لرؤية النتائج.",
     })
 
 
 @login_required
 def fetch_mahakim_ids(request):
-    """Lance la récupération des IDs des tribunaux en arrière-plan."""
+    """Met en file la récupération des IDs des tribunaux."""
     if request.method != "POST":
         return JsonResponse({"ok": False, "message": "POST فقط"}, status=405)
 
-    task_id = str(_uuid.uuid4())
-
-    with _mahakim_fetch_lock:
-        _mahakim_fetch_tasks[task_id] = {
-            "status": "running",
-            "phase": "init",
-            "current": 0,
-            "total": 0,
-            "name": "",
-            "message": "جاري بدء المهمة...",
-            "result": None,
-            "errors": [],
-        }
-
-    def _run_fetch(tid):
-        task = _mahakim_fetch_tasks[tid]
-        try:
-            from .services.mahakim_scraper import MahakimScraper
-
-            def _progress(phase, current, total, name, message):
-                with _mahakim_fetch_lock:
-                    task["phase"] = phase
-                    task["current"] = current
-                    task["total"] = total
-                    task["name"] = name
-                    task["message"] = message
-
-            with MahakimScraper(headless=False, timeout=120) as scraper:
-                data = scraper.fetch_tribunal_ids(progress_callback=_progress)
-
-            # Stocker les données brutes pour export Excel
-            with _mahakim_fetch_lock:
-                task["message"] = "جاري تحديث قاعدة البيانات..."
-                task["phase"] = "saving"
-
-            # Matching avec la BD
-            matched = 0
-            unmatched = []
-
-            for item in data.get("appel", []):
-                name = item.get("name", "").strip()
-                mahakim_id = str(item.get("id", "")).strip()
-                if not name or not mahakim_id:
-                    continue
-                qs = Juridiction.objects.filter(
-                    nomtribunal_ar__icontains=name, TribunalParent__isnull=True
-                )
-                if not qs.exists():
-                    qs = Juridiction.objects.filter(nomtribunal_ar__icontains=name)
-                if qs.exists():
-                    qs.update(id_mahakim=mahakim_id)
-                    matched += qs.count()
-                else:
-                    unmatched.append(name)
-
-            inserted = 0
-            import re as _re
-
-            def _normalize_ar(text):
-                """Normalize Arabic: alef variants → ا, remove diacritics."""
-                if not text:
-                    return ''
-                text = _re.sub('[إأآٱ]', 'ا', text)
-                text = _re.sub('[\u064B-\u065F\u0670]', '', text)
-                return _re.sub(r'\s+', ' ', text).strip()
-
-            for item in data.get("premiere_instance", []):
-                name = item.get("name", "").strip()
-                mahakim_id = str(item.get("id", "")).strip()
-                parent_name = item.get("parent_appel_name", "").strip()
-                if not name or not mahakim_id:
-                    continue
-
-                # Resolve parent appeal court
-                parent_jur = None
-                if parent_name:
-                    parent_jur = Juridiction.objects.filter(
-                        nomtribunal_ar__icontains=parent_name,
-                        TribunalParent__isnull=True,
-                    ).first()
-
-                # 1. Try exact icontains match (with parent)
-                qs = Juridiction.objects.filter(
-                    nomtribunal_ar__icontains=name, TribunalParent__isnull=False
-                )
-                if parent_name and qs.count() > 1:
-                    qs_refined = qs.filter(TribunalParent__nomtribunal_ar__icontains=parent_name)
-                    if qs_refined.exists():
-                        qs = qs_refined
-
-                # 2. Fallback: try without parent filter
-                if not qs.exists():
-                    qs = Juridiction.objects.filter(nomtribunal_ar__icontains=name)
-
-                # 3. Fallback: normalized matching (handles alef/hamza differences)
-                if not qs.exists():
-                    norm_name = _normalize_ar(name)
-                    for j in Juridiction.objects.filter(is_deleted=False).exclude(
-                        nomtribunal_ar__icontains='استئناف'
-                    ):
-                        if _normalize_ar(j.nomtribunal_ar) == norm_name:
-                            qs = Juridiction.objects.filter(pk=j.pk)
-                            break
-
-                if qs.exists():
-                    # Update id_mahakim AND TribunalParent if missing
-                    update_fields = {'id_mahakim': mahakim_id}
-                    if parent_jur:
-                        update_fields['TribunalParent'] = parent_jur
-                    qs.filter(TribunalParent__isnull=True).update(**update_fields)
-                    qs.filter(TribunalParent__isnull=False).update(id_mahakim=mahakim_id)
-                    matched += qs.count()
-                else:
-                    # Auto-insert: create new Juridiction linked to parent cour d'appel
-                    if parent_jur:
-                        from .models import TypeJuridiction
-                        type_pi = TypeJuridiction.objects.filter(code_type="TPI").first()
-                        if type_pi:
-                            Juridiction.objects.create(
-                                code=mahakim_id,
-                                nomtribunal_ar=name,
-                                nomtribunal_fr=name,
-                                type=type_pi,
-                                TribunalParent=parent_jur,
-                                id_mahakim=mahakim_id,
-                            )
-                            inserted += 1
-                            matched += 1
-                        else:
-                            unmatched.append(name)
-                    else:
-                        unmatched.append(name)
-
-            total_fetched = len(data.get("appel", [])) + len(data.get("premiere_instance", []))
-
-            msg_parts = [f"تم جلب {total_fetched} محكمة", f"تم ربط {matched}"]
-            if inserted:
-                msg_parts.append(f"تم إنشاء {inserted} محكمة جديدة")
-            if unmatched:
-                msg_parts.append(f"لم يُطابَق {len(unmatched)}")
-
-            with _mahakim_fetch_lock:
-                task["status"] = "done"
-                task["phase"] = "done"
-                task["message"] = " — ".join(msg_parts)
-                task["result"] = {
-                    "appel": data.get("appel", []),
-                    "premiere_instance": data.get("premiere_instance", []),
-                    "matched": matched,
-                    "inserted": inserted,
-                    "unmatched": unmatched,
-                    "total_fetched": total_fetched,
-                }
-                task["errors"] = data.get("errors", [])
-
-        except ImportError:
-            with _mahakim_fetch_lock:
-                task["status"] = "error"
-                task["message"] = "مكتبة Selenium غير مثبتة. قم بتثبيتها: pip install selenium"
-        except Exception as e:
-            _mahakim_logger.exception("Erreur fetch_mahakim_ids: %s", e)
-            with _mahakim_fetch_lock:
-                task["status"] = "error"
-                task["message"] = f"خطأ: {str(e)[:200]}"
-
-    thread = threading.Thread(target=_run_fetch, args=(task_id,), daemon=True)
-    thread.start()
-
-    return JsonResponse({"ok": True, "task_id": task_id})
+    job = enqueue_job(
+        mahakim_jobs.FETCH_IDS,
+        user=request.user,
+        progress={"phase": "init", "current": 0, "total": 0, "name": ""},
+        message="جاري بدء المهمة...",
+    )
+    return JsonResponse({"ok": True, "task_id": str(job.pk)})
 
 
 @login_required
 def fetch_mahakim_ids_status(request):
     """Retourne le statut de la tâche fetch_mahakim_ids (polling)."""
-    task_id = request.GET.get("task_id", "")
-    with _mahakim_fetch_lock:
-        task = _mahakim_fetch_tasks.get(task_id)
-    if not task:
+    job = get_job(request.GET.get("task_id", ""), kind=mahakim_jobs.FETCH_IDS, user=request.user)
+    if not job:
         return JsonResponse({"ok": False, "message": "مهمة غير موجودة"}, status=404)
+    return JsonResponse(job_snapshot(job))
 
-    with _mahakim_fetch_lock:
-        return JsonResponse({
-            "ok": True,
-            "status": task["status"],
-            "phase": task["phase"],
-            "current": task["current"],
-            "total": task["total"],
-            "name": task["name"],
-            "message": task["message"],
-            "errors": task.get("errors", []),
-            "result": task.get("result") if task["status"] == "done" else None,
-        })
+
+@login_required
+def job_events(request):
+    """Flux SSE de progression d'une tâche (remplace le polling des endpoints de statut)."""
+    job = get_job(request.GET.get("task_id", ""), user=request.user)
+    if not job:
+        return JsonResponse({"ok": False, "message": "مهمة غير موجودة"}, status=404)
+    stream = open_stream(job)
+    if stream is None:
+        # EventSource abandonne sur un statut ≠ 200 : la page bascule sur le polling
+        return JsonResponse({"ok": False, "message": "الخادم مشغول، يتم التحديث دوريا"}, status=503)
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx : pas de mise en tampon
+    return response
 
 
 @login_required
 def fetch_mahakim_ids_export(request):
     """Exporte les résultats du fetch en Excel."""
-    task_id = request.GET.get("task_id", "")
-    with _mahakim_fetch_lock:
-        task = _mahakim_fetch_tasks.get(task_id)
+    job = get_job(request.GET.get("task_id", ""), kind=mahakim_jobs.FETCH_IDS, user=request.user)
 
-    if not task or task["status"] != "done" or not task.get("result"):
+    if not job or job.status != job.DONE or not job.result:
         return JsonResponse({"ok": False, "message": "لا توجد نتائج للتصدير"}, status=404)
 
     try:
@@ -2981,7 +2747,7 @@ def fetch_mahakim_ids_export(request):
     except ImportError:
         return JsonResponse({"ok": False, "message": "مكتبة openpyxl غير مثبتة"}, status=500)
 
-    result = task["result"]
+    result = job.result
     wb = openpyxl.Workbook()
 
     header_font = Font(bold=True, color="FFFFFF", size=12)
@@ -3102,7 +2868,11 @@ def get_tribunaux_pi(request):
 
 @login_required
 def sync_sessions_mahakim(request):
-    """Sync session schedule from mahakim.ma for a given court + date."""
+    """Sync session schedule from mahakim.ma for a given court + date.
+
+    Le programme est relu depuis `SessionSchedule` s'il a été récupéré depuis
+    moins de MAHAKIM_SESSIONS_TTL_HOURS ; sinon il est scrapé puis enregistré.
+    """
     if request.method != "POST":
         return JsonResponse({"ok": False, "message": "POST فقط"}, status=405)
 
@@ -3114,7 +2884,8 @@ def sync_sessions_mahakim(request):
 
     juridiction_id = body.get("juridiction_id")
     date_seance = body.get("date")
-    type_seance = body.get("type_seance") or None
+    type_seance = body.get("type_seance") or ""
+    refresh = bool(body.get("refresh"))
 
     if not juridiction_id or not date_seance:
         return JsonResponse({
@@ -3123,81 +2894,109 @@ def sync_sessions_mahakim(request):
         })
 
     try:
-        juridiction = Juridiction.objects.get(pk=juridiction_id)
-    except Juridiction.DoesNotExist:
+        juridiction = Juridiction.objects.select_related("TribunalParent").get(pk=juridiction_id)
+    except (Juridiction.DoesNotExist, ValueError):
         return JsonResponse({"ok": False, "message": "المحكمة غير موجودة"})
 
     try:
-        from .services.mahakim_scraper import MahakimScraper
+        day = mahakim_sessions.parse_date(date_seance)
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "تاريخ غير صالح"})
 
-        # Auto-resolve parent appeal court for first-instance tribunals
-        is_premiere = bool(juridiction.TribunalParent)
-        nom_tribunal = juridiction.nomtribunal_ar
+    schedule = None if refresh else mahakim_sessions.fresh_schedule(juridiction.pk, day, type_seance)
+    cached = schedule is not None
 
-        if is_premiere:
-            # First-instance court → use parent appeal court for scraping
-            parent = juridiction.TribunalParent
-            nom_tribunal_appel = parent.nomtribunal_ar
-            id_mahakim = parent.id_mahakim or juridiction.id_mahakim or None
-        else:
-            # Already an appeal court (or CC)
-            nom_tribunal_appel = None
-            id_mahakim = juridiction.id_mahakim or None
-
-        with MahakimScraper(headless=False, timeout=30) as scraper:
-            result = scraper.scrape_sessions(
-                id_mahakim_tribunal=id_mahakim,
-                date_seance=date_seance,
-                type_seance=type_seance,
-                is_premiere_instance=is_premiere,
-                nom_tribunal=nom_tribunal,
-                nom_tribunal_appel=nom_tribunal_appel,
-            )
-
-        # Store sync result
-        MahakimSyncResult.objects.create(
-            sync_type='sessions',
-            statut_mahakim=f"جلسات {juridiction.nomtribunal_ar} — {date_seance}",
-            observations=f"{len(result.get('sessions', []))} جلسة",
-            raw_html=(result.get("raw_html") or "")[:50000],
-            success=result.get("success", False),
-            error_message=result.get("error_message"),
-            procedures_json=result.get("sessions"),
-        )
+    if schedule is None:
+        try:
+            from .services.mahakim_scraper import MahakimScraper
 
-        if result["success"]:
+            with MahakimScraper(headless=False, timeout=30) as scraper:
+                result = scraper.scrape_sessions(
+                    date_seance=day,
+                    type_seance=type_seance or None,
+                    **mahakim_sessions.session_target(juridiction),
+                )
+            schedule = mahakim_sessions.save_schedule(juridiction.pk, day, type_seance, result)
+        except ImportError:
             return JsonResponse({
-                "ok": True,
-                "message": f"تم جلب {len(result.get('sessions', []))} جلسة",
-                "sessions": result.get("sessions", []),
+                "ok": False,
+                "message": "مكتبة Selenium غير مثبتة. قم بتثبيتها: pip install selenium",
             })
-        else:
+        except Exception as e:
+            _mahakim_logger.exception("Erreur sync sessions mahakim")
             return JsonResponse({
                 "ok": False,
-                "message": result.get("error_message", "فشلت المزامنة"),
+                "message": f"خطأ: {str(e)[:200]}",
             })
 
-    except ImportError:
+    if not schedule.success:
         return JsonResponse({
             "ok": False,
-            "message": "مكتبة Selenium غير مثبتة. قم بتثبيتها: pip install selenium",
-        })
-    except Exception as e:
-        _mahakim_logger.exception("Erreur sync sessions mahakim")
-        return JsonResponse({
-            "ok": False,
-            "message": f"خطأ: {str(e)[:200]}",
+            "message": schedule.error_message or "فشلت المزامنة",
         })
 
+    matches = mahakim_sessions.matches_for(schedule)
+    message = f"تم جلب {schedule.sessions_count} جلسة"
+    if cached:
+        message += f" (محفوظ {timezone.localtime(schedule.fetched_at):%H:%M})"
+    if matches:
+        message += f" — {len(matches)} ملف من قضايا المكتب"
+    return JsonResponse({
+        "ok": True,
+        "message": message,
+        "cached": cached,
+        "sessions": schedule.sessions,
+        "matches": matches,
+    })
+
+
+@login_required
+def sync_sessions_batch_mahakim(request):
+    """Met en file la récupération des programmes de plusieurs juridictions sur une période."""
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "message": "POST فقط"}, status=405)
+
+    import json as _j
+    try:
+        body = _j.loads(request.body)
+    except (ValueError, TypeError):
+        return JsonResponse({"ok": False, "message": "طلب غير صالح"}, status=400)
+
+    ids = [int(x) for x in body.get("juridiction_ids") or [] if str(x).isdigit()]
+    try:
+        dates = mahakim_sessions.date_range(body.get("date_from"), body.get("date_to") or body.get("date_from"))
+    except ValueError:
+        return JsonResponse({"ok": False, "message": "تاريخ غير صالح"})
+    if not ids or not dates:
+        return JsonResponse({"ok": False, "message": "يجب اختيار المحاكم والفترة"})
+    if len(dates) > 31:
+        return JsonResponse({"ok": False, "message": "الفترة القصوى 31 يوما"})
+    try:
+        workers = max(1, min(int(body.get("workers") or 1), 4))
+    except (ValueError, TypeError):
+        return JsonResponse({"ok": False, "message": "عدد المتصفحات غير صالح"})
+
+    job = enqueue_job(
+        mahakim_jobs.SYNC_SESSIONS,
+        {
+            "juridiction_ids": ids,
+            "date_from": dates[0].isoformat(),
+            "date_to": dates[-1].isoformat(),
+            "type_seance": body.get("type_seance") or "",
+            "workers": workers,
+            "refresh": bool(body.get("refresh")),
+        },
+        user=request.user,
+        progress={"phase": "init", "current": 0, "total": len(ids) * len(dates)},
+        message="جاري بدء المهمة...",
+    )
+    return JsonResponse({"ok": True, "task_id": str(job.pk)})
+
 
 # =============================================================
 # المسطرة الغيابية — CONTUMACE SYNC
 # =============================================================
 
-_contumace_sync_lock = threading.Lock()
-_contumace_sync_tasks = {}  # task_id → {status, phase, current_page, total_pages, records_count, message}
-
-
 class ContumaceListView(SecureBase, SearchListMixin, ListView):
     model = ContumaceRecord
     template_name = "cabinet/contumace_list.html"
@@ -3205,6 +3004,17 @@ class ContumaceListView(SecureBase, SearchListMixin, ListView):
     paginate_by = 50
     permission_required = ''
     search_fields = ["nom_accuse", "numero_dossier", "cour_appel", "numero_carte", "nom_pere", "nom_mere"]
+    search_limit = 500
+
+    def get_queryset(self):
+        q = self.get_search_query()
+        if not q:
+            return super().get_queryset()
+        # Index de trigrammes normalisés (tolère les variantes d'orthographe arabe)
+        ranked = contumace_search.search(q, limit=self.search_limit)
+        order = Case(*[When(pk=pk, then=pos) for pos, (pk, _) in enumerate(ranked)],
+                     output_field=IntegerField())
+        return ContumaceRecord.objects.filter(pk__in=[pk for pk, _ in ranked]).order_by(order)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -3212,6 +3022,37 @@ class ContumaceListView(SecureBase, SearchListMixin, ListView):
         return ctx
 
 
+@login_required
+def contumace_lookup(request):
+    """Recherche approchée JSON dans المسطرة الغيابية (?q=...&limit=20)."""
+    q = (request.GET.get("q") or "").strip()
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), 100))
+    except ValueError:
+        limit = 20
+    if not q:
+        return JsonResponse({"ok": True, "results": []})
+    ranked = contumace_search.search(q, limit=limit)
+    records = ContumaceRecord.objects.in_bulk([pk for pk, _ in ranked])
+    results = []
+    for pk, score in ranked:
+        rec = records.get(pk)
+        if not rec:
+            continue
+        results.append({
+            "id": str(rec.pk),
+            "nom_accuse": rec.nom_accuse,
+            "nom_pere": rec.nom_pere or "",
+            "nom_mere": rec.nom_mere or "",
+            "numero_dossier": rec.numero_dossier,
+            "numero_carte": rec.numero_carte or "",
+            "cour_appel": rec.cour_appel,
+            "date_sync": rec.date_sync.isoformat() if rec.date_sync else None,
+            "score": round(score, 3),
+        })
+    return JsonResponse({"ok": True, "results": results})
+
+
 @login_required
 def mahakim_preview_contumace(request):
     """Returns modal HTML for contumace sync explanation + optional search."""
@@ -3233,123 +3074,23 @@ def sync_contumace_mahakim(request):
 
     search_query = (body.get("search_query") or "").strip() or None
 
-    task_id = str(_uuid.uuid4())
-
-    with _contumace_sync_lock:
-        _contumace_sync_tasks[task_id] = {
-            "status": "running",
-            "phase": "init",
-            "current_page": 0,
-            "total_pages": 0,
-            "records_count": 0,
-            "message": "جاري بدء المهمة...",
-        }
-
-    def _run_contumace(tid):
-        task = _contumace_sync_tasks[tid]
-        scraper = None
-        try:
-            from .services.mahakim_scraper import MahakimScraper
-
-            def _progress(phase, current_page, total_pages, records_count, message):
-                with _contumace_sync_lock:
-                    task["phase"] = phase
-                    task["current_page"] = current_page
-                    task["total_pages"] = total_pages
-                    task["records_count"] = records_count
-                    task["message"] = message
-
-            # Load existing (numero_dossier, cour_appel) keys from DB
-            # so the scraper can skip records that are already stored
-            existing_keys = set(
-                ContumaceRecord.objects.values_list('numero_dossier', 'cour_appel')
-            )
-
-            # Don't use 'with' — on error we keep the browser open for debugging
-            scraper = MahakimScraper(headless=False, timeout=60)
-            scraper._create_driver()
-            data = scraper.scrape_contumace(
-                search_query=search_query,
-                progress_callback=_progress,
-                existing_keys=existing_keys,
-            )
-
-            if data["success"]:
-                # Success: close browser, save records
-                scraper.close()
-
-                with _contumace_sync_lock:
-                    task["phase"] = "saving"
-                    task["message"] = "جاري حفظ السجلات في قاعدة البيانات..."
-
-                saved = 0
-                for rec in data.get("records", []):
-                    if not rec.get("numero_dossier"):
-                        continue
-                    ContumaceRecord.objects.update_or_create(
-                        numero_dossier=rec["numero_dossier"],
-                        cour_appel=rec["cour_appel"],
-                        defaults={
-                            "nom_accuse": rec.get("nom_accuse", ""),
-                            "nom_pere": rec.get("nom_pere", ""),
-                            "nom_mere": rec.get("nom_mere", ""),
-                            "numero_carte": rec.get("numero_carte", ""),
-                            "details_text": rec.get("details_text", ""),
-                        }
-                    )
-                    saved += 1
-
-                with _contumace_sync_lock:
-                    task["status"] = "done"
-                    task["phase"] = "done"
-                    task["records_count"] = saved
-                    task["message"] = f"تم جلب وحفظ {saved} سجل بنجاح"
-            else:
-                # Error from scraper: keep browser open for debugging
-                with _contumace_sync_lock:
-                    task["status"] = "error"
-                    task["message"] = (
-                        (data.get("error_message") or "فشلت المزامنة")
-                        + " — المتصفح مفتوح للتشخيص"
-                    )
-
-        except ImportError:
-            with _contumace_sync_lock:
-                task["status"] = "error"
-                task["message"] = "مكتبة Selenium غير مثبتة. قم بتثبيتها: pip install selenium"
-        except Exception as e:
-            _mahakim_logger.exception("Erreur sync contumace: %s", e)
-            # Keep browser open on unexpected error
-            with _contumace_sync_lock:
-                task["status"] = "error"
-                task["message"] = f"خطأ: {str(e)[:200]} — المتصفح مفتوح للتشخيص"
-
-    thread = threading.Thread(target=_run_contumace, args=(task_id,), daemon=True)
-    thread.start()
-
-    return JsonResponse({"ok": True, "task_id": task_id})
+    job = enqueue_job(
+        mahakim_jobs.SYNC_CONTUMACE,
+        {"search_query": search_query},
+        user=request.user,
+        progress={"phase": "init", "current_page": 0, "total_pages": 0, "records_count": 0},
+        message="جاري بدء المهمة...",
+    )
+    return JsonResponse({"ok": True, "task_id": str(job.pk)})
 
 
 @login_required
 def contumace_sync_status(request):
     """Retourne le statut de la tâche sync contumace (polling)."""
-    task_id = request.GET.get("task_id", "")
-    with _contumace_sync_lock:
-        task = _contumace_sync_tasks.get(task_id)
-
-    if not task:
+    job = get_job(request.GET.get("task_id", ""), kind=mahakim_jobs.SYNC_CONTUMACE, user=request.user)
+    if not job:
         return JsonResponse({"ok": False, "message": "مهمة غير موجودة"})
-
-    with _contumace_sync_lock:
-        return JsonResponse({
-            "ok": True,
-            "status": task["status"],
-            "phase": task["phase"],
-            "current_page": task["current_page"],
-            "total_pages": task["total_pages"],
-            "records_count": task["records_count"],
-            "message": task["message"],
-        })
+    return JsonResponse(job_snapshot(job))
 
 
 # =============================================================
@@ -3362,6 +3103,55 @@ class TaxCalculatorView(SecureBase, TemplateView):
     template_name = "cabinet/tax_calculator.html"
     permission_required = ''
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # Options de caisseenligne (prewarm_tax_cache --refresh-options) pour le calcul via tax_calculate
+        cache = TaxCalculatorCache.objects.order_by("-date_sync").first()
+        ctx["portal_tree"] = cache.options_tree if cache else {}
+        return ctx
+
+
+@login_required
+def tax_calculate(request):
+    """Calcul caisseenligne mémoïsé : réponse immédiate si connu localement, sinon tâche en file.
+
+    Une estimation par règle est renvoyée avec `estimate: true` ; `verify`
+    la fait recalculer sur le site.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ok": False, "message": "POST فقط"}, status=405)
+
+    import json as _j
+    try:
+        body = _j.loads(request.body)
+    except (ValueError, TypeError):
+        body = request.POST
+
+    params = {f: (body.get(f) or "").strip() for f in tax_engine.KEY_FIELDS}
+    params["montant"] = str(body.get("montant") or "").strip()
+    if not all(params[f] for f in ("nature", "type_maqal", "categorie", "type_qadiya", "montant")):
+        return JsonResponse({"ok": False, "message": "يرجى ملء جميع الحقول"}, status=400)
+
+    verify = str(body.get("verify") or "").lower() in ("1", "true", "on")
+    found = tax_engine.lookup(**params, estimates=not verify)
+    if found is not None:
+        return JsonResponse({"ok": True, **found})
+
+    if verify:
+        params["estimates"] = False
+    job = enqueue_job(mahakim_jobs.TAX_CALCULATE, params, user=request.user,
+                      message="جاري الحساب عبر بوابة الأداء...")
+    return JsonResponse({"ok": True, "task_id": str(job.pk)})
+
+
+@login_required
+def tax_calculate_status(request):
+    """Retourne le statut de la tâche de calcul caisseenligne (polling)."""
+    job = get_job(request.GET.get("task_id", ""), kind=mahakim_jobs.TAX_CALCULATE, user=request.user)
+    if not job:
+        return JsonResponse({"ok": False, "message": "مهمة غير موجودة"}, status=404)
+    return JsonResponse(job_snapshot(job))
+
 
 # =============================================================
 # DOCUMENT VIEWER (معاينة المرفقات)
@@ -3567,7 +3357,9 @@ def whatsapp_webhook(request: HttpRequest) -> HttpResponse:
     Twilio envoie un POST x-www-form-urlencoded contenant entre autres:
     From, Body, ProfileName, MessageSid, NumMedia.
 
-    Réponse TwiML XML pour que Twilio renvoie le message à l'utilisateur.
+    Mode asynchrone (WHATSAPP_WEBHOOK_ASYNC, défaut) : le message est mis en
+    file (idempotent par MessageSid) et la réponse TwiML est vide ; un worker
+    envoie la réponse par l'API REST. Sinon, réponse TwiML calculée ici.
     """
     from_number = request.POST.get("From", "")
     body = request.POST.get("Body", "")
@@ -3583,7 +3375,20 @@ def whatsapp_webhook(request: HttpRequest) -> HttpResponse:
         # En dev / sans signature → on accepte
         pass
 
-    from .services.whatsapp_bot import handle_inbound_message
+    from .services.whatsapp_bot import enqueue_inbound, handle_inbound_message
+    if getattr(settings, "WHATSAPP_WEBHOOK_ASYNC", True):
+        try:
+            enqueue_inbound(request.POST)
+        except Exception:
+            # 503 : Twilio renverra le message (dédoublonné par MessageSid)
+            _logging.getLogger(__name__).exception("WhatsApp : mise en file impossible (MessageSid=%s)",
+                                                   message_sid)
+            return HttpResponse("Service unavailable", status=503)
+        return HttpResponse(
+            '<?xml version="1.0" encoding="UTF-8"?><Response></Response>',
+            content_type="application/xml",
+        )
+
     try:
         reply = handle_inbound_message(from_number, body,
                                        profile_name=profile_name,
@@ -3645,6 +3450,7 @@ def jurisprudence_search(request: HttpRequest) -> HttpResponse:
                 "affaire": analysis.decision.affaire,
                 "score": round(score, 4),
                 "score_pct": int(round(score * 100)),
+                "passage": analysis.best_passage,
             })
 
     total_indexed = DecisionAnalysis.objects.exclude(embedding__isnull=True).count()
@@ -3734,7 +3540,11 @@ def juridictions_map(request: HttpRequest) -> HttpResponse:
 
 @login_required(login_url=reverse_lazy('authui:login'))
 def decision_ai_analyze(request: HttpRequest, pk) -> HttpResponse:
-    """Lance une analyse IA sur une Decision (texte saisi ou PDF joint)."""
+    """Met en file une analyse IA de la Decision (texte saisi ou PDF joint).
+
+    L'analyse tourne dans la file de tâches (services/ai_jobs.py) ; la page de
+    la décision suit la tâche. Réponse JSON {ok, task_id} aux appels fetch.
+    """
     if request.method != "POST":
         return HttpResponse("Method not allowed", status=405)
 
@@ -3749,18 +3559,31 @@ def decision_ai_analyze(request: HttpRequest, pk) -> HttpResponse:
         except Exception:
             piece_jointe = None
 
-    from .services.ai_client import analyze_decision
-    try:
-        analysis = analyze_decision(decision, source_text=source_text or None, piece_jointe=piece_jointe)
-    except Exception as e:
-        messages.error(request, f"فشل التحليل: {e}")
+    from .services.ai_jobs import start_analysis
+    from .services.jobs import visible_to
+    job = start_analysis(decision, source_text=source_text,
+                         piece_jointe_id=piece_jointe.pk if piece_jointe else None, user=request.user)
+    is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest" or request.headers.get("HX-Request")
+    if not visible_to(job, request.user):
+        # Analyse déjà lancée par un autre utilisateur (une seule tâche par décision)
+        busy = "تحليل هذا الحكم جارٍ بطلب من مستخدم آخر، ستظهر النتيجة عند انتهائه."
+        if is_ajax:
+            return JsonResponse({"ok": False, "message": busy}, status=409)
+        messages.info(request, busy)
         return redirect(reverse("cabinet:decision_detail", kwargs={"pk": pk}))
 
-    if analysis.error_message:
-        messages.warning(request, f"تم الحفظ مع خطأ: {analysis.error_message[:200]}")
-    elif analysis.is_dry_run:
-        messages.info(request, "تمت المحاكاة بنجاح (لم يتم تكوين مفتاح Anthropic).")
-    else:
-        messages.success(request, f"تم التحليل بنجاح بواسطة {analysis.model_used}.")
-
+    if is_ajax:
+        return JsonResponse({"ok": True, "task_id": str(job.pk)})
+    messages.info(request, "تم إطلاق التحليل في الخلفية، ستظهر النتيجة في هذه الصفحة عند انتهائه.")
     return redirect(reverse("cabinet:decision_detail", kwargs={"pk": pk}))
+
+
+@login_required(login_url=reverse_lazy('authui:login'))
+def decision_ai_analyze_status(request: HttpRequest, pk) -> JsonResponse:
+    """Statut de la tâche d'analyse IA de la décision (polling, repli du flux SSE)."""
+    from .services.ai_jobs import ANALYZE_DECISION
+
+    job = get_job(request.GET.get("task_id", ""), kind=ANALYZE_DECISION, user=request.user)
+    if not job or job.payload.get("decision_id") != str(pk):
+        return JsonResponse({"ok": False, "message": "مهمة غير موجودة"}, status=404)
+    return JsonResponse(job_snapshot(job))
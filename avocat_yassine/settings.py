@@ -230,6 +230,9 @@ TWILIO_ACCOUNT_SID = env('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = env('TWILIO_AUTH_TOKEN', default='')
 TWILIO_WHATSAPP_FROM = env('TWILIO_WHATSAPP_FROM', default='')  # ex: +14155238886 (sandbox)
 TWILIO_DRY_RUN = env.bool('TWILIO_DRY_RUN', default=DEBUG)
+# Webhook entrant : mise en file (clé MessageSid) et réponse via l'API REST
+# par un worker ; False → traitement dans la requête et réponse TwiML.
+WHATSAPP_WEBHOOK_ASYNC = env.bool('WHATSAPP_WEBHOOK_ASYNC', default=True)
 
 # =============================
 # Anthropic Claude — Analyse IA des décisions
@@ -238,15 +241,120 @@ TWILIO_DRY_RUN = env.bool('TWILIO_DRY_RUN', default=DEBUG)
 ANTHROPIC_API_KEY = env('ANTHROPIC_API_KEY', default='')
 ANTHROPIC_MODEL = env('ANTHROPIC_MODEL', default='claude-sonnet-4-6')
 ANTHROPIC_DRY_RUN = env.bool('ANTHROPIC_DRY_RUN', default=False)
+# Appels partagés par les threads (analyze_decisions, worker de file) : plafond de
+# requêtes par minute (0 = sans limite), URL de l'API (serveur de test local).
+ANTHROPIC_REQUESTS_PER_MINUTE = env.float('ANTHROPIC_REQUESTS_PER_MINUTE', default=50.0)
+ANTHROPIC_API_URL = env('ANTHROPIC_API_URL', default='https://api.anthropic.com/v1/messages')
+# Cache des résultats (table ai_analysis_cache) : durée de validité en jours, 0 = désactivé.
+AI_ANALYSIS_CACHE_DAYS = env.int('AI_ANALYSIS_CACHE_DAYS', default=180)
+
+# =============================
+# Texte des PDF joints (services/pdf_text.py)
+# =============================
+# Extraction une fois par fichier ; au-delà de PDF_TEXT_PARALLEL_MIN_PAGES pages,
+# plages de PDF_TEXT_PAGES_PER_CHUNK pages réparties sur PDF_TEXT_WORKERS processus
+# (0 = min(4, nombre de CPU)).
+PDF_TEXT_WORKERS = env.int('PDF_TEXT_WORKERS', default=0)
+PDF_TEXT_PARALLEL_MIN_PAGES = env.int('PDF_TEXT_PARALLEL_MIN_PAGES', default=32)
+PDF_TEXT_PAGES_PER_CHUNK = env.int('PDF_TEXT_PAGES_PER_CHUNK', default=16)
 
 # =============================
 # Voyage AI — Embeddings pour la recherche sémantique
 # =============================
 # Sans clé, fallback sur un embedding hash-based déterministe (fonctionne en dev).
 VOYAGE_API_KEY = env('VOYAGE_API_KEY', default='')
+# Réindexation (index_decisions) : textes par requête, plafond de requêtes par
+# minute partagé par les threads (0 = sans limite), URL de l'API (serveur de test).
+VOYAGE_BATCH_SIZE = env.int('VOYAGE_BATCH_SIZE', default=64)
+VOYAGE_REQUESTS_PER_MINUTE = env.float('VOYAGE_REQUESTS_PER_MINUTE', default=240.0)
+VOYAGE_API_URL = env('VOYAGE_API_URL', default='https://api.voyageai.com/v1/embeddings')
+# Cache des embeddings (services/embedding_cache.py) : LRU par processus, puis
+# table partagée bornée (éviction des lignes les moins récemment utilisées).
+EMBEDDING_CACHE_MEMORY_ITEMS = env.int('EMBEDDING_CACHE_MEMORY_ITEMS', default=2048)
+EMBEDDING_CACHE_MAX_ROWS = env.int('EMBEDDING_CACHE_MAX_ROWS', default=200000)
+# Format binaire des embeddings écrits (float32 | float16 | int8) : float16 divise
+# la taille par 2, int8 (avec échelle) par 4, au prix d'une petite perte de précision.
+EMBEDDING_STORAGE = env('EMBEDDING_STORAGE', default='float32')
+# Index vectoriel en mémoire (services/vector_index.py) : relecture des
+# embeddings modifiés par les autres processus, reconstruction complète.
+VECTOR_INDEX_REFRESH_SECONDS = env.float('VECTOR_INDEX_REFRESH_SECONDS', default=30.0)
+VECTOR_INDEX_MAX_AGE_SECONDS = env.float('VECTOR_INDEX_MAX_AGE_SECONDS', default=3600.0)
+# Index approché sur disque (services/ann_index.py, `rebuild_ann_index`) : construit
+# pour les modèles d'au moins ANN_MIN_VECTORS embeddings, sous MEDIA_ROOT/embeddings
+# si ANN_INDEX_DIR est vide. ANN_NPROBE listes parcourues par requête (rappel ↔
+# latence) ; ANN_NLIST listes par build (0 → √n).
+ANN_INDEX_DIR = env('ANN_INDEX_DIR', default='')
+ANN_MIN_VECTORS = env.int('ANN_MIN_VECTORS', default=50000)
+ANN_NPROBE = env.int('ANN_NPROBE', default=16)
+ANN_NLIST = env.int('ANN_NLIST', default=0)
+ANN_MAX_UPDATES = env.int('ANN_MAX_UPDATES', default=20000)
+# Recherche hybride (services/lexical_index.py) : candidats BM25 fusionnés avec
+# les candidats vectoriels par reciprocal rank fusion. SEARCH_RRF_K : plus petit,
+# plus les premiers rangs de chaque liste pèsent (mesure : bench_hybrid_search).
+SEARCH_HYBRID = env.bool('SEARCH_HYBRID', default=True)
+SEARCH_RRF_K = env.int('SEARCH_RRF_K', default=10)
+# Passages des textes sources (services/passages.py) : découpage en fenêtres
+# de PASSAGE_CHARS caractères (recouvrement PASSAGE_OVERLAP), au plus
+# PASSAGE_MAX_PER_DECISION par analyse, vecteurs stockés en float16.
+PASSAGE_CHARS = env.int('PASSAGE_CHARS', default=2000)
+PASSAGE_OVERLAP = env.int('PASSAGE_OVERLAP', default=200)
+PASSAGE_MAX_PER_DECISION = env.int('PASSAGE_MAX_PER_DECISION', default=32)
+PASSAGE_EMBEDDING_STORAGE = env('PASSAGE_EMBEDDING_STORAGE', default='float16')
 
 PORTAIL_COOKIE_SECRET = env('PORTAIL_COOKIE_SECRET', default=SECRET_KEY)
 
+# =============================
+# mahakim.ma — synchronisation par lots (sync_mahakim)
+# =============================
+# Délai minimal entre deux recherches, partagé par tous les workers --workers N.
+MAHAKIM_MIN_INTERVAL_SECONDS = env.float('MAHAKIM_MIN_INTERVAL_SECONDS', default=2.0)
+# Fichier de reprise (vide → MEDIA_ROOT/mahakim/sync_checkpoint.json).
+MAHAKIM_SYNC_CHECKPOINT = env('MAHAKIM_SYNC_CHECKPOINT', default='')
+# Planificateur (--plan) : âge minimal avant resynchronisation et durée moyenne
+# d'une recherche (conversion d'un budget temps --budget=30m en nombre d'affaires).
+MAHAKIM_PLAN_MIN_AGE_HOURS = env.float('MAHAKIM_PLAN_MIN_AGE_HOURS', default=6.0)
+MAHAKIM_PLAN_SECONDS_PER_AFFAIRE = env.float('MAHAKIM_PLAN_SECONDS_PER_AFFAIRE', default=25.0)
+# المسطرة الغيابية : page de reprise (vide → MEDIA_ROOT/mahakim/contumace_checkpoint.json),
+# ignorée au-delà de cet âge (la liste du site a pu changer entre-temps).
+MAHAKIM_CONTUMACE_CHECKPOINT = env('MAHAKIM_CONTUMACE_CHECKPOINT', default='')
+MAHAKIM_CONTUMACE_CHECKPOINT_HOURS = env.float('MAHAKIM_CONTUMACE_CHECKPOINT_HOURS', default=24.0)
+# جدول الجلسات : durée pendant laquelle un programme (juridiction, date) déjà
+# récupéré est resservi depuis la base sans retourner sur le site.
+MAHAKIM_SESSIONS_TTL_HOURS = env.float('MAHAKIM_SESSIONS_TTL_HOURS', default=6.0)
+# Rétention des résultats de synchronisation (prune_mahakim_syncs) ; le dernier
+# résultat de chaque affaire est toujours conservé.
+MAHAKIM_SYNC_RETENTION_DAYS = env.int('MAHAKIM_SYNC_RETENTION_DAYS', default=180)
+
+# =============================
+# File de tâches (BackgroundJob) — scraping et traitements longs
+# =============================
+# Worker embarqué (desktop, développement) : un thread par voie et par processus
+# web vide la file à la demande. En production, `manage.py run_workers --lane
+# interactive` et `--lane batch` sont requis en service, et ceci à False.
+JOBS_EMBEDDED_WORKER = env.bool('JOBS_EMBEDDED_WORKER', default=True)
+JOBS_HEARTBEAT_SECONDS = 15      # battement de cœur d'une tâche en cours
+JOBS_STALE_SECONDS = 120         # sans battement au-delà → tâche reprogrammée
+JOBS_RETRY_BACKOFF_SECONDS = 30  # délai avant nouvelle tentative (doublé à chaque échec)
+JOBS_RETENTION_DAYS = 7          # tâches terminées conservées (purge par run_workers)
+# Flux SSE de progression (/jobs/events/) : un lecteur en base par processus,
+# partagé par tous les onglets ; flux fermé (puis rouvert par le navigateur)
+# après JOBS_SSE_MAX_SECONDS pour ne pas monopoliser un worker.
+JOBS_SSE_POLL_SECONDS = 1.0
+JOBS_SSE_MAX_SECONDS = 300
+# Flux ouverts simultanément par processus (un thread chacun) ; au-delà, polling.
+JOBS_SSE_MAX_STREAMS = env.int('JOBS_SSE_MAX_STREAMS', default=8)
+# Désactivé par défaut : avec des workers gunicorn `sync`, chaque flux bloque un
+# worker entier. À activer seulement avec `--worker-class gthread` (ou ASGI).
+JOBS_SSE_ENABLED = env.bool('JOBS_SSE_ENABLED', default=False)
+
+# =============================
+# Calculateur de taxes judiciaires (services/tax_engine.py)
+# =============================
+# Échantillons concordants requis pour déduire la formule d'une combinaison.
+TAX_RULE_MIN_SAMPLES = env.int('TAX_RULE_MIN_SAMPLES', default=3)
+# Montants calculés par `prewarm_tax_cache` pour chaque combinaison.
+TAX_PREWARM_AMOUNTS = [1000, 5000, 10000, 20000, 50000, 100000, 500000, 1000000]
+
 # =============================
 # REST API (sync local <-> serveur)
 # =============================
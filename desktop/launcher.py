@@ -13,6 +13,7 @@ Bundle (later phase):
     pyinstaller desktop/avocat_desktop.spec
 """
 import logging
+import multiprocessing
 import os
 import socket
 import sys
@@ -94,4 +95,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # frozen build: spawned children must not re-run main()
     main()
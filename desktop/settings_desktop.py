@@ -56,7 +56,16 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": str(DESKTOP_DATA_DIR / "local.sqlite3"),
-        "OPTIONS": {"timeout": 20},
+        # IMMEDIATE: take the write lock at BEGIN. Queue workers and request
+        # threads write concurrently; a deferred transaction that reads then
+        # writes (claiming a job, update_or_create, enqueue with a dedup key)
+        # would otherwise fail at once with "database is locked" instead of
+        # waiting `timeout`.
+        "OPTIONS": {"timeout": 20, "transaction_mode": "IMMEDIATE"},
+        # File-backed test database: with the shared-cache in-memory one,
+        # writes from worker threads (reindex_decisions, analyze_decisions) fail
+        # with "database table is locked" instead of waiting for the lock.
+        "TEST": {"NAME": str(DESKTOP_DATA_DIR / "test.sqlite3")},
     }
 }
 
@@ -75,6 +84,10 @@ STATIC_ROOT = str(DESKTOP_DATA_DIR / "static")
 DEBUG = False
 ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
 
+# runserver gives each request its own thread: job progress streams (SSE)
+# cannot starve the other requests.
+JOBS_SSE_ENABLED = True
+
 # The desktop launcher serves over plain HTTP on localhost; flipping the
 # Secure flags off lets session, csrf and auth_token cookies survive the
 # embedded webview round-trip. The exposure is local to the device only.